@@ -1010,6 +1010,8 @@ router.post('/upload', upload.single('file'), async (req, res) => {
         // Ensure Paddle is enabled by default
         ENABLE_PADDLE_OCR: process.env.ENABLE_PADDLE_OCR || '1',
         PADDLE_ON_PDF: process.env.PADDLE_ON_PDF || '1',
+        // Latency budget for the extractor cascade; slow stages are skipped so a partial result still returns in time
+        PROCESS_FILE_BUDGET_MS: process.env.PROCESS_FILE_BUDGET_MS || '25000',
   // Paddle caches
   PPDX_HOME: process.env.PPDX_HOME || paddlexHome,
   PADDLE_HOME: process.env.PADDLE_HOME || paddleHome,
@@ -25,11 +25,27 @@ def batch_convert_years():
         print("Please place your Shopee data in shopee_data.json")
         return
     
-    # Load the main data file
+    # Import the conversion helpers
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            all_data = json.load(f)
-        print(f"📊 Loaded {len(all_data)} total records")
+        from convert_shopee_data import (
+            aggregate_shopee_record,
+            finalize_aggregated_products,
+            iter_shopee_data_from_file,
+            save_forecast_data,
+        )
+    except ImportError:
+        print("❌ Error: convert_shopee_data.py not found!")
+        return
+    
+    # Stream the main data file once, folding every record into each year's aggregate
+    aggregates = {year: {} for year in years}
+    record_count = 0
+    try:
+        for item in iter_shopee_data_from_file(input_file):
+            record_count += 1
+            for year in years:
+                aggregate_shopee_record(aggregates[year], item, target_year=year)
+        print(f"📊 Loaded {record_count} total records")
     except Exception as e:
         print(f"❌ Error loading {input_file}: {e}")
         return
@@ -38,15 +54,8 @@ def batch_convert_years():
     for year in years:
         print(f"\n🔄 Processing year {year}...")
         
-        # Import the conversion function
-        try:
-            from convert_shopee_data import convert_shopee_data_to_forecast_json, save_forecast_data
-        except ImportError:
-            print("❌ Error: convert_shopee_data.py not found!")
-            return
-        
         # Convert data for this year
-        year_data = convert_shopee_data_to_forecast_json(all_data, target_year=year)
+        year_data = finalize_aggregated_products(aggregates[year])
         
         if year_data:
             # Save year-specific file
@@ -0,0 +1,210 @@
+"""
+Benchmark: coarse-to-fine OCR of scanned pages (process_file._coarse_to_fine_ocr, OCR_COARSE_TO_FINE=1).
+
+Writes bench_invoices orders as scanned (image-only) PDFs and reads every page two ways:
+
+    full page     the whole page rendered at the fine scale (ROI_SCALE, default 3.0) and OCR'd
+    coarse/fine   one pass at --coarse-dpi to find the items table and the totals block, then
+                  only those bands rendered at the fine scale and OCR'd
+
+Reported per document: OCR'd pixels per stage and the share saved, render + OCR ms per stage,
+items recovered from the fine frames (matched on qty and subtotal against the ground truth)
+and whether the grand total line made it into the page text. A last in-process
+process_file() run with OCR_COARSE_TO_FINE=1 shows diagnostics['ocrCoarseToFine'].
+
+Without --ocr, Tesseract is stood in for by the digital twin's text layer: a rendered image
+reads as the words inside its clip, in its pixels, and words under --legible-px pixels tall
+come back garbled (a coarse pass at too low a dpi loses the anchors). Times then cover
+rendering and parsing only and pixels are the OCR cost proxy; --ocr runs the real Tesseract
+(pytesseract and the tesseract binary). Usage:
+
+    python bench_coarse_to_fine.py [--cases 5,24,60] [--coarse-dpi 100] [--fine-scale 3.0]
+                                   [--legible-px 9] [--ocr] [--seed 7] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import bench_invoices  # noqa: E402
+from bench_invoices import _match, make_order, write_digital_pdf, write_scanned_pdf  # noqa: E402
+
+
+class TextLayerOCR:
+    """
+    Tesseract stand-in: images rendered through _PageRaster are read from the digital twin's
+    words inside their clip
+    """
+
+    def __init__(self, legible_px):
+        self.legible_px = legible_px
+        self.words = []
+        self.rendered = {}
+
+    def load(self, digital_path):
+        with fitz.open(digital_path) as doc:
+            self.words = [self.visual_lines(page.get_text('words')) for page in doc]
+        self.rendered.clear()
+
+    @staticmethod
+    def visual_lines(words, tol=3.0):
+        """
+        (x0, y0, x1, y1, text, line) with words of about the same top on one line, as Tesseract
+        reads them (PyMuPDF gives every table cell a line of its own)
+        """
+        out = []
+        line, line_top = -1, None
+        for x0, y0, x1, y1, text, *_ in sorted(words, key=lambda w: (w[1], w[0])):
+            if line_top is None or y0 - line_top > tol:
+                line, line_top = line + 1, y0
+            out.append((x0, y0, x1, y1, text, line))
+        return out
+
+    def patch(self, process_file):
+        render = process_file._PageRaster.render
+        rendered = self.rendered
+
+        def recording_render(raster, scale, clip=None):
+            img = render(raster, scale, clip)
+            rendered[id(img)] = (img, raster.page.number, scale, clip)
+            return img
+
+        process_file._PageRaster.render = recording_render
+        process_file._tesseract_data_frame_untraced = self.image_to_data
+
+    def image_to_data(self, img):
+        _, page_no, scale, clip = self.rendered[id(img)]
+        cx0, cy0, cx1, cy1 = clip or (0.0, 0.0, float('inf'), float('inf'))
+        rows = []
+        for x0, y0, x1, y1, text, line_no in self.words[page_no]:
+            if not (cx0 <= (x0 + x1) / 2 <= cx1 and cy0 <= (y0 + y1) / 2 <= cy1):
+                continue
+            height = (y1 - y0) * scale
+            if height < self.legible_px:
+                text = '~' * len(text)
+            rows.append({'level': 5, 'page_num': 1, 'block_num': 1, 'par_num': 1, 'line_num': line_no + 1,
+                         'word_num': len(rows) + 1, 'left': int((x0 - cx0) * scale), 'top': int((y0 - cy0) * scale),
+                         'width': int((x1 - x0) * scale), 'height': int(height), 'conf': 90.0, 'text': text})
+        return pd.DataFrame(rows, columns=['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+                                           'left', 'top', 'width', 'height', 'conf', 'text'])
+
+
+def full_page(process_file, raster, fine_scale):
+    start = time.perf_counter()
+    img = raster.render(fine_scale)
+    df = process_file._tesseract_data_frame(img)
+    _, texts = process_file._tesseract_lines_text(df)
+    return {'text': '\n'.join(t for t in texts if t), 'images': [img], 'frames': [df],
+            'px': img.width * img.height, 'ms': (time.perf_counter() - start) * 1000}
+
+
+def grand_total_found(text, order):
+    money = f"{order['grandTotal']:,.2f}"
+    return any('Grand Total' in line and money in line for line in text.splitlines())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-page and coarse-to-fine OCR of scanned invoices")
+    parser.add_argument('--cases', default="5,24,60", help="Comma-separated item counts, one scanned document each")
+    parser.add_argument('--coarse-dpi', type=float, default=100.0)
+    parser.add_argument('--fine-scale', type=float, default=3.0, help="Render scale of the fine pass (ROI_SCALE)")
+    parser.add_argument('--legible-px', type=float, default=9.0, help="Stand-in OCR: smallest legible word height in px")
+    parser.add_argument('--ocr', action='store_true', help="Use the real Tesseract")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    import process_file
+
+    stand_in = None
+    if not args.ocr:
+        stand_in = TextLayerOCR(args.legible_px)
+        stand_in.patch(process_file)
+    print(f"   {'items':>5s} {'pages':>5s} {'mode':12s} {'Mpx':>7s} {'saved %':>7s} {'coarse ms':>9s} {'fine ms':>8s} "
+          f"{'total ms':>8s} {'items ok':>8s} {'grand total':>11s}  bands")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        last_scan = None
+        for n_items in [int(c) for c in args.cases.split(',') if c.strip()]:
+            order = make_order(n_items, args.seed)
+            digital = os.path.join(tmp, f"order-{n_items}.pdf")
+            scanned = os.path.join(tmp, f"scanned-{n_items}.pdf")
+            write_digital_pdf(digital, order)
+            write_scanned_pdf(scanned, digital, args.seed)
+            last_scan = (scanned, digital)
+            if stand_in:
+                stand_in.load(digital)
+            runs = {'full page': [], 'coarse/fine': []}
+            with fitz.open(scanned) as doc:
+                for page in doc:
+                    raster = process_file._PageRaster(page=page)
+                    runs['full page'].append(full_page(process_file, raster, args.fine_scale))
+                    runs['coarse/fine'].append(process_file._coarse_to_fine_ocr(raster, args.fine_scale, args.coarse_dpi))
+            full_px = sum(r['px'] for r in runs['full page'])
+            for mode, pages in runs.items():
+                if mode == 'full page':
+                    px, coarse_ms, fine_ms = full_px, 0.0, sum(r['ms'] for r in pages)
+                    images = [im for r in pages for im in r['images']]
+                    frames = [df for r in pages for df in r['frames']]
+                    bands = []
+                else:
+                    stats = [r['stats'] for r in pages]
+                    px = sum(s['coarse']['px'] + s.get('fine', {}).get('px', s['fullPagePx']) for s in stats)
+                    coarse_ms = sum(s['coarse']['ms'] for s in stats)
+                    fine_ms = sum(s.get('fine', {}).get('ms', 0.0) for s in stats)
+                    # Pages the coarse pass could not place would be read whole; their items come from that read
+                    images, frames = [], []
+                    for r, full in zip(pages, runs['full page']):
+                        images += r['images'] if r['regions'] else full['images']
+                        frames += r['frames'] if r['regions'] else full['frames']
+                    bands = ['+'.join(kind for kind, _ in r['regions']) or 'whole page' for r in pages]
+                items = process_file._extract_items_from_tesseract_images(images, None, frames)
+                text = '\n'.join(r['text'] if mode == 'full page' or r['regions'] else full['text']
+                                 for r, full in zip(pages, runs['full page']))
+                row = {
+                    'items': n_items,
+                    'pages': len(pages),
+                    'mode': mode,
+                    'pixels': px,
+                    'pixelsSavedPct': round(100.0 * (1 - px / full_px), 1),
+                    'coarseMs': round(coarse_ms, 1),
+                    'fineMs': round(fine_ms, 1),
+                    'itemsMatched': _match(items, order['items'], with_names=False),
+                    'grandTotalFound': grand_total_found(text, order),
+                    'bands': bands,
+                }
+                results.append(row)
+                print(f"   {n_items:5d} {len(pages):5d} {mode:12s} {px / 1e6:7.2f} {row['pixelsSavedPct']:7.1f} {coarse_ms:9.1f} "
+                      f"{fine_ms:8.1f} {coarse_ms + fine_ms:8.1f} {row['itemsMatched']:4d}/{n_items:<3d} "
+                      f"{'yes' if row['grandTotalFound'] else 'no':>11s}  {', '.join(sorted(set(bands))) or '-'}")
+
+        # One pipeline run, for the diagnostics block process_file reports
+        os.environ['OCR_COARSE_TO_FINE'] = '1'
+        os.environ['OCR_COARSE_DPI'] = str(args.coarse_dpi)
+        os.environ['ROI_SCALE'] = str(args.fine_scale)
+        scanned, digital = last_scan
+        if stand_in:
+            stand_in.load(digital)
+            process_file.pytesseract = type('NoTesseract', (), {'image_to_string': staticmethod(lambda img: '')})
+        out = process_file.process_file(scanned)
+        summary = {k: v for k, v in out['diagnostics'].get('ocrCoarseToFine', {}).items() if k != 'pages'}
+        print(f"   process_file({os.path.basename(scanned)}): {len(out['layout_items'])} items; ocrCoarseToFine {summary}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'seed': args.seed, 'coarseDpi': args.coarse_dpi, 'fineScale': args.fine_scale, 'ocr': args.ocr,
+                       'legiblePx': None if args.ocr else args.legible_px, 'results': results,
+                       'processFile': summary}, f, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark: per-record loop vs vectorised pandas/NumPy Shopee conversion.
+
+Generates a synthetic Shopee analytics export (products with variations over
+several months, with the other fields of a real export too), checks both engines
+produce identical output and reports timings: of the conversion alone, from a
+DataFrame and from parsed records, and of a whole run from a JSON file as the
+CLI does it (decoding included). Usage:
+
+    python bench_convert_shopee.py [--rows 1000000] [--products 5000] [--year 2025] [--text-sales 0.5] [--typed]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from convert_shopee_data import (
+    convert_shopee_data_to_forecast_json,
+    convert_shopee_dataframe_to_forecast_json,
+    load_shopee_data_from_file,
+    shopee_records_to_dataframe,
+)
+
+# Fields of a real export (see data/shopee_data.json) that the converters do not read
+OTHER_FIELDS = ["Variation ID", "Current Variation Status", "Product Visitors (Visit)", "Product Bounce Visitors",
+                "Product Bounce Rate", "Search Clicks", "Likes", "Product Visitors (Add to Cart)",
+                "Conversion Rate (Add to Cart)", "Buyers (Placed Order)", "Units (Placed Order)",
+                "Sales (Placed Order) (PHP)", "Conversion Rate (Placed Order)", "Buyers (Confirmed Order)",
+                "Conversion Rate (Confirmed Order)", "Conversion Rate (Placed to Confirmed)",
+                "Repeat Order Rate (Confirmed Order)", "Average Days to Repeat Order (Confirmed Order)", "Date_Range"]
+
+
+def generate_shopee_columns(rows, products, seed=0, text_sales=0.0, typed=False):
+    """
+    Column arrays shaped like a Shopee export (see data/shopee_data.json): ~1/4 main
+    product rows, the rest variations, page views as numeric strings, a few deleted /
+    zero-sales rows and "-" placeholders; text_sales is the share of "1,234.50" amounts.
+    typed=True gives clean numeric columns instead, like pandas.read_csv on a tidy export
+    """
+    rng = np.random.default_rng(seed)
+    item_ids = rng.integers(1_000_000, 1_000_000 + products, rows)
+    variation = rng.choice(np.array(["-", "", "Red", "Blue", "Large", "Small"], dtype=object), rows,
+                           p=[0.2, 0.05, 0.2, 0.2, 0.2, 0.15])
+    units = rng.integers(0, 40, rows)
+    sales = np.round(units * rng.uniform(50, 900, rows), 2)
+    sales_col = sales.astype(object)
+    if text_sales:
+        formatted = np.flatnonzero(rng.random(rows) < text_sales)
+        sales_col[formatted] = [f"{value:,.2f}" for value in sales[formatted].tolist()]
+    page_views = rng.integers(0, 2000, rows)
+    add_to_cart = rng.integers(0, 100, rows)
+    if typed:
+        sales_col = sales
+    else:
+        page_views = page_views.astype(str).astype(object)
+        page_views[rng.random(rows) < 0.05] = "-"
+        add_to_cart = add_to_cart.astype(object)
+        add_to_cart[rng.random(rows) < 0.05] = "-"
+    status = np.where(rng.random(rows) < 0.02, "Deleted", "Normal List").astype(object)
+    year = rng.choice([2024, 2025], rows)
+    month = rng.integers(1, 13, rows)
+    # The unread fields: counts, and percentages as text like the export's
+    other = {name: rng.integers(0, 500, rows) if i % 2 else
+             np.char.add(rng.integers(0, 100, rows).astype(str), "%").astype(object)
+             for i, name in enumerate(OTHER_FIELDS)}
+    return {
+        **other,
+        "Item ID": item_ids,
+        "Product": np.char.add("Product ", (item_ids % products).astype(str)).astype(object),
+        "Parent SKU": np.where(rng.random(rows) < 0.1, "-", np.char.add("P-", item_ids.astype(str))).astype(object),
+        "SKU": np.where(rng.random(rows) < 0.3, "-", np.char.add("S-", (item_ids * 7 % 9973).astype(str))).astype(object),
+        "Variation Name": variation,
+        "Current Item Status": status,
+        "Product Page Views": page_views,
+        "Units (Add to Cart)": add_to_cart,
+        "Units (Confirmed Order)": units,
+        "Sales (Confirmed Order) (PHP)": sales_col,
+        "Month": month,
+        "Year": year,
+    }
+
+
+def timed(fn, *args, repeat=1):
+    """
+    Best-of-repeat wall time (and the last result)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Shopee conversion engines")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--products', type=int, default=5_000)
+    parser.add_argument('--year', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--text-sales', type=float, default=0.0,
+                        help="Share of sales amounts given as formatted strings (slower cleaning path)")
+    parser.add_argument('--typed', action='store_true',
+                        help="Clean numeric columns (int64/float64) instead of JSON-style strings and \"-\"")
+    args = parser.parse_args()
+
+    print(f"🔄 Generating {args.rows:,} synthetic records ({args.products:,} products)...")
+    df = pd.DataFrame(generate_shopee_columns(args.rows, args.products, args.seed, args.text_sales, args.typed))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "shopee_data.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(df.to_dict('records'), f)
+        # Records as json.load produces them (native ints/floats/strings)
+        records = load_shopee_data_from_file(path)
+
+        loop_result, loop_time = timed(convert_shopee_data_to_forecast_json, records, args.year, repeat=args.repeat)
+        vector_result, vector_time = timed(convert_shopee_dataframe_to_forecast_json, df, args.year, repeat=args.repeat)
+        frame, frame_time = timed(shopee_records_to_dataframe, records, repeat=args.repeat)
+        from_records_result, from_records_time = timed(convert_shopee_dataframe_to_forecast_json, frame, args.year,
+                                                       repeat=args.repeat)
+        records_time = frame_time + from_records_time
+        del df, records, frame
+
+        # A whole CLI run without --stream: json.load of the export, then the engine
+        _, parse_time = timed(lambda: len(load_shopee_data_from_file(path)), repeat=args.repeat)
+        cli_loop_result, cli_loop_time = timed(
+            lambda: convert_shopee_data_to_forecast_json(load_shopee_data_from_file(path), args.year), repeat=args.repeat)
+        cli_pandas_result, cli_pandas_time = timed(
+            lambda: convert_shopee_dataframe_to_forecast_json(
+                shopee_records_to_dataframe(load_shopee_data_from_file(path)), args.year), repeat=args.repeat)
+
+    identical = len({json.dumps(result) for result in (loop_result, vector_result, from_records_result,
+                                                        cli_loop_result, cli_pandas_result)}) == 1
+    print(f"📊 {len(loop_result):,} products, identical output: {identical}")
+    print(f"   conversion only")
+    print(f"   loop engine:                  {loop_time:8.3f}s")
+    print(f"   pandas engine (DataFrame):    {vector_time:8.3f}s  ({loop_time / vector_time:5.1f}x)")
+    print(f"   pandas engine (from records): {records_time:8.3f}s  "
+          f"({loop_time / records_time:5.1f}x, {frame_time:.3f}s building the frame)")
+    print(f"   whole run from a JSON file ({parse_time:.3f}s of it decoding the JSON)")
+    print(f"   loop engine:                  {cli_loop_time:8.3f}s")
+    print(f"   pandas engine:                {cli_pandas_time:8.3f}s  ({cli_loop_time / cli_pandas_time:5.1f}x)")
+    if not identical:
+        raise SystemExit("❌ Engines disagree")
+
+
+if __name__ == "__main__":
+    main()
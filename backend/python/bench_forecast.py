@@ -0,0 +1,266 @@
+"""
+Benchmark: speed and accuracy of the 3-month sales forecast (forecast_sales.py).
+
+Generates (or loads) monthly sales series and runs rolling-origin backtests: for every
+origin from --min-train months up to the end of the series, each engine is fitted on the
+history before the origin and forecasts the next --horizon months, which are scored against
+the held-out actuals. Engines:
+
+    prophet          forecast_sales.forecast_series in-process (one variant per --setting)
+    prophet-cli      forecast_sales.py spawned per fit with the API's stdin payload (incl. start-up)
+    fallback         the API's fallback when Prophet is missing (last-3-month mean, +2%/month,
+                     without its random jitter)
+    naive            last observed month repeated
+    seasonal-naive   same month one year earlier (naive with under 12 months of history)
+
+Reported side by side: fit latency (mean/p50/p95 per fit), throughput (fits/sec and
+series/sec), peak memory (tracemalloc peak of the Python heap; peak RSS of the child for
+prophet-cli) and accuracy (MAPE over non-zero actuals, sMAPE). Usage:
+
+    python bench_forecast.py [--series 50] [--months 36] [--engines prophet,fallback,naive,seasonal-naive]
+                             [--setting "cps0.5:changepoint_prior_scale=0.5"] [--load series.json] [--json out.json]
+
+--load takes a JSON list of value lists, a {name: values} object, or a list of {"series": [...]}.
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+START_YEAR = 2022
+
+
+def generate_series(count, months, seed=0):
+    """
+    Monthly unit sales for small shops: seasonal with a Q4 peak, trending, intermittent (zero months) and flat
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(months)
+    month = t % 12
+    out = []
+    for i in range(count):
+        kind = i % 4
+        level = rng.uniform(20, 2000)
+        if kind == 0:
+            shape = 1 + 0.35 * np.sin(2 * np.pi * (month - 3) / 12) + np.where(month >= 9, 0.6, 0.0)
+        elif kind == 1:
+            shape = 1 + rng.uniform(-0.02, 0.05) * t
+        elif kind == 2:
+            shape = np.where(rng.random(months) < 0.3, 0.0, 1.0)
+        else:
+            shape = np.ones(months)
+        noise = rng.normal(1, 0.12, months)
+        out.append(np.maximum(0, np.round(level * np.clip(shape, 0, None) * noise)).tolist())
+    return out
+
+
+def load_series(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = list(data.values())
+    series = []
+    for entry in data:
+        values = entry.get('series') if isinstance(entry, dict) else entry
+        series.append([float(v or 0) for v in values])
+    return series
+
+
+def _fallback(history, horizon):
+    base = sum(history[-3:]) / len(history[-3:]) if history else 0.0
+    base = base if base > 0 else (history[-1] if history else 0.0)
+    return [base * (1 + i * 0.02) for i in range(horizon)]
+
+
+def _naive(history, horizon):
+    return [history[-1]] * horizon
+
+
+def _seasonal_naive(history, horizon):
+    if len(history) < 12:
+        return _naive(history, horizon)
+    return [history[len(history) - 12 + i] for i in range(horizon)]
+
+
+def _prophet_engine(options):
+    import forecast_sales
+
+    if forecast_sales.Prophet is None:
+        raise RuntimeError(f"Prophet not installed: {forecast_sales._PROPHET_IMPORT_ERROR}")
+
+    def run(history, horizon):
+        return forecast_sales.forecast_series(history, START_YEAR, periods=horizon, options=options)['forecast']
+    return run
+
+
+def _prophet_cli_engine():
+    """
+    Forecasts through the CLI exactly as analytics.routes.js calls it (one process per fit, horizon
+    fixed at 3 there); run.peak_rss keeps the largest child RSS seen
+    """
+    def run(history, horizon):
+        proc = subprocess.Popen([sys.executable, os.path.join(HERE, 'forecast_sales.py')], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=HERE)
+        proc.stdin.write(json.dumps({'series': history, 'year': START_YEAR}).encode('utf-8'))
+        proc.stdin.close()
+        out = proc.stdout.read()
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            run.peak_rss = max(run.peak_rss or 0, usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024))
+        else:
+            proc.wait()
+        lines = out.decode('utf-8', 'replace').strip().splitlines()
+        result = json.loads(lines[-1]) if lines else {'error': f"no output (exit {proc.returncode})"}
+        if result.get('error'):
+            raise RuntimeError(result['error'])
+        return result['forecast'][:horizon]
+    run.peak_rss = None
+    return run
+
+
+def mape(actual, predicted):
+    pairs = [(a, p) for a, p in zip(actual, predicted) if a != 0]
+    return sum(abs(a - p) / abs(a) for a, p in pairs) / len(pairs) * 100 if pairs else None
+
+
+def smape(actual, predicted):
+    terms = []
+    for a, p in zip(actual, predicted):
+        denom = abs(a) + abs(p)
+        terms.append(0.0 if denom == 0 else 2 * abs(a - p) / denom)
+    return sum(terms) / len(terms) * 100 if terms else None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def backtest(engine, series_list, horizon, min_train, step):
+    """
+    Rolling-origin backtest of one engine over all series; returns latency, throughput, memory and accuracy
+    """
+    fit_ms, mapes, smapes = [], [], []
+    tracemalloc.start()
+    start = time.perf_counter()
+    for series in series_list:
+        for origin in range(min_train, len(series) - horizon + 1, step):
+            history, actual = series[:origin], series[origin:origin + horizon]
+            t0 = time.perf_counter()
+            predicted = engine(history, horizon)
+            fit_ms.append((time.perf_counter() - t0) * 1000)
+            m = mape(actual, predicted)
+            if m is not None:
+                mapes.append(m)
+            smapes.append(smape(actual, predicted))
+    wall = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'fits': len(fit_ms),
+        'series': len(series_list),
+        'wallS': round(wall, 3),
+        'fitMs': {
+            'mean': round(sum(fit_ms) / len(fit_ms), 3) if fit_ms else None,
+            'p50': round(percentile(fit_ms, 50), 3) if fit_ms else None,
+            'p95': round(percentile(fit_ms, 95), 3) if fit_ms else None,
+        },
+        'fitsPerSec': round(len(fit_ms) / wall, 2) if wall else None,
+        'seriesPerSec': round(len(series_list) / wall, 3) if wall else None,
+        'peakTracedBytes': peak,
+        'mape': round(sum(mapes) / len(mapes), 2) if mapes else None,
+        'smape': round(sum(smapes) / len(smapes), 2) if smapes else None,
+    }
+
+
+def parse_setting(spec):
+    label, _, assignments = spec.partition(':')
+    options = {}
+    for pair in filter(None, assignments.split(',')):
+        key, _, value = pair.partition('=')
+        try:
+            options[key.strip()] = json.loads(value)
+        except ValueError:
+            options[key.strip()] = value.strip()
+    return label or 'default', options
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling-origin backtests of the sales forecast engines")
+    parser.add_argument('--series', type=int, default=40, help="Number of generated series")
+    parser.add_argument('--months', type=int, default=36, help="Length of each generated series")
+    parser.add_argument('--load', help="JSON file with series to use instead of generated ones")
+    parser.add_argument('--engines', default="prophet,fallback,naive,seasonal-naive")
+    parser.add_argument('--setting', action='append', default=[],
+                        help="label:option=value,... Prophet constructor overrides (repeatable)")
+    parser.add_argument('--horizon', type=int, default=3)
+    parser.add_argument('--min-train', type=int, default=12)
+    parser.add_argument('--step', type=int, default=3, help="Months between forecast origins")
+    parser.add_argument('--seed', type=int, default=3)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+    logging.getLogger('prophet').setLevel(logging.WARNING)
+
+    series_list = load_series(args.load) if args.load else generate_series(args.series, args.months, args.seed)
+    origins = sum(len(range(args.min_train, len(s) - args.horizon + 1, args.step)) for s in series_list)
+    print(f"📈 {len(series_list)} series, {origins} forecast origins, horizon {args.horizon}")
+
+    settings = [parse_setting(spec) for spec in args.setting] or [('default', {})]
+    engines = []
+    for name in filter(None, (e.strip() for e in args.engines.split(','))):
+        if name == 'prophet':
+            for label, options in settings:
+                engines.append((f"prophet[{label}]", lambda opts=options: _prophet_engine(opts)))
+        elif name == 'prophet-cli':
+            engines.append(('prophet-cli', _prophet_cli_engine))
+        elif name == 'fallback':
+            engines.append(('fallback', lambda: _fallback))
+        elif name == 'naive':
+            engines.append(('naive', lambda: _naive))
+        elif name == 'seasonal-naive':
+            engines.append(('seasonal-naive', lambda: _seasonal_naive))
+        else:
+            parser.error(f"unknown engine: {name}")
+
+    print(f"   {'engine':24s} {'fits':>6s} {'mean ms':>9s} {'p95 ms':>9s} {'fits/s':>9s} {'series/s':>9s} {'mem MiB':>9s} {'MAPE %':>8s} {'sMAPE %':>8s}")
+    results = []
+    for label, factory in engines:
+        try:
+            engine = factory()
+            row = backtest(engine, series_list, args.horizon, args.min_train, args.step)
+            if hasattr(engine, 'peak_rss'):
+                row['childPeakRssBytes'] = engine.peak_rss
+        except Exception as e:
+            print(f"   {label:24s} skipped: {e}")
+            results.append({'engine': label, 'error': str(e)})
+            continue
+        row['engine'] = label
+        results.append(row)
+        fmt = lambda v, spec: format(v, spec) if v is not None else f"{'-':>{spec.split('.')[0]}}"
+        print(f"   {label:24s} {row['fits']:6d} {fmt(row['fitMs']['mean'], '9.2f')} {fmt(row['fitMs']['p95'], '9.2f')} "
+              f"{fmt(row['fitsPerSec'], '9.1f')} {fmt(row['seriesPerSec'], '9.2f')} {(row.get('childPeakRssBytes') or row['peakTracedBytes']) / 1024 / 1024:9.2f} "
+              f"{fmt(row['mape'], '8.1f')} {fmt(row['smape'], '8.1f')}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'series': len(series_list), 'origins': origins, 'horizon': args.horizon,
+                       'minTrain': args.min_train, 'step': args.step, 'results': results}, f, indent=2)
+        print(f"💾 {args.json}")
+    print("   mem = tracemalloc peak of the Python heap (child peak RSS for prophet-cli)")
+
+
+if __name__ == "__main__":
+    main()
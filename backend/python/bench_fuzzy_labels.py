@@ -0,0 +1,157 @@
+"""
+Benchmark: fuzzy money-label matching in _extract_structured (process_file._fuzzy_match_label).
+
+Runs the lines of a generated multi-invoice text (bench_structured.multi_invoice_text) and a
+set of OCR-style misspellings of the label variants through two matchers:
+
+    reference   SequenceMatcher.ratio() against every variant, as the parser used to do
+    index       _MONEY_LABEL_INDEX.match (character inverted index bound, then ratio() on
+                the variants that can still win)
+
+and, for the parser as called, the memoised _fuzzy_match_label on a cold and a warm cache
+(normalised lines repeat heavily across item rows, pages and files; the cache holds 8192
+lines, so the mostly distinct misspelling set shows its miss cost). Reports per-line cost,
+how many ratio() computations each needs and whether every result agrees. Usage:
+
+    python bench_fuzzy_labels.py [--lines 10000] [--variants 20000] [--seed 7] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_structured import multi_invoice_text  # noqa: E402
+
+
+def misspellings(variants, count, seed=0):
+    """
+    Label variants with OCR damage: dropped, inserted and substituted characters, trailing words
+    """
+    rng = random.Random(seed)
+    out = []
+    for _ in range(count):
+        chars = list(rng.choice(variants))
+        for _ in range(rng.randint(0, 5)):
+            pos = rng.randrange(len(chars) + 1)
+            op = rng.random()
+            if op < 0.33 and chars:
+                chars.pop(min(pos, len(chars) - 1))
+            elif op < 0.66:
+                chars.insert(pos, rng.choice('abcdefghijklmnopqrstuvwxyz '))
+            elif chars:
+                chars[min(pos, len(chars) - 1)] = rng.choice('aeiou lst')
+        if rng.random() < 0.2:
+            chars += list(' ' + rng.choice(variants))
+        text = ' '.join(''.join(chars).split())
+        if text:
+            out.append(text)
+    return out
+
+
+def reference_match(line_norm, labels, threshold, counter):
+    best_key = None
+    best_score = 0.0
+    for key, variants in labels.items():
+        for v in variants:
+            counter[0] += 1
+            score = SequenceMatcher(None, line_norm, v).ratio()
+            if score > best_score:
+                best_score = score
+                best_key = key
+    if best_key and best_score >= threshold:
+        return best_key, best_score
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the fuzzy money-label matchers")
+    parser.add_argument('--lines', type=int, default=10000, help="Lines of generated invoice text")
+    parser.add_argument('--variants', type=int, default=20000, help="Number of misspelled labels")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    import process_file
+
+    index = process_file._MONEY_LABEL_INDEX
+    labels = process_file._MONEY_LABEL_VARIANTS
+    variants = [v for group in labels.values() for v in group]
+
+    # Count the ratio() calls the index makes
+    calls = [0]
+    original_matcher = process_file.SequenceMatcher
+
+    def counting_matcher(*a, **kw):
+        calls[0] += 1
+        return original_matcher(*a, **kw)
+
+    text = multi_invoice_text(args.lines, args.seed)
+    sets = {
+        'invoice lines': [n for n in (process_file._normalize_money_label(l.strip()) for l in text.splitlines() if l.strip()) if n],
+        'misspelled labels': misspellings(variants, args.variants, args.seed),
+    }
+
+    print(f"   {'input':18s} {'matcher':10s} {'lines':>7s} {'distinct':>8s} {'ms total':>9s} {'µs/line':>9s} {'ratio() calls':>14s} {'matches':>8s}  agrees")
+    results = []
+    for name, lines in sets.items():
+        ref_calls = [0]
+        start = time.perf_counter()
+        expected = [reference_match(l, labels, process_file._MONEY_LABEL_THRESHOLD, ref_calls) for l in lines]
+        ref_s = time.perf_counter() - start
+
+        process_file.SequenceMatcher = counting_matcher
+        calls[0] = 0
+        try:
+            start = time.perf_counter()
+            got = [index.match(l) for l in lines]
+            idx_s = time.perf_counter() - start
+        finally:
+            process_file.SequenceMatcher = original_matcher
+        idx_calls = calls[0]
+
+        process_file._fuzzy_match_label.cache_clear()
+        start = time.perf_counter()
+        for l in lines:
+            process_file._fuzzy_match_label(l)
+        cold_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for l in lines:
+            process_file._fuzzy_match_label(l)
+        warm_s = time.perf_counter() - start
+
+        agrees = got == expected
+        matches = sum(1 for r in expected if r)
+        rows = [('reference', ref_s, ref_calls[0]), ('index', idx_s, idx_calls),
+                ('memo cold', cold_s, None), ('memo warm', warm_s, None)]
+        for matcher, seconds, n_calls in rows:
+            per_line = seconds / max(1, len(lines)) * 1e6
+            print(f"   {name:18s} {matcher:10s} {len(lines):7d} {len(set(lines)):8d} {seconds * 1000:9.1f} {per_line:9.2f} "
+                  f"{(str(n_calls) if n_calls is not None else '-'):>14s} {matches:8d}  {'yes' if agrees else 'NO'}")
+        results.append({
+            'input': name,
+            'lines': len(lines),
+            'distinctLines': len(set(lines)),
+            'matches': matches,
+            'agrees': agrees,
+            'referenceMs': round(ref_s * 1000, 1),
+            'referenceRatioCalls': ref_calls[0],
+            'indexMs': round(idx_s * 1000, 1),
+            'indexRatioCalls': idx_calls,
+            'memoColdMs': round(cold_s * 1000, 1),
+            'memoWarmMs': round(warm_s * 1000, 1),
+        })
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'seed': args.seed, 'results': results}, f, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: Google Vision OCR round trips for _extract_items_from_google_vision_images.
+
+Starts a local stand-in for images:annotate that answers every image with a canned
+DOCUMENT_TEXT_DETECTION response (an order table) after a fixed latency. It then runs
+the extractor twice: once with one image per call and no concurrency (the old
+request pattern), and once with the batched and concurrent defaults. Both runs must return
+identical items. Usage:
+
+    python bench_google_vision.py [--pages 10] [--latency 0.2] [--batch-size 8] [--concurrency 4]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+import process_file
+
+
+def _word(text, x0, y0, x1, y1):
+    return {
+        "symbols": [{"text": ch} for ch in text],
+        "boundingBox": {"vertices": [{"x": x0, "y": y0}, {"x": x1, "y": y0}, {"x": x1, "y": y1}, {"x": x0, "y": y1}]},
+    }
+
+
+def canned_annotation(rows=5):
+    """
+    One page with an 'No Product Price Qty Subtotal' header and `rows` item lines
+    """
+    columns = [("No", 20), ("Product", 80), ("Price", 400), ("Qty", 500), ("Subtotal", 580)]
+    words = [_word(text, x, 100, x + 10 * len(text), 112) for text, x in columns]
+    for i in range(rows):
+        y = 130 + 24 * i
+        price = 150 + 25 * i
+        qty = 1 + i % 3
+        values = [str(i + 1), f"Bracelet-{i + 1}", f"{price:.2f}", str(qty), f"{price * qty:.2f}"]
+        words += [_word(text, x, y, x + 9 * len(text), y + 12) for text, (_, x) in zip(values, columns)]
+    words.append(_word("Merchandise", 80, 130 + 24 * rows, 170, 142 + 24 * rows))
+    return {"fullTextAnnotation": {"pages": [{"blocks": [{"paragraphs": [{"words": words}]}]}]}}
+
+
+class StandInVision(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.2
+    stats = {"calls": 0, "images": 0, "connections": 0}
+    lock = threading.Lock()
+    response = canned_annotation()
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            self.stats["connections"] += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        count = len(json.loads(body).get("requests") or [])
+        with self.lock:
+            self.stats["calls"] += 1
+            self.stats["images"] += count
+        time.sleep(self.latency)
+        out = json.dumps({"responses": [self.response] * count}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(images, batch_size, concurrency):
+    os.environ["GOOGLE_VISION_BATCH_SIZE"] = str(batch_size)
+    os.environ["GOOGLE_VISION_CONCURRENCY"] = str(concurrency)
+    process_file._HTTP_SESSIONS.clear()
+    for key in StandInVision.stats:
+        StandInVision.stats[key] = 0
+    start = time.perf_counter()
+    items = process_file._extract_items_from_google_vision_images(images, "stand-in-key")
+    return items, time.perf_counter() - start, dict(StandInVision.stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Google Vision batching against a local stand-in")
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds per annotate call")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    StandInVision.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInVision)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Measure live round trips, not the OCR response cache
+    os.environ["OCR_CACHE"] = "0"
+    os.environ["GOOGLE_VISION_ENDPOINT"] = f"http://127.0.0.1:{server.server_port}/v1/images:annotate"
+
+    images = [Image.new("RGB", (1240, 1754), "white") for _ in range(args.pages)]
+    try:
+        serial_items, serial_time, serial_stats = run(images, 1, 1)
+        batched_items, batched_time, batched_stats = run(images, args.batch_size, args.concurrency)
+    finally:
+        server.shutdown()
+
+    print(f"📄 {args.pages} page images, {args.latency * 1000:.0f} ms per annotate call")
+    print(f"   one image per call:  {serial_stats['calls']:3d} calls, {serial_stats['connections']} connections, {serial_time:6.2f}s")
+    print(f"   batched/concurrent:  {batched_stats['calls']:3d} calls, {batched_stats['connections']} connections, {batched_time:6.2f}s"
+          f"  (batch {args.batch_size}, concurrency {args.concurrency})")
+    print(f"   items: {len(batched_items)}, identical: {serial_items == batched_items}")
+    if serial_items != batched_items or not batched_items:
+        raise SystemExit("❌ Batched results differ from per-image results")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: bulk order-summary exports (process_file._invoice_segments, PROCESS_FILE_SPLIT_INVOICES).
+
+Writes --invoices bench_invoices orders (Shopee and TikTok styles alternating, item counts
+cycling through --items, so some invoices run over several pages) into one text-layer PDF and
+runs process_file.py on it as the API does: unsplit (PROCESS_FILE_SPLIT_INVOICES=0, the former
+behaviour: one record for the whole file), split with one worker and split with --workers
+workers. Reported per run: wall ms, the invoices found, item subtotals matched against the
+truth of every order (an item of one record counts for one order only), grand totals read
+correctly and whether every page range matches its order. Usage:
+
+    python bench_invoice_split.py [--invoices 8] [--items 3,30,8,50] [--workers 4] [--seed 7] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import fitz
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_invoices import ROWS_PER_PAGE, make_order, run_process_file, score, write_digital_pdf  # noqa: E402
+
+
+def write_bulk_pdf(path, orders, tmp):
+    """
+    The orders' summaries one after another in one PDF; returns each order's 1-based page range
+    """
+    ranges = []
+    with fitz.open() as bulk:
+        for i, order in enumerate(orders):
+            part = os.path.join(tmp, f"order-{i}.pdf")
+            write_digital_pdf(part, order, style='tiktok' if i % 2 else 'shopee')
+            with fitz.open(part) as src:
+                ranges.append({'from': len(bulk) + 1, 'to': len(bulk) + len(src)})
+                bulk.insert_pdf(src)
+        bulk.save(path)
+    return ranges
+
+
+def evaluate(result, orders, ranges):
+    """
+    Items matched and grand totals read over all orders; unsplit output is one record for all of them
+    """
+    invoices = (result or {}).get('invoices')
+    if invoices:
+        records = [(inv.get('structured'), inv.get('pages')) for inv in invoices]
+    else:
+        records = [((result or {}).get('structured'), None)]
+    matched = totals = 0
+    split = len(records) == len(orders)
+    # One record stands for every order when unsplit: its items are used up as they match
+    pool = [] if split else [it.get('subtotal') for it in (records[0][0] or {}).get('items') or []]
+    for i, order in enumerate(orders):
+        structured = records[i][0] if split else records[0][0]
+        if split:
+            pool = [it.get('subtotal') for it in (structured or {}).get('items') or []]
+        for want in order['items']:
+            hit = next((got for got in pool if got is not None and abs(float(got) - want['subtotal']) < 0.01), None)
+            if hit is not None:
+                pool.remove(hit)
+                matched += 1
+        totals += bool(score(structured, order)['grandTotalOk'])
+    parsed = sum(len((structured or {}).get('items') or []) for structured, _ in records)
+    return {
+        'invoices': len(records),
+        'expected': sum(len(o['items']) for o in orders),
+        'parsed': parsed,
+        'matched': matched,
+        'grandTotalsOk': totals,
+        'pagesOk': [pages for _, pages in records] == ranges if invoices else False,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a bulk export parsed as one document and split per invoice")
+    parser.add_argument('--invoices', type=int, default=8)
+    parser.add_argument('--items', default="3,30,8,50", help=f"Comma-separated item counts, cycled ({ROWS_PER_PAGE} per page)")
+    parser.add_argument('--workers', type=int, default=4, help="PROCESS_FILE_SPLIT_WORKERS of the parallel run")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    counts = [int(c) for c in args.items.split(',') if c.strip()]
+    orders = [make_order(counts[i % len(counts)], args.seed + i) for i in range(args.invoices)]
+    runs = [('unsplit', {'PROCESS_FILE_SPLIT_INVOICES': '0'}),
+            ('split, 1 worker', {'PROCESS_FILE_SPLIT_INVOICES': '1', 'PROCESS_FILE_SPLIT_WORKERS': '1'}),
+            ('split, parallel', {'PROCESS_FILE_SPLIT_INVOICES': '1', 'PROCESS_FILE_SPLIT_WORKERS': str(args.workers)})]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bulk-export.pdf")
+        ranges = write_bulk_pdf(path, orders, tmp)
+        print(f"   {len(orders)} invoices, {ranges[-1]['to']} pages, {sum(len(o['items']) for o in orders)} items")
+        print(f"   {'run':16s} {'wall ms':>8s} {'invoices':>8s} {'matched':>9s} {'parsed':>6s} {'totals':>7s} {'pages ok':>8s} {'workers':>7s}")
+        for label, env in runs:
+            seconds, _, result = run_process_file(path, dict(os.environ, **env))
+            row = {'run': label, 'ms': round(seconds * 1000, 1), **evaluate(result, orders, ranges)}
+            split = ((result or {}).get('diagnostics') or {}).get('split') or {}
+            row['workers'] = split.get('workers')
+            row['segmentMs'] = [seg.get('ms') for seg in split.get('segments', [])]
+            results.append(row)
+            print(f"   {label:16s} {row['ms']:8.1f} {row['invoices']:8d} {row['matched']:4d}/{row['expected']:<4d} {row['parsed']:6d} "
+                  f"{row['grandTotalsOk']:3d}/{len(orders):<3d} {'yes' if row['pagesOk'] else 'no':>8s} {row['workers'] or '-':>7}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'seed': args.seed, 'items': counts, 'pages': ranges, 'results': results}, f, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
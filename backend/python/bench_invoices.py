@@ -0,0 +1,375 @@
+"""
+Benchmark: end-to-end invoice parsing (process_file.py) on synthetic documents.
+
+Generates Shopee- and TikTok-style order summaries with PyMuPDF from a seeded item list,
+so every document comes with its ground truth:
+
+    digital   text-layer PDF, items flowing over as many pages as needed (1-200 items)
+    scanned   the same pages rasterised to a noisy, slightly rotated image-only PDF
+    png       page 1 as a PNG "photo" (rotation, blur, uneven lighting)
+
+Each document is parsed by spawning process_file.py the way the API does, once per
+repeat and per extractor configuration (a set of environment flags). It reports latency
+percentiles, the peak RSS of the child process and item-extraction accuracy against the
+ground truth (recall and precision of items matched on name, qty and subtotal, recall on
+amounts alone, and whether the grand total was found). Usage:
+
+    python bench_invoices.py [--cases digital:1,digital:20,digital:200,scanned:5,png:5,tiktok:10]
+                             [--repeat 5] [--config "no-ocr:STRICT_TESSERACT_ONLY=0"] [--json results.json]
+
+A case is kind:items with kind one of digital, scanned, png or tiktok (a digital TikTok-style
+invoice). --config may be repeated (label:KEY=VALUE,KEY=VALUE); without it one run uses
+the current environment. Accuracy on scanned/png needs Tesseract or an OCR provider key.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz
+from PIL import Image, ImageFilter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PRODUCTS = [
+    "Beaded Bracelet", "Resin Charms for DIY", "Acrylic Paint Set 24 Colors", "Canvas Tote Bag",
+    "Polymer Clay Earrings", "Embroidery Hoop 8in", "Washi Tape Bundle", "Glitter Gel Pens",
+    "Crochet Hook Set", "Sticker Sheet Kawaii", "Keychain Blank Acrylic", "Jewelry Pliers",
+]
+VARIATIONS = ["Red", "Blue", "mixed-10pcs", "1set 5pcs", "Large", "Small", "Pastel", "Gold"]
+
+# Shopee order summary: No. | Product | Variation | Product Price | Qty | Subtotal
+SHOPEE_COLUMNS = [("No.", 40), ("Product", 70), ("Variation", 290), ("Product Price", 380), ("Qty", 460), ("Subtotal", 505)]
+# TikTok Shop packing/order slip: No. | Product Name | SKU | Unit Price | Qty | Amount
+TIKTOK_COLUMNS = [("No.", 40), ("Product Name", 70), ("SKU", 290), ("Unit Price", 380), ("Qty", 460), ("Amount", 505)]
+
+ROWS_PER_PAGE = 24
+
+# A TrueType font with the peso sign, so rasterised cases show "₱" like real invoices (Helvetica lacks it)
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    r"C:\Windows\Fonts\arial.ttf",
+]
+
+
+def _font():
+    for path in FONT_CANDIDATES:
+        if os.path.exists(path):
+            return fitz.Font(fontfile=path)
+    return fitz.Font("helv")
+
+
+def make_order(n_items, seed=0):
+    """
+    Ground truth for one order: items (no, product, variation, productPrice, qty, subtotal) and totals
+    """
+    rng = random.Random(seed)
+    items = []
+    for i in range(n_items):
+        price = round(rng.uniform(25, 900), 0)
+        qty = rng.randint(1, 5)
+        name = f"{rng.choice(PRODUCTS)} ({rng.randint(1, 12)}-{rng.randint(1, 400)})"
+        items.append({
+            'no': i + 1,
+            'product': name,
+            'variation': rng.choice(VARIATIONS),
+            'productPrice': price,
+            'qty': qty,
+            'subtotal': round(price * qty, 2),
+        })
+    merchandise = round(sum(it['subtotal'] for it in items), 2)
+    shipping = 60.0
+    voucher = 100.0 if merchandise > 500 else 0.0
+    return {
+        'orderId': f"2503{seed:04d}HGU7F7CS"[:14],
+        'items': items,
+        'merchandiseSubtotal': merchandise,
+        'shippingFee': shipping,
+        'shippingDiscount': shipping,
+        'platformVoucher': voucher,
+        'grandTotal': round(merchandise - voucher, 2),
+    }
+
+
+def _money(value):
+    return f"₱{value:,.2f}"
+
+
+def write_digital_pdf(path, order, style='shopee'):
+    """
+    Text-layer order summary; the item table continues over pages of ROWS_PER_PAGE rows
+    """
+    columns = TIKTOK_COLUMNS if style == 'tiktok' else SHOPEE_COLUMNS
+    font = _font()
+    doc = fitz.open()
+    items = order['items']
+    chunks = [items[i:i + ROWS_PER_PAGE] for i in range(0, len(items), ROWS_PER_PAGE)] or [[]]
+    for page_no, chunk in enumerate(chunks):
+        page = doc.new_page(width=595, height=842)
+        writer = fitz.TextWriter(page.rect)
+        y = 50
+        if page_no == 0:
+            title = "TikTok Shop Order Details" if style == 'tiktok' else "Order Summary"
+            writer.append((40, y), title, font=font, fontsize=14)
+            header = [
+                f"Order Summary No.: ISOS{order['orderId'][-9:]}", "Date Issued: 28/03/2025",
+                f"Order ID: {order['orderId']}", "Order Paid Date: 14/03/2025", "Payment Method: SPayLater",
+                "Seller Name: studio360.ph", "Buyer Name: Dolores", "Buyer Address: Lipa City, Batangas",
+            ]
+            for line in header:
+                y += 16
+                writer.append((40, y), line, font=font, fontsize=10)
+        y += 30
+        writer.append((40, y), "Order Details", font=font, fontsize=12)
+        y += 22
+        for name, x in columns:
+            writer.append((x, y), name, font=font, fontsize=9)
+        for it in chunk:
+            y += 22
+            values = [str(it['no']), it['product'], it['variation'], _money(it['productPrice']), str(it['qty']), _money(it['subtotal'])]
+            for value, (_, x) in zip(values, columns):
+                writer.append((x, y), value, font=font, fontsize=9)
+        if page_no == len(chunks) - 1:
+            y += 34
+            totals = [("Merchandise Subtotal", _money(order['merchandiseSubtotal'])),
+                      ("Shipping Fee", _money(order['shippingFee'])),
+                      ("Shipping Discount", "- " + _money(order['shippingDiscount'])),
+                      ("Total Platform Voucher Applied", "- " + _money(order['platformVoucher'])),
+                      ("Grand Total", _money(order['grandTotal']))]
+            for label, value in totals:
+                writer.append((330, y), label, font=font, fontsize=10)
+                writer.append((505, y), value, font=font, fontsize=10)
+                y += 18
+        writer.append((260, 815), f"{page_no + 1} of {len(chunks)}", font=font, fontsize=8)
+        writer.write_text(page)
+    doc.save(path)
+    doc.close()
+
+
+def _degrade(img, rng, photo=False):
+    """
+    Scanner/camera artefacts: small rotation, blur, speckle noise and (photos) uneven lighting
+    """
+    img = img.convert('L').rotate(rng.uniform(-1.2, 1.2), resample=Image.BICUBIC, expand=False, fillcolor=255)
+    img = img.filter(ImageFilter.GaussianBlur(0.6 if photo else 0.4))
+    noise = Image.effect_noise(img.size, 18 if photo else 10).convert('L')
+    img = Image.blend(img, noise, 0.08)
+    if photo:
+        shade = Image.linear_gradient('L').resize(img.size).point(lambda v: 255 - v // 5)
+        img = Image.composite(img, Image.new('L', img.size, 0), shade)
+    return img
+
+
+def write_scanned_pdf(path, digital_path, seed=0, dpi=200):
+    """
+    Image-only PDF of the digital pages (no text layer), as a flatbed scan would produce
+    """
+    rng = random.Random(seed)
+    src = fitz.open(digital_path)
+    out = fitz.open()
+    for page in src:
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        img = _degrade(Image.frombytes('L', (pix.width, pix.height), pix.samples), rng)
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG', quality=80, dpi=(dpi, dpi))
+        new_page = out.new_page(width=page.rect.width, height=page.rect.height)
+        new_page.insert_image(new_page.rect, stream=buf.getvalue())
+    out.save(path)
+    out.close()
+    src.close()
+
+
+def write_png_photo(path, digital_path, seed=0, dpi=160):
+    """
+    First page as a phone photo of a printout, saved as PNG
+    """
+    rng = random.Random(seed)
+    with fitz.open(digital_path) as src:
+        pix = src[0].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    img = _degrade(Image.frombytes('L', (pix.width, pix.height), pix.samples), rng, photo=True)
+    img.save(path, format='PNG', dpi=(dpi, dpi))
+
+
+def build_case(tmp, kind, n_items, seed):
+    """
+    Write one document; returns (path, ground truth). png cases only hold the items of page 1
+    """
+    order = make_order(n_items, seed)
+    digital = os.path.join(tmp, f"{kind}-{n_items}-digital.pdf")
+    write_digital_pdf(digital, order, style='tiktok' if kind == 'tiktok' else 'shopee')
+    if kind in ('digital', 'tiktok'):
+        return digital, order
+    if kind == 'scanned':
+        path = os.path.join(tmp, f"scanned-{n_items}.pdf")
+        write_scanned_pdf(path, digital, seed)
+        return path, order
+    if kind == 'png':
+        path = os.path.join(tmp, f"png-{n_items}.png")
+        write_png_photo(path, digital, seed)
+        truth = dict(order, items=order['items'][:ROWS_PER_PAGE])
+        if len(order['items']) > ROWS_PER_PAGE:
+            truth['grandTotal'] = None
+        return path, truth
+    raise ValueError(f"unknown case kind: {kind}")
+
+
+def _match(parsed, truth_items, with_names):
+    remaining = list(parsed)
+    matched = 0
+    for want in truth_items:
+        for got in remaining:
+            try:
+                same_amounts = int(got.get('qty') or -1) == want['qty'] and abs(float(got.get('subtotal') or -1) - want['subtotal']) < 0.01
+            except (TypeError, ValueError):
+                same_amounts = False
+            if same_amounts and (not with_names or want['product'].lower() in str(got.get('product') or '').lower()):
+                matched += 1
+                remaining.remove(got)
+                break
+    return matched
+
+
+def score(structured, truth):
+    """
+    Items matched on qty and subtotal with the product name contained in the parsed name
+    (amountRecall ignores the name); grand total within 0.01
+    """
+    parsed = list((structured or {}).get('items') or [])
+    matched = _match(parsed, truth['items'], with_names=True)
+    expected = len(truth['items'])
+    grand = (structured or {}).get('grandTotal')
+    return {
+        'expected': expected,
+        'parsed': len(parsed),
+        'matched': matched,
+        'recall': round(matched / expected, 4) if expected else 1.0,
+        'precision': round(matched / len(parsed), 4) if parsed else (1.0 if not expected else 0.0),
+        'amountRecall': round(_match(parsed, truth['items'], with_names=False) / expected, 4) if expected else 1.0,
+        'grandTotalOk': None if truth['grandTotal'] is None else (grand is not None and abs(float(grand) - truth['grandTotal']) < 0.01),
+    }
+
+
+def run_process_file(path, env):
+    """
+    Spawn process_file.py like the API does; returns (seconds, peak RSS bytes or None, parsed JSON)
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, 'process_file.py'), path],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env, cwd=HERE)
+    out = proc.stdout.read()
+    peak_rss = None
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak_rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    else:
+        proc.wait()
+    elapsed = time.perf_counter() - start
+    result = None
+    for line in reversed(out.decode('utf-8', 'replace').splitlines()):
+        if line.startswith('{'):
+            try:
+                result = json.loads(line)
+            except ValueError:
+                pass
+            break
+    return elapsed, peak_rss, result
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a non-empty list
+    """
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def parse_config(spec):
+    label, _, assignments = spec.partition(':')
+    env = {}
+    for pair in filter(None, assignments.split(',')):
+        key, _, value = pair.partition('=')
+        env[key.strip()] = value.strip()
+    return label or 'default', env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark process_file.py on synthetic invoices")
+    parser.add_argument('--cases', default="digital:1,digital:20,digital:200,scanned:5,png:5,tiktok:10",
+                        help="Comma-separated kind:items (kind: digital, scanned, png, tiktok)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--config', action='append', default=[],
+                        help="label:KEY=VALUE,... extractor flags for one run set (repeatable)")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--keep', help="Write the generated documents to this directory instead of a temp dir")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    configs = [parse_config(spec) for spec in args.config] or [('default', {})]
+    cases = []
+    for spec in filter(None, args.cases.split(',')):
+        kind, _, count = spec.partition(':')
+        cases.append((kind.strip(), int(count or 1)))
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = args.keep or tmp
+        os.makedirs(out_dir, exist_ok=True)
+        documents = []
+        for i, (kind, n_items) in enumerate(cases):
+            path, truth = build_case(out_dir, kind, n_items, args.seed + i)
+            documents.append((f"{kind}:{n_items}", path, truth))
+
+        for label, overrides in configs:
+            env = dict(os.environ, OCR_CACHE='0', **overrides)
+            print(f"⚙️  {label} {overrides or ''}")
+            print(f"   {'case':14s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s} {'rss MiB':>8s} {'items':>9s} {'recall':>7s} {'prec':>6s} {'amounts':>7s} {'total':>6s}")
+            for name, path, truth in documents:
+                latencies, rss, runs = [], [], []
+                for _ in range(args.repeat):
+                    elapsed, peak_rss, result = run_process_file(path, env)
+                    latencies.append(elapsed * 1000)
+                    if peak_rss:
+                        rss.append(peak_rss)
+                    runs.append(result)
+                last = runs[-1] or {}
+                accuracy = score(last.get('structured'), truth) if last.get('success') else None
+                row = {
+                    'config': label,
+                    'env': overrides,
+                    'case': name,
+                    'bytes': os.path.getsize(path),
+                    'runs': args.repeat,
+                    'failures': sum(1 for r in runs if not (r or {}).get('success')),
+                    'latencyMs': {f"p{p}": round(percentile(latencies, p), 1) for p in (50, 90, 95, 99)},
+                    'peakRssBytes': max(rss) if rss else None,
+                    'accuracy': accuracy,
+                    'selectedSource': ((last.get('diagnostics') or {}).get('items') or {}).get('selectedSource'),
+                }
+                row['latencyMs']['max'] = round(max(latencies), 1)
+                row['latencyMs']['mean'] = round(sum(latencies) / len(latencies), 1)
+                results.append(row)
+                acc = accuracy or {}
+                lat = row['latencyMs']
+                grand = {True: 'ok', False: 'miss', None: '-'}[acc.get('grandTotalOk')]
+                print(f"   {name:14s} {lat['p50']:8.0f} {lat['p90']:8.0f} {lat['p99']:8.0f} {lat['max']:8.0f} "
+                      f"{(row['peakRssBytes'] or 0) / 1024 / 1024:8.1f} {acc.get('matched', 0):>4}/{acc.get('expected', 0):<4} "
+                      f"{acc.get('recall', 0):7.2f} {acc.get('precision', 0):6.2f} {acc.get('amountRecall', 0):7.2f} {grand:>6s}"
+                      + (f"  ({row['failures']} failed)" if row['failures'] else ""))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'results': results}, f, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
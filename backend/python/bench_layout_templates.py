@@ -0,0 +1,115 @@
+"""
+Benchmark: layout templates for the table extractors (layout_template_store, LAYOUT_TEMPLATES).
+
+Writes --docs bench_invoices orders as text-layer PDFs (Shopee and TikTok styles alternating,
+item counts cycling through --items, so each style is one layout with tables of different
+lengths) and runs the three table extractors of process_file (_extract_items_from_pdf_layout,
+_extract_items_from_pdfplumber, _pdfplumber_find_order_details_regions) over them without
+templates and with a fresh template store. Reported per extractor: total ms of both runs,
+whether every output is the same (regions to 0.01 pt) and the store's hits, misses and
+time saved; then the store's hit rate and the fingerprinting cost. Usage:
+
+    python bench_layout_templates.py [--docs 20] [--items 3,12,30] [--seed 7] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_invoices import make_order, write_digital_pdf  # noqa: E402
+
+EXTRACTORS = [
+    ('layout', '_extract_items_from_pdf_layout'),
+    ('pdfplumber', '_extract_items_from_pdfplumber'),
+    ('regions', '_pdfplumber_find_order_details_regions'),
+]
+
+
+def run(process_file, paths):
+    """
+    Outputs and total ms per extractor over every document, read afresh each time
+    """
+    outputs = {name: [] for name, _ in EXTRACTORS}
+    ms = {name: 0.0 for name, _ in EXTRACTORS}
+    for path in paths:
+        process_file._PAGE_LAYOUTS.clear()
+        for name, func in EXTRACTORS:
+            start = time.perf_counter()
+            outputs[name].append(getattr(process_file, func)(path))
+            ms[name] += (time.perf_counter() - start) * 1000
+    return outputs, ms
+
+
+def same(a, b):
+    """
+    Equal outputs, with region coordinates equal to 0.01 pt
+    """
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float):
+        return abs(a - b) < 0.01
+    return a == b
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the table extractors with and without layout templates")
+    parser.add_argument('--docs', type=int, default=20)
+    parser.add_argument('--items', default="3,12,30", help="Comma-separated item counts, cycled")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    counts = [int(c) for c in args.items.split(',') if c.strip()]
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['LAYOUT_TEMPLATES_PATH'] = os.path.join(tmp, "templates.sqlite")
+        import process_file
+
+        paths = []
+        for i in range(args.docs):
+            path = os.path.join(tmp, f"order-{i}.pdf")
+            write_digital_pdf(path, make_order(counts[i % len(counts)], args.seed + i), style='tiktok' if i % 2 else 'shopee')
+            paths.append(path)
+        # Warm the imports (pdfplumber, pdfminer) so neither run pays for them
+        os.environ['LAYOUT_TEMPLATES'] = '0'
+        run(process_file, paths[:1])
+        baseline, baseline_ms = run(process_file, paths)
+        os.environ['LAYOUT_TEMPLATES'] = '1'
+        templated, templated_ms = run(process_file, paths)
+        summary = process_file._LAYOUT_TEMPLATES.summary()
+        process_file._LAYOUT_TEMPLATES.close()
+
+    pages = summary['pagesFingerprinted']
+    print(f"   {args.docs} documents, {pages} pages, Shopee and TikTok styles")
+    print(f"   {'extractor':11s} {'off ms':>8s} {'on ms':>8s} {'same':>5s} {'hits':>5s} {'misses':>6s} {'saved ms':>9s}")
+    rows = []
+    for name, _ in EXTRACTORS:
+        counts_ = summary['extractors'].get(name, {})
+        row = {
+            'extractor': name,
+            'offMs': round(baseline_ms[name], 1),
+            'onMs': round(templated_ms[name], 1),
+            'same': same(baseline[name], templated[name]),
+            'hits': counts_.get('hits', 0),
+            'misses': counts_.get('misses', 0),
+            'msSaved': counts_.get('msSaved', 0.0),
+        }
+        rows.append(row)
+        print(f"   {name:11s} {row['offMs']:8.1f} {row['onMs']:8.1f} {'yes' if row['same'] else 'NO':>5s} "
+              f"{row['hits']:5d} {row['misses']:6d} {row['msSaved']:9.1f}")
+    print(f"   hit rate {summary['hitRate']:.1%}, {summary['entries']} templates, "
+          f"fingerprinting {summary['fingerprintMs']:.1f} ms over {summary['pagesFingerprinted']} pages, "
+          f"net saved {summary['netMsSaved']:.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'seed': args.seed, 'docs': args.docs, 'items': counts, 'extractors': rows, 'store': summary}, f, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark: OCR.space uploads for _extract_items_from_ocrspace.
+
+Starts a local stand-in for /parse/image that answers every upload with a canned
+TextOverlay (an order table, coordinates scaled to the uploaded image size) after a
+fixed latency. The extractor runs twice on synthetic 600-dpi scanned pages. The first
+run is the old pattern: serial, full-resolution PNG, no size budget. The second uses the
+concurrent, downscaled defaults. Both runs must return identical items. Usage:
+
+    python bench_ocrspace.py [--pages 6] [--latency 0.3] [--concurrency 3] [--max-bytes 1048576] [--target-dpi 300]
+"""
+import argparse
+import email.parser
+import io
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import process_file
+
+PAGE_WIDTH = 4960  # A4 at 600 dpi
+PAGE_HEIGHT = 7016
+
+
+def canned_overlay(width, rows=5):
+    """
+    TextOverlay for an 'No Product Price Qty Subtotal' table laid out on a PAGE_WIDTH-wide
+    page, scaled to an upload `width` pixels wide (OCR.space reports upload pixels)
+    """
+    k = width / PAGE_WIDTH
+    columns = [("No", 160), ("Product", 640), ("Price", 3200), ("Qty", 4000), ("Subtotal", 4640)]
+
+    def word(text, x, y):
+        return {"WordText": text, "Left": round(x * k), "Top": round(y * k),
+                "Width": round(70 * len(text) * k), "Height": round(96 * k)}
+
+    lines = [{"MinTop": round(800 * k), "Words": [word(text, x, 800) for text, x in columns]}]
+    for i in range(rows):
+        y = 1040 + 192 * i
+        price = 150 + 25 * i
+        qty = 1 + i % 3
+        values = [str(i + 1), f"Bracelet-{i + 1}", f"{price:.2f}", str(qty), f"{price * qty:.2f}"]
+        lines.append({"MinTop": round(y * k), "Words": [word(text, x, y) for text, (_, x) in zip(values, columns)]})
+    y = 1040 + 192 * rows
+    lines.append({"MinTop": round(y * k), "Words": [word("Merchandise", 640, y), word("Subtotal", 1500, y)]})
+    return {"ParsedResults": [{"TextOverlay": {"Lines": lines}, "ParsedText": ""}], "IsErroredOnProcessing": False}
+
+
+class StandInOcrSpace(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.3
+    stats = {"calls": 0, "bytes": 0, "connections": 0}
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            self.stats["connections"] += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        message = email.parser.BytesParser().parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode("latin-1") + b"\r\n\r\n" + body)
+        upload = next(part.get_payload(decode=True) for part in message.get_payload()
+                      if part.get_param("name", header="content-disposition") == "file")
+        width = Image.open(io.BytesIO(upload)).width
+        with self.lock:
+            self.stats["calls"] += 1
+            self.stats["bytes"] += len(upload)
+        time.sleep(self.latency * (0.5 + len(upload) / (4 << 20)))
+        out = json.dumps(canned_overlay(width)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+def scanned_page(seed):
+    """
+    Greyscale 600-dpi page with text-like strokes and scanner grain
+    """
+    rng = np.random.default_rng(seed)
+    img = Image.new("L", (PAGE_WIDTH, PAGE_HEIGHT), 245)
+    draw = ImageDraw.Draw(img)
+    for row in range(60):
+        y = 400 + row * 105
+        x = 300
+        while x < PAGE_WIDTH - 600:
+            w = int(rng.integers(60, 420))
+            draw.rectangle([x, y, x + w, y + 48], fill=int(rng.integers(20, 80)))
+            x += w + int(rng.integers(40, 120))
+    grain = rng.normal(0, 6, (PAGE_HEIGHT, PAGE_WIDTH))
+    page = Image.fromarray(np.clip(np.asarray(img, dtype=np.float32) + grain, 0, 255).astype(np.uint8))
+    page.info["dpi"] = (600, 600)
+    return page
+
+
+def run(images, concurrency, max_bytes, target_dpi):
+    os.environ["OCRSPACE_CONCURRENCY"] = str(concurrency)
+    os.environ["OCRSPACE_MAX_BYTES"] = str(max_bytes)
+    os.environ["OCRSPACE_TARGET_DPI"] = str(target_dpi)
+    process_file._HTTP_SESSIONS.clear()
+    for key in StandInOcrSpace.stats:
+        StandInOcrSpace.stats[key] = 0
+    diagnostics = {}
+    start = time.perf_counter()
+    items = process_file._extract_items_from_ocrspace(images, "stand-in-key", diagnostics)
+    return items, time.perf_counter() - start, dict(StandInOcrSpace.stats), diagnostics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR.space uploads against a local stand-in")
+    parser.add_argument('--pages', type=int, default=6)
+    parser.add_argument('--latency', type=float, default=0.3, help="Base seconds per upload (grows with upload size)")
+    parser.add_argument('--concurrency', type=int, default=3)
+    parser.add_argument('--max-bytes', type=int, default=1024 * 1024)
+    parser.add_argument('--target-dpi', type=int, default=300)
+    args = parser.parse_args()
+
+    StandInOcrSpace.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInOcrSpace)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Measure live round trips, not the OCR response cache
+    os.environ["OCR_CACHE"] = "0"
+    os.environ["OCRSPACE_ENDPOINT"] = f"http://127.0.0.1:{server.server_port}/parse/image"
+
+    print(f"🔄 Rendering {args.pages} synthetic 600-dpi scanned pages...")
+    images = [scanned_page(seed) for seed in range(args.pages)]
+    try:
+        serial_items, serial_time, serial_stats, _ = run(images, 1, 0, 0)
+        fast_items, fast_time, fast_stats, diagnostics = run(images, args.concurrency, args.max_bytes, args.target_dpi)
+    finally:
+        server.shutdown()
+
+    print(f"📄 {args.pages} pages, {args.latency * 1000:.0f} ms base latency per upload")
+    print(f"   serial, full-size PNG:   {serial_stats['calls']:3d} calls, {serial_stats['bytes'] / 1e6:8.2f} MB sent, {serial_time:6.2f}s")
+    print(f"   concurrent, downscaled:  {fast_stats['calls']:3d} calls, {fast_stats['bytes'] / 1e6:8.2f} MB sent, {fast_time:6.2f}s"
+          f"  (concurrency {args.concurrency}, {args.target_dpi} dpi, {args.max_bytes:,} byte budget)")
+    print(f"   diagnostics: bytesSent={diagnostics['bytesSent']:,} retries={diagnostics['retries']} "
+          f"latencyMsMax={diagnostics['latencyMsMax']} formats={sorted({p['format'] for p in diagnostics['pages']})}")
+    print(f"   items: {len(fast_items)}, identical: {serial_items == fast_items}")
+    if serial_items != fast_items or not fast_items:
+        raise SystemExit("❌ Downscaled/concurrent results differ from serial full-size results")
+
+
+if __name__ == "__main__":
+    main()
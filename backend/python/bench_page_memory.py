@@ -0,0 +1,107 @@
+"""
+Benchmark: memory of long scanned documents (process_file._PageImageStore, OCR_MAX_PAGES_IN_MEMORY).
+
+Writes a bench_invoices order as a scanned (image-only) PDF of --pages pages and parses it
+in a child process per setting of OCR_MAX_PAGES_IN_MEMORY (0 keeps every page image decoded,
+the former behaviour). Tesseract is stood in for by a function that decodes the image it is
+given and reads nothing, so the child holds what real OCR would hold without its run time;
+--ocr uses the real Tesseract. Reported per cap: the child's peak RSS (wait4), the peak
+process_file reports in diagnostics['memory'], the pages written to disk and decoded again,
+the most pages decoded at once and wall ms. Usage:
+
+    python bench_page_memory.py [--pages 60] [--caps 0,4,1] [--ocr] [--seed 7] [--json out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import bench_invoices  # noqa: E402
+from bench_invoices import make_order, write_digital_pdf, write_scanned_pdf  # noqa: E402
+
+
+def child(path, ocr):
+    """
+    Run process_file in this process and print its diagnostics['memory'] as JSON
+    """
+    import process_file
+
+    if not ocr:
+        def decode(img, *args, **kwargs):
+            img.load()
+            return ''
+        process_file.pytesseract = type('DecodingTesseract', (), {'image_to_string': staticmethod(decode)})
+        process_file._tesseract_data_frame_untraced = lambda img: decode(img) and None
+    out = process_file.process_file(path)
+    print(json.dumps(out['diagnostics'].get('memory')))
+
+
+def run_child(path, cap, ocr):
+    env = dict(os.environ, OCR_MAX_PAGES_IN_MEMORY=str(cap))
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', path] + (['--ocr'] if ocr else [])
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env, cwd=HERE)
+    out = proc.stdout.read()
+    peak_rss = None
+    if hasattr(os, 'wait4'):
+        _, _, usage = os.wait4(proc.pid, 0)
+        peak_rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    else:
+        proc.wait()
+    ms = (time.perf_counter() - start) * 1000
+    lines = out.decode('utf-8', 'replace').strip().splitlines()
+    return peak_rss, json.loads(lines[-1]) if lines else None, ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of a long scanned document per OCR_MAX_PAGES_IN_MEMORY")
+    parser.add_argument('--pages', type=int, default=60)
+    parser.add_argument('--caps', default="0,4,1", help="Comma-separated OCR_MAX_PAGES_IN_MEMORY values")
+    parser.add_argument('--ocr', action='store_true', help="Use the real Tesseract")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.ocr)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        digital = os.path.join(tmp, "long-digital.pdf")
+        scanned = os.path.join(tmp, "long-scanned.pdf")
+        order = make_order(args.pages * bench_invoices.ROWS_PER_PAGE, args.seed)
+        write_digital_pdf(digital, order)
+        write_scanned_pdf(scanned, digital, args.seed)
+        print(f"   {args.pages} scanned pages, {os.path.getsize(scanned) / 1e6:.1f} MB")
+        print(f"   {'cap':>4s} {'peak RSS MB':>11s} {'reported MB':>11s} {'spilled':>7s} {'reloads':>7s} {'max decoded':>11s} {'wall ms':>8s}")
+        for cap in [int(c) for c in args.caps.split(',') if c.strip()]:
+            peak_rss, memory, ms = run_child(scanned, cap, args.ocr)
+            pages = (memory or {}).get('pageImages') or {}
+            row = {
+                'cap': cap,
+                'peakRssMb': round(peak_rss / (1024 * 1024), 1) if peak_rss else None,
+                'reportedPeakRssMb': (memory or {}).get('peakRssMb'),
+                'spilled': pages.get('spilled'),
+                'loads': pages.get('loads'),
+                'peakInMemory': pages.get('peakInMemory'),
+                'ms': round(ms, 1),
+            }
+            results.append(row)
+            print(f"   {cap:4d} {row['peakRssMb'] or 0:11.1f} {row['reportedPeakRssMb'] or 0:11.1f} {row['spilled'] or 0:7d} "
+                  f"{row['loads'] or 0:7d} {row['peakInMemory'] or 0:11d} {row['ms']:8.1f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'seed': args.seed, 'pages': args.pages, 'ocr': args.ocr, 'results': results}, f, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
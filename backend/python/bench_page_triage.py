@@ -0,0 +1,170 @@
+"""
+Benchmark: page triage of multi-page PDFs (process_file._triage_pages, OCR_PAGE_TRIAGE).
+
+Writes a bench_invoices order followed by the pages that travel with it in real uploads (a
+terms-and-conditions page, a blank back, a shipping label and a second terms page), as a
+text-layer PDF and as a scanned (image-only) PDF, and runs process_file on the scan with
+triage off and on (scanned pages read coarse-to-fine, OCR_COARSE_TO_FINE=1). Reported per
+run: the pages OCR'd, the OCR'd pixels (diagnostics['renderScale'] and the coarse passes), wall ms, the triage's own ms, the items found and whether the
+grand total was read, then the triage decision per page against the page's true kind (for
+both the scan and the text-layer PDF).
+
+Without --ocr, Tesseract is stood in for by the digital twin's text layer (see
+bench_coarse_to_fine.TextLayerOCR), so times cover rendering and parsing only and pixels are
+the OCR cost proxy; --ocr runs the real Tesseract. Usage:
+
+    python bench_page_triage.py [--items 40] [--legible-px 9] [--ocr] [--seed 7] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_coarse_to_fine import TextLayerOCR, grand_total_found  # noqa: E402
+from bench_invoices import _font, make_order, write_digital_pdf, write_scanned_pdf  # noqa: E402
+
+TERMS = [
+    "Terms and Conditions",
+    "1. Returns are accepted within 7 days of delivery when the item is unused and in its packaging.",
+    "2. Refunds are credited to the original payment method within 14 business days.",
+    "3. The warranty covers manufacturing defects only and excludes wear, misuse and accidents.",
+    "4. Our liability is limited to the amount paid for the product concerned.",
+    "5. These terms are governed by the laws of the Republic of the Philippines.",
+]
+LABEL = [
+    "J&T Express   Waybill No: JT0123456789",
+    "Sort Code: 401-LIP-07",
+    "Ship To: Dolores, Lipa City, Batangas 4217",
+    "Recipient Phone: 0917 123 4567",
+    "Sender: studio360.ph, Quezon City",
+    "Cash on Delivery: No   Weight: 0.8 kg",
+]
+
+
+def append_pages(path, order_pages):
+    """
+    The order's pages, then terms, a blank back, a shipping label and more terms; returns the true kinds
+    """
+    font = _font()
+    doc = fitz.open(path)
+    kinds = ['order'] * order_pages
+    for kind, lines, size, repeat in (('terms', TERMS, 10, 6), ('blank', [], 0, 0), ('shipping_label', LABEL, 14, 1),
+                                      ('terms', TERMS[1:], 10, 7)):
+        page = doc.new_page(width=595, height=842)
+        if lines:
+            writer = fitz.TextWriter(page.rect)
+            y = 60
+            for _ in range(repeat):
+                for line in lines:
+                    writer.append((40, y), line, font=font, fontsize=size)
+                    y += size * 1.7
+            writer.write_text(page)
+        kinds.append(kind)
+    doc.saveIncr()
+    doc.close()
+    return kinds
+
+
+class PageTextOCR(TextLayerOCR):
+    """
+    TextLayerOCR that also reads whole pages rendered outside _PageRaster (the page_ocr
+    fallback) as blank: the stand-in cannot tell which page they show
+    """
+
+    def image_to_data(self, img):
+        if id(img) not in self.rendered:
+            return pd.DataFrame(columns=['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+                                         'left', 'top', 'width', 'height', 'conf', 'text'])
+        return super().image_to_data(img)
+
+    def image_to_string(self, img):
+        df = self.image_to_data(img)
+        return '\n'.join(' '.join(g['text']) for _, g in df.groupby('line_num'))
+
+
+def run(process_file, path, triage):
+    os.environ['OCR_PAGE_TRIAGE'] = triage
+    start = time.perf_counter()
+    out = process_file.process_file(path)
+    ms = (time.perf_counter() - start) * 1000
+    diag = out['diagnostics']
+    return out, {
+        'triage': triage,
+        'pagesOcr': diag['counts']['pages_ocr'],
+        'px': diag.get('renderScale', {}).get('px', 0) + diag.get('ocrCoarseToFine', {}).get('coarsePx', 0),
+        'ms': round(ms, 1),
+        'triageMs': diag.get('pageTriage', {}).get('ms'),
+        'items': len(out['layout_items']),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR work on a multi-page scan with and without page triage")
+    parser.add_argument('--items', type=int, default=40, help="Items in the order (24 per page)")
+    parser.add_argument('--legible-px', type=float, default=9.0, help="Stand-in OCR: smallest legible word height in px")
+    parser.add_argument('--ocr', action='store_true', help="Use the real Tesseract")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    import process_file
+
+    os.environ['OCR_COARSE_TO_FINE'] = '1'
+    order = make_order(args.items, args.seed)
+    results = {'runs': [], 'decisions': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        digital = os.path.join(tmp, "order-with-extras.pdf")
+        scanned = os.path.join(tmp, "order-with-extras-scan.pdf")
+        write_digital_pdf(digital, order)
+        with fitz.open(digital) as doc:
+            order_pages = len(doc)
+        kinds = append_pages(digital, order_pages)
+        write_scanned_pdf(scanned, digital, args.seed)
+        if not args.ocr:
+            stand_in = PageTextOCR(args.legible_px)
+            stand_in.patch(process_file)
+            stand_in.load(digital)
+            process_file.pytesseract = type('TextLayerTesseract', (), {'image_to_string': staticmethod(stand_in.image_to_string)})
+
+        print(f"   {len(kinds)} pages: {', '.join(kinds)}")
+        print(f"   {'triage':7s} {'pages OCR':>9s} {'Mpx':>7s} {'wall ms':>8s} {'triage ms':>9s} {'items':>6s} {'grand total':>11s}")
+        for triage in ('0', '1'):
+            out, row = run(process_file, scanned, triage)
+            row['grandTotalFound'] = grand_total_found(out['text'], order)
+            results['runs'].append(row)
+            print(f"   {'on' if triage == '1' else 'off':7s} {row['pagesOcr']:9d} {row['px'] / 1e6:7.2f} {row['ms']:8.1f} "
+                  f"{row['triageMs'] if row['triageMs'] is not None else '-':>9} {row['items']:6d} "
+                  f"{'yes' if row['grandTotalFound'] else 'no':>11s}")
+            if triage == '1':
+                results['decisions']['scanned'] = out['diagnostics'].get('pageTriage')
+        digital_out, _ = run(process_file, digital, '1')
+        results['decisions']['digital'] = digital_out['diagnostics'].get('pageTriage')
+
+    off, on = results['runs']
+    if off['px']:
+        print(f"   OCR'd pixels saved by triage: {100.0 * (1 - on['px'] / off['px']):.1f}%")
+    print(f"   {'page':>4s} {'true kind':15s} {'scan: class / decision / signal':40s} {'text layer: class / decision'}")
+    scan = (results['decisions']['scanned'] or {}).get('pages', [])
+    text = (results['decisions']['digital'] or {}).get('pages', [])
+    for i, kind in enumerate(kinds):
+        s = scan[i] if i < len(scan) else {}
+        t = text[i] if i < len(text) else {}
+        cell = f"{s.get('class', '-')} / {s.get('decision', '-')} / {s.get('signal', '-')}"
+        print(f"   {i + 1:4d} {kind:15s} {cell:40s} {t.get('class', '-')} / {t.get('decision', '-')}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'seed': args.seed, 'kinds': kinds, 'ocr': args.ocr, **results}, f, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: serial vs concurrent digital-PDF stages in process_file.
+
+Writes a synthetic order PDF (an 'Order Details' table over several pages) with PyMuPDF and
+runs process_file on it serially (PROCESS_FILE_PARALLEL_STAGES=0, TESSERACT_CONCURRENCY=1) and
+concurrently (stages on threads, several Tesseract calls at once). It reports the wall time
+of each stage (pdfplumber, tesseract_roi, layout, tesseract_tsv), the stage group and the whole call.
+Tesseract can be replaced by a stand-in that sleeps --ocr-latency seconds per call and prints an
+empty TSV, so the overlap can be measured on machines without it. Both modes must give identical
+results. Usage:
+
+    python bench_pdf_stages.py [--pages 3] [--rows 12] [--ocr-latency 0.8] [--tesseract-concurrency 4] [--real-tesseract]
+"""
+import argparse
+import json
+import os
+import stat
+import tempfile
+import time
+
+import fitz
+
+import process_file
+
+
+def write_order_pdf(path, pages=3, rows=12):
+    """
+    A digital invoice: per page an 'Order Details' header, a Product/Price/Qty/Subtotal table
+    and a 'Merchandise Subtotal' line
+    """
+    doc = fitz.open()
+    columns = [("No.", 40), ("Product", 80), ("Variation", 280), ("Price", 380), ("Qty", 450), ("Subtotal", 500)]
+    for p in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((40, 60), f"Order ID 24091{p:04d}ABCD", fontsize=11)
+        page.insert_text((40, 100), "Order Details", fontsize=13)
+        y = 130
+        for name, x in columns:
+            page.insert_text((x, y), name, fontsize=10)
+        for i in range(rows):
+            y += 22
+            price = 120 + 15 * i
+            qty = 1 + i % 4
+            values = [str(i + 1), f"Beaded Bracelet {p + 1}-{i + 1}", "Red", f"{price:.2f}", str(qty), f"{price * qty:.2f}"]
+            for value, (_, x) in zip(values, columns):
+                page.insert_text((x, y), value, fontsize=10)
+        page.insert_text((380, y + 30), "Merchandise Subtotal", fontsize=10)
+        page.insert_text((40, y + 60), "Grand Total", fontsize=11)
+    doc.save(path)
+    doc.close()
+
+
+def stand_in_tesseract(directory, latency):
+    """
+    Shell script answering like tesseract: a version banner, otherwise sleep then an empty TSV/TXT
+    """
+    script = os.path.join(directory, "tesseract")
+    with open(script, "w") as f:
+        f.write("#!/bin/sh\n"
+                'if [ "$1" = "--version" ]; then echo "tesseract 5.3.0"; exit 0; fi\n'
+                f"sleep {latency}\n"
+                'printf "level\\tpage_num\\tblock_num\\tpar_num\\tline_num\\tword_num\\tleft\\ttop\\twidth\\theight\\tconf\\ttext\\n" > "$2.tsv"\n'
+                ': > "$2.txt"\n')
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+    return script
+
+
+def run(pdf_path, parallel, repeat, tesseract_concurrency=1):
+    os.environ["PROCESS_FILE_PARALLEL_STAGES"] = "1" if parallel else "0"
+    os.environ["TESSERACT_CONCURRENCY"] = str(tesseract_concurrency if parallel else 1)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = process_file.process_file(pdf_path)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, result)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent digital-PDF stages in process_file")
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=12)
+    parser.add_argument('--ocr-latency', type=float, default=0.8, help="Seconds per stand-in Tesseract call")
+    parser.add_argument('--real-tesseract', action='store_true', help="Use the installed Tesseract instead of the stand-in")
+    parser.add_argument('--tesseract-concurrency', type=int, default=4, help="Concurrent Tesseract calls in threads mode")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "order.pdf")
+        write_order_pdf(pdf_path, args.pages, args.rows)
+        if not args.real_tesseract:
+            os.environ["TESSERACT_PATH"] = stand_in_tesseract(tmp, args.ocr_latency)
+        serial_time, serial = run(pdf_path, False, args.repeat)
+        parallel_time, parallel = run(pdf_path, True, args.repeat, args.tesseract_concurrency)
+
+    print(f"📄 {args.pages} pages x {args.rows} rows"
+          + ("" if args.real_tesseract else f", stand-in Tesseract {args.ocr_latency * 1000:.0f} ms per call"))
+    for label, elapsed, result in (("serial", serial_time, serial), ("threads", parallel_time, parallel)):
+        stages = result["diagnostics"]["stages"]
+        per_stage = ", ".join(f"{name} {ms:.0f}" for name, ms in stages["stageMs"].items())
+        print(f"   {label:8s} stages {stages['wallMs']:7.0f} ms  total {elapsed * 1000:7.0f} ms  ({per_stage})")
+    for result in (serial, parallel):
+        for key in ("stages", "timings"):
+            result["diagnostics"].pop(key)
+    identical = json.dumps(serial, sort_keys=True, default=str) == json.dumps(parallel, sort_keys=True, default=str)
+    print(f"   items: {len(parallel['layout_items'])} ({parallel['diagnostics']['items']['selectedSource']}), identical: {identical}")
+    if not identical:
+        raise SystemExit("❌ Concurrent stages changed the result")
+
+
+if __name__ == "__main__":
+    main()
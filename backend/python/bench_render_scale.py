@@ -0,0 +1,139 @@
+"""
+Benchmark: adaptive OCR render scale (process_file._choose_render_scale, OCR_ADAPTIVE_SCALE).
+
+Writes a receipt-style page per font size (A4, items and totals in one size, a small footer)
+as a text-layer PDF and as a 200 dpi scan (bench_invoices.write_scanned_pdf), then measures
+the text size the way process_file does:
+
+    pdf_fonts     span sizes of the text layer (digital pages: ROI and Paddle renders)
+    ink_profile   inked-row runs of a ~100 dpi grayscale render (image-only pages)
+
+and picks the render scale for each use against the fixed scale it replaces: 'roi' (Tesseract
+on the Order Details region, was ROI_SCALE 3.0), 'paddle' (was 2.0) and 'page_ocr' (Tesseract on
+an image-only page, was the 72 dpi default pixmap). A chosen scale may exceed the fixed one for
+small print, up to 5x, OCR_MAX_RENDER_PX pixels and, for scans, the native resolution.
+Reported per size: the measured sizes, the x-height in pixels each chosen scale gives the
+page's text, the chosen and fixed scales and the pixels against the fixed renders, plus the
+time the measurement takes. With --ocr each scanned page is also OCR'd at the fixed and the
+chosen scale (real Tesseract) and the share of the page's words read back is compared. Usage:
+
+    python bench_render_scale.py [--sizes 6,8,9,10,12,16,24] [--ocr] [--seed 7] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_invoices import _font, _money, make_order, write_scanned_pdf  # noqa: E402
+
+FIXED = {'roi': ('tesseract', 3.0), 'paddle': ('paddle', 2.0), 'page_ocr': ('tesseract', 1.0)}
+
+
+def write_receipt_pdf(path, order, size):
+    """
+    One A4 page: header, items and totals at `size` pt, a 7 pt footer; as many items as fit
+    """
+    font = _font()
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    writer = fitz.TextWriter(page.rect)
+    step = size * 1.6
+    y = 40 + size
+    lines = ["Order Summary", f"Order ID: {order['orderId']}", "Seller Name: studio360.ph", "Order Details"]
+    for it in order['items']:
+        if y + step * (len(lines) + 6) > 800:
+            break
+        lines.append(f"{it['qty']} x {it['product']} {_money(it['subtotal'])}")
+    lines += [f"Merchandise Subtotal {_money(order['merchandiseSubtotal'])}", f"Grand Total {_money(order['grandTotal'])}"]
+    for line in lines:
+        writer.append((40, y), line, font=font, fontsize=size)
+        y += step
+    writer.append((40, 820), "Thank you for shopping. Returns within 7 days with this receipt.", font=font, fontsize=7)
+    writer.write_text(page)
+    doc.save(path)
+    doc.close()
+    return lines
+
+
+def ocr_word_recall(img, lines):
+    import pytesseract
+    want = [w for line in lines for w in line.split()]
+    got = set(pytesseract.image_to_string(img, config='--psm 6').split())
+    return sum(1 for w in want if w in got) / len(want)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare adaptive and fixed OCR render scales across font sizes")
+    parser.add_argument('--sizes', default="6,8,9,10,12,16,24", help="Comma-separated body font sizes in pt")
+    parser.add_argument('--ocr', action='store_true', help="Also OCR the scans at both scales (real Tesseract)")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    import process_file
+
+    print(f"   {'size':>4s} {'fonts':>6s} {'ink':>6s} {'scan ink':>8s} {'meas ms':>7s}  "
+          + '  '.join(f"{name + ' scale':>16s} {'x px':>5s} {'px vs fixed':>11s}" for name in FIXED)
+          + ("  word recall fixed/adaptive" if args.ocr else ""))
+    results = []
+    totals = {name: [0, 0] for name in FIXED}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in [float(s) for s in args.sizes.split(',') if s.strip()]:
+            order = make_order(40, args.seed)
+            digital = os.path.join(tmp, f"receipt-{size:g}.pdf")
+            scanned = os.path.join(tmp, f"receipt-{size:g}-scan.pdf")
+            lines = write_receipt_pdf(digital, order, size)
+            write_scanned_pdf(scanned, digital, args.seed)
+            with fitz.open(digital) as ddoc, fitz.open(scanned) as sdoc:
+                dpage, spage = ddoc[0], sdoc[0]
+                start = time.perf_counter()
+                fonts = process_file._pdf_text_em(dpage)
+                fonts_ms = (time.perf_counter() - start) * 1000
+                ink = process_file._ink_text_em(process_file._PageRaster(page=dpage))
+                start = time.perf_counter()
+                scan_ink = process_file._ink_text_em(process_file._PageRaster(page=spage))
+                ink_ms = (time.perf_counter() - start) * 1000
+                row = {'size': size, 'pdfFontsEm': fonts, 'inkEm': round(ink, 2) if ink else None,
+                       'scanInkEm': round(scan_ink, 2) if scan_ink else None,
+                       'fontsMs': round(fonts_ms, 2), 'inkMs': round(ink_ms, 2), 'uses': {}}
+                cells = []
+                for name, (engine, fixed) in FIXED.items():
+                    page = spage if name == 'page_ocr' else dpage
+                    scale, entry = process_file._choose_render_scale(process_file._PageRaster(page=page), engine, fixed, name, 1)
+                    xheight = size * process_file._XHEIGHT_PER_EM * scale
+                    row['uses'][name] = {**entry, 'xHeightPx': round(xheight, 1),
+                                         'fixedXHeightPx': round(size * process_file._XHEIGHT_PER_EM * fixed, 1)}
+                    totals[name][0] += entry['px']
+                    totals[name][1] += entry['fixedPx']
+                    cells.append(f"{fixed:5.2f} -> {scale:5.2f}  {xheight:5.1f} {entry['px'] / entry['fixedPx']:10.2f}x")
+                if args.ocr:
+                    raster = process_file._PageRaster(page=spage)
+                    scale = row['uses']['page_ocr']['scale']
+                    row['wordRecall'] = {'fixed': ocr_word_recall(raster.render(1.0), lines),
+                                         'adaptive': ocr_word_recall(raster.render(scale), lines)}
+                results.append(row)
+                print(f"   {size:4g} {fonts or 0:6.2f} {ink or 0:6.2f} {scan_ink or 0:8.2f} {fonts_ms + ink_ms:7.1f}  "
+                      + '  '.join(cells)
+                      + (f"  {row['wordRecall']['fixed']:.2f}/{row['wordRecall']['adaptive']:.2f}" if args.ocr else ""))
+
+    summary = {name: {'px': px, 'fixedPx': fixed_px, 'pixelsSavedPct': round(100.0 * (1 - px / fixed_px), 1)}
+               for name, (px, fixed_px) in totals.items()}
+    print("   pixels against the fixed scales: "
+          + ", ".join(f"{name} {s['pixelsSavedPct']:+.1f}% saved" for name, s in summary.items()))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'seed': args.seed, 'targetXHeightPx': dict(process_file._OCR_TARGET_XHEIGHT_PX),
+                       'results': results, 'summary': summary}, f, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Benchmark: sales_ingest.ingest_sales on generated settlement workbooks.
+
+Generates TikTok Shop and Shopee settlement exports shaped like the real ones in uploads/:
+
+    tiktok   'Order details' (45 columns) plus the 'Reports', 'Withdrawal records' and
+             'Fees explanation' sheets the export always carries
+    shopee   a 'sales' sheet (45 columns) whose header sits at row index 0, 4 or 5 under an
+             income-report preamble, optionally followed by extra sheets
+
+for 1k to 1M order rows. Each workbook is ingested in a fresh process (as the API does); the
+worker times the Excel reads (pd.read_excel / pd.ExcelFile) and normalize_rows separately, and
+reports its peak RSS and the size of the JSON the CLI would print.
+Every run is appended to a JSON results file (with the git commit and library versions) and
+compared with the previous run of the same case. Usage:
+
+    python bench_sales_ingest.py [--cases tiktok:1000,shopee:1000:4,shopee:10000:5:3] [--repeat 1]
+                                 [--data-dir bench_data] [--results sales_ingest_bench.json] [--timeout 1800]
+
+A case is platform:rows[:header_row[:sheets]]; header_row applies to Shopee (0, 4 or 5) and
+sheets is the total sheet count (TikTok always has 4). Workbooks are cached in --data-dir,
+since writing a 1M-row workbook takes minutes.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+TIKTOK_COLUMNS = [
+    'Order/adjustment ID  ', 'Type ', 'Order created time', 'Order settled time', 'Currency',
+    'Total settlement amount', 'Total revenue', 'Subtotal after seller discounts', 'Subtotal before discounts',
+    'Seller discounts', 'Refund subtotal after seller discounts', 'Refund subtotal before seller discounts',
+    'Refund of seller discounts', 'Total fees', 'Transaction fee', 'TikTok Shop commission fee',
+    'Seller shipping fee', 'Actual shipping fee ', 'Platform shipping fee discount', 'Customer shipping fee',
+    'Refund customer shipping fee', 'Actual return shipping fee', 'Shipping fee subsidy', 'Affiliate commission ',
+    'Affiliate partner commission ', 'Affiliate Shop Ads commission\t', 'SFP service fee',
+    'LIVE Specials Service Fee', 'Voucher Xtra Service Fee', 'Flash Sale service fee',
+    'Bonus cashback service fee', 'Ajustment amount', 'Related order ID  ', None, 'Customer payment',
+    'Customer refund', 'Seller co-funded voucher discount', 'Refund of seller co-funded voucher discount',
+    'Platform discounts', 'Refund of platform discounts', 'Platform co-funded voucher discounts',
+    'Refund of platform co-funded voucher discounts', 'Seller shipping fee discount',
+    'Estimated package weight (g)', 'Actual package weight (g)',
+]
+
+SHOPEE_COLUMNS = [
+    'Sequence No.', 'Order ID', 'Refund ID', 'Username (Buyer)', 'Order Creation Date', 'Buyer Payment Method',
+    'Hot Listing', 'Buyer Payment Method Details_1(if applicable)', 'Payment Details / Installment Plan',
+    'Transaction Fee Rate (%)', 'Payout Completed Date', 'Original Product Price', 'Seller Product Promotion',
+    'Refund Amount', 'Rebate Provided by Shopee', 'Voucher Sponsored by Seller',
+    'Coin Cashback Sponsored by Seller', 'Buyer Paid Shipping Fee', 'Shipping Fee Rebate From Shopee',
+    '3rd Party Logistics - Defined Shipping Fee', 'Reverse Shipping Fee', 'Return to Sender Shipping Fee',
+    'Shipping Fee Support Program Savings', 'AMS Commission Fee', 'Commission fee', 'Service Fee',
+    'Support Program Fee', 'Transaction Fee', 'Withholding Tax', 'Total Released Amount (₱)',
+    'Seller Voucher Code', 'Lost Compensation', 'Shipping Fee Promotion by Seller', 'Shipping Provider',
+    'Courier Name',
+] + [f'Column{i}' for i in range(1, 11)]
+
+
+def _day(rng, start=datetime.date(2024, 8, 1)):
+    return start + datetime.timedelta(days=rng.randint(0, 240))
+
+
+def tiktok_rows(n_rows, seed=0):
+    """
+    'Order details' rows: amounts as text like the real export ('94.37', '-25.63')
+    """
+    rng = random.Random(seed)
+    for _ in range(n_rows):
+        created = _day(rng)
+        revenue = rng.choice((90, 110, 120, 190, 250, 480))
+        fees = round(revenue * rng.uniform(0.12, 0.24), 2)
+        row = [str(rng.randrange(10 ** 17, 10 ** 18)), 'Order', created.strftime('%Y/%m/%d'),
+               (created + datetime.timedelta(days=rng.randint(5, 12))).strftime('%Y/%m/%d'), 'PHP',
+               f"{revenue - fees:.2f}", str(revenue), str(revenue), str(revenue + 10), '-10', '0', '0', '0',
+               f"{-fees:.2f}", f"{-fees * 0.2:.2f}", f"{-fees * 0.6:.2f}", '0', '0', '0', '0', '0', '0', '0',
+               f"{-fees * 0.2:.2f}", '0', '0', '0', '0', '0', '0', '0', '0', '', None, str(revenue + 36), '0',
+               '0', '0', '0', '0', '0', '0', '0', '250', '240']
+        yield row
+
+
+def shopee_rows(n_rows, seed=0):
+    """
+    'sales' rows: numeric amounts, dates as ISO text, fee columns summed by normalize_rows
+    """
+    rng = random.Random(seed)
+    buyers = ['danelamandap', 'rinzcart', 'monnycc', 'norman.roa', 'carljustinee']
+    for i in range(n_rows):
+        created = _day(rng)
+        price = rng.choice((99, 110, 130, 219, 240, 499))
+        commission, service, transaction = round(price * 0.05, 2), round(price * 0.04, 2), round(price * 0.0224, 2)
+        tax = round(price * 0.005, 2)
+        released = round(price - commission - service - transaction - tax, 2)
+        row = [i + 1, f"24{rng.randrange(10 ** 11, 10 ** 12):012d}"[:14], None, rng.choice(buyers),
+               created.isoformat(), rng.choice(('Cash on Delivery', 'Credit / Debit Card', 'ShopeePay')), 'NO',
+               None, None, '2.24%', (created + datetime.timedelta(days=3)).isoformat(), price, 0, 0, 0, 0, 0,
+               0, 0, 0, 0, 0, 0, 0, -commission, -service, 0, -transaction, -tax, released, None, 0, 0,
+               'SPX Express', 'SPX'] + [None] * 10
+        yield row
+
+
+def write_workbook(path, platform, n_rows, header_row=0, sheets=1, seed=0):
+    """
+    Write a settlement workbook with openpyxl's streaming writer
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    if platform == 'tiktok':
+        ws = wb.create_sheet('Order details')
+        ws.append(TIKTOK_COLUMNS)
+        for row in tiktok_rows(n_rows, seed):
+            ws.append(row)
+        reports = wb.create_sheet('Reports')
+        for row in ([], [None, 'Time period:', None, None, None, '2024/08/01-2025/03/31'],
+                    [None, 'Currency', None, None, None, 'PHP'], [],
+                    [None, 'Total settlement amount', None, None, None, '2504.14'],
+                    [None, None, 'Total revenue', None, None, '2995']):
+            reports.append(row)
+        withdrawals = wb.create_sheet('Withdrawal records')
+        withdrawals.append(['Type', 'Reference ID', 'Request time (Timezone=UTC)', 'Amount', 'Status',
+                            'Success time (Timezone=UTC)', 'Bank account'])
+        rng = random.Random(seed + 1)
+        for _ in range(max(1, n_rows // 20)):
+            withdrawals.append(['Earnings', str(rng.randrange(10 ** 18, 10 ** 19)), _day(rng).strftime('%Y/%m/%d'),
+                                f"{rng.uniform(50, 500):.2f}", 'Transferred', _day(rng).strftime('%Y/%m/%d'), '/'])
+        fees = wb.create_sheet('Fees explanation')
+        fees.append(['Fee explanation'])
+        fees.append(['Name', 'Explanation', 'Formula'])
+        for name in TIKTOK_COLUMNS[:20]:
+            fees.append([name, f'Explanation of {str(name).strip().lower()}.'])
+    else:
+        ws = wb.create_sheet('sales')
+        if header_row:
+            preamble = [['Income Report'], ['Shop name', 'studio360.ph'],
+                        ['Date range', '2024-08-01 - 2025-03-31'], ['Currency', 'PHP'], []]
+            for row in preamble[:header_row]:
+                ws.append(row)
+            for _ in range(header_row - len(preamble)):
+                ws.append([])
+        ws.append(SHOPEE_COLUMNS)
+        ws.append([])
+        for row in shopee_rows(n_rows, seed):
+            ws.append(row)
+        for extra in range(1, sheets):
+            sheet = wb.create_sheet(f'Sheet{extra + 1}')
+            sheet.append(['Note', 'Generated sheet without settlement rows'])
+            for i in range(min(200, n_rows)):
+                sheet.append([i, f'memo {i}'])
+    wb.save(path)
+
+
+def workbook_for(data_dir, platform, n_rows, header_row, sheets, seed):
+    """
+    Cached workbook path for a case, generating it on first use
+    """
+    name = f"{platform}-{n_rows}-h{header_row}-s{sheets}-seed{seed}.xlsx"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        start = time.perf_counter()
+        tmp = path + '.tmp.xlsx'
+        write_workbook(tmp, platform, n_rows, header_row, sheets, seed)
+        os.replace(tmp, path)
+        print(f"   📝 generated {name} ({os.path.getsize(path) / 1024 / 1024:.1f} MiB) in {time.perf_counter() - start:.1f} s")
+    return path
+
+
+def worker(path):
+    """
+    Child process: ingest one workbook with read/normalise timers and print the measurements
+    """
+    import pandas as pd
+
+    import sales_ingest
+
+    timers = {'read': [0.0, 0], 'normalize': [0.0, 0]}
+
+    def timed(name, fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timers[name][0] += time.perf_counter() - start
+                timers[name][1] += 1
+        return wrapper
+
+    pd.read_excel = timed('read', pd.read_excel)
+    pd.ExcelFile = timed('read', pd.ExcelFile)
+    sales_ingest.normalize_rows = timed('normalize', sales_ingest.normalize_rows)
+    start = time.perf_counter()
+    result = sales_ingest.ingest_sales(path)
+    total = time.perf_counter() - start
+    output = json.dumps({'success': True, 'data': result}, ensure_ascii=False)
+    print(json.dumps({
+        'totalMs': round(total * 1000, 1),
+        'readMs': round(timers['read'][0] * 1000, 1),
+        'readCalls': timers['read'][1],
+        'normalizeMs': round(timers['normalize'][0] * 1000, 1),
+        'normalizeCalls': timers['normalize'][1],
+        'otherMs': round((total - timers['read'][0] - timers['normalize'][0]) * 1000, 1),
+        'rowsNormalized': result['count'],
+        'platform': result['platform'],
+        'headerIndexUsed': result['diagnostics']['headerIndexUsed'],
+        'outputBytes': len(output.encode('utf-8')),
+        'peakRssBytes': _peak_rss(),
+    }))
+
+
+def run_case(path, timeout):
+    """
+    Run the worker on one workbook; returns the measurements plus peak RSS, or a timeout/failure record
+    """
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker', path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=HERE)
+    start = time.perf_counter()
+    try:
+        out, err = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        return {'status': 'timeout', 'wallMs': round((time.perf_counter() - start) * 1000, 1)}
+    wall = time.perf_counter() - start
+    record = {'status': 'ok' if proc.returncode == 0 else 'failed', 'wallMs': round(wall * 1000, 1)}
+    try:
+        record.update(json.loads(out.decode('utf-8').strip().splitlines()[-1]))
+    except (ValueError, IndexError):
+        record['status'] = 'failed'
+        record['error'] = err.decode('utf-8', 'replace')[-500:]
+    return record
+
+
+def _peak_rss():
+    """
+    Peak RSS of this process in bytes (None where the resource module is missing)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _versions():
+    versions = {'python': sys.version.split()[0]}
+    for name in ('pandas', 'openpyxl', 'numpy'):
+        try:
+            versions[name] = __import__(name).__version__
+        except Exception:
+            versions[name] = None
+    return versions
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == '--worker':
+        worker(sys.argv[2])
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmark sales_ingest on generated settlement workbooks")
+    parser.add_argument('--cases', default="tiktok:1000,shopee:1000:4,shopee:10000:5:3,tiktok:10000",
+                        help="Comma-separated platform:rows[:header_row[:sheets]]")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--data-dir', default=os.path.join(HERE, 'bench_data'), help="Cache for generated workbooks")
+    parser.add_argument('--results', default=os.path.join(HERE, 'sales_ingest_bench.json'),
+                        help="JSON file the run is appended to")
+    parser.add_argument('--timeout', type=float, default=1800, help="Seconds per ingest before it is recorded as a timeout")
+    args = parser.parse_args()
+
+    try:
+        with open(args.results, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        history = []
+    previous = {}
+    for run in history:
+        for case in run.get('cases', []):
+            previous[case['case']] = case
+
+    workbooks = []
+    for spec in filter(None, args.cases.split(',')):
+        parts = spec.split(':')
+        platform = parts[0].strip().lower()
+        n_rows = int(parts[1]) if len(parts) > 1 else 1000
+        header_row = int(parts[2]) if len(parts) > 2 and platform == 'shopee' else 0
+        sheets = 4 if platform == 'tiktok' else (int(parts[3]) if len(parts) > 3 else 1)
+        name = f"{platform}:{n_rows}:h{header_row}:s{sheets}"
+        workbooks.append((name, workbook_for(args.data_dir, platform, n_rows, header_row, sheets, args.seed)))
+
+    print(f"📊 sales_ingest benchmark ({args.repeat} run(s) per case)")
+    print(f"   {'case':24s} {'total':>9s} {'read':>9s} {'normalize':>9s} {'rows':>8s} {'rss MiB':>8s} {'out KiB':>9s}  vs previous")
+    cases = []
+    for name, path in workbooks:
+        runs = [run_case(path, args.timeout) for _ in range(args.repeat)]
+        ok = [r for r in runs if r['status'] == 'ok']
+        best = min(ok, key=lambda r: r['totalMs']) if ok else runs[-1]
+        case = {'case': name, 'workbookBytes': os.path.getsize(path), 'runs': len(runs),
+                'statuses': [r['status'] for r in runs], **best}
+        case['peakRssBytes'] = max((r.get('peakRssBytes') or 0) for r in runs) or None
+        cases.append(case)
+
+        before = previous.get(name)
+        delta = ''
+        if before and before.get('totalMs') and case.get('totalMs'):
+            delta = f"{(case['totalMs'] / before['totalMs'] - 1) * 100:+.0f}% ({before.get('commit') or '?'})"
+        if case.get('status') != 'ok':
+            print(f"   {name:24s} {case['status']} after {case['wallMs'] / 1000:.0f} s")
+            continue
+        rss = f"{case['peakRssBytes'] / 1024 / 1024:8.1f}" if case['peakRssBytes'] else f"{'-':>8s}"
+        print(f"   {name:24s} {case['totalMs']:9.0f} {case['readMs']:9.0f} {case['normalizeMs']:9.0f} "
+              f"{case['rowsNormalized']:8d} {rss} {case['outputBytes'] / 1024:9.0f}  {delta}")
+
+    commit = _git_commit()
+    for case in cases:
+        case['commit'] = commit
+    history.append({
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'versions': _versions(),
+        'repeat': args.repeat,
+        'cases': cases,
+    })
+    with open(args.results, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    print(f"💾 {args.results} ({len(history)} run(s))")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark: text-field parsing (process_file._extract_structured) on long multi-invoice texts.
+
+Builds the text a batch of order summaries extracts to (Shopee-style, TikTok Shop-style and
+an OCR-noisy variant with 'P' for the peso sign, stray casing and split lines), concatenated
+until the requested line count is reached, and times _extract_structured on it in-process.
+Reported per size: median/min wall time, lines per second, cost per 1k lines (to check it
+grows linearly with the text) and a digest of the structured output, so runs before and
+after a parser change can be compared for identical results. Usage:
+
+    python bench_structured.py [--lines 1000,10000] [--repeat 5] [--seed 7] [--dump text.txt] [--json out.json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_invoices import make_order  # noqa: E402
+
+
+def _money(value, symbol='₱'):
+    return f"{symbol}{value:,.2f}"
+
+
+def shopee_lines(order):
+    lines = [
+        "Order Summary",
+        f"Order Summary No.: ISOS{order['orderId'][-9:]}", "Date Issued: 28/03/2025",
+        f"Order ID: {order['orderId']}", "Order Paid Date: 14/03/2025", "Payment Method: SPayLater",
+        "Seller Name: studio360.ph", "Seller Address: 12 Mabini St.", "Brgy. San Roque, Lipa City",
+        "Buyer Name: Dolores", "Buyer Address: Lipa City, Batangas", "4217 Philippines",
+        "Order Details",
+        "No. Product Variation Product Price Qty Subtotal",
+    ]
+    for it in order['items']:
+        lines.append(f"{it['no']} {it['product']} - {it['variation']} {_money(it['productPrice'])} {it['qty']} {_money(it['subtotal'])}")
+    lines += [
+        f"Merchandise Subtotal {_money(order['merchandiseSubtotal'])}",
+        f"Shipping Fee {_money(order['shippingFee'])}",
+        f"Shipping Discount -{_money(order['shippingDiscount'])}",
+        f"Total Platform Voucher Applied -{_money(order['platformVoucher'])}",
+        f"Grand Total {_money(order['grandTotal'])}",
+        "Page 1 of 1",
+    ]
+    return lines
+
+
+def tiktok_lines(order):
+    lines = [
+        "TikTok Shop", "Delivery Details", "Dolores Reyes", "Blk 4 Lot 2 Sampaguita St.", "Lipa City, Batangas",
+        "Sold By: studio360.ph", "Order Details",
+        f"Order Number: {order['orderId']}", "Order Date: 14 Mar 2025 10:21",
+        f"Receipt Number: RCPT{order['orderId'][-8:]}", "Receipt Date: 28 Mar 2025",
+        "Item Description SKU Unit Price Qty Amount",
+    ]
+    for it in order['items']:
+        lines.append(f"{it['product']} {it['variation']} {_money(it['productPrice'])} {it['qty']} {_money(it['subtotal'])}")
+    lines += [
+        f"Subtotal {_money(order['merchandiseSubtotal'])}",
+        f"Shipping {_money(order['shippingFee'])}",
+        f"Coupons -{_money(order['platformVoucher'])}",
+        f"TikTok shipping coupons -{_money(order['shippingDiscount'])}",
+        f"Grand total (includes VAT) {_money(order['grandTotal'])}",
+    ]
+    return lines
+
+
+def ocr_lines(order, rng):
+    """
+    Shopee text as a noisy OCR pass reads it: peso sign as 'P', random casing, wrapped rows, stray marks
+    """
+    out = []
+    for line in shopee_lines(order):
+        line = line.replace('₱', 'P')
+        roll = rng.random()
+        if roll < 0.1:
+            line = line.upper()
+        elif roll < 0.15:
+            line = line.lower()
+        if roll > 0.9 and ' ' in line:
+            cut = line.index(' ', len(line) // 2) if ' ' in line[len(line) // 2:] else line.index(' ')
+            out += [line[:cut], line[cut + 1:]]
+            continue
+        if roll > 0.85:
+            line += rng.choice([" |", " .", " ~", " —"])
+        out.append(line)
+    return out
+
+
+def multi_invoice_text(n_lines, seed=0):
+    """
+    Order summaries of 1-40 items in rotating styles until at least n_lines lines
+    """
+    rng = random.Random(seed)
+    lines = []
+    k = 0
+    while len(lines) < n_lines:
+        order = make_order(rng.randint(1, 40), seed * 10007 + k)
+        style = k % 3
+        lines += shopee_lines(order) if style == 0 else tiktok_lines(order) if style == 1 else ocr_lines(order, rng)
+        lines.append("")
+        k += 1
+    return '\n'.join(lines[:n_lines])
+
+
+def digest(structured):
+    return hashlib.sha1(json.dumps(structured, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:12]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time _extract_structured on multi-invoice texts")
+    parser.add_argument('--lines', default="1000,10000", help="Comma-separated text sizes in lines")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--dump', help="Write the largest generated text here")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    import process_file
+
+    sizes = [int(s) for s in args.lines.split(',') if s.strip()]
+    print(f"   {'lines':>7s} {'median ms':>10s} {'min ms':>9s} {'lines/s':>10s} {'ms/1k lines':>12s}  digest")
+    results = []
+    for n in sizes:
+        text = multi_invoice_text(n, args.seed)
+        if args.dump and n == max(sizes):
+            with open(args.dump, 'w', encoding='utf-8') as f:
+                f.write(text)
+        times = []
+        out = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            out = process_file._extract_structured(text)
+            times.append(time.perf_counter() - start)
+        median = statistics.median(times)
+        row = {
+            'lines': n,
+            'medianMs': round(median * 1000, 2),
+            'minMs': round(min(times) * 1000, 2),
+            'linesPerSec': round(n / median),
+            'msPer1kLines': round(median * 1000 / n * 1000, 2),
+            'digest': digest(out),
+        }
+        results.append(row)
+        print(f"   {n:7d} {row['medianMs']:10.2f} {row['minMs']:9.2f} {row['linesPerSec']:10d} {row['msPer1kLines']:12.2f}  {row['digest']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'seed': args.seed, 'repeat': args.repeat, 'results': results}, f, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
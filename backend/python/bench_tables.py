@@ -0,0 +1,202 @@
+"""
+Benchmark: item-table reconstruction from word boxes (process_file._TableEngine) per page.
+
+Lays out order summaries from bench_invoices.make_order as the four word-box extractors
+receive them and runs each extractor in-process:
+
+    layout      text-layer PDF written by bench_invoices.write_digital_pdf (PyMuPDF words)
+    tesseract   image_to_data frames (block/par/line ids, pixel boxes at 200 dpi)
+    vision      DOCUMENT_TEXT_DETECTION responses (word boxes only; tops jittered by a pixel or two)
+    ocrspace    TextOverlay lines
+
+The OCR providers are stood in for by patching their response functions (_tesseract_data_frames,
+_google_vision_annotate, _ocrspace_submit), so only the table parse is timed. --layout region
+drops the column header so every page goes through the region fallback. Reported per provider
+and rows per page: words per page, median/p95/max parse ms per page (the engine's own
+per-page timing, as in diagnostics['items']['tableParse']), µs per word, items found, the
+parse mode the pages took and the share of ground-truth items found by subtotal, and by qty
+and subtotal. PyMuPDF splits the generated header into one line per cell, so the layout
+provider always takes the region path, which finds the header again among the region's rows
+(rows written below the page edge at 30 rows per page are lost to the page clip). Usage:
+
+    python bench_tables.py [--rows 5,15,30] [--pages 5] [--providers layout,tesseract,vision,ocrspace]
+                           [--layout header|region] [--seed 7] [--json out.json]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import bench_invoices  # noqa: E402
+from bench_invoices import SHOPEE_COLUMNS, make_order, write_digital_pdf  # noqa: E402
+
+PX = 200 / 72  # image providers see the page rendered at 200 dpi
+
+
+def page_lines(order, rows_per_page, header=True):
+    """
+    Pages of lines; a line is a list of (x0, y0, x1, y1, text) in PDF points
+    """
+    def words(x, y, text):
+        out = []
+        for w in text.split():
+            width = 5.0 * len(w)
+            out.append((x, y, x + width, y + 9.0, w))
+            x += width + 2.5
+        return out
+
+    items = order['items']
+    pages = []
+    for start in range(0, len(items), rows_per_page):
+        y = 50.0
+        lines = [words(40, y, "Order Summary"), words(40, y + 16, f"Order ID: {order['orderId']}")]
+        y += 60
+        lines.append(words(40, y, "Order Details"))
+        y += 22
+        if header:
+            lines.append([w for name, x in SHOPEE_COLUMNS for w in words(x, y, name)])
+        for it in items[start:start + rows_per_page]:
+            y += 22
+            values = [str(it['no']), it['product'], it['variation'], money(it['productPrice']), str(it['qty']), money(it['subtotal'])]
+            lines.append([w for value, (_, x) in zip(values, SHOPEE_COLUMNS) for w in words(x, y, value)])
+        y += 34
+        lines.append(words(330, y, "Merchandise Subtotal") + words(505, y, money(order['merchandiseSubtotal'])))
+        lines.append(words(330, y + 18, "Grand Total") + words(505, y + 18, money(order['grandTotal'])))
+        pages.append(lines)
+    return pages
+
+
+def money(value):
+    return f"₱{value:,.2f}"
+
+
+def tesseract_frame(lines):
+    rows = []
+    for li, line in enumerate(lines):
+        for wi, (x0, y0, x1, y1, text) in enumerate(line):
+            rows.append({'level': 5, 'page_num': 1, 'block_num': li // 6 + 1, 'par_num': 1, 'line_num': li % 6 + 1,
+                         'word_num': wi + 1, 'left': int(x0 * PX), 'top': int(y0 * PX), 'width': int((x1 - x0) * PX),
+                         'height': int((y1 - y0) * PX), 'conf': 91, 'text': text})
+    return pd.DataFrame(rows)
+
+
+def vision_response(lines, rng):
+    words = []
+    for line in lines:
+        for x0, y0, x1, y1, text in line:
+            dy = rng.randint(-2, 2)
+            box = [(int(x0 * PX), int(y0 * PX) + dy), (int(x1 * PX), int(y0 * PX) + dy),
+                   (int(x1 * PX), int(y1 * PX) + dy), (int(x0 * PX), int(y1 * PX) + dy)]
+            words.append({'symbols': [{'text': c} for c in text],
+                          'boundingBox': {'vertices': [{'x': x, 'y': y} for x, y in box]}})
+    return {'fullTextAnnotation': {'pages': [{'blocks': [{'paragraphs': [{'words': words}]}]}]}}
+
+
+def ocrspace_response(lines):
+    overlay = []
+    for line in lines:
+        overlay.append({'MinTop': min(w[1] for w in line) * PX, 'Words': [
+            {'Left': x0 * PX, 'Top': y0 * PX, 'Width': (x1 - x0) * PX, 'Height': (y1 - y0) * PX, 'WordText': text}
+            for x0, y0, x1, y1, text in line]})
+    return {'ParsedResults': [{'TextOverlay': {'Lines': overlay}}]}
+
+
+def recovered(items, truth, with_qty):
+    """
+    Share of ground-truth items found by subtotal (and qty, with_qty)
+    """
+    key = (lambda it: (it.get('qty'), it.get('subtotal'))) if with_qty else (lambda it: it.get('subtotal'))
+    found = {key(it) for it in items}
+    return sum(1 for it in truth if key(it) in found) / len(truth) if truth else None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the table reconstruction of each word-box extractor per page")
+    parser.add_argument('--rows', default="5,15,30", help="Comma-separated item rows per page (an A4 PDF page fits about 30)")
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--providers', default="layout,tesseract,vision,ocrspace")
+    parser.add_argument('--layout', choices=('header', 'region'), default='header',
+                        help="region: pages without a column header (region fallback)")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    import process_file
+
+    header = args.layout == 'header'
+    providers = [p.strip() for p in args.providers.split(',') if p.strip()]
+    print(f"   {'provider':10s} {'rows/pg':>7s} {'pages':>5s} {'words/pg':>8s} {'median ms':>9s} {'p95 ms':>8s} "
+          f"{'max ms':>8s} {'µs/word':>8s} {'items':>6s} {'subtot %':>8s} {'+qty %':>7s}  modes")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in [int(r) for r in args.rows.split(',') if r.strip()]:
+            order = make_order(rows * args.pages, args.seed)
+            pages = page_lines(order, rows, header)
+            rng = random.Random(args.seed)
+            process_file._tesseract_data_frames = lambda images: [tesseract_frame(lines) for lines in pages]
+            process_file._google_vision_annotate = lambda images, key: [vision_response(lines, rng) for lines in pages]
+            process_file._ocrspace_submit = lambda images, key, stats=None: [ocrspace_response(lines) for lines in pages]
+            pdf_path = os.path.join(tmp, f"order-{rows}.pdf")
+            if 'layout' in providers:
+                bench_invoices.ROWS_PER_PAGE = rows
+                write_digital_pdf(pdf_path, order)
+            images = [None] * len(pages)
+            for provider in providers:
+                stats = {}
+                if provider == 'layout':
+                    items = process_file._extract_items_from_pdf_layout(pdf_path, stats)
+                elif provider == 'tesseract':
+                    items = process_file._extract_items_from_tesseract_images(images, stats)
+                elif provider == 'vision':
+                    items = process_file._extract_items_from_google_vision_images(images, "stand-in-key", stats)
+                elif provider == 'ocrspace':
+                    items = process_file._extract_items_from_ocrspace(images, "stand-in-key", None, stats)
+                else:
+                    parser.error(f"unknown provider: {provider}")
+                page_ms = [p['ms'] for p in stats.get('pages', [])]
+                words = stats.get('words') or 0
+                row = {
+                    'provider': provider,
+                    'rowsPerPage': rows,
+                    'pages': len(page_ms),
+                    'wordsPerPage': round(words / max(1, len(page_ms))),
+                    'pageMs': {
+                        'median': round(statistics.median(page_ms), 3) if page_ms else None,
+                        'p95': round(percentile(page_ms, 95), 3) if page_ms else None,
+                        'max': round(max(page_ms), 3) if page_ms else None,
+                    },
+                    'usPerWord': round(sum(page_ms) * 1000 / words, 2) if words else None,
+                    'modes': sorted({p['mode'] for p in stats.get('pages', [])}),
+                    'items': len(items),
+                    'subtotalsFound': recovered(items, order['items'], False),
+                    'qtyAndSubtotalFound': recovered(items, order['items'], True),
+                }
+                results.append(row)
+                ms = row['pageMs']
+                print(f"   {provider:10s} {rows:7d} {row['pages']:5d} {row['wordsPerPage']:8d} {ms['median'] or 0:9.3f} "
+                      f"{ms['p95'] or 0:8.3f} {ms['max'] or 0:8.3f} {row['usPerWord'] or 0:8.2f} {len(items):6d} "
+                      f"{(row['subtotalsFound'] or 0) * 100:8.1f} {(row['qtyAndSubtotalFound'] or 0) * 100:7.1f}  {'/'.join(row['modes'])}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'seed': args.seed, 'layout': args.layout, 'results': results}, f, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
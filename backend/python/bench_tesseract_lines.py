@@ -0,0 +1,234 @@
+"""
+Benchmark: Tesseract TSV line aggregation on long scanned documents (process_file._tesseract_word_boxes).
+
+Builds image_to_data frames for a multi-page scanned order (bench_tables.page_lines laid out at
+200 dpi, written as Tesseract 5 TSV with its page/block/paragraph/line rows and read back the
+way pytesseract does) and turns every page into text lines two ways:
+
+    reference   the former per-page aggregation: column cleaning, groupby(block, par, line),
+                sort_values('left') and iterrows() per line, then a sort by (top, left)
+    vectorised  _tesseract_word_boxes (whole-frame NumPy filtering) and _table_lines_by_key
+                (one lexsort by (block, par, line, left) and a split at the key changes)
+
+Both are checked to give the same lines_list, i.e. per line (x0, y0, text, [(x0, y0, x1, y1,
+word), ...]) in reading order (line text compared stripped; the engine keeps the joined text
+as is). Also runs _extract_items_from_tesseract_images over the whole document for the
+per-page parse cost it records. --ocr renders bench_invoices scanned pages and runs the real
+Tesseract instead (needs pytesseract and the tesseract binary; much slower). Exits non-zero
+when any page differs. Usage:
+
+    python bench_tesseract_lines.py [--pages 50] [--rows 30] [--repeat 3] [--ocr] [--seed 7]
+                                    [--json out.json]
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_tables import PX, page_lines, percentile  # noqa: E402
+from bench_invoices import make_order  # noqa: E402
+
+TSV_COLUMNS = ['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+               'left', 'top', 'width', 'height', 'conf', 'text']
+
+
+def tesseract_tsv(lines, lines_per_block=6):
+    """
+    image_to_data TSV for one page of lines (PDF points): a page row, then block, paragraph and
+    line rows (conf -1, no text) ahead of the word rows, as Tesseract 5 writes it
+    """
+    def box(words):
+        x0 = min(w[0] for w in words)
+        y0 = min(w[1] for w in words)
+        return [int(x0 * PX), int(y0 * PX), int((max(w[2] for w in words) - x0) * PX), int((max(w[3] for w in words) - y0) * PX)]
+
+    rows = [[1, 1, 0, 0, 0, 0, 0, 0, 1654, 2339, -1, '']]
+    for start in range(0, len(lines), lines_per_block):
+        block = [l for l in lines[start:start + lines_per_block] if l]
+        if not block:
+            continue
+        block_num = start // lines_per_block + 1
+        flat = [w for l in block for w in l]
+        rows.append([2, 1, block_num, 0, 0, 0] + box(flat) + [-1, ''])
+        rows.append([3, 1, block_num, 1, 0, 0] + box(flat) + [-1, ''])
+        for line_num, line in enumerate(block, start=1):
+            rows.append([4, 1, block_num, 1, line_num, 0] + box(line) + [-1, ''])
+            for word_num, (x0, y0, x1, y1, text) in enumerate(line, start=1):
+                conf = 96.0 - (len(text) * 7 + line_num * 3 + word_num) % 40 / 3
+                rows.append([5, 1, block_num, 1, line_num, word_num, int(x0 * PX), int(y0 * PX),
+                             int((x1 - x0) * PX), int((y1 - y0) * PX), round(conf, 6), text])
+    out = ['\t'.join(TSV_COLUMNS)]
+    out.extend('\t'.join(str(v) for v in row) for row in rows)
+    return '\n'.join(out) + '\n'
+
+
+def read_tsv(tsv):
+    """
+    The DataFrame pytesseract builds for output_type=DATAFRAME
+    """
+    return pd.read_csv(io.StringIO(tsv), quoting=3, sep='\t')
+
+
+def ocr_frames(order, pages, rows, seed):
+    import pytesseract
+    from PIL import Image  # noqa: F401
+    import bench_invoices
+    import fitz
+
+    with tempfile.TemporaryDirectory() as tmp:
+        digital = os.path.join(tmp, 'order.pdf')
+        scanned = os.path.join(tmp, 'scanned.pdf')
+        bench_invoices.ROWS_PER_PAGE = rows
+        bench_invoices.write_digital_pdf(digital, order)
+        bench_invoices.write_scanned_pdf(scanned, digital, seed)
+        frames = []
+        for page in list(fitz.open(scanned))[:pages]:
+            pix = page.get_pixmap(matrix=fitz.Matrix(200 / 72, 200 / 72))
+            img = Image.frombytes('RGB', [pix.width, pix.height], pix.samples)
+            frames.append(pytesseract.image_to_data(img, output_type=pytesseract.Output.DATAFRAME, config='--psm 6'))
+        return frames
+
+
+def reference_lines(df):
+    """
+    The per-page line aggregation _extract_items_from_tesseract_images used to run
+    """
+    df = df[df['conf'].astype(str) != '-1']
+    if 'text' not in df.columns or df.empty:
+        return []
+    df['text'] = df['text'].fillna('')
+    df['left'] = pd.to_numeric(df['left'], errors='coerce')
+    df['top'] = pd.to_numeric(df['top'], errors='coerce')
+    df['width'] = pd.to_numeric(df['width'], errors='coerce')
+    df = df.dropna(subset=['left', 'top', 'width'])
+    if df.empty:
+        return []
+    grouped = df.groupby(['block_num', 'par_num', 'line_num'])
+    lines_list = []
+    for (b, p, l), g in grouped:
+        g = g.sort_values('left')
+        x0 = float(g['left'].min())
+        y0 = float(g['top'].min())
+        words = [(float(r['left']), float(r['top']), float(r['left']) + float(r['width']),
+                  float(r['top']) + float(r['height']) if 'height' in r else float(r['top']) + 10.0, str(r['text']))
+                 for _, r in g.iterrows()]
+        text = ' '.join([w[-1] for w in words]).strip()
+        lines_list.append((x0, y0, text, words))
+    lines_list.sort(key=lambda t: (t[1], t[0]))
+    return lines_list
+
+
+def vectorised_lines(process_file, df):
+    boxes = process_file._tesseract_word_boxes(df)
+    if boxes is None:
+        return None
+    return process_file._table_lines_by_key(boxes)
+
+
+def as_lines_list(lines):
+    """
+    _TableLines in the reference's (x0, y0, text, words) shape
+    """
+    if lines is None:
+        return []
+    b = lines.boxes
+    out = []
+    for i in range(len(lines)):
+        ids = lines.word_ids(i)
+        words = [(float(b.x0[k]), float(b.y0[k]), float(b.x1[k]), float(b.y1[k]), b.words[k]) for k in ids]
+        out.append((float(lines.x[i]), float(lines.y[i]), lines.texts[i].strip(), words))
+    return out
+
+
+def timed(fn, frames, repeat):
+    """
+    Best-of-repeat seconds per page (each call gets a fresh copy of the frame) and the last results
+    """
+    per_page = [float('inf')] * len(frames)
+    results = [None] * len(frames)
+    for _ in range(repeat):
+        for i, df in enumerate(frames):
+            df = df.copy()
+            start = time.perf_counter()
+            results[i] = fn(df)
+            per_page[i] = min(per_page[i], time.perf_counter() - start)
+    return per_page, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Tesseract TSV line aggregations on a long scanned document")
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--rows', type=int, default=30, help="Item rows per page")
+    parser.add_argument('--repeat', type=int, default=3, help="Timing runs per page (best is kept)")
+    parser.add_argument('--ocr', action='store_true', help="OCR rendered scanned pages with the real Tesseract")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    import process_file
+
+    order = make_order(args.rows * args.pages, args.seed)
+    if args.ocr:
+        frames = ocr_frames(order, args.pages, args.rows, args.seed)
+    else:
+        frames = [read_tsv(tesseract_tsv(lines)) for lines in page_lines(order, args.rows)]
+    tsv_rows = sum(len(df) for df in frames)
+    words = sum(int((df['level'] == 5).sum()) for df in frames)
+
+    ref_s, ref_lines = timed(reference_lines, frames, args.repeat)
+    vec_s, vec_lines = timed(lambda df: vectorised_lines(process_file, df), frames, args.repeat)
+    diffs = [i + 1 for i, (a, b) in enumerate(zip(ref_lines, vec_lines)) if a != as_lines_list(b)]
+
+    stats = {}
+    process_file._tesseract_data_frames = lambda images: [df.copy() for df in frames]
+    start = time.perf_counter()
+    items = process_file._extract_items_from_tesseract_images([None] * len(frames), stats)
+    extract_s = time.perf_counter() - start
+    parse_ms = [p['ms'] for p in stats.get('pages', [])]
+
+    print(f"   {len(frames)} pages, {tsv_rows} TSV rows, {words} words, "
+          f"{sum(len(l) for l in ref_lines)} lines ({'tesseract' if args.ocr else 'generated TSV'})")
+    print(f"   {'aggregation':12s} {'total ms':>9s} {'median ms/pg':>12s} {'p95 ms/pg':>10s} {'max ms/pg':>10s} {'µs/row':>7s}")
+    results = {}
+    for name, seconds in (('reference', ref_s), ('vectorised', vec_s)):
+        ms = [s * 1000 for s in seconds]
+        row = {
+            'totalMs': round(sum(ms), 2),
+            'pageMs': {'median': round(statistics.median(ms), 3), 'p95': round(percentile(ms, 95), 3), 'max': round(max(ms), 3)},
+            'usPerRow': round(sum(ms) * 1000 / max(1, tsv_rows), 2),
+        }
+        results[name] = row
+        print(f"   {name:12s} {row['totalMs']:9.1f} {row['pageMs']['median']:12.3f} {row['pageMs']['p95']:10.3f} "
+              f"{row['pageMs']['max']:10.3f} {row['usPerRow']:7.2f}")
+    speedup = results['reference']['totalMs'] / results['vectorised']['totalMs'] if results['vectorised']['totalMs'] else None
+    print(f"   speedup {speedup:.1f}x; lines_list identical on {len(frames) - len(diffs)}/{len(frames)} pages"
+          + (f" (differs on pages {diffs[:10]})" if diffs else ""))
+    print(f"   _extract_items_from_tesseract_images: {extract_s * 1000:.1f} ms for {len(frames)} pages, "
+          f"table parse median {statistics.median(parse_ms) if parse_ms else 0:.3f} ms/page, {len(items)} items "
+          f"({len(order['items'])} in the order)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'seed': args.seed, 'pages': len(frames), 'rowsPerPage': args.rows, 'ocr': args.ocr,
+                'tsvRows': tsv_rows, 'words': words, 'results': results,
+                'speedup': round(speedup, 2) if speedup else None, 'differingPages': diffs,
+                'extract': {'ms': round(extract_s * 1000, 1), 'items': len(items), 'orderItems': len(order['items']),
+                            'parseMsMedian': round(statistics.median(parse_ms), 3) if parse_ms else None},
+            }, f, indent=2)
+        print(f"💾 {args.json}")
+    if diffs:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
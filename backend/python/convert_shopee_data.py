@@ -1,128 +1,156 @@
+import argparse
 import json
 import os
 import sys
 from datetime import datetime
 
-def convert_shopee_data_to_forecast_json(shopee_data, target_year=None):
+# Read size for the streaming JSON / JSON Lines reader
+STREAM_CHUNK_SIZE = 1 << 16
+
+# Rows per NDJSON / CSV output file (0 = one file)
+OUTPUT_CHUNK_SIZE = 5000
+
+# shopee_analytics columns filled by the CSV output (see shopee-import-system.sql)
+COPY_COLUMNS = ["item_id", "product_name", "platform_sku", "page_views", "add_to_cart_units",
+                "confirmed_units", "sales_amount", "conversion_rate", "import_date"]
+
+# Fields tried (in order) when a record has no Year
+DATE_FIELDS = ["Date", "Order Date", "Created Date", "Updated Date"]
+
+# Export fields the converters read; the vectorised engine's DataFrame keeps only these
+SHOPEE_FIELDS = ["Item ID", "Product", "Current Item Status", "Variation Name", "SKU", "Parent SKU",
+                 "Product Page Views", "Units (Add to Cart)", "Units (Confirmed Order)",
+                 "Sales (Confirmed Order) (PHP)", "Month", "Year"] + DATE_FIELDS
+
+# Records per DataFrame chunk when building the vectorised engine's input from a record stream
+DATAFRAME_CHUNK_SIZE = 1 << 16
+
+def _year_from_date_values(values):
     """
-    Convert Shopee analytics data to forecasting format
-    Focus on: Product Page Views, Units (Add to Cart), Sales (Confirmed Order)
-    HANDLES DUPLICATIONS: Aggregates variations of the same Item ID
-    SUPPORTS MULTI-YEAR: Can filter by year or process all years
+    Year taken from the first date value with a parseable 4-digit prefix, else None
+    """
+    for value in values:
+        if value:
+            try:
+                # Try to parse date and extract year
+                date_str = str(value)
+                if len(date_str) >= 4:
+                    return int(date_str[:4])
+            except (ValueError, TypeError):
+                continue
+    return None
+
+def record_in_year(item, target_year):
+    """
+    Whether a raw record passes the year filter (records with no known year always do)
     """
+    # First try the new Year field
+    item_year = item.get("Year")
     
-    # Dictionary to aggregate data by Item ID
-    aggregated_products = {}
+    # If no Year field, try to extract from date fields
+    if not item_year:
+        item_year = _year_from_date_values([item.get(field) for field in DATE_FIELDS])
     
-    for item in shopee_data:
-        # Skip deleted products or products with no sales
-        if (item.get("Current Item Status") == "Deleted" or 
-            item.get("Units (Confirmed Order)") == 0 or
-            item.get("Sales (Confirmed Order) (PHP)") == 0):
-            continue
-            
-        # Filter by year if specified
-        if target_year:
-            # First try the new Year field
-            item_year = item.get("Year")
-            
-            # If no Year field, try to extract from date fields
-            if not item_year:
-                date_fields = ["Date", "Order Date", "Created Date", "Updated Date"]
-                for field in date_fields:
-                    if field in item and item[field]:
-                        try:
-                            # Try to parse date and extract year
-                            date_str = str(item[field])
-                            if len(date_str) >= 4:
-                                item_year = int(date_str[:4])
-                                break
-                        except (ValueError, TypeError):
-                            continue
-            
-            # Skip if year doesn't match
-            if item_year and item_year != target_year:
-                continue
-            
-        item_id = item.get("Item ID", 0)
-        product_name = item.get("Product", "Unknown Product")
-        parent_sku = item.get("Parent SKU", "")
-        sku = item.get("SKU", "")
-        variation_name = item.get("Variation Name", "")
+    return not item_year or item_year == target_year
+
+def aggregate_shopee_record(aggregated_products, item, target_year=None):
+    """
+    Fold a single raw Shopee record into the per-Item-ID aggregate
+    (main product rows take precedence over their variations)
+    """
+    # Skip deleted products or products with no sales
+    if (item.get("Current Item Status") == "Deleted" or 
+        item.get("Units (Confirmed Order)") == 0 or
+        item.get("Sales (Confirmed Order) (PHP)") == 0):
+        return
         
-        # Convert sales amount (remove commas and convert to float)
-        sales_amount = item.get("Sales (Confirmed Order) (PHP)", "0")
-        if isinstance(sales_amount, str):
-            sales_amount = sales_amount.replace(",", "").replace("PHP", "").strip()
-        sales_amount = float(sales_amount) if sales_amount else 0
+    # Filter by year if specified
+    if target_year and not record_in_year(item, target_year):
+        return
         
-        # Get other metrics
-        page_views = int(item.get("Product Page Views", 0)) if item.get("Product Page Views") != "-" else 0
-        add_to_cart = int(item.get("Units (Add to Cart)", 0)) if item.get("Units (Add to Cart)") != "-" else 0
-        confirmed_units = int(item.get("Units (Confirmed Order)", 0)) if item.get("Units (Confirmed Order)") != "-" else 0
+    item_id = item.get("Item ID", 0)
+    product_name = item.get("Product", "Unknown Product")
+    parent_sku = item.get("Parent SKU", "")
+    sku = item.get("SKU", "")
+    variation_name = item.get("Variation Name", "")
+    
+    # Convert sales amount (remove commas and convert to float)
+    sales_amount = item.get("Sales (Confirmed Order) (PHP)", "0")
+    if isinstance(sales_amount, str):
+        sales_amount = sales_amount.replace(",", "").replace("PHP", "").strip()
+    sales_amount = float(sales_amount) if sales_amount else 0
+    
+    # Get other metrics
+    page_views = int(item.get("Product Page Views", 0)) if item.get("Product Page Views") != "-" else 0
+    add_to_cart = int(item.get("Units (Add to Cart)", 0)) if item.get("Units (Add to Cart)") != "-" else 0
+    confirmed_units = int(item.get("Units (Confirmed Order)", 0)) if item.get("Units (Confirmed Order)") != "-" else 0
+    
+    # Only process products with actual sales
+    if sales_amount > 0 and confirmed_units > 0:
+        # Check if this is a main product (no variation) or a variation
+        is_main_product = (variation_name == "-" or variation_name == "")
         
-        # Only process products with actual sales
-        if sales_amount > 0 and confirmed_units > 0:
-            # Check if this is a main product (no variation) or a variation
-            is_main_product = (variation_name == "-" or variation_name == "")
+        # If this Item ID already exists, we need to decide what to do
+        if item_id in aggregated_products:
+            existing = aggregated_products[item_id]
             
-            # If this Item ID already exists, we need to decide what to do
-            if item_id in aggregated_products:
-                existing = aggregated_products[item_id]
-                
-                # If this is a main product and we already have data, use the main product data
-                if is_main_product:
-                    # Main product takes precedence - replace existing data
-                    existing["metrics"]["page_views"] = page_views
-                    existing["metrics"]["add_to_cart_units"] = add_to_cart
-                    existing["metrics"]["confirmed_units"] = confirmed_units
-                    existing["metrics"]["sales_amount"] = sales_amount
-                    existing["product_name"] = product_name
-                    existing["product_sku"] = parent_sku if parent_sku != "-" else f"SHOPEE-{item_id}"
-                    existing["variation_name"] = ""
-                    
-                    # Recalculate conversion rate
-                    if page_views > 0:
-                        existing["conversion_rate"] = (confirmed_units / page_views * 100)
-                # If this is a variation, skip it (we already have main product data)
-                else:
-                    continue
+            # If this is a main product and we already have data, use the main product data
+            if is_main_product:
+                # Main product takes precedence - replace existing data
+                existing["metrics"]["page_views"] = page_views
+                existing["metrics"]["add_to_cart_units"] = add_to_cart
+                existing["metrics"]["confirmed_units"] = confirmed_units
+                existing["metrics"]["sales_amount"] = sales_amount
+                existing["product_name"] = product_name
+                existing["product_sku"] = parent_sku if parent_sku != "-" else f"SHOPEE-{item_id}"
+                existing["variation_name"] = ""
                 
+                # Recalculate conversion rate
+                if page_views > 0:
+                    existing["conversion_rate"] = (confirmed_units / page_views * 100)
+            # If this is a variation, skip it (we already have main product data)
             else:
-                # Create new product entry
-                # Determine the best SKU to use
-                product_sku = sku if sku != "-" else parent_sku
-                if product_sku == "-" or not product_sku:
-                    product_sku = f"SHOPEE-{item_id}"
-                
-                # Use variation name if available
-                display_name = product_name
-                if variation_name and variation_name != "-":
-                    display_name = f"{product_name} - {variation_name}"
-                
-                # Extract month and year from the data
-                item_month = item.get("Month", 1)  # Default to January if not specified
-                item_year = item.get("Year", 2024)  # Default to 2024 if not specified
-                item_date = item.get("Date", f"{item_year}-{item_month:02d}-15")  # Default to 15th of month
-                
-                aggregated_products[item_id] = {
-                    "item_id": item_id,
-                    "product_name": display_name,
-                    "product_sku": product_sku,
-                    "variation_name": variation_name if variation_name != "-" else "",
-                    "platform": "Shopee",
-                    "metrics": {
-                        "page_views": page_views,
-                        "add_to_cart_units": add_to_cart,
-                        "confirmed_units": confirmed_units,
-                        "sales_amount": sales_amount
-                    },
-                    "conversion_rate": (confirmed_units / page_views * 100) if page_views > 0 else 0,
-                    "import_date": item_date,
-                    "month": item_month,
-                    "year": item_year
-                }
-    
+                return
+            
+        else:
+            # Create new product entry
+            # Determine the best SKU to use
+            product_sku = sku if sku != "-" else parent_sku
+            if product_sku == "-" or not product_sku:
+                product_sku = f"SHOPEE-{item_id}"
+            
+            # Use variation name if available
+            display_name = product_name
+            if variation_name and variation_name != "-":
+                display_name = f"{product_name} - {variation_name}"
+            
+            # Extract month and year from the data
+            item_month = item.get("Month", 1)  # Default to January if not specified
+            item_year = item.get("Year", 2024)  # Default to 2024 if not specified
+            item_date = item.get("Date", f"{item_year}-{item_month:02d}-15")  # Default to 15th of month
+            
+            aggregated_products[item_id] = {
+                "item_id": item_id,
+                "product_name": display_name,
+                "product_sku": product_sku,
+                "variation_name": variation_name if variation_name != "-" else "",
+                "platform": "Shopee",
+                "metrics": {
+                    "page_views": page_views,
+                    "add_to_cart_units": add_to_cart,
+                    "confirmed_units": confirmed_units,
+                    "sales_amount": sales_amount
+                },
+                "conversion_rate": (confirmed_units / page_views * 100) if page_views > 0 else 0,
+                "import_date": item_date,
+                "month": item_month,
+                "year": item_year
+            }
+
+def finalize_aggregated_products(aggregated_products):
+    """
+    Turn the per-Item-ID aggregate into the sorted forecast list
+    """
     # Convert dictionary back to list
     products_with_sales = list(aggregated_products.values())
     
@@ -131,6 +159,236 @@ def convert_shopee_data_to_forecast_json(shopee_data, target_year=None):
     
     return products_with_sales
 
+def convert_shopee_data_to_forecast_json(shopee_data, target_year=None):
+    """
+    Convert Shopee analytics data to forecasting format
+    Focus on: Product Page Views, Units (Add to Cart), Sales (Confirmed Order)
+    HANDLES DUPLICATIONS: Aggregates variations of the same Item ID
+    SUPPORTS MULTI-YEAR: Can filter by year or process all years
+    STREAMING: shopee_data can be any iterable of records (e.g. iter_shopee_data_from_file),
+    memory then grows with the number of distinct products, not records
+    """
+    
+    # Dictionary to aggregate data by Item ID
+    aggregated_products = {}
+    
+    for item in shopee_data:
+        aggregate_shopee_record(aggregated_products, item, target_year)
+    
+    return finalize_aggregated_products(aggregated_products)
+
+def convert_shopee_dataframe_to_forecast_json(df, target_year=None):
+    """
+    Vectorised (pandas/NumPy) equivalent of convert_shopee_data_to_forecast_json
+    Takes a DataFrame with one column per Shopee export field and produces the same
+    list; NaN cells are treated as missing keys (use shopee_records_to_dataframe
+    so ints/strings keep their JSON types)
+    """
+    import numpy as np
+    import pandas as pd
+
+    size = len(df)
+    if size == 0:
+        return []
+
+    def is_numeric(name):
+        return name in df.columns and df[name].dtype.kind in 'iuf'
+
+    def column(name, default=None, rows=None):
+        if name not in df.columns:
+            return np.full(size if rows is None else len(rows), default, dtype=object)
+        values = np.asarray(df[name].array)
+        values = values.copy() if rows is None else values[rows]
+        if values.dtype != object:
+            values = values.astype(object)
+        # NaN is the only value not equal to itself; None stays None like item.get
+        missing = values != values
+        if missing.any():
+            values[missing] = default
+        return values
+
+    def int_metric(name, rows):
+        if is_numeric(name) and df[name].dtype.kind != 'f':
+            return df[name].to_numpy()[rows].astype(np.int64)
+        values = column(name, 0, rows)
+        codes = None
+        if pd.api.types.infer_dtype(values, skipna=False) == "string":
+            # Numeric strings repeat a lot, so parse each distinct one once
+            codes, values = pd.factorize(values, use_na_sentinel=False)
+            values = np.asarray(values, dtype=object)
+        values[values == "-"] = 0
+        # NumPy object casts call int() per cell, so bad values fail exactly like the loop
+        values = values.astype(np.int64)
+        return values if codes is None else values[codes]
+
+    # Skip deleted products or products with no sales
+    # (NaN compares unequal to everything, just like a missing key's None)
+    keep = np.ones(size, dtype=bool)
+    for name, skip in (("Current Item Status", "Deleted"),
+                       ("Units (Confirmed Order)", 0),
+                       ("Sales (Confirmed Order) (PHP)", 0)):
+        if name in df.columns:
+            keep &= np.asarray(df[name].array, dtype=None if is_numeric(name) else object) != skip
+
+    # Filter by year if specified
+    if target_year:
+        item_year = column("Year")
+        no_year = ~item_year.astype(bool)
+        if no_year.any():
+            missing_rows = np.flatnonzero(no_year)
+            date_columns = [column(field, rows=missing_rows) for field in DATE_FIELDS]
+            item_year[missing_rows] = [_year_from_date_values(values) for values in zip(*date_columns)]
+        keep &= ~(item_year.astype(bool) & (item_year != target_year))
+
+    rows = np.flatnonzero(keep)
+    if not len(rows):
+        return []
+
+    # Convert sales amount (remove commas and convert to float)
+    if is_numeric("Sales (Confirmed Order) (PHP)"):
+        sales_amount = df["Sales (Confirmed Order) (PHP)"].to_numpy()[rows].astype(np.float64)
+    else:
+        sales_raw = column("Sales (Confirmed Order) (PHP)", "0", rows)
+        sales_raw[~sales_raw.astype(bool)] = 0
+        try:
+            # float() accepts every plain number / numeric string unchanged
+            sales_amount = sales_raw.astype(np.float64)
+        except ValueError:
+            strip_sales = np.frompyfunc(
+                lambda value: value.replace(",", "").replace("PHP", "").strip() if isinstance(value, str) else value, 1, 1)
+            sales_raw = strip_sales(sales_raw)
+            sales_raw[~sales_raw.astype(bool)] = 0
+            sales_amount = sales_raw.astype(np.float64)
+
+    page_views = int_metric("Product Page Views", rows)
+    add_to_cart = int_metric("Units (Add to Cart)", rows)
+    confirmed_units = int_metric("Units (Confirmed Order)", rows)
+
+    # Only process products with actual sales
+    sold = np.flatnonzero((sales_amount > 0) & (confirmed_units > 0))
+    if not len(sold):
+        return []
+    rows = rows[sold]
+    sales_amount = sales_amount[sold]
+    page_views = page_views[sold]
+    add_to_cart = add_to_cart[sold]
+    confirmed_units = confirmed_units[sold]
+
+    # Group by Item ID; factorize numbers products in first-seen order like the dict does
+    if is_numeric("Item ID") and df["Item ID"].dtype.kind != 'f':
+        item_keys = df["Item ID"].to_numpy()[rows]
+    else:
+        item_keys = column("Item ID", 0, rows)
+        if pd.api.types.infer_dtype(item_keys, skipna=False) == "integer":
+            try:
+                item_keys = item_keys.astype(np.int64)
+            except OverflowError:
+                pass
+    # An explicit null Item ID is its own product (item.get returns None), not NA
+    codes, uniques = pd.factorize(item_keys, use_na_sentinel=False)
+    positions = np.arange(len(rows))
+    first = np.full(len(uniques), len(rows))
+    np.minimum.at(first, codes, positions)
+
+    # Main product rows seen after the first row take precedence (the last one wins);
+    # the conversion rate only follows main rows that have page views
+    variation_names = column("Variation Name", "", rows)
+    is_main = (variation_names == "-") | (variation_names == "")
+    main_after = is_main & (positions > first[codes])
+    last_main = np.full(len(uniques), -1)
+    np.maximum.at(last_main, codes[main_after], positions[main_after])
+    rate_source = first.copy()
+    rated = main_after & (page_views > 0)
+    np.maximum.at(rate_source, codes[rated], positions[rated])
+    has_main = last_main >= 0
+    metric_source = np.where(has_main, last_main, first)
+
+    rate_views = page_views[rate_source]
+    rates = np.zeros(len(uniques))
+    np.divide(confirmed_units[rate_source], rate_views, out=rates, where=rate_views > 0)
+    rates *= 100
+
+    # Only the first-seen and overriding main rows feed the output fields
+    first_rows = rows[first]
+    main_rows = rows[metric_source]
+    item_ids = column("Item ID", 0, first_rows).tolist()
+    variations = variation_names[first].tolist()
+    first_names = column("Product", "Unknown Product", first_rows).tolist()
+    main_names = column("Product", "Unknown Product", main_rows).tolist()
+    first_parent_skus = column("Parent SKU", "", first_rows).tolist()
+    main_parent_skus = column("Parent SKU", "", main_rows).tolist()
+    skus = column("SKU", "", first_rows).tolist()
+    months = column("Month", 1, first_rows).tolist()
+    years = column("Year", 2024, first_rows).tolist()
+    # A missing Date gets the default, an explicit null stays null like item.get
+    no_date = object()
+    dates = column("Date", no_date, first_rows).tolist()
+
+    out_sales = sales_amount[metric_source]
+    products_with_sales = []
+    for (item_id, main, variation_name, product_name, main_name, parent_sku, main_parent_sku, sku,
+         item_month, item_year, item_date, views, carts, units, sales, rate, rate_view) in zip(
+            item_ids, has_main.tolist(), variations, first_names, main_names,
+            first_parent_skus, main_parent_skus, skus, months, years, dates,
+            page_views[metric_source].tolist(), add_to_cart[metric_source].tolist(),
+            confirmed_units[metric_source].tolist(), out_sales.tolist(),
+            rates.tolist(), rate_views.tolist()):
+        default_date = f"{item_year}-{item_month:02d}-15"
+        if main:
+            # A later main product row replaced the first-seen entry
+            product_name = main_name
+            product_sku = main_parent_sku if main_parent_sku != "-" else f"SHOPEE-{item_id}"
+            variation_name = ""
+        else:
+            product_sku = sku if sku != "-" else parent_sku
+            if product_sku == "-" or not product_sku:
+                product_sku = f"SHOPEE-{item_id}"
+            if variation_name and variation_name != "-":
+                product_name = f"{product_name} - {variation_name}"
+            if variation_name == "-":
+                variation_name = ""
+        products_with_sales.append({
+            "item_id": item_id,
+            "product_name": product_name,
+            "product_sku": product_sku,
+            "variation_name": variation_name,
+            "platform": "Shopee",
+            "metrics": {
+                "page_views": views,
+                "add_to_cart_units": carts,
+                "confirmed_units": units,
+                "sales_amount": sales
+            },
+            "conversion_rate": rate if rate_view > 0 else 0,
+            "import_date": default_date if item_date is no_date else item_date,
+            "month": item_month,
+            "year": item_year
+        })
+
+    # Sort by sales amount (highest first); stable like list.sort(reverse=True)
+    order = np.argsort(-out_sales, kind='stable')
+    return [products_with_sales[i] for i in order.tolist()]
+
+def shopee_records_to_dataframe(records, chunk_size=DATAFRAME_CHUNK_SIZE):
+    """
+    Build the object-dtype DataFrame the vectorised converter expects
+    (object columns keep ints/strings exactly as json.load produced them)
+    Only SHOPEE_FIELDS are kept (a field missing from every record is an all-NaN column,
+    which the converter treats like the missing key) and records is consumed chunk_size
+    at a time, so a record stream is never held in memory as dicts
+    """
+    import pandas as pd
+    frames = []
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            frames.append(pd.DataFrame(chunk, columns=SHOPEE_FIELDS, dtype=object))
+            chunk = []
+    if chunk or not frames:
+        frames.append(pd.DataFrame(chunk, columns=SHOPEE_FIELDS, dtype=object))
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
 def load_shopee_data_from_file(file_path):
     """
     Load Shopee data from JSON file
@@ -148,6 +406,89 @@ def load_shopee_data_from_file(file_path):
         print(f"❌ Error loading file {file_path}: {e}")
         return []
 
+def iter_shopee_data_from_file(file_path, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Incrementally yield Shopee records from a top-level JSON array or a
+    JSON Lines file without loading the whole export into memory.
+    Raises FileNotFoundError / json.JSONDecodeError like json.load would,
+    including for an unterminated array or anything after its closing bracket.
+    Values that are not objects are skipped with a warning on stderr.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buf = ''
+        pos = 0
+        eof = False
+        consumed = 0  # characters dropped from the front of buf, for error positions
+        skipped = 0
+
+        def fill():
+            # Next non-whitespace character (reading more as needed), or '' at EOF
+            nonlocal buf, pos, eof, consumed
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n':
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return buf[pos] if pos < len(buf) else ''
+                consumed += pos
+                buf = f.read(chunk_size)
+                pos = 0
+                eof = not buf
+
+        def fail(message):
+            # Positions count from the start of the file, not of the current chunk
+            error = json.JSONDecodeError(message, buf, pos)
+            error.pos = consumed + pos
+            error.args = (f"{message}: char {error.pos}",)
+            raise error
+
+        in_array = fill() == '['
+        if in_array:
+            pos += 1
+            if fill() == ']':
+                pos += 1
+                if fill():
+                    fail("Extra data")
+                return
+        while True:
+            if not fill():
+                if in_array:
+                    fail("Unterminated array: expecting ']'")
+                break
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Record spans the chunk boundary: read more and retry, fail on real EOF
+                if eof:
+                    raise
+                more = f.read(chunk_size)
+                eof = not more
+                consumed += pos
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            pos = end
+            if pos > chunk_size:
+                consumed += pos
+                buf = buf[pos:]
+                pos = 0
+            if isinstance(record, dict):
+                yield record
+            else:
+                skipped += 1
+            if in_array:
+                separator = fill()
+                if separator == ']':
+                    pos += 1
+                    if fill():
+                        fail("Extra data")
+                    break
+                if separator != ',':
+                    fail("Unterminated array: expecting ',' delimiter" if not separator else "Expecting ',' delimiter")
+                pos += 1
+        if skipped:
+            print(f"⚠️ Skipped {skipped} top-level values in {file_path} that are not JSON objects", file=sys.stderr)
+
 def save_forecast_data(data, output_path):
     """
     Save forecast data to file
@@ -159,41 +500,196 @@ def save_forecast_data(data, output_path):
     except Exception as e:
         print(f"❌ Error saving file {output_path}: {e}")
 
+def _copy_csv_field(value):
+    """
+    Format one value for PostgreSQL COPY ... (FORMAT csv): None is an unquoted
+    empty field (NULL), strings are always quoted so '' stays an empty string
+    """
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+def _chunk_path(output_path, index, chunked):
+    """
+    output.csv -> output.part0001.csv when the output is split into chunks
+    """
+    if not chunked:
+        return output_path
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.part{index:04d}{ext}"
+
+def flatten_forecast_product(product):
+    """
+    One forecast product as a shopee_analytics row (metrics flattened, SKU as platform_sku)
+    """
+    metrics = product.get("metrics", {})
+    return {
+        "item_id": product.get("item_id"),
+        "product_name": product.get("product_name"),
+        "platform_sku": product.get("product_sku"),
+        "page_views": metrics.get("page_views"),
+        "add_to_cart_units": metrics.get("add_to_cart_units"),
+        "confirmed_units": metrics.get("confirmed_units"),
+        "sales_amount": metrics.get("sales_amount"),
+        "conversion_rate": product.get("conversion_rate"),
+        "import_date": product.get("import_date")
+    }
+
+def save_forecast_data_chunked(data, output_path, output_format='ndjson', chunk_size=OUTPUT_CHUNK_SIZE, user_id=None):
+    """
+    Save forecast data as NDJSON (one product per line) or COPY-compatible CSV
+    (metrics flattened into shopee_analytics columns), in files of chunk_size rows
+    Returns the list of files written
+    """
+    if output_format not in ('ndjson', 'csv'):
+        raise ValueError(f"Unsupported output format: {output_format}")
+    columns = (["user_id"] if user_id else []) + COPY_COLUMNS
+    chunked = bool(chunk_size) and len(data) > chunk_size
+    step = chunk_size if chunked else max(len(data), 1)
+    written = []
+    try:
+        for index, start in enumerate(range(0, max(len(data), 1), step), 1):
+            path = _chunk_path(output_path, index, chunked)
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                if output_format == 'csv':
+                    f.write(','.join(columns) + '\n')
+                for product in data[start:start + step]:
+                    if output_format == 'csv':
+                        row = flatten_forecast_product(product)
+                        row["user_id"] = user_id
+                        f.write(','.join(_copy_csv_field(row[column]) for column in columns) + '\n')
+                    else:
+                        f.write(json.dumps(product, ensure_ascii=False, separators=(',', ':')) + '\n')
+            written.append(path)
+        if len(written) == 1:
+            print(f"✅ Saved forecast data to: {written[0]}")
+        else:
+            print(f"✅ Saved forecast data to {len(written)} files: {written[0]} ... {written[-1]}")
+    except Exception as e:
+        print(f"❌ Error saving file {output_path}: {e}")
+    return written
+
 def main():
     """
     Main function for deployment
     """
     # Get file paths and year from command line arguments or use defaults
-    input_file = sys.argv[1] if len(sys.argv) > 1 else 'shopee_data.json'
-    output_file = sys.argv[2] if len(sys.argv) > 2 else 'shopee_forecast_data.json'
-    target_year = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    parser = argparse.ArgumentParser(description="Convert Shopee analytics data to forecasting format")
+    parser.add_argument('input_file', nargs='?', default='shopee_data.json')
+    parser.add_argument('output_file', nargs='?', default='shopee_forecast_data.json')
+    parser.add_argument('target_year', nargs='?', type=int, default=None)
+    parser.add_argument('--stream', action='store_true',
+                        help="Parse the input incrementally (JSON array or JSON Lines) instead of loading it whole")
+    parser.add_argument('--engine', choices=['loop', 'pandas'], default='loop',
+                        help="Aggregation engine: per-record loop or vectorised pandas/NumPy. From JSON input "
+                             "pandas is about as fast as loop (0.9-1.1x at 1M records): decoding the JSON costs "
+                             "several times the loop's aggregation and building the DataFrame about what the "
+                             "vectorised pass saves. It is 5-10x faster only on data already in a DataFrame "
+                             "(see bench_convert_shopee.py)")
+    parser.add_argument('--format', dest='output_format', choices=['json', 'ndjson', 'csv'], default=None,
+                        help="Output format (default: from the output file extension, else json)")
+    parser.add_argument('--chunk-size', type=int, default=OUTPUT_CHUNK_SIZE,
+                        help="Rows per NDJSON/CSV file; 0 writes a single file")
+    parser.add_argument('--user-id', default=None,
+                        help="Prepend a user_id column to the CSV output (shopee_analytics.user_id)")
+    parser.add_argument('--state', default=None,
+                        help="Incremental mode: SQLite state store of monthly aggregates; only new input files "
+                             "(input may be a directory) are processed and only changed products are written")
+    args = parser.parse_args()
+    input_file = args.input_file
+    output_file = args.output_file
+    target_year = args.target_year
+    # JSON Lines input can only be read record by record
+    stream = args.stream or input_file.lower().endswith(('.jsonl', '.ndjson'))
+    output_format = args.output_format
+    if not output_format:
+        output_format = {'.jsonl': 'ndjson', '.ndjson': 'ndjson', '.csv': 'csv'}.get(
+            os.path.splitext(output_file)[1].lower(), 'json')
     
     print(f"🔄 Converting Shopee data from: {input_file}")
     print(f"📁 Output file: {output_file}")
     if target_year:
         print(f"📅 Filtering for year: {target_year}")
     
-    # Load data
-    shopee_data = load_shopee_data_from_file(input_file)
-    if not shopee_data:
-        print("❌ No data loaded. Exiting.")
-        return
-    
-    print(f"📊 Processing {len(shopee_data)} raw records...")
+    if args.engine == 'pandas':
+        def convert(records, year):
+            return convert_shopee_dataframe_to_forecast_json(shopee_records_to_dataframe(records), year)
+    else:
+        convert = convert_shopee_data_to_forecast_json
     
-    # Convert data
-    forecast_data = convert_shopee_data_to_forecast_json(shopee_data, target_year)
+    if args.state:
+        from incremental_convert_shopee import run_incremental
+        print(f"🗃️ Incremental mode, state: {args.state}")
+        try:
+            forecast_data = run_incremental(args.state, [input_file], target_year)
+        except FileNotFoundError as e:
+            print(f"❌ Error: File {e.filename} not found")
+            return
+        except json.JSONDecodeError as e:
+            print(f"❌ Error: Invalid JSON in {input_file}: {e}")
+            return
+        if not forecast_data:
+            print("✅ No new records or product changes.")
+            return
+    elif stream:
+        print("🌊 Streaming input records...")
+        record_count = 0
+        
+        def counted(records):
+            nonlocal record_count
+            for record in records:
+                record_count += 1
+                yield record
+        
+        try:
+            forecast_data = convert(counted(iter_shopee_data_from_file(input_file)), target_year)
+        except FileNotFoundError:
+            print(f"❌ Error: File {input_file} not found")
+            return
+        except json.JSONDecodeError as e:
+            print(f"❌ Error: Invalid JSON in {input_file}: {e}")
+            return
+        except Exception as e:
+            print(f"❌ Error loading file {input_file}: {e}")
+            return
+        if not record_count:
+            print("❌ No data loaded. Exiting.")
+            return
+        print(f"📊 Processed {record_count} raw records")
+    else:
+        # Load data
+        shopee_data = load_shopee_data_from_file(input_file)
+        if not shopee_data:
+            print("❌ No data loaded. Exiting.")
+            return
+        
+        print(f"📊 Processing {len(shopee_data)} raw records...")
+        
+        # Convert data
+        try:
+            forecast_data = convert(shopee_data, target_year)
+        except ImportError as e:
+            print(f"❌ Error: {e} (pip install pandas numpy)")
+            return
     
     if not forecast_data:
         print("❌ No products with sales data found.")
         return
     
     # Save data
-    save_forecast_data(forecast_data, output_file)
+    if output_format == 'json':
+        save_forecast_data(forecast_data, output_file)
+    else:
+        written = save_forecast_data_chunked(forecast_data, output_file, output_format, args.chunk_size, args.user_id)
     
     # Print summary
     print(f"\n📊 Conversion Summary:")
-    print(f"✅ Converted {len(forecast_data)} unique products with sales data")
+    if args.state:
+        print(f"✅ {len(forecast_data)} new or changed products (per Item ID and month)")
+    else:
+        print(f"✅ Converted {len(forecast_data)} unique products with sales data")
     print(f"🔄 Aggregated variations to avoid duplications")
     
     total_sales = sum(p['metrics']['sales_amount'] for p in forecast_data)
@@ -210,6 +706,16 @@ def main():
         print(f"   Page Views: {product['metrics']['page_views']:,}")
         print()
     
+    if output_format == 'csv':
+        # Bulk-load hint: one \copy per chunk file
+        columns = ', '.join((["user_id"] if args.user_id else []) + COPY_COLUMNS)
+        print(f"\n📋 Load into Supabase with psql:")
+        for path in written[:3]:
+            print(f"\\copy shopee_analytics ({columns}) FROM '{path}' WITH (FORMAT csv, HEADER true)")
+        if len(written) > 3:
+            print(f"... and {len(written) - 3} more files")
+        return
+    
     # Print JSON for Supabase (first 3 products only to avoid spam)
     print(f"\n📋 JSON Data for Supabase (first 3 products):")
     print(json.dumps(forecast_data[:3], indent=2, ensure_ascii=False))
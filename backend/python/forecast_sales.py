@@ -1,7 +1,12 @@
 import sys
 import json
+import contextlib
 from datetime import datetime
 
+from script_profiler import profiling_requested, start_profiler
+
+Prophet = None
+_PROPHET_IMPORT_ERROR = None
 try:
     # Prophet renamed to prophet (cmdstan) or fbprophet (legacy)
     try:
@@ -9,36 +14,62 @@ try:
     except Exception:
         from fbprophet import Prophet  # type: ignore
 except Exception as e:
-    print(json.dumps({"error": f"Prophet not installed: {e}"}))
-    sys.exit(0)
+    _PROPHET_IMPORT_ERROR = e
+
+
+def _no_stage(name):
+    return contextlib.nullcontext()
+
+
+def forecast_series(series, year, periods=3, options=None, stage=_no_stage):
+    """
+    Fit Prophet on monthly values starting January of `year` and forecast `periods` months ahead.
+    options override the Prophet constructor arguments; stage(name) wraps fit/predict (profiling).
+    Returns {"forecast": [...], "dates": [...]}
+    """
+    import pandas as pd
+
+    # Build monthly dataframe for Prophet (requires ds, y); months past December roll into the next year
+    y = [float(v or 0) for v in series]
+    df = pd.DataFrame({"ds": pd.date_range(f"{year}-01-01", periods=len(y), freq='MS'), "y": y})
+    settings = dict(yearly_seasonality=True, weekly_seasonality=False, daily_seasonality=False)
+    settings.update(options or {})
+    m = Prophet(**settings)
+    with stage('fit'):
+        m.fit(df)
+    # Forecast next `periods` months
+    with stage('predict'):
+        future = m.make_future_dataframe(periods=periods, freq='MS')
+        fcst = m.predict(future)
+    # Take last `periods` months forecast values (yhat)
+    tail = fcst.tail(periods)
+    return {
+        "forecast": [float(v) for v in tail['yhat'].tolist()],
+        "dates": [d.strftime('%Y-%m-%d') for d in tail['ds'].dt.to_pydatetime()],
+    }
+
 
 def main():
+    if Prophet is None:
+        print(json.dumps({"error": f"Prophet not installed: {_PROPHET_IMPORT_ERROR}"}))
+        sys.exit(0)
+
+    # --profile / PYTHON_PROFILE: cProfile + tracemalloc per stage; input comes from stdin, so the
+    # files go to the PYTHON_PROFILE directory (or the cwd) as forecast_sales-<timestamp>.*
+    profiler = start_profiler(None, 'forecast_sales') if profiling_requested(sys.argv[1:]) else None
+
+    def stage(name):
+        return profiler.stage(name) if profiler is not None else contextlib.nullcontext()
+
     raw = sys.stdin.read()
     payload = json.loads(raw or '{}')
     # Expect payload: { "series": [v1..v12], "year": 2025 }
     series = payload.get('series') or []
     year = int(payload.get('year') or datetime.utcnow().year)
 
-    # Build monthly dataframe for Prophet (requires ds, y)
-    ds = []
-    y = []
-    for m, v in enumerate(series, start=1):
-        ds.append(f"{year}-{m:02d}-01")
-        y.append(float(v or 0))
-
-    import pandas as pd
-    df = pd.DataFrame({"ds": pd.to_datetime(ds), "y": y})
-    m = Prophet(yearly_seasonality=True, weekly_seasonality=False, daily_seasonality=False)
-    m.fit(df)
-    # Forecast next 3 months
-    future = m.make_future_dataframe(periods=3, freq='MS')
-    fcst = m.predict(future)
-    # Take last 3 months forecast values (yhat)
-    tail = fcst.tail(3)
-    out = {
-        "forecast": [float(v) for v in tail['yhat'].tolist()],
-        "dates": [d.strftime('%Y-%m-%d') for d in tail['ds'].dt.to_pydatetime()],
-    }
+    out = forecast_series(series, year, stage=stage)
+    if profiler is not None:
+        out["profile"] = profiler.finish()
     print(json.dumps(out))
 
 if __name__ == '__main__':
@@ -0,0 +1,207 @@
+"""
+Incremental Shopee conversion backed by a local SQLite state store
+Keeps one aggregate per (Item ID, year, month), only folds records from input
+files it has not seen before and emits only the products whose metrics changed.
+
+Used by: python convert_shopee_data.py INPUT OUTPUT [YEAR] --state shopee_state.sqlite
+INPUT may be a file (.json / .jsonl / .ndjson) or a directory of them.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from convert_shopee_data import (
+    aggregate_shopee_record,
+    finalize_aggregated_products,
+    iter_shopee_data_from_file,
+    record_in_year,
+)
+
+INPUT_EXTENSIONS = ('.json', '.jsonl', '.ndjson')
+# Records folded per batch; the stored products of a batch's new keys are loaded in one query
+FOLD_CHUNK_SIZE = 5000
+
+def record_month_key(item):
+    """
+    (year, month) a raw record is aggregated under - same defaults as the product fields
+    """
+    return item.get("Year", 2024), item.get("Month", 1)
+
+def file_sha256(file_path):
+    """
+    Content hash used to recognise an input file that was already folded in
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def list_input_files(inputs):
+    """
+    Expand directories into their Shopee export files, in name order
+    """
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(INPUT_EXTENSIONS)
+            ))
+        else:
+            files.append(path)
+    return files
+
+class ShopeeStateStore:
+    """
+    SQLite store of processed input files and per-(Item ID, year, month) aggregates
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS processed_files (
+                sha256 TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                records INTEGER NOT NULL,
+                processed_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS processed_files_path ON processed_files (path, size, mtime);
+            CREATE TABLE IF NOT EXISTS product_state (
+                item_id TEXT NOT NULL,
+                year TEXT NOT NULL,
+                month TEXT NOT NULL,
+                product TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (item_id, year, month)
+            );
+        """)
+
+    @staticmethod
+    def _key(item_id, year, month):
+        # JSON text keeps 123 and "123" apart like the in-memory dict does
+        return json.dumps(item_id), json.dumps(year), json.dumps(month)
+
+    def is_processed(self, file_path):
+        """
+        Return (processed, sha256). Unchanged path/size/mtime skips hashing; otherwise
+        the content hash decides, so renamed or touched copies are not folded twice
+        """
+        stat = os.stat(file_path)
+        row = self.conn.execute(
+            "SELECT sha256 FROM processed_files WHERE path = ? AND size = ? AND mtime = ?",
+            (os.path.abspath(file_path), stat.st_size, stat.st_mtime)).fetchone()
+        if row:
+            return True, row[0]
+        sha256 = file_sha256(file_path)
+        row = self.conn.execute("SELECT 1 FROM processed_files WHERE sha256 = ?", (sha256,)).fetchone()
+        return row is not None, sha256
+
+    def load_products(self, keys):
+        """
+        Stored products for the given (item_id, year, month) keys, in one join against a
+        temporary table of the keys
+        """
+        by_key = {self._key(*key): key for key in keys}
+        if not by_key:
+            return {}
+        with self.conn:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_keys (item_id TEXT, year TEXT, month TEXT)")
+            self.conn.execute("DELETE FROM wanted_keys")
+            self.conn.executemany("INSERT INTO wanted_keys (item_id, year, month) VALUES (?, ?, ?)", by_key)
+            rows = self.conn.execute(
+                "SELECT p.item_id, p.year, p.month, p.product FROM wanted_keys w "
+                "JOIN product_state p ON p.item_id = w.item_id AND p.year = w.year AND p.month = w.month").fetchall()
+        return {by_key[(item_id, year, month)]: json.loads(product) for item_id, year, month, product in rows}
+
+    def commit_file(self, file_path, sha256, record_count, products):
+        """
+        Persist updated products and mark the file processed in one transaction
+        """
+        stat = os.stat(file_path)
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO product_state (item_id, year, month, product, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(*self._key(*key), json.dumps(product, ensure_ascii=False), now) for key, product in products.items()])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO processed_files (sha256, path, size, mtime, records, processed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, os.path.abspath(file_path), stat.st_size, stat.st_mtime, record_count, now))
+
+    def close(self):
+        self.conn.close()
+
+def _iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def fold_file_into_state(store, file_path, sha256, target_year=None, chunk_size=FOLD_CHUNK_SIZE):
+    """
+    Fold one input file into the stored monthly aggregates, chunk_size records at a time
+    Every year is folded (the file is marked processed for good); target_year only
+    selects which keys are reported
+    Returns (record_count, {(item_id, year, month): product} for products that changed,
+    the keys with records in target_year)
+    """
+    aggregates = {}
+    stored = {}
+    wanted = set()
+    record_count = 0
+    for chunk in _iter_chunks(iter_shopee_data_from_file(file_path), chunk_size):
+        keyed = [((item.get("Item ID", 0), *record_month_key(item)), item) for item in chunk]
+        new_keys = {key for key, _ in keyed if key not in stored}
+        loaded = store.load_products(new_keys)
+        for key in new_keys:
+            stored[key] = loaded.get(key)
+            if stored[key] is not None:
+                # Seed the aggregate with the stored product so later main rows still
+                # override and later variation rows are still skipped, as in a full-history run
+                aggregates.setdefault(key[1:], {})[key[0]] = json.loads(json.dumps(stored[key]))
+        for key, item in keyed:
+            aggregate_shopee_record(aggregates.setdefault(key[1:], {}), item)
+            if not target_year or record_in_year(item, target_year):
+                wanted.add(key)
+        record_count += len(chunk)
+
+    changed = {}
+    for (year, month), products in aggregates.items():
+        for item_id, product in products.items():
+            key = (item_id, year, month)
+            if stored.get(key) != product:
+                changed[key] = product
+    store.commit_file(file_path, sha256, record_count, changed)
+    return record_count, changed, wanted
+
+def run_incremental(state_path, inputs, target_year=None):
+    """
+    Fold every not-yet-processed input file into the state store
+    Returns the changed products (of target_year, if given), highest sales first
+    """
+    store = ShopeeStateStore(state_path)
+    changed = {}
+    wanted = set()
+    try:
+        for file_path in list_input_files(inputs):
+            processed, sha256 = store.is_processed(file_path)
+            if processed:
+                print(f"⏭️ Already processed: {file_path}")
+                continue
+            record_count, file_changed, file_wanted = fold_file_into_state(store, file_path, sha256, target_year)
+            changed.update(file_changed)
+            wanted |= file_wanted
+            print(f"📊 {file_path}: {record_count} records, {len(file_changed)} products changed")
+    finally:
+        store.close()
+    return finalize_aggregated_products({key: product for key, product in changed.items() if key in wanted})
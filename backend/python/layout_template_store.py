@@ -0,0 +1,203 @@
+"""
+Local store of invoice layout templates (Shopee order summaries, TikTok receipts, ...)
+A template is what the table extractors of process_file.py learned about one page layout:
+the items-table region, the column header and its column positions, and which table
+strategy found rows. It is keyed by the extractor, the platform, the seller and a
+fingerprint of the page's static text and geometry (field labels, section headings and the
+column header with their positions, down to the column header, and the page size), so the
+next document with the same layout goes straight to extraction instead of rediscovering them
+whatever its number of items.
+
+Stored in SQLite (safe for the concurrent process_file runs spawned by the API) and
+bounded by entry count with least-recently-used eviction. Each template keeps the time its
+discovery took, from which the time saved by later hits is reported.
+
+Stored templates name the sellers of past invoices: process_file keeps the file in the
+same per-user 0700 directory as its OCR response cache, readable by its owner only.
+
+Used by: process_file.py (LAYOUT_TEMPLATES=0 disables; LAYOUT_TEMPLATES_PATH, LAYOUT_TEMPLATES_MAX)
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+# Field labels ("Order ID:", "Seller Name:") and the headings that place the items table
+_LABEL = re.compile(r"^\s*([A-Za-z][A-Za-z .#/&()-]{1,40}?)\s*:")
+_HEADING = re.compile(r"^\s*(Order\s+(?:Summary|Details|Items)|Items\s+List|TikTok\s+Shop\b.*|Invoice|Official\s+Receipt|Sales\s+Invoice)\s*$", re.I)
+_SELLER = re.compile(r"^\s*(?:Seller|Shop|Store)\s*(?:Name)?\s*:\s*(.+?)\s*$", re.I)
+# Smallest number of static lines a page needs to be fingerprinted (a continuation page of an
+# order summary has two: the section heading and the column header)
+MIN_STATIC_LINES = 2
+# Positions are compared on a grid this coarse (PDF points), so renderer jitter still matches
+GRID = 4.0
+
+
+def page_platform(text):
+    """
+    'shopee', 'tiktok' or 'other', from the page text
+    """
+    lowered = text.lower()
+    if 'tiktok' in lowered:
+        return 'tiktok'
+    if 'shopee' in lowered or 'order summary no' in lowered:
+        return 'shopee'
+    return 'other'
+
+
+def page_fingerprint(lines, width, height, header_like=None):
+    """
+    (fingerprint, platform, seller) of a page from its text lines [(x0, y0, text)] top to
+    bottom, or None when it has too little static text. Static text is every field label and
+    section heading down to the first line header_like(text) accepts (the items table's column
+    header) and that line, with their positions; what follows moves with the number of items.
+    """
+    static = []
+    seller = ''
+    table_header = False
+    for x0, y0, text in lines:
+        match = _SELLER.match(text)
+        if match and not seller:
+            seller = match.group(1).strip().lower()
+        if table_header:
+            continue
+        label = _LABEL.match(text)
+        table_header = header_like is not None and header_like(text)
+        if label and not table_header:
+            key = label.group(1).strip().lower()
+        elif _HEADING.match(text) or table_header:
+            key = ' '.join(text.lower().split())
+        else:
+            continue
+        static.append((key, round(x0 / GRID), round(y0 / GRID)))
+    if len(static) < MIN_STATIC_LINES:
+        return None
+    static.sort(key=lambda s: (s[2], s[1], s[0]))
+    blob = json.dumps([round(width), round(height), static], separators=(',', ':'))
+    platform = page_platform(' '.join(text for _, _, text in lines))
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()[:20], platform, seller
+
+
+class LayoutTemplateStore:
+    """
+    SQLite store of layout templates with count-bounded LRU eviction
+    """
+
+    def __init__(self, db_path, max_entries=500):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'stale': 0, 'evicted': 0, 'msSaved': 0.0,
+                      'pagesFingerprinted': 0, 'fingerprintMs': 0.0}
+        self.by_extractor = {}
+        self.conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS layout_templates (
+                    key TEXT PRIMARY KEY,
+                    extractor TEXT NOT NULL,
+                    platform TEXT NOT NULL,
+                    seller TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    learn_ms REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS layout_templates_last_used ON layout_templates (last_used);
+            """)
+
+    @staticmethod
+    def key(extractor, fingerprint):
+        fp, platform, seller = fingerprint
+        return f"{extractor}:{platform}:{hashlib.sha256(seller.encode('utf-8')).hexdigest()[:8]}:{fp}"
+
+    def _count(self, extractor, field, amount=1):
+        self.stats[field] += amount
+        counts = self.by_extractor.setdefault(extractor, {'hits': 0, 'misses': 0, 'stale': 0, 'msSaved': 0.0})
+        counts[field] += amount
+
+    def get(self, extractor, fingerprint):
+        """
+        (template, learn_ms) for the page layout (and bump its recency), or None
+        """
+        key = self.key(extractor, fingerprint)
+        with self.lock:
+            row = self.conn.execute("SELECT value, learn_ms FROM layout_templates WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(extractor, 'misses')
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE layout_templates SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            self._count(extractor, 'hits')
+        return json.loads(row[0]), row[1]
+
+    def fingerprinted(self, pages, ms):
+        """
+        Record the cost of reading pages for their fingerprints (what every lookup pays)
+        """
+        with self.lock:
+            self.stats['pagesFingerprinted'] += pages
+            self.stats['fingerprintMs'] += ms
+
+    def saved(self, extractor, learn_ms, hit_ms):
+        """
+        Record a hit's time saved: the discovery it skipped minus what the hit took
+        """
+        with self.lock:
+            self._count(extractor, 'msSaved', max(0.0, learn_ms - hit_ms))
+
+    def stale(self, extractor, fingerprint):
+        """
+        Drop a template that no longer fits its layout (the page is then handled as a miss)
+        """
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM layout_templates WHERE key = ?", (self.key(extractor, fingerprint),))
+            self._count(extractor, 'stale')
+
+    def put(self, extractor, fingerprint, value, learn_ms):
+        """
+        Store a JSON-serialisable template, then evict least recently used entries over max_entries
+        """
+        _, platform, seller = fingerprint
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO layout_templates (key, extractor, platform, seller, value, learn_ms, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key(extractor, fingerprint), extractor, platform, seller, json.dumps(value), learn_ms, now, now))
+            self.stats['stores'] += 1
+            if self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COUNT(*) FROM layout_templates").fetchone()[0]
+        if total <= self.max_entries:
+            return
+        victims = self.conn.execute("SELECT key FROM layout_templates ORDER BY last_used ASC LIMIT ?",
+                                    (total - self.max_entries,)).fetchall()
+        self.conn.executemany("DELETE FROM layout_templates WHERE key = ?", victims)
+        self.stats['evicted'] += len(victims)
+
+    def summary(self):
+        """
+        Counters for this run (overall and per extractor), the hit rate, the time saved net of
+        fingerprinting and the current store size
+        """
+        with self.lock:
+            entries, sellers = self.conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT platform || ':' || seller) FROM layout_templates").fetchone()
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(self.stats, msSaved=round(self.stats['msSaved'], 1),
+                        fingerprintMs=round(self.stats['fingerprintMs'], 1),
+                        netMsSaved=round(self.stats['msSaved'] - self.stats['fingerprintMs'], 1),
+                        hitRate=round(self.stats['hits'] / lookups, 4) if lookups else None,
+                        extractors={name: dict(c, msSaved=round(c['msSaved'], 1)) for name, c in self.by_extractor.items()},
+                        entries=entries, sellers=sellers, maxEntries=self.max_entries)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,138 @@
+"""
+Local cache of raw external OCR responses (Google Vision, OCR.space)
+Responses are keyed by a hash of the submitted image pixels plus the provider
+settings that shape the response, so a re-uploaded or reprocessed document is
+answered from disk and replayed through the same row parsers as a live call.
+
+Stored in SQLite (safe for the concurrent process_file runs spawned by the API),
+zlib-compressed, bounded by total size with least-recently-used eviction and by
+entry age. Responses carry buyer names and addresses: process_file keeps the file
+in a per-user 0700 directory, readable by its owner only.
+
+Used by: process_file.py (OCR_CACHE=0 disables; OCR_CACHE_PATH, OCR_CACHE_MAX_MB, OCR_CACHE_MAX_AGE_DAYS)
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+
+def image_digest(img):
+    """
+    SHA-256 of the decoded pixels (mode, size and raw bytes), so a page hashes the same
+    whether it comes from a re-uploaded file or a fresh render of the same PDF
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{img.mode}:{img.width}x{img.height}:".encode('ascii'))
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def settings_digest(provider, settings):
+    """
+    Short hash of the provider name and the request settings that affect its response
+    """
+    blob = json.dumps([provider, settings], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()[:16]
+
+
+class OcrResponseCache:
+    """
+    SQLite store of provider responses with size-bounded LRU eviction; entries older than
+    max_age seconds (0 = no limit) are dropped
+    """
+
+    def __init__(self, db_path, max_bytes=200 * 1024 * 1024, max_age=0):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evicted': 0, 'expired': 0}
+        self.conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS ocr_responses (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ocr_responses_last_used ON ocr_responses (last_used);
+            """)
+            self._expire()
+
+    @staticmethod
+    def key(provider, image_hash, settings):
+        return f"{provider}:{settings_digest(provider, settings)}:{image_hash}"
+
+    def get(self, key):
+        """
+        Cached value for key (and bump its recency), or None
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT value, created_at FROM ocr_responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.max_age and time.time() - row[1] > self.max_age:
+                with self.conn:
+                    self._expire()
+                row = None
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE ocr_responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.stats['hits'] += 1
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def put(self, key, provider, value):
+        """
+        Store a JSON-serialisable value, then evict least recently used entries over max_bytes
+        """
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+        if self.max_bytes and len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ocr_responses (key, provider, value, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, blob, len(blob), now, now))
+            self.stats['stores'] += 1
+            self._expire()
+            if self.max_bytes:
+                self._evict()
+
+    def _expire(self):
+        if not self.max_age:
+            return
+        cursor = self.conn.execute("DELETE FROM ocr_responses WHERE created_at < ?", (time.time() - self.max_age,))
+        self.stats['expired'] += max(cursor.rowcount, 0)
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM ocr_responses ORDER BY last_used ASC"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM ocr_responses WHERE key = ?", victims)
+        self.stats['evicted'] += len(victims)
+
+    def summary(self):
+        """
+        Counters for this run plus the current store size
+        """
+        with self.lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_responses").fetchone()
+        return dict(self.stats, entries=entries, bytes=size, maxBytes=self.max_bytes, maxAge=self.max_age)
+
+    def close(self):
+        self.conn.close()
@@ -3,51 +3,135 @@ import sys
 import json
 import io
 import re
+import stat
+import tempfile
+import threading
+import time
+import importlib
+import importlib.util
+import contextlib
 from typing import Dict, Any, List, Optional, Tuple
 from difflib import SequenceMatcher
+from collections import Counter
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import base64
-# 'requests' is optional; if unavailable, external OCR fallbacks will be skipped gracefully
-try:
-    import requests  # type: ignore
-except Exception:
-    requests = None  # sentinel to detect unavailability
-
-# Third-party imports
-try:
-    import pytesseract
-    import pandas as pd
-    import fitz  # PyMuPDF
-    from pdf2image import convert_from_path
-    from PIL import Image
+import bisect
+import math
+
+from trace_spans import SpanTracer
+from script_profiler import ScriptProfiler, profiling_requested, start_profiler
+
+_STARTED_AT = time.perf_counter()
+_MAIN_STARTED_AT: Optional[float] = None
+# Seconds spent importing each lazily loaded dependency (reported in diagnostics['imports'])
+_IMPORT_TIMINGS: Dict[str, float] = {}
+
+
+def _timed_import(name: str):
+    start = time.perf_counter()
+    try:
+        return importlib.import_module(name)
+    finally:
+        _IMPORT_TIMINGS[name] = _IMPORT_TIMINGS.get(name, 0.0) + (time.perf_counter() - start)
+
+
+class _LazyModule:
+    """Required third-party module imported on first attribute access.
+
+    xlsx/csv inputs only pay for pandas and digital PDFs never load the OCR stack.
+    A missing dependency raises ImportError("Missing Python dependency: ...") where it is first
+    used, which may be a stage's worker thread: the stage handles it like any other failure, and
+    anything left reaches main's JSON error.
+    """
+
+    def __init__(self, name: str, on_load=None):
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            try:
+                module = _timed_import(self._name)
+            except Exception as e:
+                raise ImportError(f"Missing Python dependency: {e}") from e
+            self._module = module
+            if self._on_load:
+                self._on_load(module)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+
+_OPTIONAL_MODULES: Dict[str, Any] = {}
+
+
+def _optional_module(name: str):
+    """Import an optional dependency once; None when unavailable."""
+    if name not in _OPTIONAL_MODULES:
+        try:
+            _OPTIONAL_MODULES[name] = _timed_import(name)
+        except Exception:
+            _OPTIONAL_MODULES[name] = None
+    return _OPTIONAL_MODULES[name]
+
+
+def _module_available(name: str) -> bool:
+    """Cheap availability check (no import) for optional heavy dependencies."""
+    if name in _OPTIONAL_MODULES:
+        return _OPTIONAL_MODULES[name] is not None
     try:
-        import pdfplumber  # optional: preferred for digital PDFs
+        return importlib.util.find_spec(name) is not None
     except Exception:
-        pdfplumber = None
-except Exception as e:
-    # Fail fast with a clear message about missing dependencies
-    print(json.dumps({
-        "success": False,
-        "error": f"Missing Python dependency: {e}",
-        "text": ""
-    }))
-    sys.exit(1)
-
-# Optional PaddleOCR (for improved table/currency OCR)
-try:
-    from paddleocr import PaddleOCR  # type: ignore
-except Exception:
-    PaddleOCR = None  # optional
+        return False
 
 
-def _configure_binaries():
-    """Configure platform-specific binary paths (Tesseract, Poppler)."""
-    # Tesseract
+def _configure_tesseract(module) -> None:
     tess_path = os.environ.get(
         "TESSERACT_PATH",
         r"C:\\Program Files\\Tesseract-OCR\\tesseract.exe" if os.name == "nt" else None,
     )
     if tess_path:
-        pytesseract.pytesseract.tesseract_cmd = tess_path
+        module.pytesseract.tesseract_cmd = tess_path
+
+
+# Third-party imports (deferred until an extractor needs them)
+pytesseract = _LazyModule("pytesseract", on_load=_configure_tesseract)
+pd = _LazyModule("pandas")
+np = _LazyModule("numpy")
+fitz = _LazyModule("fitz")  # PyMuPDF
+pdf2image = _LazyModule("pdf2image")
+Image = _LazyModule("PIL.Image")
+# Optional: 'requests' (external OCR fallbacks), 'pdfplumber' (preferred for digital PDFs)
+# and 'paddleocr' (improved table/currency OCR) are loaded via _optional_module
+
+
+def _print_import_report() -> None:
+    """Write the lazy-import timings to stderr in `python -X importtime` layout."""
+    sys.stderr.write("import time: self [us] | cumulative | imported package\n")
+    for name, seconds in sorted(_IMPORT_TIMINGS.items(), key=lambda kv: kv[1]):
+        us = int(seconds * 1_000_000)
+        sys.stderr.write(f"import time: {us:>9} | {us:>10} | {name}\n")
+    report = _import_report()
+    sys.stderr.write(f"module load: {report['moduleLoadMs']} ms, dependency imports: "
+                     f"{report['dependencyImportMs']} ms, total: {report['totalMs']} ms\n")
+
+
+def _import_report() -> Dict[str, Any]:
+    """Startup/import cost summary, in the spirit of `python -X importtime`."""
+    return {
+        'moduleLoadMs': round((_MAIN_STARTED_AT - _STARTED_AT) * 1000, 1) if _MAIN_STARTED_AT else None,
+        'dependencyImportMs': round(sum(_IMPORT_TIMINGS.values()) * 1000, 1),
+        'modulesMs': {name: round(seconds * 1000, 1) for name, seconds in _IMPORT_TIMINGS.items()},
+        'totalMs': round((time.perf_counter() - _STARTED_AT) * 1000, 1),
+    }
+
+
+def _configure_binaries():
+    """Configure platform-specific binary paths (Tesseract, Poppler)."""
+    # Tesseract: applied by _configure_tesseract when pytesseract is first used
 
     # Poppler (for pdf2image). Optional; if missing, we'll fall back to PyMuPDF rasterization.
     poppler_path = os.environ.get(
@@ -57,255 +141,431 @@ def _configure_binaries():
     return poppler_path
 
 
-def _extract_items_from_pdf_layout(file_path: str) -> List[Dict[str, Any]]:
-    """Extract item rows from a tabular 'Order Details' using PDF text positions (PyMuPDF words).
-    Works when the PDF has embedded text (not just images). Returns a list of items with
-    columns: no, product, variation, productPrice, qty, subtotal.
-    """
-    items: List[Dict[str, Any]] = []
+# Active span tracer (set by main / process_file); spans end up in diagnostics['timings']
+_TRACER: Optional[SpanTracer] = None
+
+
+def _span(name: str, parent=None, **attrs):
+    """Tracing span on the active tracer; a no-op context (yielding a scratch dict) without one."""
+    if _TRACER is None:
+        return contextlib.nullcontext({})
+    return _TRACER.span(name, parent=parent, **attrs)
+
+
+def _current_span():
+    return _TRACER.current() if _TRACER is not None else None
+
+
+def _annotate_span(**attrs) -> None:
+    """Add counters (bytes, pages, ...) to the innermost open span on this thread."""
+    current = _current_span()
+    if current is not None:
+        current.update(attrs)
+
+
+def _adopt_span(parent):
+    """Continue `parent` (captured on the submitting thread) as the current span in a pool worker."""
+    if _TRACER is None or parent is None:
+        return contextlib.nullcontext(parent)
+    return _TRACER.adopt(parent)
+
+
+# Active profiler (--profile / PYTHON_PROFILE); stage summaries end up in diagnostics['profile']
+_PROFILER: Optional[ScriptProfiler] = None
+
+
+def _profile_stage(name: str):
+    """tracemalloc/cProfile stage on the active profiler; a no-op context without one."""
+    if _PROFILER is None:
+        return contextlib.nullcontext()
+    return _PROFILER.stage(name)
+
+
+# Table reconstruction shared by the word-box extractors (PDF layout, Tesseract TSV, Google Vision,
+# OCR.space): header synonyms, stop lines and the cell/row patterns the item parser reads
+_TABLE_PROD_SYN = re.compile(r"product|item|description|details?", re.I)
+_TABLE_QTY_SYN = re.compile(r"qty|quantity", re.I)
+_TABLE_PRICE_SYN = re.compile(r"price|unit\s*price|unitprice", re.I)
+_TABLE_SUBTOTAL_SYN = re.compile(r"subtotal|amount|total", re.I)
+_TABLE_NO_SYN = re.compile(r"^(no\.|no|#)$", re.I)
+_TABLE_VARIATION_SYN = re.compile(r"variation|variant|var", re.I)
+# Ends the rows under a header; region parses also stop at 'Total Quantity'
+_TABLE_STOP = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due", re.I)
+_TABLE_REGION_STOP = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due|Total\s+Quantity", re.I)
+_TABLE_ORDER_DETAILS = re.compile(r"^\s*Order\s+Details\b", re.I)
+_TABLE_HEADER_ROW = re.compile(r"No\b\s*\|\s*Product", re.I)
+_TABLE_MONEY = re.compile(r"^[₱$P]?\d[\d,]*(?:\.\d{2})?$")
+_TABLE_SMALL_INT = re.compile(r"^\d{1,3}$")
+_TABLE_LABEL_WORD = re.compile(r"^(qty|quantity|subtotal|amount|price)$", re.I)
+# Amounts written as money (currency sign or cents), told apart from bare row numbers and quantities
+_TABLE_PRICED = re.compile(r"^[₱$P]|\.\d{2}$")
+# Lines right under the items ('Subtotal ₱41.00', 'Total Quantity 3 items', "Buyer's remarks")
+_TABLE_SUMMARY_ROW = re.compile(r"^\s*(?:Sub\s*total|Total\s+Quantity|Buyer'?s\s+remarks?)\b", re.I)
+_TABLE_CELL_AMOUNT = re.compile(r"([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})|[0-9]+(?:\.[0-9]{2})?)")
+_TABLE_COLUMNS = ('no', 'product', 'variation', 'price', 'qty', 'subtotal')
+
+
+def _table_amount(s: str) -> Optional[float]:
+    """Amount in a price/subtotal cell or money token ('₱1,234.50', 'P99', '1,234.50 x')."""
     try:
-        doc = fitz.open(file_path)
+        return float(s.replace(',', '').lstrip('₱$P'))
     except Exception:
-        return items
+        m = _TABLE_CELL_AMOUNT.search(s)
+        if m:
+            try:
+                return float(m.group(1).replace(',', ''))
+            except Exception:
+                return None
+        return None
 
-    # Synonyms for header detection
-    prod_syn = re.compile(r"product|item|description|details?", re.I)
-    qty_syn = re.compile(r"qty|quantity", re.I)
-    price_syn = re.compile(r"price|unit\s*price|unitprice", re.I)
-    subtotal_syn = re.compile(r"subtotal|amount|total", re.I)
-    no_syn = re.compile(r"^(no\.|no|#)$", re.I)
 
-    def _to_float(s: str) -> Optional[float]:
-        try:
-            return float(s.replace(',', '').lstrip('₱$P'))
-        except Exception:
-            m = re.search(r"([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})|[0-9]+(?:\.[0-9]{2})?)", s)
-            if m:
-                try:
-                    return float(m.group(1).replace(',', ''))
-                except Exception:
-                    return None
-            return None
+class _WordBoxes:
+    """
+    Words of one page as parallel NumPy arrays: box corners x0, y0, x1, y1 and the index of each
+    word's text in `words`. `line` optionally carries the provider's line ids (one row of integer
+    keys per word, e.g. PyMuPDF (block, line) or Tesseract (block, par, line))
+    """
 
-    for page in doc:
-        words = page.get_text('words')  # list of (x0, y0, x1, y1, word, block_no, line_no, word_no)
-        if not words:
-            continue
-        # Group by line_no
-        lines_map: Dict[Tuple[int,int], List[Tuple[float,float,float,float,str]]] = {}
-        for x0,y0,x1,y1,w,bno,lno,wn in words:
-            key = (bno, lno)
-            lines_map.setdefault(key, []).append((x0,y0,x1,y1,w))
-        # Build sorted lines
-        sorted_lines = []
-        for key, lst in lines_map.items():
-            lst.sort(key=lambda t: t[0])
-            x0s = [t[0] for t in lst]
-            y0s = [t[1] for t in lst]
-            text = ' '.join([t[4] for t in lst])
-            sorted_lines.append((min(x0s), min(y0s), text, lst))
-        sorted_lines.sort(key=lambda t: (t[1], t[0]))
-
-        # Find header line on this page
-        header_idx = None
-        header_cols = None
-        for idx, (_x, _y, text, lst) in enumerate(sorted_lines):
-            tnorm = text.lower()
-            if prod_syn.search(tnorm) and qty_syn.search(tnorm) and price_syn.search(tnorm) and subtotal_syn.search(tnorm):
-                # Build column map based on word positions
-                col_markers: List[Tuple[float,str]] = []
-                for x0,y0,x1,y1,w in lst:
-                    wl = w.lower()
-                    if no_syn.match(wl):
-                        col_markers.append((x0, 'no'))
-                    elif prod_syn.search(wl):
-                        col_markers.append((x0, 'product'))
-                    elif re.search(r"variation|variant|var", wl):
-                        col_markers.append((x0, 'variation'))
-                    elif price_syn.search(wl):
-                        col_markers.append((x0, 'price'))
-                    elif qty_syn.search(wl):
-                        col_markers.append((x0, 'qty'))
-                    elif subtotal_syn.search(wl):
-                        col_markers.append((x0, 'subtotal'))
-                # Deduplicate markers by nearest x and sort
-                col_markers.sort(key=lambda z: z[0])
-                dedup = []
-                for x, name in col_markers:
-                    if not dedup or abs(x - dedup[-1][0]) > 5:
-                        dedup.append((x, name))
-                if len(dedup) >= 3:
-                    header_idx = idx
-                    header_cols = dedup
-                    break
+    def __init__(self, words: List[str], x0, y0, x1, y1, line=None):
+        self.words = words
+        self.x0 = np.asarray(x0, dtype=np.float64)
+        self.y0 = np.asarray(y0, dtype=np.float64)
+        self.x1 = np.asarray(x1, dtype=np.float64)
+        self.y1 = np.asarray(y1, dtype=np.float64)
+        self.text = np.arange(len(words))
+        self.line = None if line is None else np.asarray(line, dtype=np.int64).reshape(len(words), -1)
 
-        if header_idx is None or not header_cols:
-            # Region-based fallback: find words between 'Order Details' and totals and parse rows heuristically
-            # 1) Locate region bounds
-            lines_rb = []
-            # Rebuild lines for region finding
-            lines_map2: Dict[int, List[Tuple[float,float,float,float,str,int]]] = {}
-            for x0,y0,x1,y1,w,bno,lno,wn in words:
-                key = int(y0)
-                lines_map2.setdefault(key, []).append((x0,y0,x1,y1,w,bno))
-            for key, lst in lines_map2.items():
-                lst.sort(key=lambda t: t[0])
-                text = ' '.join([t[4] for t in lst])
-                y = min([t[1] for t in lst])
-                lines_rb.append((y, text))
-            lines_rb.sort(key=lambda t: t[0])
-            y_start = None
-            y_end = None
-            for y, text in lines_rb:
-                if re.search(r"^\s*Order\s+Details\b", text, re.I):
-                    y_start = y + 3
-                    break
-            if y_start is None:
-                continue
-            for y, text in lines_rb:
-                if y <= y_start:
-                    continue
-                if re.search(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due|Total\s+Quantity", text, re.I):
-                    y_end = y - 2
-                    break
-            if y_end is None:
-                # take lower page bound
-                y_end = max([t[1] for t in words]) + 5
+    def __len__(self) -> int:
+        return len(self.words)
 
-            # 2) Collect words in region
-            region_words = [ (x0,y0,x1,y1,w) for x0,y0,x1,y1,w,_,_,_ in words if y0 >= y_start and y0 <= y_end ]
-            if not region_words:
-                continue
-            region_words.sort(key=lambda t: (t[1], t[0]))
-
-            # 3) Group into rows by y proximity
-            rows: List[List[Tuple[float,float,float,float,str]]] = []
-            row = []
-            prev_y = None
-            for x0,y0,x1,y1,w in region_words:
-                if prev_y is None or abs(y0 - prev_y) <= 5:
-                    row.append((x0,y0,x1,y1,w))
-                    prev_y = y0 if prev_y is None else (prev_y + y0) / 2.0
-                else:
-                    if row:
-                        rows.append(sorted(row, key=lambda t: t[0]))
-                    row = [(x0,y0,x1,y1,w)]
-                    prev_y = y0
-            if row:
-                rows.append(sorted(row, key=lambda t: t[0]))
-
-            # 4) Parse each row with numeric heuristics
-            amt_re = re.compile(r"^[₱$P]?\d[\d,]*(?:\.\d{2})?$")
-            int_re = re.compile(r"^\d{1,3}$")
-
-            def _to_f(s: str) -> Optional[float]:
-                try:
-                    return float(s.replace(',', '').lstrip('₱$P'))
-                except Exception:
-                    m = re.search(r"\d[\d,]*(?:\.\d{2})?", s)
-                    return float(m.group(0).replace(',', '')) if m else None
 
-            for r in rows:
-                texts = [t[4] for t in r]
-                if not texts or any(re.search(r"No\b\s*\|\s*Product", ' '.join(texts), re.I)):
-                    continue
-                # Identify rightmost money as subtotal, the next money as price; an integer near left-middle as qty.
-                money_tokens = [(((t[0]+t[2])/2.0), t[4]) for t in r if amt_re.match(t[4]) and re.search(r"\d", t[4])]
-                money_tokens.sort(key=lambda z: z[0])
-                price_val = None
-                subtotal_val = None
-                qty_val = None
-                if money_tokens:
-                    # choose rightmost as subtotal
-                    subtotal_val = _to_f(money_tokens[-1][1])
-                    if len(money_tokens) >= 2:
-                        price_val = _to_f(money_tokens[-2][1])
-                # qty: integer tokens that aren't part of money tokens
-                qty_candidates = [(((t[0]+t[2])/2.0), t[4]) for t in r if int_re.match(t[4])]
-                if qty_candidates:
-                    try:
-                        qty_val = int(qty_candidates[0][1])
-                    except Exception:
-                        qty_val = None
-                # Product: all words excluding tokens used above and obvious labels
-                used = set([tok for _, tok in money_tokens]) | set([q for _, q in qty_candidates])
-                prod_parts = []
-                for x0,y0,x1,y1,w in r:
-                    if w in used:
-                        continue
-                    if re.search(r"^(qty|quantity|subtotal|amount|price)$", w, re.I):
-                        continue
-                    prod_parts.append(w)
-                product = ' '.join(prod_parts).strip()
-                if product and (qty_val is not None or price_val is not None or subtotal_val is not None):
-                    items.append({
-                        'no': (len(items) + 1),
-                        'product': product[:200],
-                        'variation': None,
-                        'productPrice': price_val,
-                        'qty': qty_val,
-                        'subtotal': subtotal_val,
-                    })
-            # Move to next page after region parse
+class _TableLines:
+    """
+    Text lines of a page: line i holds the word indices order[starts[i]:starts[i + 1]] left to
+    right and is anchored at (x[i], y[i])
+    """
+
+    def __init__(self, boxes: _WordBoxes, order, line_of_word, x, y):
+        self.boxes = boxes
+        self.order = order
+        count = len(x)
+        self.starts = np.searchsorted(line_of_word, np.arange(count + 1))
+        self.x = x
+        self.y = y
+        self._order = order.tolist()
+        self._starts = self.starts.tolist()
+        self.texts = [' '.join([boxes.words[self._order[k]] for k in range(self._starts[i], self._starts[i + 1])])
+                      for i in range(count)]
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def word_ids(self, i: int) -> List[int]:
+        return self._order[self._starts[i]:self._starts[i + 1]]
+
+
+def _table_lines_by_key(boxes: _WordBoxes, reading_order: bool = True) -> _TableLines:
+    """
+    Lines from provider line ids: one lexsort by (ids, x0) and a split where the ids change. With
+    reading_order, lines are ordered by (top, left), ties by id; otherwise by id. A line is
+    anchored at its leftmost x0 and (in reading order) its smallest y0, else its leftmost word's y0
+    """
+    keys = boxes.line
+    order = np.lexsort((boxes.x0,) + tuple(keys[:, j] for j in range(keys.shape[1] - 1, -1, -1)))
+    sorted_keys = keys[order]
+    breaks = np.flatnonzero((sorted_keys[1:] != sorted_keys[:-1]).any(axis=1)) + 1
+    starts = np.concatenate(([0], breaks))
+    step = np.zeros(len(order), dtype=np.int64)
+    step[breaks] = 1
+    group = np.cumsum(step)
+    x = boxes.x0[order][starts]
+    if reading_order:
+        y = np.minimum.reduceat(boxes.y0[order], starts)
+        line_order = np.lexsort((x, y))
+    else:
+        y = boxes.y0[order][starts]
+        line_order = np.arange(len(starts))
+    rank = np.empty(len(starts), dtype=np.int64)
+    rank[line_order] = np.arange(len(starts))
+    line_of_word = np.empty(len(order), dtype=np.int64)
+    line_of_word[order] = rank[group]
+    final = np.lexsort((boxes.x0, line_of_word))
+    return _TableLines(boxes, final, line_of_word[final], x[line_order], y[line_order])
+
+
+def _table_rows_by_proximity(boxes: _WordBoxes, ids, tol: float) -> _TableLines:
+    """
+    Lines from word tops alone: words in (y0, x0) order join the current line while their y0 is
+    within tol of its running mean top. A gap above tol between neighbours always starts a line and
+    a run spanning at most tol never splits, so only wider runs are walked one word at a time.
+    Lines are anchored at their leftmost word
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(ids):
+        empty = np.zeros(0, dtype=np.int64)
+        return _TableLines(boxes, empty, empty, np.zeros(0), np.zeros(0))
+    ids = ids[np.lexsort((boxes.x0[ids], boxes.y0[ids]))]
+    y = boxes.y0[ids]
+    runs = np.concatenate(([0], np.flatnonzero(np.diff(y) > tol) + 1, [len(ids)]))
+    new_line = np.zeros(len(ids), dtype=bool)
+    new_line[runs[:-1]] = True
+    wide = np.flatnonzero(y[runs[1:] - 1] - y[runs[:-1]] > tol)
+    if len(wide):
+        ys = y.tolist()
+        for r in wide.tolist():
+            prev_y = ys[runs[r]]
+            for k in range(runs[r] + 1, runs[r + 1]):
+                if abs(ys[k] - prev_y) <= tol:
+                    prev_y = (prev_y + ys[k]) / 2.0
+                else:
+                    new_line[k] = True
+                    prev_y = ys[k]
+    line_of_word = np.cumsum(new_line) - 1
+    within = np.lexsort((boxes.x0[ids], line_of_word))
+    final = ids[within]
+    line_sorted = line_of_word[within]
+    starts = np.flatnonzero(np.concatenate(([True], line_sorted[1:] != line_sorted[:-1])))
+    return _TableLines(boxes, final, line_sorted, boxes.x0[final][starts], boxes.y0[final][starts])
+
+
+def _table_header_names(text: str) -> bool:
+    """A line naming product, qty, price and subtotal columns"""
+    tnorm = text.lower()
+    return bool(_TABLE_PROD_SYN.search(tnorm) and _TABLE_QTY_SYN.search(tnorm)
+                and _TABLE_PRICE_SYN.search(tnorm) and _TABLE_SUBTOTAL_SYN.search(tnorm))
+
+
+def _table_header(lines: _TableLines) -> Optional[Tuple[int, List[Tuple[float, str]]]]:
+    """First line naming product, qty, price and subtotal columns, with its column markers
+    (x0, name) left to right; markers within 5 units of the previous one are dropped."""
+    words = lines.boxes.words
+    for idx, text in enumerate(lines.texts):
+        if not _table_header_names(text):
             continue
+        ids = lines.word_ids(idx)
+        x0s = lines.boxes.x0[ids].tolist()
+        x1s = lines.boxes.x1[ids].tolist()
+        heights = (lines.boxes.y1[ids] - lines.boxes.y0[ids]).tolist()
+        col_markers: List[Tuple[float, str]] = []
+        for k, (x, j) in enumerate(zip(x0s, ids)):
+            wl = words[j].lower()
+            if (k and words[ids[k - 1]].lower() in ('product', 'item') and _TABLE_PRICE_SYN.search(wl)
+                    and x - x1s[k - 1] <= max(heights[k], 1.0)):
+                # 'Product Price' / 'Item Price' in one cell (a word space apart, not two columns):
+                # the price column starts at the first word
+                col_markers[-1] = (x0s[k - 1], 'price')
+            elif _TABLE_NO_SYN.match(wl):
+                col_markers.append((x, 'no'))
+            elif _TABLE_PROD_SYN.search(wl):
+                col_markers.append((x, 'product'))
+            elif _TABLE_VARIATION_SYN.search(wl):
+                col_markers.append((x, 'variation'))
+            elif _TABLE_PRICE_SYN.search(wl):
+                col_markers.append((x, 'price'))
+            elif _TABLE_QTY_SYN.search(wl):
+                col_markers.append((x, 'qty'))
+            elif _TABLE_SUBTOTAL_SYN.search(wl):
+                col_markers.append((x, 'subtotal'))
+        col_markers.sort(key=lambda z: z[0])
+        dedup: List[Tuple[float, str]] = []
+        for x, name in col_markers:
+            if not dedup or abs(x - dedup[-1][0]) > 5:
+                dedup.append((x, name))
+        if len(dedup) >= 3:
+            return idx, dedup
+    return None
+
+
+def _table_header_like(text: str) -> bool:
+    """A line naming a product, a qty and a price or subtotal column"""
+    tnorm = text.lower()
+    return bool(re.search(r"product|item|description", tnorm) and re.search(r"qty|quantity", tnorm)
+                and (_TABLE_PRICE_SYN.search(tnorm) or _TABLE_SUBTOTAL_SYN.search(tnorm)))
+
+
+def _table_row_item(words: List[str], mids: List[float]) -> Optional[Dict[str, Any]]:
+    """Item fields of a row without column positions: a leftmost 1-3 digit token is the row No.,
+    the rightmost amount is the subtotal and the one before it the price (amounts written as money
+    when the row has any), the 1-3 digit token between them (else the first one) the quantity and
+    the remaining words (minus column labels) the product."""
+    by_x = sorted(range(len(words)), key=lambda k: mids[k])
+    used = set()
+    if len(by_x) > 1 and _TABLE_SMALL_INT.match(words[by_x[0]]):
+        used.add(by_x[0])
+    amounts = [k for k in by_x if k not in used and _TABLE_MONEY.match(words[k])]
+    priced = [k for k in amounts if _TABLE_PRICED.search(words[k])]
+    if priced:
+        amounts = priced
+    price_k = amounts[-2] if len(amounts) >= 2 else None
+    subtotal_k = amounts[-1] if amounts else None
+    used.update(k for k in (price_k, subtotal_k) if k is not None)
+    ints = [k for k in by_x if k not in used and _TABLE_SMALL_INT.match(words[k])]
+    between = [k for k in ints if price_k is not None and mids[price_k] < mids[k] < mids[subtotal_k]]
+    qty_k = (between or ints or [None])[0]
+    if qty_k is not None:
+        used.add(qty_k)
+    price_val = _table_amount(words[price_k]) if price_k is not None else None
+    subtotal_val = _table_amount(words[subtotal_k]) if subtotal_k is not None else None
+    qty_val = int(words[qty_k]) if qty_k is not None else None
+    product = ' '.join([w for k, w in enumerate(words) if k not in used and not _TABLE_LABEL_WORD.match(w)]).strip()
+    if product and (qty_val is not None or price_val is not None or subtotal_val is not None):
+        return {
+            'product': product[:200],
+            'variation': None,
+            'productPrice': price_val,
+            'qty': qty_val,
+            'subtotal': subtotal_val,
+        }
+    return None
 
-        # Header present: Build column x ranges and parse rows
-        xs = [x for x,_ in header_cols]
-        names = [n for _,n in header_cols]
-        ranges = []
-        for i, x in enumerate(xs):
-            start = x - 2
-            end = xs[i+1] - 2 if i+1 < len(xs) else float('inf')
-            ranges.append((start, end, names[i]))
 
+def _table_rows_reading_order(rows: _TableLines, tol: float = 1.5) -> _TableLines:
+    """The same rows with each row's words in reading order: a row that merged wrapped lines (a
+    product name wrapping above and below its values) reads its top line first, each left to right."""
+    boxes = rows.boxes
+    fine = _table_rows_by_proximity(boxes, rows.order, tol)
+    fine_line = np.zeros(len(boxes), dtype=np.int64)
+    fine_line[fine.order] = np.repeat(np.arange(len(fine)), np.diff(fine.starts))
+    row_of_word = np.repeat(np.arange(len(rows)), np.diff(rows.starts))
+    within = np.lexsort((boxes.x0[rows.order], fine_line[rows.order], row_of_word))
+    return _TableLines(boxes, rows.order[within], row_of_word[within], rows.x, rows.y)
+
+
+class _TableEngine:
+    """
+    Item rows rebuilt from the word boxes of successive pages. A page with a column header is cut
+    into columns at the header words (minus col_offset) and every word below it, up to a totals
+    or summary line, is assigned to a column by its x midpoint in one searchsorted; a new item starts on a
+    numeric No. cell or on product text next to a qty/price/subtotal value, other lines continue
+    the current item. Pages without a header fall back to a region parse of the rows between the
+    anchor ('order_details': an 'Order Details' line; 'order_details_or_header': else a header-like
+    line among the first 20; None: the top of the page) and region_stop, each row read with
+    _table_row_item. region_rows='cluster' regroups the region's words by top (region_tol)
+    instead of using the page lines, in reading order within a row; a column header among those
+    rows (one the page lines had split) is then parsed by columns. Per-page parse cost goes to
+    stats['pages']
+    """
+
+    def __init__(self, col_offset: float = 3.0, anchor: Optional[str] = 'order_details',
+                 region_stop: "re.Pattern" = _TABLE_REGION_STOP, region_rows: str = 'lines',
+                 region_tol: float = 5.0, line_tol: float = 6.0, reading_order: bool = True,
+                 stats: Optional[Dict[str, Any]] = None):
+        self.col_offset = col_offset
+        self.anchor = anchor
+        self.region_stop = region_stop
+        self.region_rows = region_rows
+        self.region_tol = region_tol
+        self.line_tol = line_tol
+        self.reading_order = reading_order
+        self.stats = stats
+        self.items: List[Dict[str, Any]] = []
+        self.pages: List[Dict[str, Any]] = []
+
+    def lines(self, boxes: _WordBoxes) -> _TableLines:
+        if boxes.line is not None:
+            return _table_lines_by_key(boxes, self.reading_order)
+        return _table_rows_by_proximity(boxes, boxes.text, self.line_tol)
+
+    def add_page(self, boxes: _WordBoxes, page: int, region_only: bool = False,
+                 header_hint: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Parse one page; region_only skips the header search (second pass over every page).
+        header_hint ({'y', 'columns'} from a layout template; y None for a layout without a column
+        header) replaces the header search. Returns the header used, as a hint for the next page."""
+        start = time.perf_counter()
+        before = len(self.items)
+        mode = 'none'
+        line_count = 0
+        used: Optional[Dict[str, Any]] = None
+        hint_state = None
+        if len(boxes):
+            lines = self.lines(boxes)
+            line_count = len(lines)
+            header = None
+            if not region_only:
+                header = self._hinted_header(lines, header_hint) if header_hint is not None else False
+                hint_state = None if header_hint is None else ('stale' if header is False else 'used')
+                if header is False:
+                    header = _table_header(lines)
+            if header is not None:
+                self._parse_columns(lines, *header)
+                mode = 'columns'
+                used = {'y': float(lines.y[header[0]]), 'columns': [[float(x), name] for x, name in header[1]]}
+            else:
+                used = {'y': None, 'columns': []}
+                if self._parse_region(lines):
+                    mode = 'region'
+        entry = {
+            'page': page,
+            'words': len(boxes),
+            'lines': line_count,
+            'mode': mode,
+            'items': len(self.items) - before,
+            'ms': round((time.perf_counter() - start) * 1000, 3),
+        }
+        if hint_state:
+            entry['template'] = hint_state
+        self.pages.append(entry)
+        return used
+
+    @staticmethod
+    def _hinted_header(lines: _TableLines, hint: Dict[str, Any]):
+        """The header a template names: (line index, column markers), None for a layout without
+        one, or False when no line sits where the template puts it."""
+        if hint.get('y') is None:
+            return None
+        near = np.flatnonzero(np.abs(lines.y - hint['y']) <= 1.0)
+        for idx in near.tolist():
+            if _table_header_names(lines.texts[idx]):
+                return idx, [(x, name) for x, name in hint['columns']]
+        return False
+
+    def finish(self) -> List[Dict[str, Any]]:
+        if self.stats is not None:
+            self.stats['pages'] = self.pages
+            self.stats['words'] = sum(p['words'] for p in self.pages)
+            self.stats['items'] = len(self.items)
+            self.stats['parseMs'] = round(sum(p['ms'] for p in self.pages), 3)
+            self.stats['parseMsMax'] = max((p['ms'] for p in self.pages), default=None)
+        return self.items
+
+    def _parse_columns(self, lines: _TableLines, header_idx: int, header_cols: List[Tuple[float, str]]) -> None:
+        end = header_idx + 1
+        while end < len(lines) and not (_TABLE_STOP.search(lines.texts[end]) or _TABLE_SUMMARY_ROW.match(lines.texts[end])):
+            end += 1
+        names = [name for _, name in header_cols]
+        col_starts = np.array([x for x, _ in header_cols]) - self.col_offset
+        lo, hi = lines.starts[header_idx + 1], lines.starts[end]
+        body = lines.order[lo:hi]
+        mids = (lines.boxes.x0[body] + lines.boxes.x1[body]) / 2.0
+        cols = (np.searchsorted(col_starts, mids, side='right') - 1).tolist()
+        words = lines.boxes.words
+        body_ids = body.tolist()
         current_row: Dict[str, Any] = {}
 
         def flush_row():
             nonlocal current_row
-            if not current_row:
-                return
             prod = (current_row.get('product') or '').strip()
-            if not prod:
-                current_row = {}
-                return
-            # Map to final schema
-            item = {
-                'no': current_row.get('no'),
-                'product': prod[:200],
-                'variation': (current_row.get('variation') or None),
-                'productPrice': current_row.get('price'),
-                'qty': current_row.get('qty'),
-                'subtotal': current_row.get('subtotal'),
-            }
-            items.append(item)
+            if prod:
+                self.items.append({
+                    'no': current_row.get('no'),
+                    'product': prod[:200],
+                    'variation': (current_row.get('variation') or None),
+                    'productPrice': current_row.get('price'),
+                    'qty': current_row.get('qty'),
+                    'subtotal': current_row.get('subtotal'),
+                })
             current_row = {}
 
-        stop_pattern = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due", re.I)
-        for _x, _y, text, lst in sorted_lines[header_idx+1:]:
-            if stop_pattern.search(text):
-                flush_row()
-                break
-            # Assign each word to a column by x center
-            col_text: Dict[str, List[str]] = {n: [] for n in ['no','product','variation','price','qty','subtotal']}
-            for x0,y0,x1,y1,w in lst:
-                xmid = (x0 + x1) / 2.0
-                col_name = None
-                for start,end,name in ranges:
-                    if start <= xmid < end:
-                        col_name = name
-                        break
-                if not col_name:
-                    continue
-                col_text.setdefault(col_name, []).append(w)
-            # Build fields
+        for i in range(header_idx + 1, end):
+            col_text: Dict[str, List[str]] = {n: [] for n in _TABLE_COLUMNS}
+            for k in range(lines._starts[i] - lo, lines._starts[i + 1] - lo):
+                if cols[k] >= 0:
+                    col_text[names[cols[k]]].append(words[body_ids[k]])
+
             def join(n):
-                return ' '.join(col_text.get(n, [])).strip()
-            no_s = join('no')
-            product_s = join('product')
-            variation_s = join('variation')
-            price_s = join('price')
-            qty_s = join('qty')
-            subtotal_s = join('subtotal')
+                return ' '.join(col_text[n]).strip()
+            no_s = join('no'); product_s = join('product'); variation_s = join('variation')
+            price_s = join('price'); qty_s = join('qty'); subtotal_s = join('subtotal')
 
             # New row heuristics: start if we have a numeric No., or if we see qty/price/subtotal alongside product text
             new_row = False
@@ -316,154 +576,252 @@ def _extract_items_from_pdf_layout(file_path: str) -> List[Dict[str, Any]]:
                     new_row = True
             except Exception:
                 no_val = None
-            price_val = _to_float(price_s) if price_s else None
+            price_val = _table_amount(price_s) if price_s else None
             qty_val = None
             try:
                 if qty_s:
-                    qtmp = int(re.sub(r"[^0-9]", "", qty_s))
-                    qty_val = qtmp
+                    qty_val = int(re.sub(r"[^0-9]", "", qty_s))
             except Exception:
-                pass
-            subtotal_val = _to_float(subtotal_s) if subtotal_s else None
-
+                qty_val = None
+            subtotal_val = _table_amount(subtotal_s) if subtotal_s else None
             if not new_row and product_s and (qty_val is not None or price_val is not None or subtotal_val is not None):
                 new_row = True
-
             if new_row:
                 if current_row:
                     flush_row()
                 current_row = {'no': no_val}
-            # Append/assign fields
             if product_s:
-                if 'product' in current_row and current_row.get('product'):
-                    current_row['product'] += ' ' + product_s
-                else:
-                    current_row['product'] = product_s
+                current_row['product'] = (current_row['product'] + ' ' + product_s) if current_row.get('product') else product_s
             if variation_s:
-                if current_row.get('variation'):
-                    current_row['variation'] += ' ' + variation_s
-                else:
-                    current_row['variation'] = variation_s
+                current_row['variation'] = (current_row['variation'] + ' ' + variation_s) if current_row.get('variation') else variation_s
             if price_val is not None:
                 current_row['price'] = price_val
             if qty_val is not None:
                 current_row['qty'] = qty_val
             if subtotal_val is not None:
                 current_row['subtotal'] = subtotal_val
-        # Flush last row for this page
         flush_row()
-    # If header-based parsing produced no items, try region-based fallback once more
-    if not items:
-        try:
-            doc2 = fitz.open(file_path)
-            for page in doc2:
-                words = page.get_text('words')
-                if not words:
-                    continue
-                lines_rb = []
-                lines_map2: Dict[int, List[Tuple[float,float,float,float,str,int]]] = {}
-                for x0,y0,x1,y1,w,bno,lno,wn in words:
-                    key = int(y0)
-                    lines_map2.setdefault(key, []).append((x0,y0,x1,y1,w,bno))
-                for key, lst in lines_map2.items():
-                    lst.sort(key=lambda t: t[0])
-                    text = ' '.join([t[4] for t in lst])
-                    y = min([t[1] for t in lst])
-                    lines_rb.append((y, text))
-                lines_rb.sort(key=lambda t: t[0])
-                y_start = None
-                y_end = None
-                for y, text in lines_rb:
-                    if re.search(r"^\s*Order\s+Details\b", text, re.I):
-                        y_start = y + 3
-                        break
-                if y_start is None:
-                    continue
-                for y, text in lines_rb:
-                    if y <= y_start:
-                        continue
-                    if re.search(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due|Total\s+Quantity", text, re.I):
-                        y_end = y - 2
-                        break
-                if y_end is None:
-                    y_end = max([t[1] for t in words]) + 5
-                region_words = [ (x0,y0,x1,y1,w) for x0,y0,x1,y1,w,_,_,_ in words if y0 >= y_start and y0 <= y_end ]
-                if not region_words:
-                    continue
-                region_words.sort(key=lambda t: (t[1], t[0]))
-                rows: List[List[Tuple[float,float,float,float,str]]] = []
-                row = []
-                prev_y = None
-                for x0,y0,x1,y1,w in region_words:
-                    if prev_y is None or abs(y0 - prev_y) <= 5:
-                        row.append((x0,y0,x1,y1,w))
-                        prev_y = y0 if prev_y is None else (prev_y + y0) / 2.0
-                    else:
-                        if row:
-                            rows.append(sorted(row, key=lambda t: t[0]))
-                        row = [(x0,y0,x1,y1,w)]
-                        prev_y = y0
-                if row:
-                    rows.append(sorted(row, key=lambda t: t[0]))
-                amt_re = re.compile(r"^[₱$P]?\d[\d,]*(?:\.\d{2})?$")
-                int_re = re.compile(r"^\d{1,3}$")
-                def _to_f(s: str) -> Optional[float]:
-                    try:
-                        return float(s.replace(',', '').lstrip('₱$P'))
-                    except Exception:
-                        m = re.search(r"\d[\d,]*(?:\.\d{2})?", s)
-                        return float(m.group(0).replace(',', '')) if m else None
-                for r in rows:
-                    texts = [t[4] for t in r]
-                    if not texts or any(re.search(r"No\b\s*\|\s*Product", ' '.join(texts), re.I)):
-                        continue
-                    money_tokens = [(((t[0]+t[2])/2.0), t[4]) for t in r if amt_re.match(t[4]) and re.search(r"\d", t[4])]
-                    money_tokens.sort(key=lambda z: z[0])
-                    price_val = None; subtotal_val = None
-                    qty_val = None
-                    if money_tokens:
-                        subtotal_val = _to_f(money_tokens[-1][1])
-                        if len(money_tokens) >= 2:
-                            price_val = _to_f(money_tokens[-2][1])
-                    qty_candidates = [(((t[0]+t[2])/2.0), t[4]) for t in r if int_re.match(t[4])]
-                    if qty_candidates:
-                        try:
-                            qty_val = int(qty_candidates[0][1])
-                        except Exception:
-                            qty_val = None
-                    used = set([tok for _, tok in money_tokens]) | set([q for _, q in qty_candidates])
-                    prod_parts = []
-                    for x0,y0,x1,y1,w in r:
-                        if w in used:
-                            continue
-                        if re.search(r"^(qty|quantity|subtotal|amount|price)$", w, re.I):
-                            continue
-                        prod_parts.append(w)
-                    product = ' '.join(prod_parts).strip()
-                    if product and (qty_val is not None or price_val is not None or subtotal_val is not None):
-                        items.append({
-                            'no': (len(items) + 1),
-                            'product': product[:200],
-                            'variation': None,
-                            'productPrice': price_val,
-                            'qty': qty_val,
-                            'subtotal': subtotal_val,
+
+    def _region_bounds(self, lines: _TableLines) -> Optional[Tuple[float, float]]:
+        """(y_start, y_end) of the rows between the anchor line and the first stop line below it"""
+        y_start = None
+        for i, text in enumerate(lines.texts):
+            if _TABLE_ORDER_DETAILS.search(text):
+                y_start = float(lines.y[i]) + 3
+                break
+        if y_start is None and self.anchor == 'order_details_or_header':
+            for i, text in enumerate(lines.texts[:20]):
+                if _table_header_like(text):
+                    y_start = float(lines.y[i]) + 3
+                    break
+        if y_start is None:
+            return None
+        ys = lines.y.tolist()
+        for i, text in enumerate(lines.texts):
+            if ys[i] > y_start and self.region_stop.search(text):
+                return y_start, ys[i] - 2
+        return y_start, float('inf')
+
+    def _parse_region(self, lines: _TableLines) -> bool:
+        if self.anchor is None:
+            rows = lines
+            end = 0
+            while end < len(lines) and not self.region_stop.search(lines.texts[end]):
+                end += 1
+            selected = range(end)
+        else:
+            bounds = self._region_bounds(lines)
+            if bounds is None:
+                return False
+            y_start, y_end = bounds
+            if self.region_rows == 'cluster':
+                boxes = lines.boxes
+                ids = np.flatnonzero((boxes.y0 >= y_start) & (boxes.y0 <= y_end))
+                rows = _table_rows_reading_order(_table_rows_by_proximity(boxes, ids, self.region_tol))
+                # A column header the page lines split (one PyMuPDF line per header cell) is whole here
+                header = _table_header(rows)
+                if header is not None:
+                    self._parse_columns(rows, *header)
+                    return True
+                selected = range(len(rows))
+            else:
+                rows = lines
+                selected = np.flatnonzero((lines.y >= y_start) & (lines.y <= y_end)).tolist()
+        boxes = rows.boxes
+        mids = ((boxes.x0 + boxes.x1) / 2.0).tolist()
+        for i in selected:
+            text = rows.texts[i]
+            if self.region_stop.search(text) or _TABLE_HEADER_ROW.search(text):
+                continue
+            ids = rows.word_ids(i)
+            item = _table_row_item([boxes.words[j] for j in ids], [mids[j] for j in ids])
+            if item is not None:
+                self.items.append({'no': len(self.items) + 1, **item})
+        return True
+
+
+_LAYOUT_TEMPLATES = None
+_LAYOUT_TEMPLATES_FAILED = False
+# The table extractors run concurrently; the store is opened once
+_LAYOUT_TEMPLATES_LOCK = threading.Lock()
+# PyMuPDF words, lines and fingerprints per page by (path, mtime, size), shared by the table extractors
+_PAGE_LAYOUTS: Dict[Tuple[str, float, int], List[Dict[str, Any]]] = {}
+# Totals lines that end the items table
+_ORDER_TOTALS_LINE = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due|Total\s+Quantity", re.I)
+
+
+def _layout_templates():
+    """Shared layout-template store for the table extractors (None when LAYOUT_TEMPLATES=0 or it cannot be opened)."""
+    global _LAYOUT_TEMPLATES, _LAYOUT_TEMPLATES_FAILED
+    if os.environ.get('LAYOUT_TEMPLATES', '1') not in ('1', 'true', 'True') or _LAYOUT_TEMPLATES_FAILED:
+        return None
+    if _LAYOUT_TEMPLATES is None:
+        with _LAYOUT_TEMPLATES_LOCK:
+            if _LAYOUT_TEMPLATES is None and not _LAYOUT_TEMPLATES_FAILED:
+                try:
+                    from layout_template_store import LayoutTemplateStore
+                    # Templates name the sellers of past invoices: a private file like the OCR cache
+                    path = _private_cache_path(os.environ.get('LAYOUT_TEMPLATES_PATH'), 'layout_templates.sqlite')
+                    _LAYOUT_TEMPLATES = LayoutTemplateStore(path, max_entries=int(os.environ.get('LAYOUT_TEMPLATES_MAX', '500') or 0))
+                except Exception:
+                    _LAYOUT_TEMPLATES_FAILED = True
+    return _LAYOUT_TEMPLATES
+
+
+def _pdf_page_boxes(page) -> Optional[_WordBoxes]:
+    """PyMuPDF words of a page with their (block, line) ids; None for a page without text."""
+    words = page.get_text('words')  # list of (x0, y0, x1, y1, word, block_no, line_no, word_no)
+    if not words:
+        return None
+    x0, y0, x1, y1, text, block_no, line_no, _word_no = zip(*words)
+    return _WordBoxes(list(text), x0, y0, x1, y1, line=np.column_stack((block_no, line_no)))
+
+
+def _page_layouts(file_path: str) -> List[Dict[str, Any]]:
+    """Per page of a PDF: its PyMuPDF word boxes, text lines [(x0, y0, text)] top to bottom, size and
+    layout fingerprint (None where the page has too little static text, e.g. a blank page).
+    Read once per file for the three table extractors; empty without a template store or on failure.
+    """
+    if _layout_templates() is None:
+        return []
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return []
+    from layout_template_store import page_fingerprint
+    key = (os.path.abspath(file_path), st.st_mtime, st.st_size)
+    with _FITZ_LOCK:
+        if key not in _PAGE_LAYOUTS:
+            layouts: List[Dict[str, Any]] = []
+            try:
+                with fitz.open(file_path) as doc:
+                    # Timed from here: opening the file and importing PyMuPDF and NumPy are paid without templates too
+                    np.asarray(())
+                    start = time.perf_counter()
+                    for page in doc:
+                        boxes = _pdf_page_boxes(page)
+                        lines: List[Tuple[float, float, str]] = []
+                        if boxes is not None:
+                            # Rows by word top, as pdfplumber reads them (PyMuPDF may split a row per cell)
+                            rows = _table_rows_by_proximity(boxes, boxes.text, 3.0)
+                            lines = sorted(zip(rows.x.tolist(), rows.y.tolist(), rows.texts), key=lambda line: line[1])
+                        width, height = float(page.rect.width), float(page.rect.height)
+                        layouts.append({
+                            'boxes': boxes,
+                            'lines': lines,
+                            'fingerprint': page_fingerprint(lines, width, height, _table_header_names) if lines else None,
                         })
+            except Exception:
+                return []
+            if len(_PAGE_LAYOUTS) >= 8:
+                _PAGE_LAYOUTS.clear()
+            _PAGE_LAYOUTS[key] = layouts
+            _LAYOUT_TEMPLATES.fingerprinted(len(layouts), (time.perf_counter() - start) * 1000)
+        return _PAGE_LAYOUTS[key]
+
+
+def _totals_line_y(lines: List[Tuple[float, float, str]], below: float) -> Optional[float]:
+    """Top of the first totals line below `below` among a page's lines (top to bottom)."""
+    for _x, y, text in lines:
+        if y > below and _ORDER_TOTALS_LINE.search(text):
+            return y
+    return None
+
+
+def _extract_items_from_pdf_layout(file_path: str, stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Extract item rows from a tabular 'Order Details' using PDF text positions (PyMuPDF words).
+    Works when the PDF has embedded text (not just images). Returns a list of items with
+    columns: no, product, variation, productPrice, qty, subtotal.
+    Lines are PyMuPDF's (block, line) groups; rows are rebuilt by _TableEngine. A page whose
+    layout has a template starts from the template's column header instead of searching for one.
+    """
+    layouts = _page_layouts(file_path)
+    templates = _layout_templates() if layouts else None
+    if layouts:
+        page_boxes = [(page_no, layout['boxes'], layout['fingerprint']) for page_no, layout in enumerate(layouts, start=1)]
+    else:
+        try:
+            doc = fitz.open(file_path)
         except Exception:
-            pass
-    return items
+            return []
+        page_boxes = [(page_no, _pdf_page_boxes(page), None) for page_no, page in enumerate(doc, start=1)]
+
+    engine = _TableEngine(col_offset=2, region_rows='cluster', region_tol=5.0, stats=stats)
+    pages: List[Tuple[int, _WordBoxes]] = []
+    for page_no, boxes, fingerprint in page_boxes:
+        _stage_checkpoint()
+        if boxes is None:
+            continue
+        pages.append((page_no, boxes))
+        found = templates.get('layout', fingerprint) if fingerprint is not None else None
+        used = engine.add_page(boxes, page_no, header_hint=found[0] if found else None)
+        entry = engine.pages[-1]
+        if found and entry.get('template') == 'used':
+            templates.saved('layout', found[1], entry['ms'])
+        elif fingerprint is not None and used is not None:
+            if found:
+                templates.stale('layout', fingerprint)
+            templates.put('layout', fingerprint, used, entry['ms'])
+    # If header-based parsing produced no items, try the region-based fallback on every page
+    if not engine.items:
+        for page_no, boxes in pages:
+            _stage_checkpoint()
+            engine.add_page(boxes, page_no, region_only=True)
+    return engine.finish()
 
 
 def _extract_items_from_pdfplumber(file_path: str) -> List[Dict[str, Any]]:
     """Use pdfplumber's table extraction to parse 'Order Details' when available.
     Prefer column headers mapping: No | Product | Variation | Product Price | Qty | Subtotal.
+    A page whose layout has a template runs only the table strategy that found its rows, and is
+    skipped when its layout gave none; with every page skipped pdfplumber is not opened.
     """
     items: List[Dict[str, Any]] = []
+    pdfplumber = _optional_module('pdfplumber')
     if not pdfplumber:
         return items
+    layouts = _page_layouts(file_path)
+    templates = _layout_templates() if layouts else None
+    # Per page: (template, learn_ms) when the layout is known, else None
+    known: List[Optional[Tuple[Dict[str, Any], float]]] = [
+        templates.get('pdfplumber', layout['fingerprint']) if layout['fingerprint'] is not None else None
+        for layout in layouts
+    ]
+    if layouts and all(found is not None and not found[0]['items'] for found in known):
+        for _template, learn_ms in known:
+            templates.saved('pdfplumber', learn_ms, 0.0)
+        return items
     try:
         with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
+            for pi, page in enumerate(pdf.pages):
+                _stage_checkpoint()
+                page_start = time.perf_counter()
+                found = known[pi] if pi < len(known) else None
+                if found is not None and not found[0]['items']:
+                    templates.saved('pdfplumber', found[1], 0.0)
+                    continue
+                items_before = len(items)
+                strategy_used = None
                 # Attempt to locate the 'Order Details' region to improve table detection
                 y_top = None
                 y_bottom = None
@@ -518,9 +876,14 @@ def _extract_items_from_pdfplumber(file_path: str) -> List[Dict[str, Any]]:
                         except Exception:
                             return []
 
-                tables = run_table_pass(page_to_parse, 'lines')
-                if not tables:
-                    tables = run_table_pass(page_to_parse, 'text')
+                # A known layout goes straight to the strategy that found its rows
+                strategies = [found[0]['strategy']] if found is not None and found[0].get('strategy') else ['lines', 'text']
+                tables = []
+                for strategy in strategies:
+                    tables = run_table_pass(page_to_parse, strategy)
+                    if tables:
+                        strategy_used = strategy
+                        break
 
                 for tbl in tables:
                     if not tbl or len(tbl) < 2:
@@ -604,6 +967,14 @@ def _extract_items_from_pdfplumber(file_path: str) -> List[Dict[str, Any]]:
                                 combined = (combined + ' ' + str(prod_s)).strip()
                                 last_item_ref['product'] = combined[:200]
                 # If items found on this page, proceed; else keep scanning next pages
+                page_ms = (time.perf_counter() - page_start) * 1000
+                fingerprint = layouts[pi]['fingerprint'] if pi < len(layouts) else None
+                if found is not None and len(items) > items_before:
+                    templates.saved('pdfplumber', found[1], page_ms)
+                elif found is not None:
+                    templates.stale('pdfplumber', fingerprint)
+                elif fingerprint is not None:
+                    templates.put('pdfplumber', fingerprint, {'strategy': strategy_used, 'items': len(items) - items_before}, page_ms)
     except Exception:
         return items
     return items
@@ -616,100 +987,173 @@ def _pdfplumber_find_order_details_regions(file_path: str) -> List[Tuple[int, Tu
     - Else, detect a header row by synonyms (Product/Item/Description + Qty + Price/Subtotal)
       and use it as the top boundary.
 
+    A page whose layout has a template takes its top and width from the template and its bottom
+    from the totals line in PyMuPDF's text (offset as when learned); pdfplumber only reads the
+    other pages, and is not opened when the templates cover every page.
+
     Returns list of (page_index, (x0, y0, x1, y1)) in PDF point coordinates.
     Non-throwing; empty list on failure or when pdfplumber is unavailable.
     """
     regions: List[Tuple[int, Tuple[float, float, float, float]]] = []
+    pdfplumber = _optional_module('pdfplumber')
     if not pdfplumber:
         return regions
+    layouts = _page_layouts(file_path)
+    templates = _layout_templates() if layouts else None
+    # Pages placed by a template: page index -> region (None for a layout without one)
+    placed: Dict[int, Optional[Tuple[float, float, float, float]]] = {}
+    for pi, layout in enumerate(layouts):
+        if layout['fingerprint'] is None:
+            continue
+        start = time.perf_counter()
+        found = templates.get('regions', layout['fingerprint'])
+        if found is None:
+            continue
+        template, learn_ms = found
+        if template['top'] is None:
+            placed[pi] = None
+        else:
+            stop_y = _totals_line_y(layout['lines'], template['top'])
+            if stop_y is not None and template['bottomOffset'] is None:
+                # Learned from a page of the layout whose table ran on; relearn with a totals line
+                templates.stale('regions', layout['fingerprint'])
+                continue
+            bottom = round(stop_y + template['bottomOffset'], 3) if stop_y is not None else template['height'] - 2
+            placed[pi] = (0.0, template['top'], template['width'], bottom)
+        templates.saved('regions', learn_ms, (time.perf_counter() - start) * 1000)
+
+    def learn(pi: int, page, y_top: Optional[float], y_bottom: Optional[float], stop_found: bool, ms: float) -> None:
+        fingerprint = layouts[pi]['fingerprint'] if pi < len(layouts) else None
+        if fingerprint is None:
+            return
+        template = {'top': y_top, 'bottomOffset': None, 'width': float(page.width), 'height': float(page.height)}
+        if y_top is not None:
+            stop_y = _totals_line_y(layouts[pi]['lines'], y_top)
+            if (stop_y is None) == stop_found:
+                return  # PyMuPDF's lines would not place the bottom where pdfplumber's did
+            if stop_y is not None:
+                template['bottomOffset'] = y_bottom - stop_y
+        templates.put('regions', fingerprint, template, ms)
+
     try:
-        with pdfplumber.open(file_path) as pdf:
-            for pi, page in enumerate(pdf.pages):
-                try:
-                    words = page.extract_words() or []
-                except Exception:
-                    words = []
-                if not words:
-                    continue
-                # Build line-ish structures by y to help detect headers
-                lines_rb = []
-                # group by integer top
-                lines_map: Dict[int, List[dict]] = {}
-                for w in words:
-                    top_i = int(float(w.get('top', 0)))
-                    lines_map.setdefault(top_i, []).append(w)
-                for top_i, lst in lines_map.items():
-                    lst_sorted = sorted(lst, key=lambda ww: float(ww.get('x0', ww.get('left', 0)) or 0))
-                    text = ' '.join([(ww.get('text') or '').strip() for ww in lst_sorted if (ww.get('text') or '').strip()])
-                    if text:
-                        y = float(lst_sorted[0].get('top', top_i) or top_i)
-                        lines_rb.append((y, text))
-                lines_rb.sort(key=lambda t: t[0])
-
-                y_top: Optional[float] = None
-                y_bottom: Optional[float] = None
-
-                # 1) Explicit section headers
-                header_sec_pat = re.compile(r"^\s*(Order\s+Details|Order\s+Items|Items\s+List)\b", re.I)
-                for y, text in lines_rb:
-                    if header_sec_pat.search(text):
-                        y_top = y + 2
-                        break
+        if not layouts or len(placed) < len(layouts):
+            with pdfplumber.open(file_path) as pdf:
+                for pi, page in enumerate(pdf.pages):
+                    if pi in placed:
+                        continue
+                    page_start = time.perf_counter()
+                    region = _pdfplumber_page_region(page)
+                    if region is not None:
+                        y_top, y_bottom, stop_found = region
+                        if y_top is not None:
+                            regions.append((pi, (0.0, float(y_top), float(page.width), float(y_bottom))))
+                        if templates is not None:
+                            learn(pi, page, y_top, y_bottom, stop_found, (time.perf_counter() - page_start) * 1000)
+    except Exception:
+        return []
+    regions.extend((pi, region) for pi, region in placed.items() if region is not None)
+    regions.sort(key=lambda r: r[0])
+    return regions
 
-                # 2) If not found, header row by synonyms (Product+Qty+Price/Subtotal)
-                if y_top is None:
-                    for y, text in lines_rb[:20]:
-                        tnorm = text.lower()
-                        if (re.search(r"product|item|description", tnorm)
-                            and re.search(r"qty|quantity", tnorm)
-                            and (re.search(r"price|unit\s*price|unitprice", tnorm) or re.search(r"subtotal|amount|total", tnorm))):
-                            y_top = y + 2
-                            break
 
-                if y_top is None:
-                    # No region candidate on this page
-                    continue
+def _pdfplumber_page_region(page) -> Optional[Tuple[Optional[float], Optional[float], bool]]:
+    """(y_top, y_bottom, whether the bottom is a totals line) of the items table on a pdfplumber
+    page; y_top None when the page has no region candidate, None for a page without words."""
+    try:
+        words = page.extract_words() or []
+    except Exception:
+        words = []
+    if not words:
+        return None
+    # Build line-ish structures by y to help detect headers
+    lines_rb = []
+    # group by integer top
+    lines_map: Dict[int, List[dict]] = {}
+    for w in words:
+        top_i = int(float(w.get('top', 0)))
+        lines_map.setdefault(top_i, []).append(w)
+    for top_i, lst in lines_map.items():
+        lst_sorted = sorted(lst, key=lambda ww: float(ww.get('x0', ww.get('left', 0)) or 0))
+        text = ' '.join([(ww.get('text') or '').strip() for ww in lst_sorted if (ww.get('text') or '').strip()])
+        if text:
+            y = float(lst_sorted[0].get('top', top_i) or top_i)
+            lines_rb.append((y, text))
+    lines_rb.sort(key=lambda t: t[0])
+
+    y_top: Optional[float] = None
+    y_bottom: Optional[float] = None
+
+    # 1) Explicit section headers
+    header_sec_pat = re.compile(r"^\s*(Order\s+Details|Order\s+Items|Items\s+List)\b", re.I)
+    for y, text in lines_rb:
+        if header_sec_pat.search(text):
+            y_top = y + 2
+            break
+
+    # 2) If not found, header row by synonyms (Product+Qty+Price/Subtotal)
+    if y_top is None:
+        for y, text in lines_rb[:20]:
+            tnorm = text.lower()
+            if (re.search(r"product|item|description", tnorm)
+                and re.search(r"qty|quantity", tnorm)
+                and (re.search(r"price|unit\s*price|unitprice", tnorm) or re.search(r"subtotal|amount|total", tnorm))):
+                y_top = y + 2
+                break
+
+    if y_top is None:
+        # No region candidate on this page
+        return None, None, False
+
+    # 3) Find bottom near totals/summary lines
+    for y, text in lines_rb:
+        if y <= y_top:
+            continue
+        if _ORDER_TOTALS_LINE.search(text):
+            y_bottom = y - 2
+            return y_top, y_bottom, True
+    return y_top, float(page.height) - 2, False
 
-                # 3) Find bottom near totals/summary lines
-                for y, text in lines_rb:
-                    if y <= y_top:
-                        continue
-                    if re.search(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due|Total\s+Quantity", text, re.I):
-                        y_bottom = y - 2
-                        break
-                if y_bottom is None:
-                    y_bottom = float(page.height) - 2
 
-                x0, x1 = 0.0, float(page.width)
-                regions.append((pi, (x0, float(y_top), x1, float(y_bottom))))
+def _roi_scale() -> float:
+    """Fixed render scale for OCR regions: ROI_SCALE, default 3.0 (216 dpi)."""
+    try:
+        return float(os.environ.get('ROI_SCALE', '3.0'))
     except Exception:
-        return []
-    return regions
+        return 3.0
+
 
+def _roi_scale_pinned() -> bool:
+    """ROI_SCALE set in the environment pins the region scale (no adaptive scaling)."""
+    return bool(os.environ.get('ROI_SCALE'))
 
-def _render_pdf_regions_to_images(file_path: str, regions: List[Tuple[int, Tuple[float, float, float, float]]], scale: float = None) -> List["Image.Image"]:
+
+def _render_pdf_regions_to_images(file_path: str, regions: List[Tuple[int, Tuple[float, float, float, float]]], scale: float = None,
+                                  stats: Optional[List[Dict[str, Any]]] = None) -> List["Image.Image"]:
     """Render given page regions (x0,y0,x1,y1) to PIL Images using PyMuPDF.
     Coordinates are expected in PDF points with origin at top-left.
+    Without a scale each region gets _choose_render_scale's (adaptive unless ROI_SCALE pins it);
+    stats receives one diagnostics['renderScale'] entry per region.
     """
     images: List["Image.Image"] = []
     if not regions:
         return images
     try:
-        # ROI scale configurable via env; defaults to 3.0 for higher OCR fidelity
-        if scale is None:
-            try:
-                scale = float(os.environ.get('ROI_SCALE', '3.0'))
-            except Exception:
-                scale = 3.0
         doc = fitz.open(file_path)
         for pi, (x0, y0, x1, y1) in regions:
+            _stage_checkpoint()
             if pi < 0 or pi >= len(doc):
                 continue
             try:
                 page = doc[pi]
-                rect = fitz.Rect(float(x0), float(y0), float(x1), float(y1))
-                mat = fitz.Matrix(scale, scale)
-                pix = page.get_pixmap(matrix=mat, clip=rect)
+                clip = (float(x0), float(y0), float(x1), float(y1))
+                region_scale = scale
+                if region_scale is None:
+                    region_scale, entry = _choose_render_scale(_PageRaster(page=page), 'tesseract', _roi_scale(), 'roi', pi + 1,
+                                                               clip=clip, pinned=_roi_scale_pinned())
+                    if stats is not None:
+                        stats.append(entry)
+                mat = fitz.Matrix(region_scale, region_scale)
+                pix = page.get_pixmap(matrix=mat, clip=fitz.Rect(*clip))
                 img = Image.open(io.BytesIO(pix.tobytes("png")))
                 images.append(img)
             except Exception:
@@ -719,307 +1163,913 @@ def _render_pdf_regions_to_images(file_path: str, regions: List[Tuple[int, Tuple
     return images
 
 
-def _extract_items_from_tesseract_images(images: List[Image.Image]) -> List[Dict[str, Any]]:
-    """Use Tesseract TSV output to detect a tabular items section on page images.
-    Works for scanned PDFs or images by reconstructing lines and mapping to columns using header positions.
-    """
-    items: List[Dict[str, Any]] = []
-    if not images:
-        return items
-    # Header synonym patterns
-    prod_syn = re.compile(r"product|item|description|details?", re.I)
-    qty_syn = re.compile(r"qty|quantity", re.I)
-    price_syn = re.compile(r"price|unit\s*price|unitprice", re.I)
-    subtotal_syn = re.compile(r"subtotal|amount|total", re.I)
-    no_syn = re.compile(r"^(no\.|no|#)$", re.I)
-
-    def _to_float(s: str) -> Optional[float]:
+def _tesseract_data_frame(img: "Image.Image", parent=None):
+    """Tesseract word boxes for one image as a DataFrame (None when OCR fails)."""
+    with _adopt_span(parent), _span('tesseract_image', pixels=img.width * img.height):
+        return _tesseract_data_frame_untraced(img)
+
+
+def _tesseract_data_frame_untraced(img: "Image.Image"):
+    try:
+        # Prefer DataFrame for easier grouping if pandas is available
+        return pytesseract.image_to_data(img, output_type=pytesseract.Output.DATAFRAME, config='--psm 6',
+                                         timeout=_ocr_timeout())
+    except Exception:
         try:
-            return float(s.replace(',', '').lstrip('₱$P'))
+            tsv = pytesseract.image_to_data(img, config='--psm 6', timeout=_ocr_timeout())
+            # Fallback: rough parse of TSV
+            lines = [l for l in tsv.splitlines()[1:] if l.strip()]
+            parts = [ln.split('\t') for ln in lines if '\t' in ln]
+            cols = ['level','page_num','block_num','par_num','line_num','word_num','left','top','width','height','conf','text']
+            # crude DataFrame substitute
+            return pd.DataFrame(parts, columns=cols)
         except Exception:
-            m = re.search(r"([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})|[0-9]+(?:\.[0-9]{2})?)", s)
-            if m:
-                try:
-                    return float(m.group(1).replace(',', ''))
-                except Exception:
-                    return None
             return None
 
-    for img in images:
-        try:
-            # Prefer DataFrame for easier grouping if pandas is available
-            df = pytesseract.image_to_data(img, output_type=pytesseract.Output.DATAFRAME, config='--psm 6')
-        except Exception:
-            try:
-                tsv = pytesseract.image_to_data(img, config='--psm 6')
-                # Fallback: rough parse of TSV
-                lines = [l for l in tsv.splitlines()[1:] if l.strip()]
-                parts = [ln.split('\t') for ln in lines if '\t' in ln]
-                cols = ['level','page_num','block_num','par_num','line_num','word_num','left','top','width','height','conf','text']
-                # crude DataFrame substitute
-                df = pd.DataFrame(parts, columns=cols)
-            except Exception:
-                continue
-        # Clean and types
-        df = df[df['conf'].astype(str) != '-1']
-        if 'text' not in df.columns or df.empty:
-            continue
-        # Build line-level aggregation
-        df['text'] = df['text'].fillna('')
-        df['left'] = pd.to_numeric(df['left'], errors='coerce')
-        df['top'] = pd.to_numeric(df['top'], errors='coerce')
-        df['width'] = pd.to_numeric(df['width'], errors='coerce')
-        df = df.dropna(subset=['left','top','width'])
-        if df.empty:
-            continue
-        grouped = df.groupby(['block_num','par_num','line_num'])
-        lines_list = []
-        for (b,p,l), g in grouped:
-            g = g.sort_values('left')
-            x0 = float(g['left'].min())
-            y0 = float(g['top'].min())
-            words = [(float(r['left']), float(r['top']), float(r['left'])+float(r['width']), float(r['top'])+float(r['height']) if 'height' in r else float(r['top'])+10.0, str(r['text'])) for _, r in g.iterrows()]
-            text = ' '.join([w[-1] for w in words]).strip()
-            lines_list.append((x0, y0, text, words))
-        lines_list.sort(key=lambda t: (t[1], t[0]))
-
-    # Find header
-        header_idx = None
-        header_cols = None
-        for idx, (_x, _y, text, lst) in enumerate(lines_list):
-            tnorm = text.lower()
-            if prod_syn.search(tnorm) and qty_syn.search(tnorm) and price_syn.search(tnorm) and subtotal_syn.search(tnorm):
-                # Collect column markers
-                col_markers: List[Tuple[float,str]] = []
-                for x0,y0,x1,y1,w in lst:
-                    wl = w.lower()
-                    if no_syn.match(wl):
-                        col_markers.append((x0, 'no'))
-                    elif prod_syn.search(wl):
-                        col_markers.append((x0, 'product'))
-                    elif re.search(r"variation|variant|var", wl):
-                        col_markers.append((x0, 'variation'))
-                    elif price_syn.search(wl):
-                        col_markers.append((x0, 'price'))
-                    elif qty_syn.search(wl):
-                        col_markers.append((x0, 'qty'))
-                    elif subtotal_syn.search(wl):
-                        col_markers.append((x0, 'subtotal'))
-                col_markers.sort(key=lambda z: z[0])
-                dedup = []
-                for x, name in col_markers:
-                    if not dedup or abs(x - dedup[-1][0]) > 5:
-                        dedup.append((x, name))
-                if len(dedup) >= 3:
-                    header_idx = idx
-                    header_cols = dedup
-                    break
-        if header_idx is None or not header_cols:
-            # Region-based fallback: between an items header (synonyms) or 'Order Details' and the totals
-            stop_pattern = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due|Total\s+Quantity", re.I)
-            y_start = None
-            y_end = None
-            # Prefer explicit section headers
-            for (_x, _y, text, _lst) in lines_list:
-                if re.search(r"^\s*Order\s+Details\b", text, re.I):
-                    y_start = _y + 3
-                    break
-            # Else, anchor to a header-like line with column synonyms
-            if y_start is None:
-                for (_x, _y, text, _lst) in lines_list[:20]:
-                    tnorm = text.lower()
-                    if (re.search(r"product|item|description", tnorm)
-                        and re.search(r"qty|quantity", tnorm)
-                        and (re.search(r"price|unit\s*price|unitprice", tnorm) or re.search(r"subtotal|amount|total", tnorm))):
-                        y_start = _y + 3
-                        break
-            if y_start is None:
-                continue
-            for (_x, _y, text, _lst) in lines_list:
-                if _y <= y_start:
-                    continue
-                if stop_pattern.search(text):
-                    y_end = _y - 2
-                    break
-            if y_end is None:
-                # fallback to lowest y
-                ys = [y for (_, y, _t, _l) in lines_list]
-                y_end = (max(ys) + 5) if ys else (y_start + 300)
 
-            def _to_f(s: str) -> Optional[float]:
-                try:
-                    return float(s.replace(',', '').lstrip('₱$P'))
-                except Exception:
-                    m = re.search(r"\d[\d,]*(?:\.\d{2})?", s)
-                    return float(m.group(0).replace(',', '')) if m else None
+def _tesseract_data_frames(images: List["Image.Image"], indices: Optional[List[int]] = None) -> List[Any]:
+    """_tesseract_data_frame for every image (or images[i] for i in indices), in order. Tesseract
+    runs as a subprocess, so up to TESSERACT_CONCURRENCY (default: CPU count, max 4) images are
+    OCR'd at once. Images are fetched by the worker that reads them, so a _PageImageStore never
+    has more than that many pages decoded for OCR.
+    """
+    if indices is None:
+        indices = list(range(len(images)))
+    workers = int(os.environ.get('TESSERACT_CONCURRENCY', '0') or 0) or min(4, os.cpu_count() or 1)
+    if workers <= 1 or len(indices) <= 1:
+        return [_tesseract_data_frame(images[i]) for i in indices]
+    parent = _current_span()
+    with ThreadPoolExecutor(max_workers=min(workers, len(indices)), thread_name_prefix='tesseract') as pool:
+        return list(pool.map(lambda i: _tesseract_data_frame(images[i], parent), indices))
 
-            for (_x, _y, text, lst) in lines_list:
-                if _y < y_start or _y > y_end:
-                    continue
-                if stop_pattern.search(text) or re.search(r"No\b\s*\|\s*Product", text, re.I):
-                    continue
-                monies = [(((x0+x1)/2.0), w) for x0,y0,x1,y1,w in lst if re.match(r"^[₱$P]?\d[\d,]*(?:\.\d{2})?$", w)]
-                monies.sort(key=lambda z: z[0])
-                price_val = _to_f(monies[-2][1]) if len(monies) >= 2 else None
-                subtotal_val = _to_f(monies[-1][1]) if len(monies) >= 1 else None
-                qty_tokens = [w for x0,y0,x1,y1,w in lst if re.match(r"^\d{1,3}$", w)]
-                qty_val = None
-                if qty_tokens:
-                    try:
-                        qty_val = int(qty_tokens[0])
-                    except Exception:
-                        pass
-                used = set([m for _, m in monies]) | set(qty_tokens)
-                prod_parts = [w for x0,y0,x1,y1,w in lst if w not in used and not re.match(r"^(qty|quantity|subtotal|amount|price)$", w, re.I)]
-                product = ' '.join(prod_parts).strip()
-                if product and (qty_val is not None or price_val is not None or subtotal_val is not None):
-                    items.append({
-                        'no': (len(items) + 1),
-                        'product': product[:200],
-                        'variation': None,
-                        'productPrice': price_val,
-                        'qty': qty_val,
-                        'subtotal': subtotal_val,
-                    })
-            # proceed to next image
+
+_TESSERACT_LINE_KEYS = ('block_num', 'par_num', 'line_num')
+
+
+def _tesseract_word_boxes(df) -> Optional[_WordBoxes]:
+    """Words of one image_to_data frame as _WordBoxes keyed by (block, par, line), or None when
+    nothing is left. Rows with conf '-1' or without a box or line id are dropped; a missing
+    height counts as 10 px. The frame is filtered and converted column by column once; the
+    line grouping itself is the lexsort/split in _table_lines_by_key.
+    """
+    if df is None or 'text' not in df.columns or 'conf' not in df.columns:
+        return None
+    keep = (df['conf'].astype(str) != '-1').to_numpy()
+    left = pd.to_numeric(df['left'], errors='coerce').to_numpy(dtype=np.float64)
+    top = pd.to_numeric(df['top'], errors='coerce').to_numpy(dtype=np.float64)
+    width = pd.to_numeric(df['width'], errors='coerce').to_numpy(dtype=np.float64)
+    keys = np.column_stack([pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float64) for c in _TESSERACT_LINE_KEYS])
+    keep = keep & np.isfinite(left) & np.isfinite(top) & np.isfinite(width) & np.isfinite(keys).all(axis=1)
+    if not keep.any():
+        return None
+    if 'height' in df.columns:
+        height = pd.to_numeric(df['height'], errors='coerce').to_numpy(dtype=np.float64)[keep]
+        height[~np.isfinite(height)] = 10.0
+    else:
+        height = 10.0
+    text = df['text'].fillna('').to_numpy(dtype=object)[keep]
+    left, top = left[keep], top[keep]
+    return _WordBoxes([str(t) for t in text], left, top,
+                      left + width[keep], top + height, line=keys[keep])
+
+
+def _extract_items_from_tesseract_images(images: List["Image.Image"], stats: Optional[Dict[str, Any]] = None,
+                                         frames: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+    """Use Tesseract TSV output to detect a tabular items section on page images.
+    Works for scanned PDFs or images by reconstructing lines and mapping to columns using header positions
+    (lines are Tesseract's (block, par, line) groups; rows are rebuilt by _TableEngine).
+    frames optionally holds image_to_data frames already read for the images (None entries are OCR'd).
+    """
+    if not images:
+        return []
+    if frames is None:
+        frames = _tesseract_data_frames(images)
+    else:
+        missing = [i for i, df in enumerate(frames) if df is None]
+        frames = list(frames)
+        for i, df in zip(missing, _tesseract_data_frames(images, missing) if missing else []):
+            frames[i] = df
+    engine = _TableEngine(anchor='order_details_or_header', stats=stats)
+    for page_no, df in enumerate(frames, start=1):
+        _stage_checkpoint()
+        boxes = _tesseract_word_boxes(df)
+        if boxes is None:
             continue
-        # Build column ranges
-        xs = [x for x,_ in header_cols]
-        names = [n for _,n in header_cols]
-        ranges = []
-        for i, x in enumerate(xs):
-            start = x - 3
-            end = xs[i+1] - 3 if i+1 < len(xs) else float('inf')
-            ranges.append((start, end, names[i]))
+        engine.add_page(boxes, page_no)
+    return engine.finish()
 
-        current_row: Dict[str, Any] = {}
-        def flush_row():
-            nonlocal current_row
-            if not current_row:
-                return
-            prod = (current_row.get('product') or '').strip()
-            if not prod:
-                current_row = {}
-                return
-            items.append({
-                'no': current_row.get('no'),
-                'product': prod[:200],
-                'variation': (current_row.get('variation') or None),
-                'productPrice': current_row.get('price'),
-                'qty': current_row.get('qty'),
-                'subtotal': current_row.get('subtotal'),
-            })
-            current_row = {}
 
-        stop_pattern = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due", re.I)
-        for _x, _y, text, lst in lines_list[header_idx+1:]:
-            if stop_pattern.search(text):
-                flush_row()
-                break
-            col_text: Dict[str, List[str]] = {n: [] for n in ['no','product','variation','price','qty','subtotal']}
-            for x0,y0,x1,y1,w in lst:
-                xmid = (x0 + x1) / 2.0
-                name = None
-                for start,end,col in ranges:
-                    if start <= xmid < end:
-                        name = col
-                        break
-                if name:
-                    col_text.setdefault(name, []).append(w)
-            def join(n):
-                return ' '.join(col_text.get(n, [])).strip()
-            no_s = join('no'); product_s = join('product'); variation_s = join('variation')
-            price_s = join('price'); qty_s = join('qty'); subtotal_s = join('subtotal')
-            new_row = False
-            no_val = None
-            try:
-                if no_s:
-                    no_val = int(re.sub(r"[^0-9]", "", no_s))
-                    new_row = True
-            except Exception:
-                no_val = None
-            price_val = _to_float(price_s) if price_s else None
-            qty_val = None
-            try:
-                if qty_s:
-                    qty_val = int(re.sub(r"[^0-9]", "", qty_s))
-            except Exception:
-                qty_val = None
-            subtotal_val = _to_float(subtotal_s) if subtotal_s else None
-            if not new_row and product_s and (qty_val is not None or price_val is not None or subtotal_val is not None):
-                new_row = True
-            if new_row:
-                if current_row:
-                    flush_row()
-                current_row = {'no': no_val}
-            if product_s:
-                if current_row.get('product'):
-                    current_row['product'] += ' ' + product_s
-                else:
-                    current_row['product'] = product_s
-            if variation_s:
-                current_row['variation'] = (current_row.get('variation') + ' ' + variation_s) if current_row.get('variation') else variation_s
-            if price_val is not None:
-                current_row['price'] = price_val
-            if qty_val is not None:
-                current_row['qty'] = qty_val
-            if subtotal_val is not None:
-                current_row['subtotal'] = subtotal_val
-        flush_row()
-    return items
+# PyMuPDF is not thread-safe; stages that run concurrently serialise their fitz work on this lock
+# Coarse-to-fine OCR of image-only pages (OCR_COARSE_TO_FINE=1). Lines of the totals block that
+# may follow the first totals line below the items table
+_COARSE_TOTALS = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+(?:Fee|Subtotal|Discount)|Amount\s+Due|"
+                            r"Total\s+(?:Payment|Quantity|Amount)|Voucher|Discount|Payment\s+Method", re.I)
+_A4_LONG_SIDE_IN = 11.69
 
 
-def _extract_items_from_google_vision_images(images: List[Image.Image], api_key: str) -> List[Dict[str, Any]]:
-    """Use Google Vision API (DOCUMENT_TEXT_DETECTION) to get word boxes and parse table rows.
-    Requires GOOGLE_CLOUD_API_KEY; uses REST endpoint to avoid extra libs.
+class _PageRaster:
     """
-    if not api_key or not images or requests is None:
+    A page that can be rendered whole or clipped at any scale: a PDF page (units are points,
+    scale 1 is 72 dpi) or an image (units are its pixels, scale 1 is the image as is)
+    """
+
+    def __init__(self, page=None, image=None):
+        self.page = page
+        self.image = image
+        if page is not None:
+            self.width, self.height = float(page.rect.width), float(page.rect.height)
+            self.dpi = 72.0
+        else:
+            self.width, self.height = float(image.width), float(image.height)
+            # Photos rarely carry a meaningful dpi tag; read the image as an A4 page
+            self.dpi = max(image.width, image.height) / _A4_LONG_SIDE_IN
+
+    def render(self, scale: float, clip: Optional[Tuple[float, float, float, float]] = None) -> "Image.Image":
+        if self.page is not None:
+            kwargs = {'clip': fitz.Rect(*clip)} if clip else {}
+            pix = self.page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False, **kwargs)
+            return Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+        img = self.image.crop(tuple(int(round(v)) for v in clip)) if clip else self.image
+        if scale != 1.0:
+            img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.BILINEAR)
+        return img
+
+
+def _pages_in_memory_cap() -> int:
+    """OCR_MAX_PAGES_IN_MEMORY: page images a document may hold decoded at once (0: no cap)"""
+    try:
+        return max(0, int(os.environ.get('OCR_MAX_PAGES_IN_MEMORY', '4') or 0))
+    except ValueError:
+        return 4
+
+
+def _page_spill_max_bytes() -> int:
+    """OCR_SPILL_MAX_MB: disk the spilled pages of one document may take (0: no limit)"""
+    try:
+        return int(float(os.environ.get('OCR_SPILL_MAX_MB', '512') or 0) * 1024 * 1024)
+    except ValueError:
+        return 512 * 1024 * 1024
+
+
+class _PageImageStore:
+    """
+    The page images of one document as a list the extractors index and iterate, holding at
+    most `cap` decoded images (OCR_MAX_PAGES_IN_MEMORY, default 4; 0 keeps every page). Older
+    pages are written once to a temporary PNG (lossless, fast compression) and decoded again
+    when an extractor reaches them, so a long scan costs a few pages of RAM instead of all of
+    them. Once the spilled files reach `max_bytes` (OCR_SPILL_MAX_MB, default 512) new pages
+    are no longer kept: append returns False and summary()['dropped'] counts them. Thread-safe
+    """
+
+    def __init__(self, cap: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.cap = _pages_in_memory_cap() if cap is None else max(0, cap)
+        self.max_bytes = _page_spill_max_bytes() if max_bytes is None else max(0, max_bytes)
+        self._live: Dict[int, "Image.Image"] = {}  # insertion order is least recently used first
+        self._paths: Dict[int, str] = {}
+        self._count = 0
+        self._tmp = None
+        self._lock = threading.Lock()
+        self.spilled = 0
+        self.spilled_bytes = 0
+        self.dropped = 0
+        self.loads = 0
+        self.peak = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def append(self, img: "Image.Image") -> bool:
+        with self._lock:
+            if self.cap and self.max_bytes and len(self._live) >= self.cap and self.spilled_bytes >= self.max_bytes:
+                # Keeping the page would mean spilling another one past the limit
+                self.dropped += 1
+                return False
+            self._live[self._count] = img
+            self._count += 1
+            self._evict()
+            return True
+
+    def __getitem__(self, i: int) -> "Image.Image":
+        if i < 0:
+            i += self._count
+        with self._lock:
+            img = self._live.pop(i, None)
+            if img is None:
+                if i not in self._paths:
+                    raise IndexError(i)
+                img = Image.open(self._paths[i])
+                img.load()
+                self.loads += 1
+            self._live[i] = img
+            self._evict()
+            return img
+
+    def _evict(self) -> None:
+        while self.cap and len(self._live) > self.cap:
+            i = next(iter(self._live))
+            img = self._live.pop(i)
+            if i not in self._paths:
+                if self._tmp is None:
+                    self._tmp = tempfile.TemporaryDirectory(prefix='process_file_pages_')
+                path = os.path.join(self._tmp.name, f"{i}.png")
+                img.save(path, format='PNG', compress_level=1)
+                self._paths[i] = path
+                self.spilled += 1
+                self.spilled_bytes += os.path.getsize(path)
+        self.peak = max(self.peak, len(self._live))
+
+    def close(self) -> None:
+        with self._lock:
+            self._live.clear()
+            if self._tmp is not None:
+                self._tmp.cleanup()
+                self._tmp = None
+            self._paths.clear()
+
+    def summary(self) -> Dict[str, Any]:
+        return {'cap': self.cap, 'pages': self._count, 'spilled': self.spilled, 'spilledBytes': self.spilled_bytes,
+                'maxSpillBytes': self.max_bytes, 'dropped': self.dropped, 'loads': self.loads, 'peakInMemory': self.peak}
+
+
+def _release_page_cache() -> None:
+    """Empty MuPDF's store of decoded images (up to 256 MB by default) after an image-only page,
+    unless OCR_MAX_PAGES_IN_MEMORY=0: the next page never reuses a scan's decoded image"""
+    if not _pages_in_memory_cap():
+        return
+    try:
+        with _FITZ_LOCK:
+            fitz.TOOLS.store_shrink(100)
+    except Exception:
+        pass
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where the platform does not report it)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+# Adaptive render scale (OCR_ADAPTIVE_SCALE, on by default): render at the smallest scale that
+# brings the page's small print to the OCR engine's preferred x-height. Large print is read below
+# the fixed scale the render used before and small print above it, up to _OCR_SCALE_LIMITS, a
+# scan's native resolution and OCR_MAX_RENDER_PX pixels per render. Tesseract reads best
+# from about 20 px (10 pt at 300 dpi); PaddleOCR's recogniser resizes text lines to 48 px.
+_OCR_TARGET_XHEIGHT_PX = {'tesseract': 20.0, 'paddle': 12.0}
+_OCR_TARGET_XHEIGHT_ENV = {'tesseract': 'OCR_TARGET_XHEIGHT_PX', 'paddle': 'PADDLE_TARGET_XHEIGHT_PX'}
+_XHEIGHT_PER_EM = 0.5  # x-height per font size
+_GLYPH_HEIGHT_PER_EM = 0.72  # small-print ink height of a text line (mostly caps and digits) per font size
+_TEXT_SIZE_PERCENTILE = 25  # 'small print': this percentile of the measured text sizes
+_OCR_SCALE_LIMITS = (0.25, 5.0)
+_OCR_MAX_RENDER_PX = 12_000_000  # about an A4 page at 400 dpi
+_INK_ANALYSIS_DPI = 100.0
+
+
+def _adaptive_scale_enabled() -> bool:
+    return os.environ.get('OCR_ADAPTIVE_SCALE', '1') in ('1', 'true', 'True')
+
+
+def _ocr_max_render_px() -> float:
+    try:
+        return float(os.environ.get('OCR_MAX_RENDER_PX') or _OCR_MAX_RENDER_PX)
+    except ValueError:
+        return float(_OCR_MAX_RENDER_PX)
+
+
+def _ocr_target_xheight(engine: str) -> float:
+    try:
+        return float(os.environ.get(_OCR_TARGET_XHEIGHT_ENV[engine]) or _OCR_TARGET_XHEIGHT_PX[engine])
+    except ValueError:
+        return _OCR_TARGET_XHEIGHT_PX[engine]
+
+
+def _weighted_percentile(values, weights, pct: float) -> float:
+    order = np.argsort(values)
+    values = np.asarray(values, dtype=np.float64)[order]
+    cum = np.cumsum(np.asarray(weights, dtype=np.float64)[order])
+    return float(values[min(len(values) - 1, int(np.searchsorted(cum, pct / 100.0 * cum[-1])))])
+
+
+def _pdf_text_em(page, clip=None) -> Optional[float]:
+    """Small-print font size (pt) of a PDF page's text layer, inside clip: the percentile by characters"""
+    sizes: List[float] = []
+    chars: List[int] = []
+    try:
+        blocks = page.get_text('dict', clip=clip).get('blocks', [])
+    except Exception:
+        return None
+    for block in blocks:
+        for line in block.get('lines', []) or []:
+            for span in line.get('spans', []) or []:
+                n = len((span.get('text') or '').strip())
+                if n and span.get('size'):
+                    sizes.append(float(span['size']))
+                    chars.append(n)
+    return _weighted_percentile(sizes, chars, _TEXT_SIZE_PERCENTILE) if sizes else None
+
+
+def _ink_text_em(raster: "_PageRaster", clip=None) -> Optional[float]:
+    """
+    Small-print font size (raster units) from a quick grayscale render at about 100 dpi: inked
+    rows of 48 px wide strips form one run per text line (narrow strips keep the lines of a
+    slightly rotated scan apart); runs under 3 px (rules, specks) or over an eighth of the height
+    (pictures) are dropped and the percentile run is read as _GLYPH_HEIGHT_PER_EM of the font
+    size. None when too few lines are found
+    """
+    scale = _INK_ANALYSIS_DPI / raster.dpi
+    if raster.image is not None:
+        scale = min(scale, 1.0)
+    gray = np.asarray(raster.render(scale, clip).convert('L'))
+    h, w = gray.shape
+    strips = w // 48
+    if not strips or h < 16:
+        return None
+    rows = (gray[:, :strips * 48] < 128).reshape(h, strips, 48).sum(axis=2) >= 2
+    edges = np.zeros((1, strips), dtype=bool)
+    runs_of = np.diff(np.concatenate((edges, rows, edges)).T.ravel().astype(np.int8))
+    runs = np.flatnonzero(runs_of == -1) - np.flatnonzero(runs_of == 1)
+    runs = runs[(runs >= 3) & (runs <= h // 8)]
+    if runs.size < 3:
+        return None
+    return float(np.percentile(runs, _TEXT_SIZE_PERCENTILE)) / scale / _GLYPH_HEIGHT_PER_EM
+
+
+def _page_native_scale(page) -> Optional[float]:
+    """Pixels per point of the largest image drawn over at least half the page width (a scan)"""
+    best = None
+    try:
+        for info in page.get_images(full=True):
+            for rect in page.get_image_rects(info[0]):
+                if rect.width >= 0.5 * page.rect.width:
+                    best = max(best or 0.0, info[2] / rect.width)
+    except Exception:
+        return None
+    return best
+
+
+def _ocr_render_scale(em: float, engine: str, native: Optional[float] = None, area: Optional[float] = None) -> float:
+    """Smallest scale (in 0.25 steps) giving em-sized text the engine's x-height, within the limits,
+    the native resolution and the pixel budget for a render of area square raster units"""
+    scale = math.ceil(_ocr_target_xheight(engine) / (_XHEIGHT_PER_EM * em) * 4) / 4
+    low, high = _OCR_SCALE_LIMITS
+    if native:
+        high = min(high, native)
+    budget = _ocr_max_render_px()
+    if area and budget > 0:
+        high = min(high, math.floor(math.sqrt(budget / area) * 4) / 4)
+    return max(min(low, high), min(scale, high))
+
+
+def _choose_render_scale(raster: "_PageRaster", engine: str, fixed: float, purpose: str, page_no: int,
+                         clip=None, em: Optional[float] = None, pinned: bool = False) -> Tuple[float, Dict[str, Any]]:
+    """
+    Render scale for OCR'ing raster (or its clip) with engine, and its diagnostics['renderScale']
+    entry. The text size is em when given (measured by a coarse OCR pass), else the PDF font
+    sizes, else the ink profile. The scale may fall below or rise above fixed (the scale used
+    before) within _ocr_render_scale's bounds; image-based sizes are also capped at the scan's
+    native resolution. fixed is kept when adaptive scaling is off, the scale is pinned by the
+    environment or no text size can be measured.
+    """
+    source = 'coarse_ocr' if em is not None else None
+    if pinned:
+        source = 'pinned'
+    elif not _adaptive_scale_enabled():
+        source = 'fixed'
+    elif em is None and raster.page is not None:
+        em = _pdf_text_em(raster.page, fitz.Rect(*clip) if clip else None)
+        source = 'pdf_fonts' if em is not None else None
+    if source is None:
+        em = _ink_text_em(raster, clip)
+        source = 'ink_profile' if em is not None else 'fixed'
+    x0, y0, x1, y1 = clip or (0.0, 0.0, raster.width, raster.height)
+    if source in ('pinned', 'fixed'):
+        scale = fixed
+    else:
+        native = None
+        if source != 'pdf_fonts':
+            native = _page_native_scale(raster.page) if raster.page is not None else 1.0
+        scale = _ocr_render_scale(em, engine, native, (x1 - x0) * (y1 - y0))
+    return scale, {
+        'purpose': purpose,
+        'page': page_no,
+        'engine': engine,
+        'source': source,
+        'textEm': round(em, 2) if em is not None and source not in ('pinned', 'fixed') else None,
+        'scale': scale,
+        'fixedScale': fixed,
+        'px': int((x1 - x0) * scale) * int((y1 - y0) * scale),
+        'fixedPx': int((x1 - x0) * fixed) * int((y1 - y0) * fixed),
+    }
+
+
+def _render_scale_summary(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """diagnostics['renderScale']: every render's chosen scale and the pixels against the fixed scales"""
+    px = sum(e['px'] for e in entries)
+    fixed_px = sum(e['fixedPx'] for e in entries)
+    return {
+        'adaptive': _adaptive_scale_enabled(),
+        'targetXHeightPx': {engine: _ocr_target_xheight(engine) for engine in _OCR_TARGET_XHEIGHT_PX},
+        'renders': entries,
+        'px': px,
+        'fixedPx': fixed_px,
+        'pixelsSavedPct': round(100.0 * (1 - px / fixed_px), 1) if fixed_px else None,
+    }
+
+
+def _tesseract_lines_text(df) -> Tuple[Optional[_TableLines], List[str]]:
+    """Reading-order lines of an image_to_data frame and their stripped texts"""
+    boxes = _tesseract_word_boxes(df)
+    if boxes is None:
+        return None, []
+    lines = _table_lines_by_key(boxes)
+    return lines, [t.strip() for t in lines.texts]
+
+
+def _coarse_ocr_regions(lines: _TableLines) -> List[Tuple[str, float, float]]:
+    """
+    Bands (kind, top, bottom) in the lines' pixels: 'items' from the 'Order Details' line (else a
+    column-header line among the first 20) to the first totals line, then 'totals' over the
+    totals lines that follow it. Bands get a line height of margin (scans are rarely level);
+    overlapping bands are merged into one 'items' band. [] when no table anchor is found
+    """
+    texts = lines.texts
+    anchor = next((i for i, t in enumerate(texts) if _TABLE_ORDER_DETAILS.search(t)), None)
+    if anchor is None:
+        anchor = next((i for i, t in enumerate(texts[:20]) if _table_header_like(t)), None)
+    if anchor is None:
         return []
-    items: List[Dict[str, Any]] = []
+    boxes = lines.boxes
+    line_h = float(np.median(boxes.y1 - boxes.y0))
+    ys = lines.y.tolist()
+    bottoms = np.maximum.reduceat(boxes.y1[lines.order], lines.starts[:-1]).tolist()
+    top = ys[anchor] - line_h
+    stop = next((i for i in range(anchor + 1, len(texts)) if _TABLE_REGION_STOP.search(texts[i])), None)
+    if stop is None:
+        return [('items', top, float('inf'))]
+    last = stop
+    for i in range(stop + 1, len(texts)):
+        if ys[i] - bottoms[last] > 3 * line_h:
+            break
+        if _COARSE_TOTALS.search(texts[i]):
+            last = i
+    items_bottom = bottoms[stop - 1] + line_h / 2
+    totals_top = ys[stop] - line_h / 2
+    totals_bottom = bottoms[last] + line_h
+    if items_bottom >= totals_top:
+        return [('items', top, totals_bottom)]
+    return [('items', top, items_bottom), ('totals', totals_top, totals_bottom)]
+
+
+def _coarse_band_boxes(lines: _TableLines, bands: List[Tuple[str, float, float]]) -> List[Tuple[str, Tuple[float, float, float, float]]]:
+    """Bands as (kind, (x0, y0, x1, y1)) boxes trimmed to the words inside them plus a line height of margin"""
+    boxes = lines.boxes
+    line_h = float(np.median(boxes.y1 - boxes.y0))
+    out = []
+    for kind, top, bottom in bands:
+        inside = (boxes.y0 >= top) & (boxes.y0 < bottom)
+        if inside.any():
+            out.append((kind, (float(boxes.x0[inside].min()) - line_h, top, float(boxes.x1[inside].max()) + line_h, bottom)))
+    return out
+
+
+def _coarse_to_fine_ocr(raster: _PageRaster, fine_scale: float, coarse_dpi: float, page_no: int = 1,
+                        adaptive: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Two-pass Tesseract of an image-only page. The page is read once at coarse_dpi to find the
+    items table and the totals block; only those bands (trimmed to their words) are rendered at
+    fine_scale and read again. With adaptive, the fine scale is chosen from the coarse pass's
+    text line heights instead (fine_scale being the fixed scale it replaces; 'renderScale' holds
+    the choice).
+    Returns the page text (coarse lines outside the bands, fine lines inside), the fine items
+    image with its image_to_data frame, the bands in page units and per-stage pixels and ms
+    ('stats'). 'regions' is empty when the coarse pass finds no table (the caller reads the whole
+    page instead); None when coarse_dpi is not below the fine resolution.
+    """
+    coarse_scale = coarse_dpi / raster.dpi
+    ceiling = fine_scale
+    if adaptive:
+        ceiling = 1.0 if raster.page is None else (_page_native_scale(raster.page) or _OCR_SCALE_LIMITS[1])
+    if coarse_scale >= ceiling:
+        return None
+    start = time.perf_counter()
+    with _span('ocr_coarse', scale=round(coarse_scale, 3)) as span:
+        img = raster.render(coarse_scale)
+        span['pixels'] = img.width * img.height
+        lines, texts = _tesseract_lines_text(_tesseract_data_frame(img))
+    bands = _coarse_ocr_regions(lines) if lines is not None else []
+    scale_entry = None
+    if adaptive and bands:
+        heights = (np.maximum.reduceat(lines.boxes.y1[lines.order], lines.starts[:-1])
+                   - np.minimum.reduceat(lines.boxes.y0[lines.order], lines.starts[:-1]))
+        em = float(np.percentile(heights, _TEXT_SIZE_PERCENTILE)) / coarse_scale / _GLYPH_HEIGHT_PER_EM
+        fine_scale, scale_entry = _choose_render_scale(raster, 'tesseract', fine_scale, 'fine', page_no, em=em)
+    full_px = int(raster.width * fine_scale) * int(raster.height * fine_scale)
+    stats: Dict[str, Any] = {
+        'mode': 'regions' if bands else 'full_page',
+        'coarse': {'scale': round(coarse_scale, 3), 'px': img.width * img.height, 'lines': len(texts),
+                   'ms': round((time.perf_counter() - start) * 1000, 1)},
+        'fullPagePx': full_px,
+    }
+    result: Dict[str, Any] = {'text': '\n'.join(t for t in texts if t), 'regions': [], 'images': [], 'frames': [], 'stats': stats,
+                              'renderScale': scale_entry}
+    if not bands:
+        return result
+
+    _stage_checkpoint()
+    start = time.perf_counter()
+    regions = []
+    for kind, (x0, y0, x1, y1) in _coarse_band_boxes(lines, bands):
+        x0, y0 = max(0.0, x0 / coarse_scale), max(0.0, y0 / coarse_scale)
+        x1, y1 = min(raster.width, x1 / coarse_scale), min(raster.height, y1 / coarse_scale)
+        if x1 > x0 and y1 > y0:
+            regions.append((kind, (x0, y0, x1, y1)))
+    with _span('ocr_fine', scale=fine_scale, regions=len(regions)) as span:
+        images = [raster.render(fine_scale, box) for _, box in regions]
+        span['pixels'] = sum(im.width * im.height for im in images)
+        frames = _tesseract_data_frames(images)
+    fine_texts = [_tesseract_lines_text(df)[1] for df in frames]
+    if scale_entry is not None:
+        # The entry covers the bands actually rendered
+        fixed = scale_entry['fixedScale']
+        scale_entry['px'] = sum(im.width * im.height for im in images)
+        scale_entry['fixedPx'] = sum(int((x1 - x0) * fixed) * int((y1 - y0) * fixed) for _, (x0, y0, x1, y1) in regions)
+    ys = lines.y.tolist()
+    above = [t for y, t in zip(ys, texts) if t and y < bands[0][1]]
+    below = [t for y, t in zip(ys, texts) if t and y >= bands[-1][2]]
+    result['text'] = '\n'.join(above + [t for band in fine_texts for t in band if t] + below)
+    result['regions'] = regions
+    result['images'] = [im for (kind, _), im in zip(regions, images) if kind == 'items']
+    result['frames'] = [df for (kind, _), df in zip(regions, frames) if kind == 'items']
+    stats['fine'] = {
+        'scale': fine_scale,
+        'px': sum(im.width * im.height for im in images),
+        'ms': round((time.perf_counter() - start) * 1000, 1),
+        'regions': [{'kind': kind, 'box': [round(v, 1) for v in box], 'px': im.width * im.height}
+                    for (kind, box), im in zip(regions, images)],
+    }
+    return result
+
+
+def _coarse_to_fine_summary(pages: List[Dict[str, Any]], coarse_dpi: float) -> Dict[str, Any]:
+    """Totals for diagnostics['ocrCoarseToFine']; pages read whole count at their fine-scale size"""
+    coarse_px = sum(p['coarse']['px'] for p in pages)
+    fine_px = sum(p['fine']['px'] if 'fine' in p else p['fullPagePx'] for p in pages)
+    full_px = sum(p['fullPagePx'] for p in pages)
+    return {
+        'coarseDpi': coarse_dpi,
+        'pages': pages,
+        'regionPages': sum(1 for p in pages if p['mode'] == 'regions'),
+        'coarsePx': coarse_px,
+        'finePx': fine_px,
+        'fullPagePx': full_px,
+        'pixelsSavedPct': round(100.0 * (1 - (coarse_px + fine_px) / full_px), 1) if full_px else None,
+        'coarseMs': round(sum(p['coarse']['ms'] for p in pages), 1),
+        'fineMs': round(sum(p.get('fine', {}).get('ms', 0.0) for p in pages), 1),
+    }
 
-    prod_syn = re.compile(r"product|item|description|details?", re.I)
-    qty_syn = re.compile(r"qty|quantity", re.I)
-    price_syn = re.compile(r"price|unit\s*price|unitprice", re.I)
-    subtotal_syn = re.compile(r"subtotal|amount|total", re.I)
-    no_syn = re.compile(r"^(no\.|no|#)$", re.I)
 
-    def _to_float(s: str) -> Optional[float]:
+# Page triage of multi-page PDFs (OCR_PAGE_TRIAGE: on by default, '0' off, 'report' classifies
+# without skipping). Before a page is rasterised for OCR or PaddleOCR, text-layer pages are
+# classed by keyword and image-only pages by their ink at thumbnail size and, when inked, a
+# quick OCR of a ~100 dpi thumbnail (OCR_TRIAGE_DPI, 0 to skip it). Blank pages are skipped;
+# terms pages and shipping labels are deferred. Any order keyword keeps a page
+_TRIAGE_ORDER = re.compile(r"Order\s+(?:Details|Summary)|Grand\s+Total|Sub\s*total|Total\s+(?:Payment|Amount|Quantity)|"
+                           r"Amount\s+Due|Unit\s+Price|Product\s+Price|\bQty\b|Quantity|Invoice|Official\s+Receipt|\bSeller\b", re.I)
+_TRIAGE_OTHER = {
+    'terms': re.compile(r"Terms\s+(?:and|&)\s+Conditions|Privacy\s+(?:Policy|Notice)|Return\s+(?:and\s+Refund\s+)?Policy|"
+                        r"Warranty|Liabilit(?:y|ies)|Governing\s+Law", re.I),
+    'shipping_label': re.compile(r"Waybill|Air\s*way\s*Bill|Tracking\s+(?:No|Number)|Sort(?:ing)?\s+Code|"
+                                 r"\bShip\s+To\b|Recipient|Cash\s+on\s+Delivery|\bCOD\b", re.I),
+}
+_TRIAGE_DECISIONS = {'order': 'ocr', 'unknown': 'ocr', 'blank': 'skip', 'terms': 'defer', 'shipping_label': 'defer'}
+_TRIAGE_INK_DPI = 36.0
+_TRIAGE_INK_CONTRAST = 48  # a pixel this much darker than the paper (the median) is ink
+# Inked share of the thumbnail below which a page is blank: about a dozen pixels of an A4 page. A lone
+# 9 pt total line on a continuation page inks ~0.0008, so the threshold sits well below one line of print
+_TRIAGE_BLANK_INK = 0.0001
+
+
+def _triage_mode() -> str:
+    value = os.environ.get('OCR_PAGE_TRIAGE', '1')
+    if value in ('0', 'false', 'False'):
+        return 'off'
+    return 'report' if value == 'report' else 'on'
+
+
+def _triage_class(text: str) -> Tuple[str, List[str]]:
+    """Page class from its text and the keywords that decided it"""
+    found = sorted({' '.join(m.group(0).split()) for m in _TRIAGE_ORDER.finditer(text)})
+    if found:
+        return 'order', found[:6]
+    for cls, pattern in _TRIAGE_OTHER.items():
+        found = sorted({' '.join(m.group(0).split()) for m in pattern.finditer(text)})
+        if found:
+            return cls, found[:6]
+    return 'unknown', []
+
+
+def _page_ink(raster: _PageRaster) -> float:
+    """Share of a thumbnail's pixels that are ink"""
+    gray = np.asarray(raster.render(min(1.0, _TRIAGE_INK_DPI / raster.dpi)).convert('L'))
+    if not gray.size:
+        return 0.0
+    return float((gray < int(np.median(gray)) - _TRIAGE_INK_CONTRAST).mean())
+
+
+def _thumbnail_texts(images: List["Image.Image"]) -> List[Optional[str]]:
+    """Tesseract text of each thumbnail (None when OCR fails), TESSERACT_CONCURRENCY at a time"""
+    def read(img):
         try:
-            return float(s.replace(',', '').lstrip('₱$P'))
+            return pytesseract.image_to_string(img, timeout=_ocr_timeout())
         except Exception:
-            m = re.search(r"([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})|[0-9]+(?:\.[0-9]{2})?)", s)
-            if m:
+            return None
+    workers = int(os.environ.get('TESSERACT_CONCURRENCY', '0') or 0) or min(4, os.cpu_count() or 1)
+    if workers <= 1 or len(images) <= 1:
+        return [read(img) for img in images]
+    with ThreadPoolExecutor(max_workers=min(workers, len(images)), thread_name_prefix='tesseract') as pool:
+        return list(pool.map(read, images))
+
+
+def _triage_pages(pdf_file, texts: List[str]) -> List[Dict[str, Any]]:
+    """
+    One diagnostics['pageTriage'] entry per page: class, decision ('ocr', 'skip' or 'defer'),
+    the signal that decided it and its keywords. When no page is classed 'order' the triage
+    cannot tell the document apart, so nothing is deferred
+    """
+    try:
+        ocr_dpi = float(os.environ.get('OCR_TRIAGE_DPI', '100') or 0)
+    except ValueError:
+        ocr_dpi = 100.0
+    entries: List[Dict[str, Any]] = []
+    thumbs: List[Tuple[Dict[str, Any], "Image.Image"]] = []
+    # Thumbnails are read in batches of OCR_MAX_PAGES_IN_MEMORY, so a long scan never has them all decoded
+    batch = _pages_in_memory_cap() or len(texts)
+
+    def read_thumbs() -> None:
+        start = time.perf_counter()
+        for (entry, _), text in zip(thumbs, _thumbnail_texts([img for _, img in thumbs])):
+            if text is not None:
+                entry['signal'] = 'thumbnail_ocr'
+                entry['class'], entry['keywords'] = _triage_class(text)
+        per_page = (time.perf_counter() - start) * 1000 / len(thumbs)
+        for entry, _ in thumbs:
+            entry['ms'] = round(entry['ms'] + per_page, 1)
+        thumbs.clear()
+
+    for page_no, text in enumerate(texts, start=1):
+        _stage_checkpoint()
+        start = time.perf_counter()
+        entry: Dict[str, Any] = {'page': page_no}
+        if text.strip():
+            entry['signal'] = 'text'
+            entry['class'], entry['keywords'] = _triage_class(text)
+        else:
+            raster = _PageRaster(page=pdf_file[page_no - 1])
+            entry['ink'] = round(_page_ink(raster), 4)
+            entry['signal'], entry['class'], entry['keywords'] = 'ink', 'unknown', []
+            if entry['ink'] < _TRIAGE_BLANK_INK:
+                entry['class'] = 'blank'
+            elif ocr_dpi > 0:
+                thumbs.append((entry, raster.render(ocr_dpi / raster.dpi)))
+            _release_page_cache()
+        entry['ms'] = round((time.perf_counter() - start) * 1000, 1)
+        entries.append(entry)
+        if len(thumbs) >= batch:
+            read_thumbs()
+    if thumbs:
+        read_thumbs()
+    any_order = any(e['class'] == 'order' for e in entries)
+    for entry in entries:
+        entry['decision'] = _TRIAGE_DECISIONS[entry['class']]
+        if entry['decision'] == 'defer' and not any_order:
+            entry['decision'] = 'ocr'
+    return entries
+
+
+def _triage_summary(entries: List[Dict[str, Any]], mode: str) -> Dict[str, Any]:
+    """diagnostics['pageTriage']: per-page decisions and what they kept from OCR"""
+    return {
+        'mode': mode,
+        'pages': entries,
+        'ocr': sum(1 for e in entries if e['decision'] == 'ocr'),
+        'skipped': sum(1 for e in entries if e['decision'] == 'skip'),
+        'deferred': sum(1 for e in entries if e['decision'] == 'defer'),
+        'deferredRead': sum(1 for e in entries if e.get('deferredRead')),
+        'ms': round(sum(e['ms'] for e in entries), 1),
+    }
+
+
+_FITZ_LOCK = threading.RLock()
+# One pooled session per OCR provider, each sized to that provider's concurrency
+_HTTP_SESSIONS: Dict[str, Any] = {}
+_HTTP_SESSIONS_LOCK = threading.Lock()
+_OCR_CACHE = None
+_OCR_CACHE_FAILED = False
+_OCR_CACHE_LOCK = threading.Lock()
+
+
+def _http_session(provider: str, pool_size: int = 4):
+    """Keep-alive requests.Session of one external OCR provider (None without requests).
+
+    Each provider has its own connection pool of pool_size connections per host, so one
+    provider's concurrency neither takes nor caps the other's.
+    """
+    requests = _optional_module('requests')
+    if requests is None:
+        return None
+    with _HTTP_SESSIONS_LOCK:
+        session = _HTTP_SESSIONS.get(provider)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size))
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _HTTP_SESSIONS[provider] = session
+    return session
+
+
+def _private_cache_path(path: Optional[str], filename: str) -> str:
+    """Path of a local cache file that holds invoice content, created readable by its owner only.
+
+    path (an explicit *_PATH setting) is used as given; otherwise filename goes in a per-user
+    directory under the temp dir, created 0700. Raises OSError when that directory is not private
+    (a link, another user's, or open to group/others) or the file cannot be made 0600.
+    """
+    if not path:
+        owner = os.getuid() if hasattr(os, 'getuid') else os.environ.get('USERNAME', 'user')
+        directory = os.path.join(tempfile.gettempdir(), f'process_file-{owner}')
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.lstat(directory)
+        if hasattr(os, 'getuid') and (stat.S_ISLNK(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077):
+            raise OSError(f"{directory} is not a private directory")
+        path = os.path.join(directory, filename)
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+    os.chmod(path, 0o600)
+    return path
+
+
+def _ocr_cache():
+    """Shared response cache for the external OCR providers (None when OCR_CACHE=0 or it cannot be opened).
+
+    It holds the raw text of invoices, so it lives in a private file (see _private_cache_path)
+    and entries expire after OCR_CACHE_MAX_AGE_DAYS (default 7).
+    """
+    global _OCR_CACHE, _OCR_CACHE_FAILED
+    if os.environ.get('OCR_CACHE', '1') not in ('1', 'true', 'True') or _OCR_CACHE_FAILED:
+        return None
+    if _OCR_CACHE is None:
+        with _OCR_CACHE_LOCK:
+            if _OCR_CACHE is None and not _OCR_CACHE_FAILED:
                 try:
-                    return float(m.group(1).replace(',', ''))
+                    from ocr_response_cache import OcrResponseCache
+                    path = _private_cache_path(os.environ.get('OCR_CACHE_PATH'), 'ocr_cache.sqlite')
+                    max_mb = float(os.environ.get('OCR_CACHE_MAX_MB', '200') or 0)
+                    max_days = float(os.environ.get('OCR_CACHE_MAX_AGE_DAYS', '7') or 0)
+                    _OCR_CACHE = OcrResponseCache(path, max_bytes=int(max_mb * 1024 * 1024),
+                                                  max_age=max_days * 86400)
                 except Exception:
-                    return None
-            return None
+                    _OCR_CACHE_FAILED = True
+    return _OCR_CACHE
 
-    url = f"https://vision.googleapis.com/v1/images:annotate?key={api_key}"
 
+def _ocr_cache_keys(cache, provider: str, images: List["Image.Image"], settings: Dict[str, Any]) -> List[Optional[str]]:
+    """Cache key per image (None where the image cannot be hashed or there is no cache)."""
+    if cache is None:
+        return [None] * len(images)
+    from ocr_response_cache import image_digest
+    keys: List[Optional[str]] = []
     for img in images:
         try:
-            buf = io.BytesIO()
-            img.save(buf, format='PNG')
-            b64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-            payload = {
-                "requests": [
-                    {
-                        "image": {"content": b64},
-                        "features": [{"type": "DOCUMENT_TEXT_DETECTION"}]
-                    }
-                ]
-            }
-            resp = requests.post(url, json=payload, timeout=30)
-            data = resp.json()
+            keys.append(cache.key(provider, image_digest(img), settings))
         except Exception:
-            continue
+            keys.append(None)
+    return keys
+
+
+def _google_vision_annotate(images: List["Image.Image"], api_key: str) -> List[Optional[Dict[str, Any]]]:
+    """DOCUMENT_TEXT_DETECTION for every image, one response dict (or None) per image, in order.
+
+    Images are packed several per images:annotate call (GOOGLE_VISION_BATCH_SIZE, max 16,
+    capped at ~8 MB of base64 per call) and the calls run on a pooled session with
+    GOOGLE_VISION_CONCURRENCY workers. GOOGLE_VISION_ENDPOINT overrides the URL (local stand-ins).
+    Responses for images seen before are served from the OCR response cache and not re-sent.
+    """
+    workers = max(1, int(os.environ.get('GOOGLE_VISION_CONCURRENCY', '4') or 4))
+    session = _http_session('google_vision', pool_size=workers)
+    if session is None or not images:
+        return [None] * len(images)
+    batch_size = min(16, max(1, int(os.environ.get('GOOGLE_VISION_BATCH_SIZE', '8') or 8)))
+    endpoint = os.environ.get('GOOGLE_VISION_ENDPOINT') or 'https://vision.googleapis.com/v1/images:annotate'
+    max_batch_chars = 8 * 1024 * 1024
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+    cache = _ocr_cache()
+    keys = _ocr_cache_keys(cache, 'google_vision', images, {'features': ['DOCUMENT_TEXT_DETECTION'], 'endpoint': endpoint})
+    pending: List[int] = []
+    for idx in range(len(images)):
+        cached = cache.get(keys[idx]) if keys[idx] else None
+        if cached is not None:
+            results[idx] = cached
+        else:
+            pending.append(idx)
+    if not pending:
+        return results
+    # Spread images evenly over the fewest calls (10 pages at 8/call -> 5 + 5, not 8 + 2)
+    batch_size = -(-len(pending) // -(-len(pending) // batch_size))
+
+    def _annotate(batch: List[Tuple[int, str]]) -> List[Optional[Dict[str, Any]]]:
+        payload = {
+            "requests": [
+                {
+                    "image": {"content": b64},
+                    "features": [{"type": "DOCUMENT_TEXT_DETECTION"}]
+                }
+                for _idx, b64 in batch
+            ]
+        }
+        try:
+            resp = session.post(endpoint, params={'key': api_key}, json=payload, timeout=_request_timeout(30))
+            responses = resp.json().get('responses') or []
+        except Exception:
+            return [None] * len(batch)
+        return [responses[i] if i < len(responses) else None for i in range(len(batch))]
+
+    parent = _current_span()
+
+    def _annotate_traced(batch: List[Tuple[int, str]]) -> List[Optional[Dict[str, Any]]]:
+        with _adopt_span(parent), _span('google_vision_request', images=len(batch),
+                                        bytes=sum(len(b64) for _idx, b64 in batch)):
+            return _annotate(batch)
+
+    def _collect(batch: List[Tuple[int, str]], responses: List[Optional[Dict[str, Any]]]) -> None:
+        for (idx, _b64), response in zip(batch, responses):
+            results[idx] = response
+            if keys[idx] and isinstance(response, dict) and 'error' not in response:
+                try:
+                    cache.put(keys[idx], 'google_vision', response)
+                except Exception:
+                    pass
+
+    # Images are encoded as the batches fill and at most `workers` batches are in flight, so a
+    # long document never holds every page's base64 at once
+    in_flight: List[Tuple[List[Tuple[int, str]], Any]] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def _send(batch: List[Tuple[int, str]]) -> None:
+            _stage_checkpoint()
+            if len(in_flight) >= workers:
+                done, future = in_flight.pop(0)
+                _collect(done, future.result())
+            in_flight.append((batch, pool.submit(_annotate_traced, batch)))
+
+        current: List[Tuple[int, str]] = []
+        current_chars = 0
+        for idx in pending:
+            try:
+                buf = io.BytesIO()
+                images[idx].save(buf, format='PNG')
+                b64 = base64.b64encode(buf.getvalue()).decode('utf-8')
+            except Exception:
+                continue
+            if current and (len(current) >= batch_size or current_chars + len(b64) > max_batch_chars):
+                _send(current)
+                current, current_chars = [], 0
+            current.append((idx, b64))
+            current_chars += len(b64)
+        if current:
+            _send(current)
+        for batch, future in in_flight:
+            _collect(batch, future.result())
+    return results
+
+
+def _extract_items_from_google_vision_images(images: List["Image.Image"], api_key: str, stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Use Google Vision API (DOCUMENT_TEXT_DETECTION) to get word boxes and parse table rows.
+    Requires GOOGLE_CLOUD_API_KEY; uses REST endpoint to avoid extra libs
+    (batched, concurrent calls on a pooled session; see _google_vision_annotate).
+    Vision words carry no line ids, so _TableEngine groups them into lines by top.
+    """
+    requests = _optional_module('requests')
+    if not api_key or not images or requests is None:
+        return []
+    engine = _TableEngine(region_stop=_TABLE_STOP, line_tol=6.0, stats=stats)
+    for page_no, data in enumerate(_google_vision_annotate(images, api_key), start=1):
         try:
-            pages = data['responses'][0]['fullTextAnnotation']['pages']
+            pages = data['fullTextAnnotation']['pages']
         except Exception:
             continue
-        # Build words list similar to PyMuPDF output
-        words_flat: List[Tuple[float,float,float,float,str]] = []
+        words: List[str] = []
+        corners: List[Tuple[float, float, float, float]] = []
         for page in pages:
             for block in page.get('blocks', []):
                 for para in block.get('paragraphs', []):
@@ -1032,400 +2082,229 @@ def _extract_items_from_google_vision_images(images: List[Image.Image], api_key:
                         ys = [v.get('y', 0) for v in bb]
                         if not xs or not ys:
                             continue
-                        x0, x1 = min(xs), max(xs)
-                        y0, y1 = min(ys), max(ys)
-                        words_flat.append((float(x0), float(y0), float(x1), float(y1), text))
-        if not words_flat:
-            continue
-        # Group to line-like structures by y
-        words_flat.sort(key=lambda t: (t[1], t[0]))
-        lines_list: List[Tuple[float,float,str,List[Tuple[float,float,float,float,str]]]] = []
-        row: List[Tuple[float,float,float,float,str]] = []
-        prev_y = None
-        for w in words_flat:
-            if prev_y is None or abs(w[1] - prev_y) <= 6:
-                row.append(w)
-                prev_y = w[1] if prev_y is None else (prev_y + w[1]) / 2.0
-            else:
-                if row:
-                    row.sort(key=lambda t: t[0])
-                    text = ' '.join([t[4] for t in row])
-                    lines_list.append((row[0][0], row[0][1], text, row.copy()))
-                row = [w]
-                prev_y = w[1]
-        if row:
-            row.sort(key=lambda t: t[0])
-            text = ' '.join([t[4] for t in row])
-            lines_list.append((row[0][0], row[0][1], text, row.copy()))
-
-        # Find header or proceed to region parse if missing
-        header_idx = None
-        header_cols = None
-        for idx, (_x, _y, text, lst) in enumerate(lines_list):
-            tnorm = text.lower()
-            if prod_syn.search(tnorm) and qty_syn.search(tnorm) and price_syn.search(tnorm) and subtotal_syn.search(tnorm):
-                col_markers: List[Tuple[float,str]] = []
-                for x0,y0,x1,y1,w in lst:
-                    wl = w.lower()
-                    if no_syn.match(wl):
-                        col_markers.append((x0, 'no'))
-                    elif prod_syn.search(wl):
-                        col_markers.append((x0, 'product'))
-                    elif re.search(r"variation|variant|var", wl):
-                        col_markers.append((x0, 'variation'))
-                    elif price_syn.search(wl):
-                        col_markers.append((x0, 'price'))
-                    elif qty_syn.search(wl):
-                        col_markers.append((x0, 'qty'))
-                    elif subtotal_syn.search(wl):
-                        col_markers.append((x0, 'subtotal'))
-                col_markers.sort(key=lambda z: z[0])
-                dedup = []
-                for x, name in col_markers:
-                    if not dedup or abs(x - dedup[-1][0]) > 5:
-                        dedup.append((x, name))
-                if len(dedup) >= 3:
-                    header_idx = idx
-                    header_cols = dedup
-                    break
-        # Build ranges if header present
-        ranges = []
-        if header_cols is not None:
-            xs = [x for x,_ in header_cols]
-            names = [n for _,n in header_cols]
-            for i, x in enumerate(xs):
-                start = x - 3
-                end = xs[i+1] - 3 if i+1 < len(xs) else float('inf')
-                ranges.append((start, end, names[i]))
-
-        stop_pattern = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due", re.I)
-        current_row: Dict[str, Any] = {}
-        def flush_row():
-            nonlocal current_row
-            if not current_row:
-                return
-            prod = (current_row.get('product') or '').strip()
-            if not prod:
-                current_row = {}
-                return
-            items.append({
-                'no': current_row.get('no'),
-                'product': prod[:200],
-                'variation': (current_row.get('variation') or None),
-                'productPrice': current_row.get('price'),
-                'qty': current_row.get('qty'),
-                'subtotal': current_row.get('subtotal'),
-            })
-            current_row = {}
-
-        # If header missing, fall back to region parse similar to the PDF path
-        if header_idx is None:
-            # Define region between 'Order Details' and totals
-            y_start = None
-            y_end = None
-            for (_x,_y,text,_lst) in lines_list:
-                if re.search(r"^\s*Order\s+Details\b", text, re.I):
-                    y_start = _y + 3
-                    break
-            if y_start is None:
-                continue
-            for (_x,_y,text,_lst) in lines_list:
-                if _y <= y_start:
-                    continue
-                if stop_pattern.search(text):
-                    y_end = _y - 2
-                    break
-            if y_end is None:
-                y_end = max([w[1] for w in words_flat]) + 5
-            # Collect words in region and group by rows (already grouped)
-            for (_x, _y, text, lst) in lines_list:
-                if _y < y_start or _y > y_end:
-                    continue
-                if stop_pattern.search(text) or re.search(r"No\b\s*\|\s*Product", text, re.I):
-                    continue
-                # Heuristic extraction
-                def join_by(filt):
-                    return ' '.join([w for x0,y0,x1,y1,w in lst if filt(x0,y0,x1,y1,w)]).strip()
-                # Money tokens in the row
-                monies = [( (x0+x1)/2.0, w) for x0,y0,x1,y1,w in lst if re.match(r"^[₱$P]?\d[\d,]*(?:\.\d{2})?$", w)]
-                monies.sort(key=lambda z: z[0])
-                price_val = _to_float(monies[-2][1]) if len(monies) >= 2 else None
-                subtotal_val = _to_float(monies[-1][1]) if len(monies) >= 1 else None
-                qty_tokens = [w for x0,y0,x1,y1,w in lst if re.match(r"^\d{1,3}$", w)]
-                qty_val = None
-                if qty_tokens:
-                    try:
-                        qty_val = int(qty_tokens[0])
-                    except Exception:
-                        pass
-                used = set([m for _,m in monies]) | set(qty_tokens)
-                prod_parts = [w for x0,y0,x1,y1,w in lst if w not in used and not re.match(r"^(qty|quantity|subtotal|amount|price)$", w, re.I)]
-                product = ' '.join(prod_parts).strip()
-                if product and (qty_val is not None or price_val is not None or subtotal_val is not None):
-                    items.append({
-                        'no': (len(items)+1),
-                        'product': product[:200],
-                        'variation': None,
-                        'productPrice': price_val,
-                        'qty': qty_val,
-                        'subtotal': subtotal_val,
-                    })
+                        words.append(text)
+                        corners.append((min(xs), min(ys), max(xs), max(ys)))
+        if not words:
             continue
+        x0, y0, x1, y1 = np.asarray(corners, dtype=np.float64).T
+        engine.add_page(_WordBoxes(words, x0, y0, x1, y1), page_no)
+    return engine.finish()
 
-        # Header present: column-based parsing
-        for (_x,_y,text,lst) in lines_list[header_idx+1:]:
-            if stop_pattern.search(text):
-                flush_row()
-                break
-            col_text: Dict[str, List[str]] = {n: [] for n in ['no','product','variation','price','qty','subtotal']}
-            for x0,y0,x1,y1,w in lst:
-                xmid = (x0 + x1)/2.0
-                name = None
-                for start,end,col in ranges:
-                    if start <= xmid < end:
-                        name = col
-                        break
-                if name:
-                    col_text.setdefault(name, []).append(w)
-            def join(n):
-                return ' '.join(col_text.get(n, [])).strip()
-            no_s = join('no'); product_s = join('product'); variation_s = join('variation')
-            price_s = join('price'); qty_s = join('qty'); subtotal_s = join('subtotal')
-            new_row = False
-            no_val = None
-            try:
-                if no_s:
-                    no_val = int(re.sub(r"[^0-9]", "", no_s))
-                    new_row = True
-            except Exception:
-                no_val = None
-            price_val = _to_float(price_s) if price_s else None
-            qty_val = None
-            try:
-                if qty_s:
-                    qty_val = int(re.sub(r"[^0-9]", "", qty_s))
-            except Exception:
-                qty_val = None
-            subtotal_val = _to_float(subtotal_s) if subtotal_s else None
-            if not new_row and product_s and (qty_val is not None or price_val is not None or subtotal_val is not None):
-                new_row = True
-            if new_row:
-                if current_row:
-                    flush_row()
-                current_row = {'no': no_val}
-            if product_s:
-                current_row['product'] = (current_row.get('product') + ' ' + product_s).strip() if current_row.get('product') else product_s
-            if variation_s:
-                current_row['variation'] = (current_row.get('variation') + ' ' + variation_s) if current_row.get('variation') else variation_s
-            if price_val is not None:
-                current_row['price'] = price_val
-            if qty_val is not None:
-                current_row['qty'] = qty_val
-            if subtotal_val is not None:
-                current_row['subtotal'] = subtotal_val
-        flush_row()
-
-    return items
 
+def _ocrspace_encode_image(img: "Image.Image", target_dpi: int, max_bytes: int) -> Tuple[bytes, str, float]:
+    """Encode a page for upload: downscale to target_dpi (when the image records its DPI), then
+    keep shrinking until it fits max_bytes. PNG first; JPEG once PNG is too large for the budget.
+    Returns (payload, mime type, scale factor applied to the original pixel coordinates).
+    """
+    factor = 1.0
+    try:
+        dpi = float((img.info.get('dpi') or (0, 0))[0] or 0)
+    except Exception:
+        dpi = 0.0
+    if target_dpi > 0 and dpi > target_dpi:
+        factor = target_dpi / dpi
+    fmt = 'PNG'
+    for _attempt in range(8):
+        work = img
+        if factor < 1.0:
+            size = (max(1, int(img.width * factor)), max(1, int(img.height * factor)))
+            work = img.resize(size, Image.LANCZOS, reducing_gap=2.0)
+        buf = io.BytesIO()
+        if fmt == 'JPEG':
+            if work.mode not in ('RGB', 'L'):
+                work = work.convert('RGB')
+            work.save(buf, format='JPEG', quality=85, optimize=True)
+        else:
+            # Fast deflate when a budget applies: the trial encode only has to decide whether PNG fits
+            work.save(buf, format='PNG', compress_level=1 if max_bytes > 0 else 6)
+        payload = buf.getvalue()
+        if max_bytes <= 0 or len(payload) <= max_bytes:
+            break
+        if fmt == 'PNG':
+            # Scanned pages and photos compress far better as JPEG; retry at the same size first
+            fmt = 'JPEG'
+            continue
+        factor *= max(0.5, min(0.9, (max_bytes / len(payload)) ** 0.5 * 0.95))
+    return payload, ('image/jpeg' if fmt == 'JPEG' else 'image/png'), factor
+
+
+def _ocrspace_rescale_overlay(result: Dict[str, Any], factor: float) -> None:
+    """Map TextOverlay coordinates of a downscaled upload back to original page pixels."""
+    if factor >= 1.0:
+        return
+    for parsed in result.get('ParsedResults') or []:
+        for ln in (parsed.get('TextOverlay') or {}).get('Lines') or []:
+            if 'MinTop' in ln:
+                ln['MinTop'] = float(ln.get('MinTop') or 0) / factor
+            for w in ln.get('Words') or []:
+                for key in ('Left', 'Top', 'Width', 'Height'):
+                    if key in w:
+                        w[key] = float(w.get(key) or 0) / factor
+
+
+def _ocrspace_submit(images: List["Image.Image"], api_key: str, stats: Optional[Dict[str, Any]] = None) -> List[Optional[Dict[str, Any]]]:
+    """Upload every page to OCR.space concurrently on the pooled session, one response (or None) per page, in order.
+
+    Pages are downscaled/re-encoded to OCRSPACE_TARGET_DPI (default 300) and OCRSPACE_MAX_BYTES
+    (default 1 MB, the free-tier file limit) before upload. OCRSPACE_CONCURRENCY (default 3) pages
+    are in flight at once, each with OCRSPACE_TIMEOUT (default 60 s) and up to OCRSPACE_RETRIES
+    (default 2) retries on network errors, 429 and 5xx. Per-page bytes, latency and retries are
+    appended to `stats` when given. OCRSPACE_ENDPOINT overrides the URL (local stand-ins).
+    Pages seen before with the same settings are answered from the OCR response cache.
+    """
+    workers = max(1, int(os.environ.get('OCRSPACE_CONCURRENCY', '3') or 3))
+    session = _http_session('ocrspace', pool_size=workers)
+    if session is None or not images:
+        return [None] * len(images)
+    url = os.environ.get('OCRSPACE_ENDPOINT') or 'https://api.ocr.space/parse/image'
+    target_dpi = int(os.environ.get('OCRSPACE_TARGET_DPI', '300') or 0)
+    max_bytes = int(os.environ.get('OCRSPACE_MAX_BYTES', str(1024 * 1024)) or 0)
+    timeout = float(os.environ.get('OCRSPACE_TIMEOUT', '60') or 60)
+    retries = max(0, int(os.environ.get('OCRSPACE_RETRIES', '2') or 0))
+    headers = {'apikey': api_key}
+    data = {
+        'isOverlayRequired': True,
+        'OCREngine': 2,
+        'scale': True,
+        'isTable': True,
+        'detectOrientation': True,
+        'language': 'eng'
+    }
 
-def _extract_items_from_ocrspace(images: List[Image.Image], api_key: str) -> List[Dict[str, Any]]:
+    cache = _ocr_cache()
+    keys = _ocr_cache_keys(cache, 'ocrspace', images, {
+        'endpoint': url, 'data': data, 'targetDpi': target_dpi, 'maxBytes': max_bytes,
+    })
+
+    def _submit(page: int) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        img = images[page]
+        info: Dict[str, Any] = {'page': page + 1, 'bytesSent': 0, 'latencyMs': None, 'retries': 0, 'ok': False}
+        cached = cache.get(keys[page]) if keys[page] else None
+        if cached is not None:
+            info.update({'ok': True, 'cached': True, 'scale': cached.get('scale', 1.0)})
+            j = cached.get('response') or {}
+            _ocrspace_rescale_overlay(j, float(cached.get('scale') or 1.0))
+            return j, info
+        try:
+            payload, mime, factor = _ocrspace_encode_image(img, target_dpi, max_bytes)
+        except Exception as e:
+            info['error'] = f'encode_failed: {e}'
+            return None, info
+        info.update({
+            'format': mime.split('/')[-1],
+            'size': [max(1, int(img.width * factor)), max(1, int(img.height * factor))],
+            'scale': round(factor, 4),
+        })
+        filename = 'page.jpg' if mime == 'image/jpeg' else 'page.png'
+        for attempt in range(retries + 1):
+            _stage_checkpoint()
+            if attempt:
+                remaining = _SCHEDULER.remaining_ms() if _SCHEDULER is not None else None
+                if remaining is not None and remaining < 2000:
+                    break
+                info['retries'] += 1
+                time.sleep(min(8.0, 0.5 * (2 ** (attempt - 1))))
+            start = time.perf_counter()
+            try:
+                info['bytesSent'] += len(payload)
+                resp = session.post(url, headers=headers, files={'file': (filename, payload, mime)}, data=data, timeout=_request_timeout(timeout))
+                info['latencyMs'] = round((time.perf_counter() - start) * 1000, 1)
+                info['status'] = resp.status_code
+                if resp.status_code == 429 or resp.status_code >= 500:
+                    continue
+                j = resp.json()
+            except Exception as e:
+                info['latencyMs'] = round((time.perf_counter() - start) * 1000, 1)
+                info['error'] = str(e)[:200]
+                continue
+            info.pop('error', None)
+            info['ok'] = True
+            if keys[page] and isinstance(j, dict) and not j.get('IsErroredOnProcessing'):
+                try:
+                    cache.put(keys[page], 'ocrspace', {'response': j, 'scale': factor})
+                except Exception:
+                    pass
+            _ocrspace_rescale_overlay(j, factor)
+            return j, info
+        return None, info
+
+    parent = _current_span()
+
+    def _submit_traced(page: int) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        with _adopt_span(parent), _span('ocrspace_request', page=page + 1) as span:
+            j, info = _submit(page)
+            span.update(bytes=info.get('bytesSent') or 0, retries=info.get('retries') or 0,
+                        cached=bool(info.get('cached')), ok=bool(info.get('ok')))
+            return j, info
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(images))) as pool:
+        outcomes = list(pool.map(_submit_traced, range(len(images))))
+    if stats is not None:
+        pages = stats.setdefault('pages', [])
+        pages.extend(info for _j, info in outcomes)
+        stats['requests'] = len(pages)
+        stats['bytesSent'] = sum(p.get('bytesSent') or 0 for p in pages)
+        stats['retries'] = sum(p.get('retries') or 0 for p in pages)
+        stats['failed'] = sum(1 for p in pages if not p.get('ok'))
+        latencies = [p['latencyMs'] for p in pages if p.get('latencyMs') is not None]
+        stats['latencyMsMax'] = max(latencies) if latencies else None
+        stats['concurrency'] = workers
+        stats['cached'] = sum(1 for p in pages if p.get('cached'))
+    return [j for j, _info in outcomes]
+
+
+def _extract_items_from_ocrspace(images: List["Image.Image"], api_key: str, stats: Optional[Dict[str, Any]] = None,
+                                 table_stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
     """Use OCR.space API with isTable=true to get table-aware OCR and parse items.
     Docs: https://ocr.space/ocrapi
+    (concurrent, size-budgeted uploads on a pooled session; see _ocrspace_submit)
+    Overlay lines are kept in MinTop order; pages without a column header are read row by row
+    from the top until a totals line. table_stats receives _TableEngine's per-page parse cost.
     """
+    requests = _optional_module('requests')
     if not api_key or not images or requests is None:
         return []
-    items: List[Dict[str, Any]] = []
-    url = 'https://api.ocr.space/parse/image'
-    headers = {'apikey': api_key}
-
-    def _to_float(s: str) -> Optional[float]:
-        try:
-            return float(s.replace(',', '').lstrip('₱$P'))
-        except Exception:
-            m = re.search(r"\d[\d,]*(?:\.\d{2})?", s)
-            return float(m.group(0).replace(',', '')) if m else None
-
-    for img in images:
-        try:
-            buf = io.BytesIO()
-            img.save(buf, format='PNG')
-            buf.seek(0)
-            files = {'file': ('page.png', buf.getvalue(), 'image/png')}
-            data = {
-                'isOverlayRequired': True,
-                'OCREngine': 2,
-                'scale': True,
-                'isTable': True,
-                'detectOrientation': True,
-                'language': 'eng'
-            }
-            resp = requests.post(url, headers=headers, files=files, data=data, timeout=60)
-            j = resp.json()
-        except Exception:
+    engine = _TableEngine(anchor=None, region_stop=_TABLE_STOP, reading_order=False, stats=table_stats)
+    for page_no, j in enumerate(_ocrspace_submit(images, api_key, stats), start=1):
+        if j is None:
             continue
         try:
             parsed = j['ParsedResults'][0]
         except Exception:
             continue
-        # First try text overlay lines by MinTop to reconstruct rows
+        # Text overlay lines by MinTop to reconstruct rows
         overlay = parsed.get('TextOverlay', {})
         lines = overlay.get('Lines', []) or []
-        if lines:
-            # Group words per line, then map to columns by x as before using header synonyms
-            line_structs = []
-            for ln in sorted(lines, key=lambda x: x.get('MinTop', 0)):
-                words = ln.get('Words', []) or []
-                lst = []
-                for w in words:
-                    left = float(w.get('Left', 0))
-                    top = float(w.get('Top', 0))
-                    width = float(w.get('Width', 0))
-                    height = float(w.get('Height', 0))
-                    text = w.get('WordText', '')
-                    lst.append((left, top, left+width, top+height, text))
-                if lst:
-                    lst.sort(key=lambda t: t[0])
-                    text = ' '.join([t[4] for t in lst])
-                    line_structs.append((lst[0][0], lst[0][1], text, lst))
-
-            # Header detection
-            prod_syn = re.compile(r"product|item|description|details?", re.I)
-            qty_syn = re.compile(r"qty|quantity", re.I)
-            price_syn = re.compile(r"price|unit\s*price|unitprice", re.I)
-            subtotal_syn = re.compile(r"subtotal|amount|total", re.I)
-            no_syn = re.compile(r"^(no\.|no|#)$", re.I)
-            header_idx = None
-            header_cols = None
-            for idx, (_x,_y,text,lst) in enumerate(line_structs):
-                tnorm = text.lower()
-                if prod_syn.search(tnorm) and qty_syn.search(tnorm) and price_syn.search(tnorm) and subtotal_syn.search(tnorm):
-                    col_markers = []
-                    for x0,y0,x1,y1,w in lst:
-                        wl = w.lower()
-                        if no_syn.match(wl): col_markers.append((x0,'no'))
-                        elif prod_syn.search(wl): col_markers.append((x0,'product'))
-                        elif re.search(r"variation|variant|var", wl): col_markers.append((x0,'variation'))
-                        elif price_syn.search(wl): col_markers.append((x0,'price'))
-                        elif qty_syn.search(wl): col_markers.append((x0,'qty'))
-                        elif subtotal_syn.search(wl): col_markers.append((x0,'subtotal'))
-                    col_markers.sort(key=lambda z: z[0])
-                    dedup = []
-                    for x,name in col_markers:
-                        if not dedup or abs(x - dedup[-1][0]) > 5:
-                            dedup.append((x,name))
-                    if len(dedup) >= 3:
-                        header_idx = idx
-                        header_cols = dedup
-                        break
-            ranges = []
-            if header_cols:
-                xs = [x for x,_ in header_cols]
-                names = [n for _,n in header_cols]
-                for i, x in enumerate(xs):
-                    start = x - 3
-                    end = xs[i+1] - 3 if i+1 < len(xs) else float('inf')
-                    ranges.append((start, end, names[i]))
-            # Parse lines
-            stop_pattern = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due", re.I)
-            current_row: Dict[str, Any] = {}
-            def flush_row():
-                nonlocal current_row
-                if not current_row:
-                    return
-                prod = (current_row.get('product') or '').strip()
-                if not prod:
-                    current_row = {}
-                    return
-                items.append({
-                    'no': current_row.get('no'),
-                    'product': prod[:200],
-                    'variation': (current_row.get('variation') or None),
-                    'productPrice': current_row.get('price'),
-                    'qty': current_row.get('qty'),
-                    'subtotal': current_row.get('subtotal'),
-                })
-                current_row = {}
-            for (_x,_y,text,lst) in (line_structs[header_idx+1:] if header_idx is not None else line_structs):
-                if stop_pattern.search(text):
-                    flush_row(); break
-                col_text: Dict[str, List[str]] = {n: [] for n in ['no','product','variation','price','qty','subtotal']}
-                if ranges:
-                    for x0,y0,x1,y1,w in lst:
-                        xmid = (x0 + x1)/2.0
-                        name = None
-                        for start,end,col in ranges:
-                            if start <= xmid < end:
-                                name = col; break
-                        if name:
-                            col_text.setdefault(name, []).append(w)
-                else:
-                    # No header: fallback heuristic per line
-                    monies = [( (x0+x1)/2.0, w) for x0,y0,x1,y1,w in lst if re.match(r"^[₱$P]?\d[\d,]*(?:\.\d{2})?$", w)]
-                    monies.sort(key=lambda z: z[0])
-                    price_val = _to_float(monies[-2][1]) if len(monies) >= 2 else None
-                    subtotal_val = _to_float(monies[-1][1]) if len(monies) >= 1 else None
-                    qty_tokens = [w for x0,y0,x1,y1,w in lst if re.match(r"^\d{1,3}$", w)]
-                    qty_val = int(qty_tokens[0]) if qty_tokens and qty_tokens[0].isdigit() else None
-                    used = set([m for _,m in monies]) | set(qty_tokens)
-                    prod_parts = [w for x0,y0,x1,y1,w in lst if w not in used and not re.match(r"^(qty|quantity|subtotal|amount|price)$", w, re.I)]
-                    product = ' '.join(prod_parts).strip()
-                    if product and (qty_val is not None or price_val is not None or subtotal_val is not None):
-                        items.append({
-                            'no': (len(items)+1),
-                            'product': product[:200],
-                            'variation': None,
-                            'productPrice': price_val,
-                            'qty': qty_val,
-                            'subtotal': subtotal_val,
-                        })
-                    continue
-                def join(n):
-                    return ' '.join(col_text.get(n, [])).strip()
-                no_s = join('no'); product_s = join('product'); variation_s = join('variation')
-                price_s = join('price'); qty_s = join('qty'); subtotal_s = join('subtotal')
-                new_row = False
-                no_val = None
-                try:
-                    if no_s:
-                        no_val = int(re.sub(r"[^0-9]", "", no_s))
-                        new_row = True
-                except Exception:
-                    no_val = None
-                price_val = _to_float(price_s) if price_s else None
-                qty_val = None
-                try:
-                    if qty_s:
-                        qty_val = int(re.sub(r"[^0-9]", "", qty_s))
-                except Exception:
-                    qty_val = None
-                subtotal_val = _to_float(subtotal_s) if subtotal_s else None
-                if not new_row and product_s and (qty_val is not None or price_val is not None or subtotal_val is not None):
-                    new_row = True
-                if new_row:
-                    if current_row:
-                        flush_row()
-                    current_row = {'no': no_val}
-                if product_s:
-                    current_row['product'] = (current_row.get('product') + ' ' + product_s).strip() if current_row.get('product') else product_s
-                if variation_s:
-                    current_row['variation'] = (current_row.get('variation') + ' ' + variation_s) if current_row.get('variation') else variation_s
-                if price_val is not None:
-                    current_row['price'] = price_val
-                if qty_val is not None:
-                    current_row['qty'] = qty_val
-                if subtotal_val is not None:
-                    current_row['subtotal'] = subtotal_val
-            flush_row()
-    return items
+        words: List[str] = []
+        corners: List[Tuple[float, float, float, float]] = []
+        line_ids: List[int] = []
+        for line_no, ln in enumerate(sorted(lines, key=lambda x: x.get('MinTop', 0))):
+            for w in ln.get('Words', []) or []:
+                left = float(w.get('Left', 0))
+                top = float(w.get('Top', 0))
+                width = float(w.get('Width', 0))
+                height = float(w.get('Height', 0))
+                words.append(w.get('WordText', ''))
+                corners.append((left, top, left+width, top+height))
+                line_ids.append(line_no)
+        if not words:
+            continue
+        x0, y0, x1, y1 = np.asarray(corners, dtype=np.float64).T
+        engine.add_page(_WordBoxes(words, x0, y0, x1, y1, line=line_ids), page_no)
+    return engine.finish()
 
 
-def _paddle_ocr_extract_lines_and_items(images: List[Image.Image]) -> Tuple[str, List[Dict[str, Any]]]:
+def _paddle_ocr_extract_lines_and_items(images: List["Image.Image"]) -> Tuple[str, List[Dict[str, Any]]]:
     """Use PaddleOCR to get high-quality text lines and parse item rows heuristically.
 
     Returns a tuple of (all_text_lines, items). This complements Tesseract: we keep
     Tesseract as the primary text extractor, while Paddle helps with tables/currency.
     """
-    if not images or PaddleOCR is None:
+    if not images:
+        return ('', [])
+    paddleocr = _optional_module('paddleocr')
+    PaddleOCR = getattr(paddleocr, 'PaddleOCR', None)
+    if PaddleOCR is None:
         return ('', [])
     try:
         import numpy as np  # paddleocr depends on numpy
@@ -1457,6 +2336,7 @@ def _paddle_ocr_extract_lines_and_items(images: List[Image.Image]) -> Tuple[str,
             return float(m.group(0).replace(',', '')) if m else None
 
     for img in images:
+        _stage_checkpoint()
         try:
             arr = np.array(img.convert('RGB'))
             res = ocr.ocr(arr, cls=True)
@@ -1964,7 +2844,431 @@ def _paddle_ocr_extract_lines_and_items(images: List[Image.Image]) -> Tuple[str,
     return (combined_text, all_items)
 
 
-def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, Any]:
+# Stage cost priors in ms: (fixed, per page). Refined per stage from past budgeted runs.
+_STAGE_COST_PRIORS: Dict[str, Tuple[float, float]] = {
+    'page_ocr': (50.0, 1500.0),
+    'ocr_coarse_to_fine': (50.0, 900.0),
+    'page_triage': (5.0, 150.0),
+    'pdfplumber': (100.0, 150.0),
+    'layout': (20.0, 40.0),
+    'tesseract_roi': (300.0, 1200.0),
+    'tesseract_tsv': (200.0, 1500.0),
+    'paddle': (3000.0, 4000.0),
+    'google_vision': (300.0, 400.0),
+    'ocrspace': (500.0, 1500.0),
+}
+# Relative value of each stage's items (mirrors the item source priority in process_file)
+_STAGE_VALUE: Dict[str, float] = {
+    'pdfplumber': 8.0, 'tesseract_roi': 7.0, 'layout': 5.0, 'tesseract_tsv': 4.0,
+}
+
+_SCHEDULER = None
+
+
+class _StageCancelled(BaseException):
+    """Raised at a stage checkpoint once the budget's deadline has passed.
+
+    A BaseException (like asyncio.CancelledError), so the extractors' `except Exception`
+    fallbacks let it through to _StageScheduler.run instead of carrying on with the next page.
+    """
+
+
+class _StageScheduler:
+    """Runs process_file's extractor stages against an optional latency budget.
+
+    Every stage runs inline on the calling thread. Without a budget that is all. With one, a
+    stage is skipped when its estimated cost (fixed + per-page ms, learned from past runs) does
+    not fit the time left, and a running stage is cancelled (its result discarded) at its next
+    checkpoint after the deadline: the extractors call _stage_checkpoint() between pages, regions
+    and provider calls, Tesseract subprocesses are killed at the deadline (_ocr_timeout) and HTTP
+    calls time out by it (_request_timeout). Nothing of a stage keeps running once run() returns.
+    The deadline counts from interpreter start, minus a reserve for structuring and printing the
+    result.
+    """
+
+    def __init__(self, budget_ms: Optional[float] = None, started_at: Optional[float] = None):
+        self.budget_ms = budget_ms if budget_ms and budget_ms > 0 else None
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        default_reserve = max(300.0, 0.1 * self.budget_ms) if self.budget_ms else 0.0
+        self.reserve_ms = float(os.environ.get('PROCESS_FILE_BUDGET_RESERVE_MS', default_reserve) or 0)
+        self.history_path = os.environ.get('PROCESS_FILE_STAGE_HISTORY') or os.path.join(
+            tempfile.gettempdir(), 'process_file_stage_timings.json')
+        self.history: Dict[str, Dict[str, float]] = {}
+        self.ran: List[Dict[str, Any]] = []
+        self.skipped: List[Dict[str, Any]] = []
+        self.cancelled: List[Dict[str, Any]] = []
+        # Stages running now (the digital-PDF stages may overlap); checkpoints only cancel inside one
+        self.active = 0
+        self._active_lock = threading.Lock()
+        if self.budget_ms:
+            try:
+                with open(self.history_path, 'r', encoding='utf-8') as f:
+                    self.history = json.load(f)
+            except Exception:
+                self.history = {}
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def remaining_ms(self) -> Optional[float]:
+        """Milliseconds left for extractor stages (None without a budget)."""
+        if not self.budget_ms:
+            return None
+        return self.budget_ms - self.reserve_ms - self.elapsed_ms()
+
+    def request_timeout(self, default: float) -> float:
+        """HTTP timeout in seconds for an external call, capped by the time left."""
+        remaining = self.remaining_ms()
+        if remaining is None:
+            return default
+        return max(1.0, min(default, remaining / 1000))
+
+    def checkpoint(self) -> None:
+        """Raise _StageCancelled when a stage is running and the deadline has passed."""
+        if self.active and self.budget_ms and self.remaining_ms() <= 0:
+            raise _StageCancelled()
+
+    def ocr_timeout(self) -> float:
+        """Seconds a Tesseract call of the running stage may take (0: no limit); cancels past the deadline."""
+        self.checkpoint()
+        if not self.active or not self.budget_ms:
+            return 0
+        return max(0.05, self.remaining_ms() / 1000)
+
+    def estimate_ms(self, stage: str, pages: int = 1) -> float:
+        fixed, per_page = _STAGE_COST_PRIORS.get(stage, (100.0, 500.0))
+        learned = self.history.get(stage) or {}
+        per_page = float(learned.get('perPageMs', per_page))
+        return fixed + per_page * max(1, pages)
+
+    def order(self, stages: List[str], pages: int = 1) -> List[str]:
+        """Independent stages in run order: as given without a budget, else best value per ms first."""
+        if not self.budget_ms:
+            return list(stages)
+        return sorted(stages, key=lambda s: self.estimate_ms(s, pages) / _STAGE_VALUE.get(s, 1.0))
+
+    def _learn(self, stage: str, pages: int, ms: float) -> None:
+        fixed, per_page = _STAGE_COST_PRIORS.get(stage, (100.0, 500.0))
+        observed = max(0.0, ms - fixed) / max(1, pages)
+        entry = self.history.setdefault(stage, {'perPageMs': per_page, 'runs': 0})
+        # Exponential moving average so a machine's real speed wins over the priors quickly
+        entry['perPageMs'] = round(0.7 * float(entry.get('perPageMs', per_page)) + 0.3 * observed, 1)
+        entry['runs'] = int(entry.get('runs', 0)) + 1
+
+    def run(self, stage: str, fn, pages: int = 1, default: Any = None) -> Any:
+        """Run fn() as `stage` unless the budget rules it out; returns default when skipped or cancelled."""
+        remaining = self.remaining_ms()
+        estimate = self.estimate_ms(stage, pages)
+        if remaining is not None and estimate > remaining:
+            self.skipped.append({'stage': stage, 'pages': pages, 'estimateMs': round(estimate, 1),
+                                 'remainingMs': round(max(0.0, remaining), 1)})
+            return default
+        start = time.perf_counter()
+        with self._active_lock:
+            self.active += 1
+        try:
+            with _span(stage, pages=pages), _profile_stage(stage):
+                result = fn()
+        except _StageCancelled:
+            self._record_cancel(stage, pages, estimate, start)
+            return default
+        except Exception:
+            if self.budget_ms and self.remaining_ms() <= 0:
+                # A Tesseract call killed at the deadline fails like any other error
+                self._record_cancel(stage, pages, estimate, start)
+                return default
+            self._record_failure(stage, pages, estimate, start)
+            raise
+        finally:
+            with self._active_lock:
+                self.active -= 1
+        ms = (time.perf_counter() - start) * 1000
+        self.ran.append({'stage': stage, 'pages': pages, 'ms': round(ms, 1), 'estimateMs': round(estimate, 1)})
+        if self.budget_ms:
+            self._learn(stage, pages, ms)
+        return result
+
+    def _record_cancel(self, stage: str, pages: int, estimate: float, start: float) -> None:
+        waited = (time.perf_counter() - start) * 1000
+        self.cancelled.append({'stage': stage, 'pages': pages, 'estimateMs': round(estimate, 1),
+                               'waitedMs': round(waited, 1)})
+        self._learn(stage, pages, waited)
+
+    def _record_failure(self, stage: str, pages: int, estimate: float, start: float) -> None:
+        # Failures usually return early, so they are listed but not learned from
+        self.ran.append({'stage': stage, 'pages': pages, 'ms': round((time.perf_counter() - start) * 1000, 1),
+                         'estimateMs': round(estimate, 1), 'failed': True})
+
+    def save_history(self) -> None:
+        if not self.budget_ms or not (self.ran or self.cancelled):
+            return
+        try:
+            tmp = f'{self.history_path}.{os.getpid()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.history, f)
+            os.replace(tmp, self.history_path)
+        except Exception:
+            pass
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'budgetMs': self.budget_ms,
+            'reserveMs': self.reserve_ms,
+            'elapsedMs': round(self.elapsed_ms(), 1),
+            'ran': self.ran,
+            'skipped': self.skipped,
+            'cancelled': self.cancelled,
+        }
+
+
+def _request_timeout(default: float) -> float:
+    """Per-call timeout for external OCR requests, shortened to fit the active latency budget."""
+    return _SCHEDULER.request_timeout(default) if _SCHEDULER is not None else default
+
+
+def _stage_checkpoint() -> None:
+    """Cancel the running stage here if the latency budget's deadline has passed (see _StageScheduler)."""
+    if _SCHEDULER is not None:
+        _SCHEDULER.checkpoint()
+
+
+def _ocr_timeout() -> float:
+    """pytesseract timeout for a call inside a budgeted stage (0: none); cancels past the deadline."""
+    return _SCHEDULER.ocr_timeout() if _SCHEDULER is not None else 0
+
+
+# Bulk order-summary exports (Shopee/TikTok) put many invoices in one PDF. Each invoice starts on a
+# page whose header names another ID of a type the current invoice has (Order ID, Order Summary
+# No. or Invoice No.), or whose footer restarts the page count ("1 of N"); see _invoice_segments.
+# PROCESS_FILE_SPLIT_INVOICES=0 turns the split off.
+_INVOICE_ID_RE = re.compile(
+    r"(Order\s+Summary\s+No|Order\s+ID|Invoice\s+(?:No|Number))\.?\s*[:#]\s*([A-Z0-9][A-Z0-9-]{5,})", re.I)
+_PAGE_ONE_RE = re.compile(r"^\s*(?:Page\s+)?1\s*(?:of|/)\s*\d+\s*$", re.I | re.M)
+
+
+def _split_invoices_enabled() -> bool:
+    return os.environ.get('PROCESS_FILE_SPLIT_INVOICES', '1') not in ('0', 'false', 'False')
+
+
+def _invoice_segments(page_texts: List[str]) -> List[Dict[str, Any]]:
+    """Contiguous page ranges of a PDF, one per invoice, from the pages' text layers.
+
+    Pages without a text layer (or without a header) stay with the invoice before them, so a
+    scanned bulk export is one segment. IDs are compared per type: a page naming only an Order ID
+    does not split from an invoice known only by its Invoice No. Returns [{first, last (0-based),
+    ids, reason}], ids being every ID value seen.
+    """
+    segments: List[Dict[str, Any]] = []
+    for n, text in enumerate(page_texts):
+        ids: Dict[str, set] = {}
+        for m in _INVOICE_ID_RE.finditer(text or ''):
+            kind = ' '.join(m.group(1).lower().split()).replace('number', 'no')
+            ids.setdefault(kind, set()).add(m.group(2).upper())
+        current = segments[-1] if segments else None
+        shared = [kind for kind in ids if current is not None and kind in current['typed']]
+        reason = None
+        if current is None:
+            reason = 'start'
+        elif shared and not any(ids[kind] & current['typed'][kind] for kind in shared):
+            reason = 'order_id'
+        elif _PAGE_ONE_RE.search(text or ''):
+            reason = 'page_count'
+        if reason:
+            current = {'first': n, 'last': n, 'ids': set(), 'typed': {}, 'reason': reason}
+            segments.append(current)
+        current['last'] = n
+        for kind, values in ids.items():
+            current['typed'].setdefault(kind, set()).update(values)
+            current['ids'] |= values
+    for segment in segments:
+        del segment['typed']
+    return segments
+
+
+def _detect_invoice_segments(file_path: str) -> Optional[List[Dict[str, Any]]]:
+    """Invoice segments of a multi-invoice PDF, or None when the file holds one invoice."""
+    if os.path.splitext(file_path)[-1].lower() != '.pdf' or not _split_invoices_enabled():
+        return None
+    try:
+        with _FITZ_LOCK, fitz.open(file_path) as doc:
+            if len(doc) < 2:
+                return None
+            texts = [page.get_text() for page in doc]
+    except Exception:
+        return None
+    segments = _invoice_segments(texts)
+    return segments if len(segments) > 1 else None
+
+
+def _process_invoice_segment(path: str, poppler_path: str | None, deadline: Optional[float]) -> Tuple[Dict[str, Any], float]:
+    """Worker for one invoice of a split PDF, traced and timed on its own.
+
+    deadline is the caller's time.time() deadline (None: no budget); the invoice's budget is what
+    is left of it when the invoice starts, so invoices queued behind others do not get it afresh.
+    Its stdout goes to stderr and a missing dependency raises: only the parent writes the result.
+    """
+    global _TRACER, _MAIN_STARTED_AT
+    budget_ms = max(1.0, (deadline - time.time()) * 1000) if deadline is not None else 0.0
+    saved = _TRACER, _MAIN_STARTED_AT
+    _TRACER, _MAIN_STARTED_AT = None, None
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = process_file(path, poppler_path, budget_ms)
+    finally:
+        _TRACER, _MAIN_STARTED_AT = saved
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _process_invoices(file_path: str, poppler_path: str | None, budget_ms: Optional[float],
+                      segments: List[Dict[str, Any]], detect_ms: float) -> Dict[str, Any]:
+    """Process each invoice of a bulk export as its own PDF, in parallel, and combine the results.
+
+    The top-level text, layout_items, warnings and font_hints concatenate the invoices' (what a
+    single-invoice caller reads); result['invoices'] keeps them apart with their page ranges and
+    diagnostics['items']['invoices'] keeps each one's item diagnostics. Every invoice runs against
+    one deadline taken from budget_ms. Invoices run in processes rather than threads: PyMuPDF is
+    not thread-safe and parsing is CPU-bound.
+    """
+    start = time.perf_counter()
+    if budget_ms is None:
+        budget_ms = float(os.environ.get('PROCESS_FILE_BUDGET_MS', '0') or 0)
+    workers = int(os.environ.get('PROCESS_FILE_SPLIT_WORKERS', '0') or 0) or min(4, os.cpu_count() or 1)
+    workers = max(1, min(workers, len(segments)))
+    outputs: List[Optional[Tuple[Dict[str, Any], float]]] = [None] * len(segments)
+    errors: Dict[int, str] = {}
+    with tempfile.TemporaryDirectory(prefix='process_file_invoices_') as tmp:
+        paths = []
+        with _span('split_write', invoices=len(segments)), _FITZ_LOCK, fitz.open(file_path) as src:
+            for i, seg in enumerate(segments):
+                path = os.path.join(tmp, f'invoice_{i + 1:03d}.pdf')
+                with fitz.open() as part:
+                    part.insert_pdf(src, from_page=seg['first'], to_page=seg['last'])
+                    part.save(path)
+                paths.append(path)
+        # One wall-clock deadline for every invoice (from the CLI the budget covers start-up too)
+        started = _STARTED_AT if _MAIN_STARTED_AT is not None else start
+        deadline = time.time() + (budget_ms - (time.perf_counter() - started) * 1000) / 1000 if budget_ms > 0 else None
+
+        with _span('split_invoices', invoices=len(segments), workers=workers):
+            if workers == 1:
+                for i, path in enumerate(paths):
+                    try:
+                        outputs[i] = _process_invoice_segment(path, poppler_path, deadline)
+                    except Exception as e:
+                        errors[i] = str(e)
+            else:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # Never fork: stage, OCR and HTTP pool threads may hold locks (fitz, caches, sessions)
+                # that a forked child would inherit locked. Workers start fresh and import this module
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                    # Invoices run side by side, each with what is left of the deadline when it starts
+                    futures = [pool.submit(_process_invoice_segment, path, poppler_path, deadline) for path in paths]
+                    for i, future in enumerate(futures):
+                        try:
+                            outputs[i] = future.result()
+                        except Exception as e:
+                            errors[i] = str(e)
+
+    invoices: List[Dict[str, Any]] = []
+    split_segments: List[Dict[str, Any]] = []
+    for i, seg in enumerate(segments):
+        result, ms = outputs[i] or ({'text': '', 'layout_items': [], 'warnings': [f'invoice_failed: {errors.get(i)}'],
+                                     'diagnostics': {}}, 0.0)
+        pages = {'from': seg['first'] + 1, 'to': seg['last'] + 1}
+        invoices.append({
+            'pages': pages,
+            'orderIds': sorted(seg['ids']),
+            'text': result.get('text') or '',
+            'layout_items': result.get('layout_items') or [],
+            'font_hints': result.get('font_hints'),
+            'warnings': result.get('warnings') or [],
+            'diagnostics': result.get('diagnostics') or {},
+        })
+        split_segments.append({'pages': pages, 'reason': seg['reason'], 'orderIds': sorted(seg['ids']),
+                               'items': len(invoices[-1]['layout_items']),
+                               'selectedSource': (invoices[-1]['diagnostics'].get('items') or {}).get('selectedSource'),
+                               'ms': round(ms, 1)})
+
+    counts: Counter = Counter()
+    item_counts: Counter = Counter()
+    for inv in invoices:
+        counts.update(inv['diagnostics'].get('counts') or {})
+        item_counts.update((inv['diagnostics'].get('items') or {}).get('counts') or {})
+    sources = {seg['selectedSource'] for seg in split_segments}
+    warnings: List[str] = []
+    for inv in invoices:
+        warnings.extend(w for w in inv['warnings'] if w not in warnings)
+    bold_lines = [line for inv in invoices for line in ((inv['font_hints'] or {}).get('bold_total_lines') or [])]
+    diagnostics: Dict[str, Any] = {
+        'ext': '.pdf',
+        'providers': next((inv['diagnostics']['providers'] for inv in invoices if inv['diagnostics'].get('providers')), {}),
+        'counts': dict(counts),
+        # Item extraction per invoice (each one's counts, ROI, selectedSource and tableParse)
+        'items': {
+            'counts': dict(item_counts),
+            'selectedSource': sources.pop() if len(sources) == 1 else 'mixed',
+            'invoices': [dict(inv['diagnostics'].get('items') or {}, pages=inv['pages']) for inv in invoices],
+        },
+        'split': {
+            'invoices': len(invoices),
+            'workers': workers,
+            'detectMs': round(detect_ms, 1),
+            'wallMs': round((time.perf_counter() - start) * 1000, 1),
+            'segments': split_segments,
+        },
+    }
+    return {
+        'text': '\n'.join(inv['text'] for inv in invoices if inv['text']),
+        'layout_items': [item for inv in invoices for item in inv['layout_items']],
+        'warnings': warnings,
+        'diagnostics': diagnostics,
+        'font_hints': {'bold_total_lines': bold_lines},
+        'invoices': invoices,
+    }
+
+
+def process_file(file_path: str, poppler_path: str | None = None, budget_ms: Optional[float] = None) -> Dict[str, Any]:
+    """Extract text and item rows from an invoice file.
+
+    budget_ms (default PROCESS_FILE_BUDGET_MS) bounds the extractor cascade: stages that do not
+    fit the time left are skipped or cancelled, and the best result so far is returned with
+    diagnostics['schedule'] listing what ran, what was skipped and what was cancelled.
+    Stages, pages, OCR calls and external requests are traced into diagnostics['timings'].
+    A PDF holding several invoices is split and each is processed on its own (result['invoices'],
+    diagnostics['split']); see _process_invoices.
+    """
+    global _TRACER
+    own_tracer = _TRACER is None
+    if own_tracer:
+        _TRACER = SpanTracer()
+    try:
+        with _span('process_file', file=os.path.basename(file_path), bytes=os.path.getsize(file_path)):
+            detect_start = time.perf_counter()
+            with _span('invoice_segments'):
+                segments = _detect_invoice_segments(file_path)
+            if segments:
+                result = _process_invoices(file_path, poppler_path, budget_ms, segments,
+                                           (time.perf_counter() - detect_start) * 1000)
+            else:
+                result = _process_file(file_path, poppler_path, budget_ms)
+        result['diagnostics']['timings'] = _TRACER.tree()
+        return result
+    finally:
+        if own_tracer:
+            _TRACER = None
+
+
+def _process_file(file_path: str, poppler_path: str | None, budget_ms: Optional[float]) -> Dict[str, Any]:
+    global _SCHEDULER
+    if budget_ms is None:
+        budget_ms = float(os.environ.get('PROCESS_FILE_BUDGET_MS', '0') or 0)
+    # From the CLI the budget covers interpreter start-up too (the caller's clock starts at spawn)
+    sched = _StageScheduler(budget_ms, started_at=_STARTED_AT if _MAIN_STARTED_AT is not None else None)
+    _SCHEDULER = sched
     ext = os.path.splitext(file_path)[-1].lower()
     extracted_text = ""
     layout_items: List[Dict[str, Any]] = []
@@ -1978,14 +3282,32 @@ def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, A
     paddle_lines_text: str = ''
     vision_items: List[Dict[str, Any]] = []
     ocrspace_items: List[Dict[str, Any]] = []
-    page_images: List[Image.Image] = []
-    paddle_page_images: List[Image.Image] = []
+    # Per-source table reconstruction cost (_TableEngine stats), reported in diagnostics['items']['tableParse']
+    table_parse: Dict[str, Dict[str, Any]] = {}
+    # Rendered pages for the OCR extractors; only OCR_MAX_PAGES_IN_MEMORY of them stay decoded (diagnostics['memory'])
+    page_images = _PageImageStore()
+    # image_to_data frames already read for page_images (by index), so the TSV stage does not OCR them again
+    tsv_frames: Dict[int, Any] = {}
+    paddle_page_images = _PageImageStore()
     warnings: List[str] = []
+    # Checked without importing paddle; the import happens only if Paddle OCR actually runs
+    paddle_available = _module_available('paddleocr')
+
+    def paddle_ready(out: List[str]) -> bool:
+        """Import paddle before its first run; an install that fails to import counts as unavailable."""
+        nonlocal paddle_available
+        if paddle_available and _optional_module('paddleocr') is None:
+            paddle_available = False
+            diagnostics['providers']['paddleocr_available'] = False
+        if not paddle_available:
+            out.append('paddleocr_unavailable')
+        return paddle_available
+
     diagnostics: Dict[str, Any] = {
         'ext': ext,
         'providers': {
-            'pdfplumber': bool('pdfplumber' in globals() and pdfplumber is not None),
-            'paddleocr_available': bool('PaddleOCR' in globals() and PaddleOCR is not None),
+            'pdfplumber': _module_available('pdfplumber'),
+            'paddleocr_available': paddle_available,
         },
         'counts': {
             'pages_ocr': 0,
@@ -1994,21 +3316,67 @@ def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, A
     }
 
     strict_tess = os.environ.get('STRICT_TESSERACT_ONLY', '0') in ('1','true','True')
+    # Coarse-to-fine OCR of image-only pages: a low-dpi pass finds the items table and totals,
+    # and only those bands are read at full resolution (diagnostics['ocrCoarseToFine'])
+    coarse_to_fine = os.environ.get('OCR_COARSE_TO_FINE', '0') in ('1','true','True')
+    coarse_dpi = float(os.environ.get('OCR_COARSE_DPI', '100') or 100)
+    coarse_fine_pages: List[Dict[str, Any]] = []
+    # Render scales chosen for OCR (diagnostics['renderScale']); see _choose_render_scale
+    render_scales: List[Dict[str, Any]] = []
+    # Multi-page PDFs: pages classed before any rasterising (diagnostics['pageTriage']); see _triage_pages
+    triage_mode = _triage_mode()
+
+    def _page_scale(page, engine: str, fixed: float, purpose: str, page_no: int) -> float:
+        scale, entry = _choose_render_scale(_PageRaster(page=page), engine, fixed, purpose, page_no)
+        render_scales.append(entry)
+        return scale
+
+    def _page_frames() -> Optional[List[Any]]:
+        return [tsv_frames.get(i) for i in range(len(page_images))] if tsv_frames else None
+
+    def _ocr_coarse_to_fine(raster: _PageRaster, fine_scale: float, page_no: int, label: str, adaptive: bool) -> bool:
+        """Read an image-only page coarse-to-fine; False when the whole page still needs OCR."""
+        nonlocal extracted_text
+        try:
+            fine_page = sched.run('ocr_coarse_to_fine', lambda: _coarse_to_fine_ocr(raster, fine_scale, coarse_dpi, page_no, adaptive))
+        except Exception as e:
+            warnings.append(f'coarse_to_fine_failed_{label}: {e}')
+            return False
+        if fine_page is None:
+            return False
+        coarse_fine_pages.append({'page': page_no, **fine_page['stats']})
+        if fine_page['renderScale'] is not None:
+            render_scales.append(fine_page['renderScale'])
+        if not fine_page['regions']:
+            return False
+        extracted_text += fine_page['text'] + "\n"
+        for img_roi, df in zip(fine_page['images'], fine_page['frames']):
+            tsv_frames[len(page_images)] = df
+            page_images.append(img_roi)
+        diagnostics['counts']['pages_ocr'] += 1
+        return True
+
     if ext in [".jpg", ".jpeg", ".png", ".bmp", ".tiff"]:
+        _annotate_span(pages=1)
         try:
             img = Image.open(file_path)
-            page_images.append(img)
         except Exception as e:
             warnings.append(f'image_open_failed: {e}')
             img = None
-        if img is not None:
+        if img is not None and not (coarse_to_fine and _ocr_coarse_to_fine(_PageRaster(image=img), 1.0, 1, 'image', _adaptive_scale_enabled())):
+            # Large photos of large print are read downscaled (never above the image's own resolution)
+            ocr_scale, entry = _choose_render_scale(_PageRaster(image=img), 'tesseract', 1.0, 'page_ocr', 1)
+            render_scales.append(entry)
+            ocr_img = _PageRaster(image=img).render(ocr_scale) if ocr_scale != 1.0 else img
+            page_images.append(ocr_img)
             try:
-                extracted_text = pytesseract.image_to_string(img)
+                extracted_text = sched.run('page_ocr', lambda: pytesseract.image_to_string(ocr_img, timeout=_ocr_timeout()), default='')
             except Exception as e:
                 warnings.append(f'tesseract_failed_image: {e}')
+        if img is not None:
             # Prepare for PaddleOCR on images as well
             try:
-                if PaddleOCR is not None:
+                if paddle_available:
                     paddle_page_images.append(img)
                     diagnostics['counts']['pages_paddle'] += 1
             except Exception:
@@ -2016,128 +3384,233 @@ def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, A
 
     elif ext == ".pdf":
         pdf_file = fitz.open(file_path)
+        _annotate_span(pages=len(pdf_file))
         bold_total_lines: List[str] = []
-        for page_num in range(len(pdf_file)):
-            page = pdf_file[page_num]
-            text = page.get_text()
-            if text and text.strip():
-                extracted_text += text + "\n"
-            else:
-                # If no embedded text, run OCR on the page image.
-                try:
-                    if poppler_path:
-                        images = convert_from_path(file_path, first_page=page_num + 1, last_page=page_num + 1, poppler_path=poppler_path)
-                        if images:
+        page_texts: Optional[List[str]] = None
+        triage: Optional[List[Dict[str, Any]]] = None
+        if triage_mode != 'off' and len(pdf_file) > 1:
+            page_texts = [page.get_text() or '' for page in pdf_file]
+            try:
+                triage = sched.run('page_triage', lambda: _triage_pages(pdf_file, page_texts), len(pdf_file))
+            except Exception as e:
+                warnings.append(f'page_triage_failed: {e}')
+
+        def _triaged_pages():
+            """(page index, rasterise it) in reading order. Skipped image-only pages are left out;
+            deferred ones come last and only when no order keyword has turned up in the text read"""
+            deferred = []
+            for page_num in range(len(pdf_file)):
+                decision = triage[page_num]['decision'] if triage and triage_mode == 'on' else 'ocr'
+                if decision == 'ocr':
+                    yield page_num, True
+                elif page_texts[page_num].strip():
+                    yield page_num, False
+                elif decision == 'defer':
+                    deferred.append(page_num)
+            if deferred and not _TRIAGE_ORDER.search(extracted_text):
+                for page_num in deferred:
+                    triage[page_num]['deferredRead'] = True
+                    yield page_num, True
+
+        for page_num, rasterise in _triaged_pages():
+            with _span('page', page=page_num + 1, pages=1):
+                page = pdf_file[page_num]
+                text = page_texts[page_num] if page_texts is not None else page.get_text()
+                if text and text.strip():
+                    extracted_text += text + "\n"
+                elif not (coarse_to_fine and _ocr_coarse_to_fine(_PageRaster(page=page), _roi_scale(), page_num + 1, f'pdf_page_{page_num+1}',
+                                                                        _adaptive_scale_enabled() and not _roi_scale_pinned())):
+                    # If no embedded text, run OCR on the page image.
+                    try:
+                        if poppler_path:
+                            ocr_dpi = round(72 * _page_scale(page, 'tesseract', 200 / 72, 'page_ocr', page_num + 1))
+                            with _span('rasterise', engine='pdf2image', dpi=ocr_dpi):
+                                images = pdf2image.convert_from_path(file_path, dpi=ocr_dpi, first_page=page_num + 1, last_page=page_num + 1, poppler_path=poppler_path)
+                            if images:
+                                try:
+                                    page_text = sched.run('page_ocr', lambda: pytesseract.image_to_string(images[0], timeout=_ocr_timeout()))
+                                    if page_text is not None:
+                                        extracted_text += page_text + "\n"
+                                except Exception as e:
+                                    warnings.append(f'tesseract_failed_pdf_page_{page_num+1}: {e}')
+                                page_images.append(images[0])
+                                diagnostics['counts']['pages_ocr'] += 1
+                        else:
+                            # Fallback: render the page to a pixmap using PyMuPDF, then OCR
+                            ocr_scale = _page_scale(page, 'tesseract', 1.0, 'page_ocr', page_num + 1)
+                            with _span('rasterise', engine='pymupdf', scale=ocr_scale) as raster:
+                                pix = page.get_pixmap(matrix=fitz.Matrix(ocr_scale, ocr_scale))
+                                png = pix.tobytes("png")
+                                raster['bytes'] = len(png)
+                                img = Image.open(io.BytesIO(png))
                             try:
-                                extracted_text += pytesseract.image_to_string(images[0]) + "\n"
+                                page_text = sched.run('page_ocr', lambda: pytesseract.image_to_string(img, timeout=_ocr_timeout()))
+                                if page_text is not None:
+                                    extracted_text += page_text + "\n"
                             except Exception as e:
                                 warnings.append(f'tesseract_failed_pdf_page_{page_num+1}: {e}')
-                            page_images.append(images[0])
+                            page_images.append(img)
                             diagnostics['counts']['pages_ocr'] += 1
-                    else:
-                        # Fallback: render the page to a pixmap using PyMuPDF, then OCR
-                        pix = page.get_pixmap()
-                        img = Image.open(io.BytesIO(pix.tobytes("png")))
+                    except Exception:
+                        # As a last resort, try PyMuPDF rasterization
                         try:
-                            extracted_text += pytesseract.image_to_string(img) + "\n"
-                        except Exception as e:
-                            warnings.append(f'tesseract_failed_pdf_page_{page_num+1}: {e}')
-                        page_images.append(img)
-                        diagnostics['counts']['pages_ocr'] += 1
+                            with _span('rasterise', engine='pymupdf') as raster:
+                                pix = page.get_pixmap()
+                                png = pix.tobytes("png")
+                                raster['bytes'] = len(png)
+                                img = Image.open(io.BytesIO(png))
+                            try:
+                                page_text = sched.run('page_ocr', lambda: pytesseract.image_to_string(img, timeout=_ocr_timeout()))
+                                if page_text is not None:
+                                    extracted_text += page_text + "\n"
+                            except Exception as e:
+                                warnings.append(f'tesseract_failed_pdf_page_{page_num+1}: {e}')
+                            page_images.append(img)
+                            diagnostics['counts']['pages_ocr'] += 1
+                        except Exception:
+                            pass
+                # Collect bold-ish lines that include totals / currency for better Grand Total detection
+                try:
+                    tdict = page.get_text("dict")
+                    for b in tdict.get('blocks', []) or []:
+                        for ln in b.get('lines', []) or []:
+                            spans = ln.get('spans', []) or []
+                            if not spans:
+                                continue
+                            line_text = ''.join([str(s.get('text') or '') for s in spans]).strip()
+                            if not line_text:
+                                continue
+                            # Heuristic bold detection via font name
+                            is_bold = any(re.search(r"bold|black|heavy|semibold|medium", str(s.get('font','')), re.I) for s in spans)
+                            if is_bold and (re.search(r"[₱$€£]", line_text) or re.search(r"total", line_text, re.I)):
+                                bold_total_lines.append(line_text)
                 except Exception:
-                    # As a last resort, try PyMuPDF rasterization
-                    try:
-                        pix = page.get_pixmap()
-                        img = Image.open(io.BytesIO(pix.tobytes("png")))
-                        try:
-                            extracted_text += pytesseract.image_to_string(img) + "\n"
-                        except Exception as e:
-                            warnings.append(f'tesseract_failed_pdf_page_{page_num+1}: {e}')
-                        page_images.append(img)
-                        diagnostics['counts']['pages_ocr'] += 1
-                    except Exception:
-                        pass
-            # Collect bold-ish lines that include totals / currency for better Grand Total detection
-            try:
-                tdict = page.get_text("dict")
-                for b in tdict.get('blocks', []) or []:
-                    for ln in b.get('lines', []) or []:
-                        spans = ln.get('spans', []) or []
-                        if not spans:
-                            continue
-                        line_text = ''.join([str(s.get('text') or '') for s in spans]).strip()
-                        if not line_text:
-                            continue
-                        # Heuristic bold detection via font name
-                        is_bold = any(re.search(r"bold|black|heavy|semibold|medium", str(s.get('font','')), re.I) for s in spans)
-                        if is_bold and (re.search(r"[₱$€£]", line_text) or re.search(r"total", line_text, re.I)):
-                            bold_total_lines.append(line_text)
-            except Exception:
-                pass
-            # Additionally, prepare page images for PaddleOCR even when embedded text exists (controlled by env)
-            try:
-                if PaddleOCR is not None and os.environ.get('PADDLE_ON_PDF', '1') in ('1', 'true', 'True'):
-                    try:
-                        mat = fitz.Matrix(2, 2)
-                        pix_pd = page.get_pixmap(matrix=mat)
-                    except Exception:
-                        pix_pd = page.get_pixmap()
-                    img_pd = Image.open(io.BytesIO(pix_pd.tobytes("png")))
-                    paddle_page_images.append(img_pd)
-                    diagnostics['counts']['pages_paddle'] += 1
-            except Exception:
-                pass
+                    pass
+                # Additionally, prepare page images for PaddleOCR even when embedded text exists (controlled by env)
+                try:
+                    if rasterise and paddle_available and os.environ.get('PADDLE_ON_PDF', '1') in ('1', 'true', 'True'):
+                        with _span('rasterise', engine='pymupdf', purpose='paddle') as raster:
+                            try:
+                                paddle_scale = _page_scale(page, 'paddle', 2.0, 'paddle', page_num + 1)
+                                raster['scale'] = paddle_scale
+                                mat = fitz.Matrix(paddle_scale, paddle_scale)
+                                pix_pd = page.get_pixmap(matrix=mat)
+                            except Exception:
+                                pix_pd = page.get_pixmap()
+                            png_pd = pix_pd.tobytes("png")
+                            raster['bytes'] = len(png_pd)
+                            img_pd = Image.open(io.BytesIO(png_pd))
+                        paddle_page_images.append(img_pd)
+                        diagnostics['counts']['pages_paddle'] += 1
+                except Exception:
+                    pass
+                if not text.strip():
+                    _release_page_cache()
+
+        page_count = len(pdf_file)
 
         # Try pdfplumber table extraction first (best for digital PDFs)
-        if not strict_tess:
+        def _run_pdfplumber(out: List[str]) -> None:
+            nonlocal plumber_items
+            if not strict_tess:
+                try:
+                    plumber_items = sched.run('pdfplumber', lambda: _extract_items_from_pdfplumber(file_path), page_count, [])
+                    if not plumber_items and _optional_module('pdfplumber') is None:
+                        out.append('pdfplumber_unavailable')
+                except Exception as e:
+                    out.append(f'pdfplumber_failed: {e}')
+                    plumber_items = []
+
+        # If we have pdfplumber, guide Tesseract to only read the Order Details table region
+        def _run_tesseract_roi(out: List[str]) -> None:
+            nonlocal roi_regions_debug, roi_images_len, tess_roi_items, paddle_roi_items
             try:
-                plumber_items = _extract_items_from_pdfplumber(file_path)
-                if not plumber_items and pdfplumber is None:
-                    warnings.append('pdfplumber_unavailable')
+                if _optional_module('pdfplumber') is not None:
+                    with _span('roi_regions', pages=page_count):
+                        roi_regions = _pdfplumber_find_order_details_regions(file_path)
+                    roi_regions_debug = roi_regions or []
+                    if roi_regions:
+                        def _render_and_ocr_regions():
+                            with _FITZ_LOCK:
+                                images = _render_pdf_regions_to_images(file_path, roi_regions, stats=render_scales)
+                            return images, (_extract_items_from_tesseract_images(images, table_parse.setdefault('tesseract_roi', {})) if images else [])
+                        roi_images, tess_roi_items = sched.run('tesseract_roi', _render_and_ocr_regions, len(roi_regions), ([], []))
+                        roi_images_len = len(roi_images)
+                        if roi_images:
+                            # Optionally run PaddleOCR on ROIs for better table capture
+                            enable_paddle_tables = os.environ.get('ENABLE_PADDLE_TABLES', '0') in ('1','true','True')
+                            if enable_paddle_tables and paddle_ready(out):
+                                _lines_txt, paddle_roi_items = sched.run('paddle', lambda: _paddle_ocr_extract_lines_and_items(roi_images), len(roi_images), ('', []))
             except Exception as e:
-                warnings.append(f'pdfplumber_failed: {e}')
-                plumber_items = []
-        # If we have pdfplumber, guide Tesseract to only read the Order Details table region
-        try:
-            if pdfplumber is not None:
-                roi_regions = _pdfplumber_find_order_details_regions(file_path)
-                roi_regions_debug = roi_regions or []
-                if roi_regions:
-                    roi_images = _render_pdf_regions_to_images(file_path, [r for _, r in roi_regions])
-                    roi_images_len = len(roi_images)
-                    if roi_images:
-                        tess_roi_items = _extract_items_from_tesseract_images(roi_images)
-                        # Optionally run PaddleOCR on ROIs for better table capture
-                        enable_paddle_tables = os.environ.get('ENABLE_PADDLE_TABLES', '0') in ('1','true','True')
-                        if enable_paddle_tables and PaddleOCR is not None:
-                            _lines_txt, paddle_roi_items = _paddle_ocr_extract_lines_and_items(roi_images)
-                        elif enable_paddle_tables and PaddleOCR is None:
-                            warnings.append('paddleocr_unavailable')
-        except Exception as e:
-            warnings.append(f'tesseract_roi_failed: {e}')
+                out.append(f'tesseract_roi_failed: {e}')
+
         # Try layout-based table extraction for items
-        if not strict_tess:
+        def _run_layout(out: List[str]) -> None:
+            nonlocal layout_items
+            if not strict_tess:
+                try:
+                    def _layout_locked():
+                        with _FITZ_LOCK:
+                            return _extract_items_from_pdf_layout(file_path, table_parse.setdefault('layout', {}))
+                    layout_items = sched.run('layout', _layout_locked, page_count, [])
+                except Exception as e:
+                    out.append(f'layout_extract_failed: {e}')
+                    layout_items = []
+
+        # Also run Tesseract TSV on rendered images (for scanned PDFs)
+        def _run_tesseract_tsv(out: List[str]) -> None:
+            nonlocal tesseract_items
             try:
-                layout_items = _extract_items_from_pdf_layout(file_path)
+                if page_images:
+                    tesseract_items = sched.run('tesseract_tsv', lambda: _extract_items_from_tesseract_images(page_images, table_parse.setdefault('tesseract', {}), _page_frames()), len(page_images), [])
             except Exception as e:
-                warnings.append(f'layout_extract_failed: {e}')
-                layout_items = []
-        # Also run Tesseract TSV on rendered images (for scanned PDFs)
-        try:
-            if page_images:
-                tesseract_items = _extract_items_from_tesseract_images(page_images)
-        except Exception as e:
-            warnings.append(f'tesseract_tsv_failed: {e}')
-            tesseract_items = []
+                out.append(f'tesseract_tsv_failed: {e}')
+                tesseract_items = []
+
+        # Independent stages; under a budget the best value per estimated ms runs first.
+        # By default they run concurrently (PROCESS_FILE_PARALLEL_STAGES=0 runs them in turn):
+        # Tesseract works in a subprocess, so ROI OCR overlaps pdfplumber and layout parsing.
+        # Each stage collects its own warnings, merged in stage order so output never depends on timing.
+        digital_stages = {
+            'pdfplumber': _run_pdfplumber,
+            'tesseract_roi': _run_tesseract_roi,
+            'layout': _run_layout,
+            'tesseract_tsv': _run_tesseract_tsv,
+        }
+        stage_order = sched.order(list(digital_stages), page_count)
+        stage_warnings: Dict[str, List[str]] = {stage: [] for stage in stage_order}
+        stage_ms: Dict[str, float] = {}
+
+        def _run_stage(stage: str) -> None:
+            stage_start = time.perf_counter()
+            with _adopt_span(group_span):
+                digital_stages[stage](stage_warnings[stage])
+            stage_ms[stage] = round((time.perf_counter() - stage_start) * 1000, 1)
+
+        parallel_stages = os.environ.get('PROCESS_FILE_PARALLEL_STAGES', '1') in ('1', 'true', 'True')
+        stages_start = time.perf_counter()
+        with _span('pdf_stages', pages=page_count, mode='threads' if parallel_stages else 'serial') as group_span:
+            if parallel_stages:
+                with ThreadPoolExecutor(max_workers=len(stage_order), thread_name_prefix='pdf-stage') as pool:
+                    list(pool.map(_run_stage, stage_order))
+            else:
+                for stage in stage_order:
+                    _run_stage(stage)
+        for stage in stage_order:
+            warnings.extend(stage_warnings[stage])
+        diagnostics['stages'] = {
+            'mode': 'threads' if parallel_stages else 'serial',
+            'wallMs': round((time.perf_counter() - stages_start) * 1000, 1),
+            'stageMs': {stage: stage_ms.get(stage) for stage in stage_order},
+        }
         # PaddleOCR for improved table/currency (optional)
         if not strict_tess:
             try:
                 enable_paddle_tables = os.environ.get('ENABLE_PADDLE_TABLES', '0') in ('1','true','True')
                 if enable_paddle_tables and (paddle_page_images or page_images):
-                    if PaddleOCR is not None:
-                        paddle_lines_text, paddle_items = _paddle_ocr_extract_lines_and_items(paddle_page_images or page_images)
-                    else:
-                        warnings.append('paddleocr_unavailable')
+                    if paddle_ready(warnings):
+                        paddle_images = paddle_page_images or page_images
+                        paddle_lines_text, paddle_items = sched.run('paddle', lambda: _paddle_ocr_extract_lines_and_items(paddle_images), len(paddle_images), ('', []))
             except Exception as e:
                 warnings.append(f'paddleocr_failed: {e}')
                 paddle_items = []
@@ -2146,7 +3619,7 @@ def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, A
         try:
             api_key = os.environ.get('GOOGLE_CLOUD_API_KEY') or os.environ.get('GOOGLE_API_KEY')
             if page_images and api_key:
-                vision_items = _extract_items_from_google_vision_images(page_images, api_key)
+                vision_items = sched.run('google_vision', lambda: _extract_items_from_google_vision_images(page_images, api_key, table_parse.setdefault('vision', {})), len(page_images), [])
         except Exception as e:
             warnings.append(f'google_vision_failed: {e}')
             vision_items = []
@@ -2154,18 +3627,21 @@ def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, A
         try:
             ocrspace_key = os.environ.get('OCRSPACE_API_KEY')
             if page_images and ocrspace_key:
-                ocrspace_items = _extract_items_from_ocrspace(page_images, ocrspace_key)
+                ocrspace_stats = diagnostics.setdefault('ocrspace', {})
+                ocrspace_items = sched.run('ocrspace', lambda: _extract_items_from_ocrspace(page_images, ocrspace_key, ocrspace_stats, table_parse.setdefault('ocrspace', {})), len(page_images), [])
         except Exception as e:
             warnings.append(f'ocrspace_failed: {e}')
             ocrspace_items = []
 
     elif ext == ".xlsx":
-        df = pd.read_excel(file_path)
-        extracted_text = df.to_string(index=False)
+        with _span('read_table', format='xlsx'):
+            df = pd.read_excel(file_path)
+            extracted_text = df.to_string(index=False)
 
     elif ext == ".csv":
-        df = pd.read_csv(file_path)
-        extracted_text = df.to_string(index=False)
+        with _span('read_table', format='csv'):
+            df = pd.read_csv(file_path)
+            extracted_text = df.to_string(index=False)
 
     else:
         raise ValueError(f"Unsupported file type: {ext}")
@@ -2173,7 +3649,7 @@ def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, A
     # Prefer layout-based items; then PaddleOCR-derived items; then Tesseract-derived items
     if not tesseract_items and page_images:
         try:
-            tesseract_items = _extract_items_from_tesseract_images(page_images)
+            tesseract_items = sched.run('tesseract_tsv', lambda: _extract_items_from_tesseract_images(page_images, table_parse.setdefault('tesseract', {}), _page_frames()), len(page_images), [])
         except Exception as e:
             warnings.append(f'tesseract_tsv_failed: {e}')
             tesseract_items = []
@@ -2182,10 +3658,9 @@ def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, A
     items_empty_before_paddle = not (plumber_items or layout_items or tesseract_items or vision_items or ocrspace_items)
     if (enable_paddle_tables or items_empty_before_paddle) and (paddle_page_images or page_images) and not paddle_items:
         try:
-            if PaddleOCR is not None:
-                paddle_lines_text, paddle_items = _paddle_ocr_extract_lines_and_items(paddle_page_images or page_images)
-            else:
-                warnings.append('paddleocr_unavailable')
+            if paddle_ready(warnings):
+                paddle_images = paddle_page_images or page_images
+                paddle_lines_text, paddle_items = sched.run('paddle', lambda: _paddle_ocr_extract_lines_and_items(paddle_images), len(paddle_images), ('', []))
         except Exception as e:
             warnings.append(f'paddleocr_failed: {e}')
             paddle_items = []
@@ -2195,7 +3670,7 @@ def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, A
         try:
             api_key = os.environ.get('GOOGLE_CLOUD_API_KEY') or os.environ.get('GOOGLE_API_KEY')
             if api_key:
-                vision_items = _extract_items_from_google_vision_images(page_images, api_key)
+                vision_items = sched.run('google_vision', lambda: _extract_items_from_google_vision_images(page_images, api_key, table_parse.setdefault('vision', {})), len(page_images), [])
         except Exception as e:
             warnings.append(f'google_vision_failed: {e}')
             vision_items = []
@@ -2204,7 +3679,8 @@ def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, A
         try:
             ocrspace_key = os.environ.get('OCRSPACE_API_KEY')
             if ocrspace_key:
-                ocrspace_items = _extract_items_from_ocrspace(page_images, ocrspace_key)
+                ocrspace_stats = diagnostics.setdefault('ocrspace', {})
+                ocrspace_items = sched.run('ocrspace', lambda: _extract_items_from_ocrspace(page_images, ocrspace_key, ocrspace_stats, table_parse.setdefault('ocrspace', {})), len(page_images), [])
         except Exception as e:
             warnings.append(f'ocrspace_failed: {e}')
             ocrspace_items = []
@@ -2270,7 +3746,34 @@ def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, A
         'roiImageCount': roi_images_len,
     }
     diagnostics['items']['selectedSource'] = items_hint_source
+    if any(table_parse.values()):
+        diagnostics['items']['tableParse'] = {source: stats for source, stats in table_parse.items() if stats}
+    if render_scales:
+        diagnostics['renderScale'] = _render_scale_summary(render_scales)
+    if ext == ".pdf" and triage:
+        diagnostics['pageTriage'] = _triage_summary(triage, triage_mode)
+    if coarse_fine_pages:
+        diagnostics['ocrCoarseToFine'] = _coarse_to_fine_summary(coarse_fine_pages, coarse_dpi)
+    if _OCR_CACHE is not None:
+        diagnostics['ocrCache'] = _OCR_CACHE.summary()
+    if _LAYOUT_TEMPLATES is not None:
+        diagnostics['layoutTemplates'] = _LAYOUT_TEMPLATES.summary()
+    if sched.budget_ms:
+        warnings.extend(f"budget_skipped: {entry['stage']}" for entry in sched.skipped)
+        warnings.extend(f"budget_cancelled: {entry['stage']}" for entry in sched.cancelled)
+        diagnostics['schedule'] = sched.report()
+        sched.save_history()
     diagnostics['items']['fallbackByNoItems'] = bool(items_empty_before_paddle)
+    diagnostics['memory'] = {
+        'peakRssMb': _peak_rss_mb(),
+        'pageImages': page_images.summary(),
+        'paddlePageImages': paddle_page_images.summary(),
+    }
+    for label, store in (('page_images', page_images), ('paddle_page_images', paddle_page_images)):
+        if store.dropped:
+            warnings.append(f'{label}_dropped: {store.dropped} pages over OCR_SPILL_MAX_MB')
+    page_images.close()
+    paddle_page_images.close()
 
     result: Dict[str, Any] = { 'text': extracted_text.strip(), 'layout_items': items_hint, 'warnings': warnings, 'diagnostics': diagnostics }
     try:
@@ -2282,6 +3785,159 @@ def process_file(file_path: str, poppler_path: str | None = None) -> Dict[str, A
     return result
 
 
+# Currency tokens and amounts as _extract_structured reads them; a plain 'P' stands in for an OCR'd '₱'
+_CURRENCY_SYMBOLS = ['₱', 'P', '$', '€', '£', '¥', '₹', '₽']
+_CURRENCY_CODES = ['USD','EUR','GBP','JPY','PHP','INR','CNY','RMB','CAD','AUD']
+_CURRENCY_RE = re.compile(r"(" + '|'.join([re.escape(c) for c in _CURRENCY_SYMBOLS + _CURRENCY_CODES]) + r")")
+_AMOUNT_NUMBER = r"[0-9]{1,3}(?:[0-9,]*)(?:\.[0-9]{2})?"
+_AMOUNT_RE = re.compile(_AMOUNT_NUMBER)
+_DIGIT_RE = re.compile(r"\d")
+
+# Words (and label separators) the line index records. Every field pattern in _extract_structured
+# contains at least one of them literally, so a line without it cannot match that pattern
+_LINE_KEYWORDS = (
+    'invoice', 'order', 'bill', 'statement', 'date', 'payment', 'seller', 'merchant', 'sold', 'supplier',
+    'vendor', 'buyer', 'tiktok', 'grand', 'delivery', 'receipt', 'subtotal', 'shipping', 'coupons', 'total',
+    'amount', 'peso', 'voucher', 'product', 'qty', 'quantity', 'details', ':', '-',
+)
+# Characters re.IGNORECASE matches to ASCII letters that str.lower() does not map onto them
+_KEYWORD_FOLD = str.maketrans('İıſ\u212a', 'iisk')
+
+
+class _LineIndex:
+    """
+    One classification pass over the text lines of _extract_structured: the keywords each line
+    contains, its digits, first currency token and amount tokens. Extractors ask for the lines
+    their patterns could match instead of rescanning every line with every pattern; the patterns
+    still decide on those lines, so results are the same as a full scan
+    """
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        text = '\n'.join(lines)
+        if not text.isascii():
+            # Length-preserving once 'İ' is folded, so offsets still line up with the lines
+            text = text.translate(_KEYWORD_FOLD)
+        text = text.lower()
+        starts = []
+        offset = 0
+        for line in lines:
+            starts.append(offset)
+            offset += len(line) + 1
+        self.postings: Dict[str, List[int]] = {}
+        for keyword in _LINE_KEYWORDS:
+            found: List[int] = []
+            pos = text.find(keyword)
+            while pos != -1:
+                idx = bisect.bisect_right(starts, pos) - 1
+                found.append(idx)
+                # Continue from the next line: one entry per line
+                pos = text.find(keyword, starts[idx + 1]) if idx + 1 < len(starts) else -1
+            self.postings[keyword] = found
+        self.digit_lines = [i for i, line in enumerate(lines) if _DIGIT_RE.search(line)]
+        self.amounts: List[List[str]] = [[] for _ in lines]
+        for i in self.digit_lines:
+            self.amounts[i] = _AMOUNT_RE.findall(lines[i])
+        self.currency: List[Optional[str]] = []
+        for line in lines:
+            m = _CURRENCY_RE.search(line)
+            self.currency.append(m.group(1) if m else None)
+
+    def with_any(self, *keywords: str) -> List[int]:
+        """Indices (ascending) of lines containing at least one of the keywords"""
+        if len(keywords) == 1:
+            return self.postings[keywords[0]]
+        return sorted(set().union(*(self.postings[k] for k in keywords)))
+
+    def with_all(self, *keywords: str) -> List[int]:
+        """Indices (ascending) of lines containing every keyword"""
+        common = set(self.postings[keywords[0]]).intersection(*(self.postings[k] for k in keywords[1:]))
+        return sorted(common)
+
+    def first(self, pattern: "re.Pattern", keywords: Tuple[str, ...], after: int = -1) -> Optional[int]:
+        """First line after `after` that has one of the keywords and matches pattern (search)"""
+        for i in self.with_any(*keywords):
+            if i > after and pattern.search(self.lines[i]):
+                return i
+        return None
+
+
+# Canonical money breakdown fields and the label spellings fuzzy-matched to them; on equal scores
+# the earlier variant wins
+_MONEY_LABEL_VARIANTS: Dict[str, List[str]] = {
+    'merchandiseSubtotal': [
+        'merchandise subtotal','subtotal','item subtotal','items subtotal','product subtotal','merch subtotal'
+    ],
+    'shippingFee': [
+        'shipping fee','delivery fee','ship fee','shipping cost','delivery charge','delivery charges','shipping'
+    ],
+    'shippingDiscount': [
+        'shipping discount','delivery discount','ship discount','shipping disc','shipping voucher','tiktok shipping coupons','shipping coupons'
+    ],
+    'platformVoucher': [
+        'platform voucher','voucher applied','platform voucher applied','voucher discount','total platform voucher applied','voucher','coupon','coupons','coupons applied'
+    ],
+}
+_MONEY_LABEL_THRESHOLD = 0.78  # threshold tuned heuristically
+
+
+class _FuzzyLabelIndex:
+    """
+    Best canonical label for a normalised line by SequenceMatcher ratio, scoring only the
+    variants that can still win. ratio() is 2*M/(len(a)+len(b)) where M, the matched characters,
+    cannot exceed the characters both strings share; a character inverted index gives that
+    count for every variant in one pass over the line, and variants whose bound is under the
+    threshold or not above the best score so far are skipped. Results equal a full scan
+    """
+
+    def __init__(self, labels: Dict[str, List[str]], threshold: float):
+        self.threshold = threshold
+        self.variants = [(key, v) for key, variants in labels.items() for v in variants]
+        self.by_char: Dict[str, List[Tuple[int, int]]] = {}
+        for vid, (_key, v) in enumerate(self.variants):
+            for ch, n in Counter(v).items():
+                self.by_char.setdefault(ch, []).append((vid, n))
+
+    def match(self, line_norm: str) -> Optional[Tuple[str, float]]:
+        shared = [0] * len(self.variants)
+        for ch, k in Counter(line_norm).items():
+            for vid, n in self.by_char.get(ch, ()):
+                shared[vid] += k if k < n else n
+        best_key = None
+        best_score = 0.0
+        la = len(line_norm)
+        for vid, (key, v) in enumerate(self.variants):
+            bound = 2.0 * shared[vid] / (la + len(v))
+            if bound < self.threshold or bound <= best_score:
+                continue
+            score = SequenceMatcher(None, line_norm, v).ratio()
+            if score > best_score:
+                best_score = score
+                best_key = key
+        if best_key and best_score >= self.threshold:
+            return best_key, best_score
+        return None
+
+
+_MONEY_LABEL_INDEX = _FuzzyLabelIndex(_MONEY_LABEL_VARIANTS, _MONEY_LABEL_THRESHOLD)
+
+
+@lru_cache(maxsize=8192)
+def _normalize_money_label(txt: str) -> str:
+    # Remove amounts & currency, punctuation, collapse spaces (memoised: item rows repeat across pages and files)
+    txt = _CURRENCY_RE.sub(' ', txt)
+    txt = _AMOUNT_RE.sub(' ', txt)
+    txt = re.sub(r"[^a-zA-Z ]+", ' ', txt)
+    txt = re.sub(r"\s+", ' ', txt).strip().lower()
+    return txt
+
+
+@lru_cache(maxsize=8192)
+def _fuzzy_match_label(line_norm: str) -> Optional[Tuple[str, float]]:
+    """(canonical key, score) of the closest money label at or above the threshold, else None"""
+    return _MONEY_LABEL_INDEX.match(line_norm)
+
+
 def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]] = None, font_hints: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Lightweight heuristic parsing of common invoice/receipt fields.
 
@@ -2291,6 +3947,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
     currency symbol or code is present (₱, $, €, £, ¥, etc.).
     """
     lines = [l.strip() for l in text.splitlines() if l.strip()]
+    # Single pass: keywords, currency and amounts per line; the extractors below only visit candidate lines
+    index = _LineIndex(lines)
 
     # Patterns
     date_patterns = [
@@ -2300,10 +3958,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
     ]
 
     # Include plain 'P' as fallback when the Peso sign '₱' is OCR'd as 'P'
-    currency_symbols = ['₱', 'P', '$', '€', '£', '¥', '₹', '₽']
-    currency_codes = ['USD','EUR','GBP','JPY','PHP','INR','CNY','RMB','CAD','AUD']
-    currency_regex = re.compile(r"(" + '|'.join([re.escape(c) for c in currency_symbols + currency_codes]) + r")")
-    amount_number = r"[0-9]{1,3}(?:[0-9,]*)(?:\.[0-9]{2})?"
+    currency_regex = _CURRENCY_RE
+    amount_number = _AMOUNT_NUMBER
     amount_regex = re.compile(rf"({amount_number})")
 
     invoice_regex = re.compile(r"\b(?:Invoice|Order|Order\s+Summary|Bill|Statement)\s*(?:ID|No\.?|Number|#)?[:\s-]*([A-Z0-9\-]{5,})", re.I)
@@ -2347,7 +4003,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
     amount_in_words_val = _parse_amount_in_words(lines)
 
     # Extract date (first match wins)
-    for line in lines:
+    for i in index.digit_lines:
+        line = lines[i]
         for pat in date_patterns:
             m = pat.search(line)
             if m:
@@ -2357,7 +4014,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
             break
 
     # Extract invoice / order numbers and related metadata
-    for line in lines:
+    for i in index.with_any('invoice', 'order', 'bill', 'statement', 'date', 'payment'):
+        line = lines[i]
         if found['invoiceNumber'] is None:
             m = invoice_regex.search(line)
             if m:
@@ -2387,7 +4045,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
             break
 
     # Extract supplier (explicit prefix preferred)
-    for line in lines:
+    for i in index.with_any('seller', 'merchant', 'sold', 'supplier', 'vendor'):
+        line = lines[i]
         m = seller_prefix_regex.match(line)
         if m:
             cand = m.group(1).strip()
@@ -2397,7 +4056,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
             break
 
     # Extract seller address (may span multiple lines after label)
-    for i, line in enumerate(lines):
+    for i in index.with_any('seller'):
+        line = lines[i]
         m = re.match(r"^(Seller\s*Address)[:\s-]+(.*)$", line, re.I)
         if m:
             first = m.group(2).strip()
@@ -2416,12 +4076,13 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
             break
 
     # Extract buyer fields
-    for line in lines:
-        m = re.match(r"^Buyer\s*Name[:\s-]+(.+)$", line, re.I)
+    for i in index.with_any('buyer'):
+        m = re.match(r"^Buyer\s*Name[:\s-]+(.+)$", lines[i], re.I)
         if m:
             found['buyerName'] = m.group(1).strip()
             break
-    for i, line in enumerate(lines):
+    for i in index.with_any('buyer'):
+        line = lines[i]
         m = re.match(r"^Buyer\s*Address[:\s-]+(.+)$", line, re.I)
         if m:
             first = m.group(1).strip()
@@ -2440,11 +4101,12 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
 
     # TikTok-specific block parsing: Delivery Details / Sold By / Order Details
     # Detect presence of TikTok style to trigger additional parsing
-    has_tiktok_markers = any(re.search(r"TikTok\s*Shop|Grand\s*total\s*\(includes\s*VAT\)", ln, re.I) for ln in lines)
+    has_tiktok_markers = any(re.search(r"TikTok\s*Shop|Grand\s*total\s*\(includes\s*VAT\)", lines[i], re.I)
+                             for i in index.with_any('tiktok', 'grand'))
     if has_tiktok_markers:
         # Delivery Details block: first line is buyer name, following lines until empty/next section are address
-        for i, ln in enumerate(lines):
-            if re.match(r"^\s*Delivery\s+Details\s*$", ln, re.I):
+        for i in index.with_any('delivery'):
+            if re.match(r"^\s*Delivery\s+Details\s*$", lines[i], re.I):
                 # collect next lines until a blank or a known header
                 addr_parts = []
                 buyer_nm = None
@@ -2464,7 +4126,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
                     found['buyerAddress'] = ' '.join(addr_parts)
                 break
         # Sold By: name can be on same or next line
-        for i, ln in enumerate(lines):
+        for i in index.with_any('sold'):
+            ln = lines[i]
             m = re.match(r"^\s*Sold\s*By\s*:?[\s-]*([^].]*)$", ln, re.I)
             if m:
                 val = m.group(1).strip()
@@ -2479,7 +4142,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
                         break
                 break
         # Order Details: Order Number and Order Date
-        for ln in lines:
+        for i in index.with_any('order'):
+            ln = lines[i]
             m = re.search(r"Order\s*Number\s*[:\-]\s*([A-Za-z0-9\-]+)", ln, re.I)
             if m and not found.get('orderId'):
                 found['orderId'] = m.group(1).strip()
@@ -2487,7 +4151,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
             if m2 and not found.get('dateIssued'):
                 found['dateIssued'] = m2.group(1).strip()
         # Receipt Number / Receipt Date -> summary no / date issued if still missing
-        for ln in lines:
+        for i in index.with_any('receipt'):
+            ln = lines[i]
             if not found.get('orderSummaryNo'):
                 m = re.search(r"Receipt\s*Number\s*[:\-]\s*([A-Za-z0-9\-]+)", ln, re.I)
                 if m:
@@ -2497,7 +4162,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
                 if m:
                     found['dateIssued'] = m.group(1).strip()
         # Monetary lines: Subtotal / Shipping / Coupons / TikTok shipping coupons / Grand total (includes VAT)
-        for ln in lines:
+        for i in index.with_any('subtotal', 'shipping', 'coupons', 'grand'):
+            ln = lines[i]
             # Subtotal
             m = re.search(r"^\s*Subtotal\s*[:\-]?\s*([₱$P]?\s*\d[\d,]*(?:\.\d{2})?)\b", ln, re.I)
             if m and found.get('merchandiseSubtotal') is None:
@@ -2619,7 +4285,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
     # Extract total: prefer explicit 'Grand Total' lines first (in plain text, allow next-line amount)
     if found.get('total') is None:
         gt_candidates: list[tuple[float,int,int,bool]] = []  # (value, score, idx, has_currency)
-        for idx, line in enumerate(lines):
+        for idx in index.with_any('grand'):
+            line = lines[idx]
             if not re.search(r"\bGrand\s*Total\b", line, re.I):
                 continue
             # same line amount
@@ -2672,14 +4339,15 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
 
     # Extract total with prioritization & scoring (fallback)
     candidate_totals: list[tuple[float, str, int]] = []  # (value, currency, score)
-    for idx, line in enumerate(lines):
+    for idx in index.with_any('total', 'amount'):
+        line = lines[idx]
         if not total_keyword_regex.search(line):
             continue
         # Skip lines that clearly reference components (shipping fee, discount, etc.) unless they also contain 'Grand'
         if negative_total_context.search(line) and not re.search(r"grand", line, re.I):
             continue
         # Accept numbers even if currency symbol was OCR-missed
-        nums = re.findall(amount_number, line)
+        nums = index.amounts[idx]
         if not nums:
             continue
         # Choose last number as probable total
@@ -2687,8 +4355,7 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
             val = float(nums[-1].replace(',', ''))
         except ValueError:
             continue
-        cur_match = currency_regex.search(line)
-        cur_val = cur_match.group(1) if cur_match else None
+        cur_val = index.currency[idx]
         # Score: +5 if contains Grand, +3 if Amount Due, +2 if Total Amount, +1 generic TOTAL, -2 if no currency symbol
         score = 0
         if re.search(r"grand", line, re.I):
@@ -2731,8 +4398,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
         found['grandTotalConfidence'] = max(prev_conf, 0.9)
         # Guess currency from text if not set
         if not found.get('currency'):
-            for line in lines:
-                if re.search(r"peso", line, re.I):
+            for i in index.with_any('peso'):
+                if re.search(r"peso", lines[i], re.I):
                     found['currency'] = 'PHP'
                     break
 
@@ -2740,21 +4407,20 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
     if found['total'] is None:
         best_val = None
         best_cur = None
-        for line in lines:
+        for idx in index.digit_lines:
+            line = lines[idx]
+            if index.currency[idx] is None or not index.amounts[idx]:
+                continue
             if negative_total_context.search(line):
                 continue
-            if currency_regex.search(line):
-                nums = re.findall(amount_number, line)
-                for n in nums:
-                    try:
-                        val = float(n.replace(',', ''))
-                    except ValueError:
-                        continue
-                    if best_val is None or val > best_val:
-                        best_val = val
-                        cur_match = currency_regex.search(line)
-                        if cur_match:
-                            best_cur = cur_match.group(1)
+            for n in index.amounts[idx]:
+                try:
+                    val = float(n.replace(',', ''))
+                except ValueError:
+                    continue
+                if best_val is None or val > best_val:
+                    best_val = val
+                    best_cur = index.currency[idx]
         if best_val is not None:
             found['total'] = best_val
             found['currency'] = best_cur
@@ -2762,46 +4428,10 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
             found['grandTotalSource'] = 'largest_currency'
             found['grandTotalConfidence'] = 0.5 if best_cur else 0.45
 
-    # Monetary breakdown lines with fuzzy label matching
-    canonical_money_labels: Dict[str, List[str]] = {
-        'merchandiseSubtotal': [
-            'merchandise subtotal','subtotal','item subtotal','items subtotal','product subtotal','merch subtotal'
-        ],
-        'shippingFee': [
-            'shipping fee','delivery fee','ship fee','shipping cost','delivery charge','delivery charges','shipping'
-        ],
-        'shippingDiscount': [
-            'shipping discount','delivery discount','ship discount','shipping disc','shipping voucher','tiktok shipping coupons','shipping coupons'
-        ],
-        'platformVoucher': [
-            'platform voucher','voucher applied','platform voucher applied','voucher discount','total platform voucher applied','voucher','coupon','coupons','coupons applied'
-        ],
-    }
-
-    def _normalize_label(txt: str) -> str:
-        # Remove amounts & currency, punctuation, collapse spaces
-        txt = currency_regex.sub(' ', txt)
-        txt = re.sub(amount_number, ' ', txt)
-        txt = re.sub(r"[^a-zA-Z ]+", ' ', txt)
-        txt = re.sub(r"\s+", ' ', txt).strip().lower()
-        return txt
-
-    def _fuzzy_match_label(line_norm: str) -> Optional[Tuple[str,float]]:
-        best_key = None
-        best_score = 0.0
-        for key, variants in canonical_money_labels.items():
-            for v in variants:
-                score = SequenceMatcher(None, line_norm, v).ratio()
-                if score > best_score:
-                    best_score = score
-                    best_key = key
-        if best_key and best_score >= 0.78:  # threshold tuned heuristically
-            return best_key, best_score
-        return None
-
+    # Monetary breakdown lines with fuzzy label matching (_MONEY_LABEL_VARIANTS)
     exclusion_noise = re.compile(r"receipt\s*number|tracking|awb|waybill|barcode|order\s*id|reference|ref\.?\s*no|date\b|time\b", re.I)
-    for raw_line in lines:
-        line_norm = _normalize_label(raw_line)
+    for idx, raw_line in enumerate(lines):
+        line_norm = _normalize_money_label(raw_line)
         if not line_norm:
             continue
         # Skip if clearly a grand total line to avoid overwriting
@@ -2816,11 +4446,11 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
         key, _score = match_res
         if found.get(key) is not None:
             continue
-        nums = re.findall(amount_number, raw_line)
+        nums = index.amounts[idx]
         if not nums:
             continue
         # Require currency for very large numbers to avoid capturing order/receipt IDs
-        has_currency = bool(currency_regex.search(raw_line))
+        has_currency = index.currency[idx] is not None
         try:
             candidate_val = float(nums[-1].replace(',', ''))
         except ValueError:
@@ -2830,40 +4460,37 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
         sign = -1 if (re.search(r"[-(]", raw_line) or 'discount' in key or 'voucher' in key) else 1
         val = candidate_val * sign
         found[key] = val
-        if not found['currency']:
-            cm = currency_regex.search(raw_line)
-            if cm:
-                found['currency'] = cm.group(1)
+        if not found['currency'] and has_currency:
+            found['currency'] = index.currency[idx]
 
     # Existing exact pattern fallback (only fill still-missing fields)
     if any(found[k] is None for k in ['merchandiseSubtotal','shippingFee','shippingDiscount','platformVoucher']):
         money_patterns = [
-            ('merchandiseSubtotal', r"(Merchandise\s+Subtotal|Subtotal)"),
-            ('shippingFee', r"Shipping\s+Fee"),
-            ('shippingDiscount', r"Shipping\s+Discount"),
-            ('platformVoucher', r"Total\s+Platform\s+Voucher\s+Applied"),
+            ('merchandiseSubtotal', r"(Merchandise\s+Subtotal|Subtotal)", 'subtotal'),
+            ('shippingFee', r"Shipping\s+Fee", 'shipping'),
+            ('shippingDiscount', r"Shipping\s+Discount", 'shipping'),
+            ('platformVoucher', r"Total\s+Platform\s+Voucher\s+Applied", 'voucher'),
         ]
-        for key, label_pat in money_patterns:
+        for key, label_pat, keyword in money_patterns:
             if found[key] is not None:
                 continue
             label_re = re.compile(label_pat, re.I)
-            for line in lines:
+            for idx in index.with_any(keyword):
+                line = lines[idx]
                 if label_re.search(line):
                     if exclusion_noise.search(line):
                         continue
                     sign = -1 if re.search(r"[-(]", line) or 'discount' in key or 'voucher' in key else 1
-                    nums = re.findall(amount_number, line)
+                    nums = index.amounts[idx]
                     if nums:
                         try:
                             val = float(nums[-1].replace(',', '')) * sign
-                            if not currency_regex.search(line) and abs(val) > 10000000:
+                            if index.currency[idx] is None and abs(val) > 10000000:
                                 # Skip absurdly large values without currency
                                 continue
                             found[key] = val
-                            if not found['currency']:
-                                cm = currency_regex.search(line)
-                                if cm:
-                                    found['currency'] = cm.group(1)
+                            if not found['currency'] and index.currency[idx]:
+                                found['currency'] = index.currency[idx]
                         except ValueError:
                             pass
                     break
@@ -2872,8 +4499,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
     header_idx = None
     # Accept headers that contain at least Product and Qty columns, even without explicit No/Subtotal
     header_regex = re.compile(r"^(?=.*\bProduct\b)(?=.*\bQty\b).*", re.I)
-    for i, line in enumerate(lines):
-        if header_regex.search(line):
+    for i in index.with_all('product', 'qty'):
+        if header_regex.search(lines[i]):
             header_idx = i
             break
 
@@ -3002,22 +4629,20 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
                 })
             found['items'] = normed
     
+    # 'Order Details' section start and end (first stop line after it), shared by the fallbacks below
+    order_details_idx = index.first(re.compile(r"^\s*Order\s+Details\b", re.I), ('details',))
+    order_details_end = len(lines)
+    if order_details_idx is not None:
+        stop_re = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due|Total\s+Quantity", re.I)
+        stop_idx = index.first(stop_re, ('grand', 'subtotal', 'shipping', 'amount', 'quantity'), after=order_details_idx)
+        if stop_idx is not None:
+            order_details_end = stop_idx
+
     # Region-based text parser in 'Order Details' block (no headers/labels) to reconstruct rows
     if not found.get('items'):
         # 1) Find 'Order Details' block boundaries in text lines
-        start_idx = None
-        for i, ln in enumerate(lines):
-            if re.search(r"^\s*Order\s+Details\b", ln, re.I):
-                start_idx = i
-                break
-        if start_idx is not None:
-            stop_re = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due|Total\s+Quantity", re.I)
-            block: List[str] = []
-            for j in range(start_idx + 1, len(lines)):
-                if stop_re.search(lines[j]):
-                    break
-                if lines[j].strip():
-                    block.append(lines[j].strip())
+        if order_details_idx is not None:
+            block: List[str] = lines[order_details_idx + 1:order_details_end]
             # 2) Parse rows. Rows begin with an index number; continuation lines append to product.
             items_rb: List[Dict[str, Any]] = []
             cur: Optional[Dict[str, Any]] = None
@@ -3113,10 +4738,11 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
         price_syn = r"price|unit|unit\s*price|unitprice"
         subtotal_syn = r"subtotal|amount|total"
         header_pattern = re.compile(rf"^(?=.*{prod_syn})(?=.*{qty_syn})(?=.*{price_syn})(?=.*{subtotal_syn}).*$", re.I)
-        for idx, line in enumerate(lines):
-            norm = re.sub(r"\s+", " ", line.lower())
+        for idx in index.with_any('qty', 'quantity'):
+            norm = re.sub(r"\s+", " ", lines[idx].lower())
             if header_pattern.search(norm):
                 header_candidates.append(idx)
+                break
         chosen_header = header_candidates[0] if header_candidates else None
         if chosen_header is not None:
             # Tokenize header to find column boundaries by splitting on 2+ spaces
@@ -3214,18 +4840,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
     # Final conservative fallback: parse label-style rows inside 'Order Details' section
     if not found.get('items'):
         # Locate 'Order Details' block boundaries
-        start_idx = None
-        for i, ln in enumerate(lines):
-            if re.search(r"^\s*Order\s+Details\b", ln, re.I):
-                start_idx = i
-                break
-        if start_idx is not None:
-            stop_re = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due|Total\s+Quantity", re.I)
-            block = []
-            for j in range(start_idx + 1, len(lines)):
-                if stop_re.search(lines[j]):
-                    break
-                block.append(lines[j])
+        if order_details_idx is not None:
+            block: List[str] = lines[order_details_idx + 1:order_details_end]
             # Parse within block using label cues
             items_fb: List[Dict[str, Any]] = []
             cur: Dict[str, Any] = {}
@@ -3296,19 +4912,8 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
     # Last-chance Order Details parser: within the section, pair product lines with next-line numeric-only qty
     if not found.get('items'):
         # Find Order Details block boundaries
-        start_idx = None
-        for i, ln in enumerate(lines):
-            if re.search(r"^\s*Order\s+Details\b", ln, re.I):
-                start_idx = i
-                break
-        if start_idx is not None:
-            stop_re = re.compile(r"Grand\s+Total|Merchandise\s+Subtotal|Shipping\s+Fee|Amount\s+Due|Total\s+Quantity", re.I)
-            block: List[str] = []
-            for j in range(start_idx + 1, len(lines)):
-                if stop_re.search(lines[j]):
-                    break
-                if lines[j].strip():
-                    block.append(lines[j].strip())
+        if order_details_idx is not None:
+            block: List[str] = lines[order_details_idx + 1:order_details_end]
             # Skip month/date-only lines like "June" or "June :"
             month_re = re.compile(r"^(Jan|Feb|Mar|Apr|May|Jun|June|Jul|Aug|Sep|Sept|Oct|Nov|Dec)\b", re.I)
             dashed_re = re.compile(r"^-{3,}$")
@@ -3381,9 +4986,9 @@ def _extract_structured(text: str, layout_items: Optional[List[Dict[str, Any]]]
     # ---------------- Second Pass: Key/Value JSON-style harvesting & fallbacks ----------------
     # Build a quick key->value map from lines that look like labelled pairs for additional recovery.
     kv_map: Dict[str, str] = {}
-    for line in lines:
+    for i in index.with_any(':', '-'):
         # Split on first ':' or ' - ' if present.
-        m = re.match(r"^\s*([A-Za-z][A-Za-z0-9 ./#]+?)\s*[:\-]\s*(.+?)\s*$", line)
+        m = re.match(r"^\s*([A-Za-z][A-Za-z0-9 ./#]+?)\s*[:\-]\s*(.+?)\s*$", lines[i])
         if m:
             raw_key = m.group(1).strip().lower()
             raw_val = m.group(2).strip()
@@ -3826,15 +5431,27 @@ def _build_standard_overview(found: Dict[str, Any]) -> Dict[str, Any]:
     return overview
 
 def main():
-    if len(sys.argv) < 2:
+    global _MAIN_STARTED_AT
+    _MAIN_STARTED_AT = time.perf_counter()
+    args = sys.argv[1:]
+    budget_ms = None
+    if '--budget-ms' in args:
+        i = args.index('--budget-ms')
+        try:
+            budget_ms = float(args[i + 1])
+        except (IndexError, ValueError):
+            budget_ms = None
+        del args[i:i + 2]
+    profile = profiling_requested(args)
+    if len(args) < 1:
         print(json.dumps({
             "success": False,
-            "error": "Usage: process_file.py <file_path>",
+            "error": "Usage: process_file.py <file_path> [--budget-ms MS] [--profile]",
             "text": ""
         }))
         sys.exit(1)
 
-    file_path = sys.argv[1]
+    file_path = args[0]
     if not os.path.exists(file_path):
         print(json.dumps({
             "success": False,
@@ -3843,17 +5460,62 @@ def main():
         }))
         sys.exit(1)
 
+    global _TRACER, _PROFILER
+    _TRACER = SpanTracer()
+    if profile:
+        _PROFILER = start_profiler(file_path, 'process_file')
     try:
-        poppler_path = _configure_binaries()
-        result = process_file(file_path, poppler_path)
-        text = result['text'] if isinstance(result, dict) else str(result)
-        layout_items = result.get('layout_items') if isinstance(result, dict) else None
-        font_hints = result.get('font_hints') if isinstance(result, dict) else None
-        warnings = result.get('warnings') if isinstance(result, dict) else []
-        diagnostics = result.get('diagnostics') if isinstance(result, dict) else None
-        structured = _extract_structured(text, layout_items, font_hints)
-        standard_overview = _build_standard_overview(structured)
-        print(json.dumps({
+        with _span('main'):
+            poppler_path = _configure_binaries()
+            with _profile_stage('process_file'):
+                result = process_file(file_path, poppler_path, budget_ms)
+            text = result['text'] if isinstance(result, dict) else str(result)
+            layout_items = result.get('layout_items') if isinstance(result, dict) else None
+            font_hints = result.get('font_hints') if isinstance(result, dict) else None
+            warnings = result.get('warnings') if isinstance(result, dict) else []
+            diagnostics = result.get('diagnostics') if isinstance(result, dict) else None
+            with _span('extract_structured', chars=len(text or '')), _profile_stage('extract_structured'):
+                structured = _extract_structured(text, layout_items, font_hints)
+            with _span('standard_overview'), _profile_stage('standard_overview'):
+                standard_overview = _build_standard_overview(structured)
+            # Bulk exports: one structured record per invoice, next to the combined one above
+            invoices = None
+            if isinstance(result, dict) and result.get('invoices'):
+                invoices = []
+                with _span('extract_invoices', invoices=len(result['invoices'])):
+                    for inv in result['invoices']:
+                        inv_structured = _extract_structured(inv['text'], inv['layout_items'], inv['font_hints'])
+                        invoices.append({
+                            'pages': inv['pages'],
+                            'orderIds': inv['orderIds'],
+                            'structured': inv_structured,
+                            'standardOverview': _build_standard_overview(inv_structured),
+                            'warnings': inv['warnings'],
+                        })
+        if _PROFILER is not None:
+            # cProfile stats and tracemalloc snapshots go next to the input; the summary into diagnostics
+            try:
+                profile_summary = _PROFILER.finish()
+            except Exception as e:
+                profile_summary = None
+                warnings.append(f'profile_write_failed: {e}')
+            _PROFILER = None
+            if isinstance(diagnostics, dict) and profile_summary is not None:
+                diagnostics['profile'] = profile_summary
+        if isinstance(diagnostics, dict):
+            diagnostics['imports'] = _import_report()
+            diagnostics['timings'] = _TRACER.tree()
+            # PROCESS_FILE_TRACE=1 writes <input>.trace.json; any other value is the output path
+            trace_target = os.environ.get('PROCESS_FILE_TRACE', '')
+            if trace_target and trace_target not in ('0', 'false', 'False'):
+                trace_path = file_path + '.trace.json' if trace_target in ('1', 'true', 'True') else trace_target
+                try:
+                    diagnostics['traceFile'] = _TRACER.write_chrome_trace(trace_path)
+                except Exception as e:
+                    warnings.append(f'trace_write_failed: {e}')
+        if os.environ.get('PROCESS_FILE_IMPORT_REPORT', '0') in ('1', 'true', 'True'):
+            _print_import_report()
+        output = {
             "success": True,
             "error": None,
             "text": text,
@@ -3861,7 +5523,10 @@ def main():
             "standardOverview": standard_overview,
             "warnings": warnings,
             "diagnostics": diagnostics
-        }))
+        }
+        if invoices is not None:
+            output["invoices"] = invoices
+        print(json.dumps(output))
     except Exception as e:
         print(json.dumps({
             "success": False,
@@ -1,5 +1,6 @@
 import os
 import sys
+import contextlib
 import json
 import re
 from dataclasses import dataclass, asdict
@@ -7,6 +8,8 @@ from typing import List, Optional, Dict, Any
 
 import pandas as pd
 
+from script_profiler import profiling_requested, start_profiler
+
 # Column alias maps per platform
 TIKTOK_ALIASES = {
     'total_revenue': ['total revenue', 'sales (after seller discounts)', 'net sales', 'net item amount'],
@@ -26,6 +29,14 @@ SHOPEE_ALIASES = {
 
 COMMON_SCHEMA_KEYS = ['date','platform','order_id','total_revenue','fees','withholding_tax','cash_received']
 
+# Active profiler when run with --profile / PYTHON_PROFILE (see script_profiler.py)
+_PROFILER = None
+
+
+def _profile_stage(name: str):
+    """Profiler stage (cProfile + tracemalloc snapshot) when profiling, else a no-op context."""
+    return _PROFILER.stage(name) if _PROFILER is not None else contextlib.nullcontext()
+
 @dataclass
 class NormalizedSale:
     date: str
@@ -212,10 +223,11 @@ def ingest_sales(path: str) -> Dict[str, Any]:
     then select the best parse by number of normalized rows. Returns diagnostics.
     """
     # Try a quick default read for a fast-path
-    try:
-        df_default = load_excel(path)
-    except Exception:
-        df_default = pd.DataFrame()
+    with _profile_stage('default_read'):
+        try:
+            df_default = load_excel(path)
+        except Exception:
+            df_default = pd.DataFrame()
 
     best = {
         'platform': 'Unknown',
@@ -241,91 +253,100 @@ def ingest_sales(path: str) -> Dict[str, Any]:
     header_candidates = list(range(0, 16))
 
     for sheet in sheet_names:
-        for hdr in header_candidates:
-            try:
-                df = pd.read_excel(path, engine='openpyxl', sheet_name=sheet, header=hdr)
-            except Exception:
-                continue
-            if df is None or df.empty:
-                best['diagnostics']['tried'].append({'sheet': sheet, 'header': hdr, 'rows': 0, 'why': 'empty'})
-                continue
-            # Detect platform on this candidate frame
-            platform = detect_platform(df)
-            # Normalize rows
-            try:
-                sales = normalize_rows(df, platform)
-            except Exception:
-                best['diagnostics']['tried'].append({'sheet': sheet, 'header': hdr, 'rows': 0, 'why': 'normalize_error'})
-                continue
-            rows_count = len(sales)
-            best['diagnostics']['tried'].append({'sheet': sheet, 'header': hdr, 'rows': rows_count, 'platform': platform})
-            if rows_count > best['count']:
-                normalized = [asdict(s) for s in sales]
-                journal_batches: List[Dict[str, Any]] = []
-                for s in sales:
-                    journal_batches.append({
-                        'date': s.date,
-                        'remarks': s.remarks(),
-                        'order_id': s.order_id,
-                        'lines': s.to_journal_entries(),
-                        'platform': s.platform,
-                    })
-                best.update({
-                    'platform': platform,
-                    'count': rows_count,
-                    'normalized': normalized,
-                    'journalEntries': journal_batches,
-                })
-                best['diagnostics'].update({
-                    'selectedSheet': sheet,
-                    'headerIndexUsed': hdr,
-                    'platformDetected': platform,
-                })
-
-    # If scanning failed to find any rows, attempt the earlier Shopee-specific heuristic as a last resort
-    if best['count'] == 0 and df_default is not None:
-        platform_guess = detect_platform(df_default) if not df_default.empty else 'Unknown'
-        if platform_guess.lower() == 'shopee' or _peek_shopee_signature(path):
-            for sheet in [None, 'sales', 'Sales', 'Sheet1']:
-                for hdr in (4, 5):
-                    df_alt = _try_read_sheet(path, sheet, hdr)
-                    if df_alt is None or df_alt.empty:
-                        continue
-                    platform = 'Shopee'
-                    sales = normalize_rows(df_alt, platform)
-                    if len(sales) > best['count']:
-                        normalized = [asdict(s) for s in sales]
-                        journal_batches = [{
+        with _profile_stage(f'sheet:{sheet}'):
+            for hdr in header_candidates:
+                try:
+                    df = pd.read_excel(path, engine='openpyxl', sheet_name=sheet, header=hdr)
+                except Exception:
+                    continue
+                if df is None or df.empty:
+                    best['diagnostics']['tried'].append({'sheet': sheet, 'header': hdr, 'rows': 0, 'why': 'empty'})
+                    continue
+                # Detect platform on this candidate frame
+                platform = detect_platform(df)
+                # Normalize rows
+                try:
+                    sales = normalize_rows(df, platform)
+                except Exception:
+                    best['diagnostics']['tried'].append({'sheet': sheet, 'header': hdr, 'rows': 0, 'why': 'normalize_error'})
+                    continue
+                rows_count = len(sales)
+                best['diagnostics']['tried'].append({'sheet': sheet, 'header': hdr, 'rows': rows_count, 'platform': platform})
+                if rows_count > best['count']:
+                    normalized = [asdict(s) for s in sales]
+                    journal_batches: List[Dict[str, Any]] = []
+                    for s in sales:
+                        journal_batches.append({
                             'date': s.date,
                             'remarks': s.remarks(),
                             'order_id': s.order_id,
                             'lines': s.to_journal_entries(),
                             'platform': s.platform,
-                        } for s in sales]
-                        best.update({
-                            'platform': platform,
-                            'count': len(sales),
-                            'normalized': normalized,
-                            'journalEntries': journal_batches,
-                        })
-                        best['diagnostics'].update({
-                            'selectedSheet': sheet,
-                            'headerIndexUsed': hdr,
-                            'platformDetected': platform,
                         })
+                    best.update({
+                        'platform': platform,
+                        'count': rows_count,
+                        'normalized': normalized,
+                        'journalEntries': journal_batches,
+                    })
+                    best['diagnostics'].update({
+                        'selectedSheet': sheet,
+                        'headerIndexUsed': hdr,
+                        'platformDetected': platform,
+                    })
+
+    # If scanning failed to find any rows, attempt the earlier Shopee-specific heuristic as a last resort
+    if best['count'] == 0 and df_default is not None:
+        platform_guess = detect_platform(df_default) if not df_default.empty else 'Unknown'
+        if platform_guess.lower() == 'shopee' or _peek_shopee_signature(path):
+            with _profile_stage('shopee_fallback'):
+                for sheet in [None, 'sales', 'Sales', 'Sheet1']:
+                    for hdr in (4, 5):
+                        df_alt = _try_read_sheet(path, sheet, hdr)
+                        if df_alt is None or df_alt.empty:
+                            continue
+                        platform = 'Shopee'
+                        sales = normalize_rows(df_alt, platform)
+                        if len(sales) > best['count']:
+                            normalized = [asdict(s) for s in sales]
+                            journal_batches = [{
+                                'date': s.date,
+                                'remarks': s.remarks(),
+                                'order_id': s.order_id,
+                                'lines': s.to_journal_entries(),
+                                'platform': s.platform,
+                            } for s in sales]
+                            best.update({
+                                'platform': platform,
+                                'count': len(sales),
+                                'normalized': normalized,
+                                'journalEntries': journal_batches,
+                            })
+                            best['diagnostics'].update({
+                                'selectedSheet': sheet,
+                                'headerIndexUsed': hdr,
+                                'platformDetected': platform,
+                            })
 
     return best
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print(json.dumps({'success': False, 'error': 'Usage: python sales_ingest.py <excel_path>'}))
+    args = sys.argv[1:]
+    profile = profiling_requested(args)
+    if len(args) < 1:
+        print(json.dumps({'success': False, 'error': 'Usage: python sales_ingest.py <excel_path> [--profile]'}))
         sys.exit(1)
-    path = sys.argv[1]
+    path = args[0]
     if not os.path.exists(path):
         print(json.dumps({'success': False, 'error': 'File not found'}))
         sys.exit(1)
     try:
+        if profile:
+            _PROFILER = start_profiler(path, 'sales_ingest')
         result = ingest_sales(path)
+        if _PROFILER is not None:
+            # cProfile stats and tracemalloc snapshots are written next to the workbook
+            result['diagnostics']['profile'] = _PROFILER.finish()
         print(json.dumps({'success': True, 'data': result}, ensure_ascii=False))
     except Exception as e:
         print(json.dumps({'success': False, 'error': str(e)}))
@@ -0,0 +1,242 @@
+"""
+Opt-in CPU and memory profiling for the Python processing scripts
+Turned on with a --profile flag or PYTHON_PROFILE=1 (any other value is taken as
+the output directory). While on, cProfile runs on every thread that executes
+Python code and tracemalloc traces allocations; each named stage records its
+wall time, net and peak traced memory and a snapshot diff of the lines that
+allocated the most. On finish it writes next to the input:
+
+    <input>.prof               cProfile stats (pstats / snakeviz / gprof2dot)
+    <input>.tracemalloc.txt    top allocations per stage
+
+and returns a small summary (hottest functions, peak memory) for the JSON output.
+
+Used by: process_file.py, sales_ingest.py, forecast_sales.py
+"""
+
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def profiling_requested(args):
+    """
+    Remove a --profile flag from args (in place); True when it or PYTHON_PROFILE asks for profiling
+    """
+    flagged = '--profile' in args
+    while '--profile' in args:
+        args.remove('--profile')
+    env = os.environ.get('PYTHON_PROFILE', '')
+    return flagged or bool(env and env not in ('0', 'false', 'False'))
+
+
+def profile_base_path(input_path, script_name):
+    """
+    Path prefix for the profile files: the input file itself, or <PYTHON_PROFILE dir>/<input name>;
+    scripts reading stdin pass input_path=None and get <dir or cwd>/<script>-<timestamp>
+    """
+    env = os.environ.get('PYTHON_PROFILE', '')
+    directory = env if env and env not in ('0', '1', 'true', 'True', 'false', 'False') else None
+    if input_path:
+        return os.path.join(directory, os.path.basename(input_path)) if directory else input_path
+    return os.path.join(directory or os.getcwd(), f"{script_name}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+
+def start_profiler(input_path, script_name):
+    """
+    Started ScriptProfiler writing next to input_path (PYTHON_PROFILE_TOP rows in the summary,
+    PYTHON_PROFILE_SNAPSHOTS=0 keeps per-stage peaks but skips the allocation diffs)
+    """
+    return ScriptProfiler(
+        profile_base_path(input_path, script_name),
+        top=int(os.environ.get('PYTHON_PROFILE_TOP', '15') or 15),
+        snapshots=os.environ.get('PYTHON_PROFILE_SNAPSHOTS', '1') not in ('0', 'false', 'False'),
+    ).start()
+
+
+# Blocking waits (pool workers idling, joins, subprocess pipes) that would otherwise top the self-time list
+_IDLE_FUNCTIONS = {
+    "<method 'acquire' of '_thread.lock' objects>",
+    "<method 'acquire' of '_thread.RLock' objects>",
+    "<method 'get' of '_queue.SimpleQueue' objects>",
+    "<built-in method time.sleep>",
+    "<built-in method select.select>",
+    "<method 'poll' of 'select.poll' objects>",
+    "<built-in method posix.waitpid>",
+    "<built-in method posix.read>",
+}
+
+
+def _short_path(filename):
+    parts = filename.replace('\\', '/').split('/')
+    return '/'.join(parts[-2:])
+
+
+class ScriptProfiler:
+    """
+    cProfile (all threads) plus tracemalloc stage snapshots for one script run
+    """
+
+    def __init__(self, base_path, top=15, frames=1, snapshots=True):
+        self.base_path = base_path
+        self.top = top
+        self.frames = frames
+        # Snapshot diffs group every live allocation twice: a few seconds per stage once pdfminer/pandas are loaded
+        self.snapshots = snapshots
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.profiles = []
+        self.stages = []
+        self.open_stages = []
+        self.peak_bytes = 0
+        self.started = None
+
+    def _thread_hook(self, *_):
+        # First profile event of a new thread: give it its own profiler (replacing this hook)
+        profile = self.local.profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        tracemalloc.start(self.frames)
+        self.started = time.perf_counter()
+        threading.setprofile(self._thread_hook)
+        profile = self.local.profile = cProfile.Profile()
+        self.profiles.append(profile)
+        profile.enable()
+        return self
+
+    @contextmanager
+    def _paused(self):
+        # Keep the profiler's own bookkeeping (snapshots, diffs) out of this thread's cProfile stats
+        profile = getattr(self.local, 'profile', None)
+        if profile is not None:
+            profile.disable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.enable()
+
+    def _top_diff(self, after, before):
+        diff = []
+        for stat in after.compare_to(before, 'lineno'):
+            filename = stat.traceback[0].filename
+            if filename == tracemalloc.__file__ or filename.startswith('<frozen importlib'):
+                continue
+            diff.append(stat)
+            if len(diff) >= self.top:
+                break
+        return diff
+
+    def _fold_peak(self):
+        # Credit the peak since the last stage boundary to every open stage, then start a new window
+        peak = tracemalloc.get_traced_memory()[1]
+        self.peak_bytes = max(self.peak_bytes, peak)
+        for record in self.open_stages:
+            record['peakBytes'] = max(record['peakBytes'], peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Record one stage. Memory figures are process-wide while the stage is open, so nested
+        or concurrent stages (threads) include each other's allocations
+        """
+        record = {'name': name, 'thread': threading.current_thread().name, 'peakBytes': 0, 'diff': []}
+        with self._paused():
+            with self.lock:
+                self._fold_peak()
+                self.open_stages.append(record)
+                current_before = tracemalloc.get_traced_memory()[0]
+            before = tracemalloc.take_snapshot() if self.snapshots else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            with self._paused():
+                with self.lock:
+                    self._fold_peak()
+                    self.open_stages.remove(record)
+                    record['netBytes'] = tracemalloc.get_traced_memory()[0] - current_before
+                record['wallMs'] = round(wall * 1000, 1)
+                if before is not None:
+                    record['diff'] = self._top_diff(tracemalloc.take_snapshot(), before)
+                with self.lock:
+                    self.stages.append(record)
+
+    def _stats(self):
+        stats = None
+        for profile in self.profiles:
+            try:
+                profile.create_stats()
+            except Exception:
+                continue
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        return stats
+
+    def _hottest(self, stats):
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, _callers) in stats.stats.items():
+            if func in _IDLE_FUNCTIONS:
+                continue
+            rows.append({
+                'function': f"{_short_path(filename)}:{line}({func})" if line else func,
+                'calls': nc,
+                'selfMs': round(tt * 1000, 1),
+                'cumulativeMs': round(ct * 1000, 1),
+            })
+        rows.sort(key=lambda r: r['selfMs'], reverse=True)
+        return rows[:self.top]
+
+    def _write_allocations(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"peak traced memory: {self.peak_bytes / 1024 / 1024:.2f} MiB\n")
+            for stage in self.stages:
+                f.write(f"\n== {stage['name']}: {stage['wallMs']:.1f} ms, net {stage['netBytes'] / 1024:+.1f} KiB, "
+                        f"peak {stage['peakBytes'] / 1024 / 1024:.2f} MiB [{stage['thread']}]\n")
+                for diff in stage['diff']:
+                    f.write(f"  {diff}\n")
+        return path
+
+    def finish(self):
+        """
+        Stop profiling, write the stats and allocation files and return the summary dict
+        """
+        threading.setprofile(None)
+        self.profiles[0].disable()
+        self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1])
+        wall = time.perf_counter() - self.started
+        tracemalloc.stop()
+        summary = {
+            'wallMs': round(wall * 1000, 1),
+            'peakTracedBytes': self.peak_bytes,
+            'threads': len(self.profiles),
+            'stages': [{
+                'name': s['name'],
+                'wallMs': s['wallMs'],
+                'netBytes': s['netBytes'],
+                'peakBytes': s['peakBytes'],
+                'topAllocations': [f"{_short_path(d.traceback[0].filename)}:{d.traceback[0].lineno} {d.size_diff / 1024:+.1f} KiB"
+                                   for d in s['diff'][:3]],
+            } for s in self.stages],
+        }
+        stats = self._stats()
+        if stats is not None:
+            summary['statsFile'] = self.base_path + '.prof'
+            stats.dump_stats(summary['statsFile'])
+            summary['hottest'] = self._hottest(stats)
+        summary['allocationsFile'] = self._write_allocations(self.base_path + '.tracemalloc.txt')
+        return summary
+
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+# The scripts live flat in backend/python and import each other by module name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def shopee_record():
+    """
+    Factory of one Shopee analytics record: shopee_record(item_id, **fields overriding the defaults)
+    """
+    def make(item_id, **fields):
+        record = {"Item ID": item_id, "Product": f"P{item_id}", "Product Page Views": 10,
+                  "Units (Add to Cart)": 2, "Units (Confirmed Order)": 1, "Sales (Confirmed Order) (PHP)": "100"}
+        record.update(fields)
+        return record
+    return make
+
+
+@pytest.fixture
+def order_pdf(tmp_path, monkeypatch):
+    """
+    Factory of a digital order PDF: order_pdf(*order_ids) writes one page per Order ID, each with
+    a two-row Order Details table, and returns its path. OCR and layout caches stay in tmp_path
+    """
+    fitz = pytest.importorskip("fitz")
+    monkeypatch.setenv("OCR_CACHE", "0")
+    monkeypatch.setenv("LAYOUT_TEMPLATES_PATH", str(tmp_path / "templates.sqlite"))
+    monkeypatch.setattr("process_file._LAYOUT_TEMPLATES", None)
+    columns = [40, 70, 260, 350, 440, 500]
+
+    def make(*order_ids):
+        doc = fitz.open()
+        for order_id in order_ids or ("2309258H1UTEXV",):
+            lines = [
+                [(40, f"Order ID: {order_id}")],
+                [(40, "Order Details")],
+                list(zip(columns, ["No.", "Product", "Variation", "Product Price", "Quantity", "Subtotal"])),
+                list(zip(columns, ["1", "Cotton Shirt Blue", "M", "P250.00", "2", "P500.00"])),
+                list(zip(columns, ["2", "Denim Pants", "32", "P799.00", "1", "P799.00"])),
+                [(350, "Merchandise Subtotal"), (500, "P1,299.00")],
+                [(350, "Grand Total"), (500, "P1,299.00")],
+            ]
+            page = doc.new_page()
+            for i, line in enumerate(lines):
+                for x, text in line:
+                    page.insert_text((x, 72 + 18 * i), text, fontsize=9)
+        path = tmp_path / f"orders_{len(order_ids)}.pdf"
+        doc.save(str(path))
+        return str(path)
+    return make
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from convert_shopee_data import (convert_shopee_data_to_forecast_json, convert_shopee_dataframe_to_forecast_json,
+                                 iter_shopee_data_from_file, shopee_records_to_dataframe)
+
+
+def _write(tmp_path, text):
+    path = tmp_path / "shopee.json"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_iter_reads_arrays_and_json_lines(tmp_path):
+    records = [{"Item ID": i, "Product": f"P{i}"} for i in range(50)]
+    array = _write(tmp_path, json.dumps(records, indent=2))
+    assert list(iter_shopee_data_from_file(array, chunk_size=16)) == records
+    lines = _write(tmp_path, "\n".join(json.dumps(r) for r in records))
+    assert list(iter_shopee_data_from_file(lines, chunk_size=16)) == records
+
+
+@pytest.mark.parametrize("text", ["[", '[{"Item ID": 1},', '[{"Item ID": 1} {"Item ID": 2}]', '[{"Item ID": 1}] x'])
+def test_iter_raises_on_malformed_array(tmp_path, text):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_shopee_data_from_file(_write(tmp_path, text)))
+
+
+def test_iter_warns_on_non_object_values(tmp_path, capsys):
+    path = _write(tmp_path, '[{"Item ID": 1}, 5, "x", {"Item ID": 2}]')
+    assert list(iter_shopee_data_from_file(path)) == [{"Item ID": 1}, {"Item ID": 2}]
+    assert "Skipped 2 top-level values" in capsys.readouterr().err
+
+
+def _both_engines(records, target_year=None):
+    loop = convert_shopee_data_to_forecast_json(records, target_year)
+    pandas = convert_shopee_dataframe_to_forecast_json(shopee_records_to_dataframe(records), target_year)
+    assert pandas == loop
+    return loop
+
+
+def test_engines_keep_null_item_id_separate(shopee_record):
+    records = [shopee_record(7), shopee_record(None, **{"Sales (Confirmed Order) (PHP)": "50"}), shopee_record(8)]
+    products = _both_engines(records)
+    assert [p["item_id"] for p in products] == [7, 8, None]
+    assert products[2]["metrics"]["sales_amount"] == 50.0
+
+
+def test_engines_keep_null_date(shopee_record):
+    records = [shopee_record(1, Date=None), shopee_record(2), shopee_record(3, Date="2024-03-02")]
+    products = {p["item_id"]: p["import_date"] for p in _both_engines(records)}
+    assert products == {1: None, 2: "2024-01-15", 3: "2024-03-02"}
+
+
+def test_dataframe_from_record_stream_in_chunks(shopee_record):
+    records = [shopee_record(i % 3, **{"Variation Name": "Red" if i % 2 else "-", "Likes": i, "Year": 2024})
+               for i in range(7)]
+    records.append(shopee_record(5, Date="2023-05-01"))
+    frame = shopee_records_to_dataframe(iter(records), chunk_size=3)
+    assert "Likes" not in frame.columns and len(frame) == len(records)
+    for year in (None, 2024):
+        assert convert_shopee_dataframe_to_forecast_json(frame, year) == convert_shopee_data_to_forecast_json(records, year)
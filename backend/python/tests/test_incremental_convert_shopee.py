@@ -0,0 +1,44 @@
+import json
+
+from incremental_convert_shopee import ShopeeStateStore, fold_file_into_state, run_incremental
+
+
+def _monthly(shopee_record, item_id, year, sales):
+    return shopee_record(item_id, Year=year, Month=3, **{"Sales (Confirmed Order) (PHP)": sales})
+
+
+def test_target_year_keeps_other_years_in_state(tmp_path, shopee_record):
+    state = str(tmp_path / "state.sqlite")
+    export = tmp_path / "export.jsonl"
+    records = [_monthly(shopee_record, 1, 2023, 50), _monthly(shopee_record, 2, 2024, 80)]
+    export.write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+
+    assert [p["item_id"] for p in run_incremental(state, [str(export)], 2024)] == [2]
+    # The file is processed now, but its 2023 records were folded too
+    assert run_incremental(state, [str(export)], 2023) == []
+    store = ShopeeStateStore(state)
+    try:
+        stored = store.load_products([(1, 2023, 3), (2, 2024, 3)])
+    finally:
+        store.close()
+    assert {key: p["metrics"]["sales_amount"] for key, p in stored.items()} == {(1, 2023, 3): 50.0, (2, 2024, 3): 80.0}
+
+
+def test_folds_in_chunks_against_stored_products(tmp_path, shopee_record):
+    state = str(tmp_path / "state.sqlite")
+    first, second = tmp_path / "first.jsonl", tmp_path / "second.jsonl"
+    first.write_text("\n".join(json.dumps(_monthly(shopee_record, i, 2024, 10)) for i in range(5)), encoding="utf-8")
+    # Item 3 again (its main row overrides the stored one), a new item and "3" as a string (a different key)
+    again = [_monthly(shopee_record, 3, 2024, 5), _monthly(shopee_record, 9, 2024, 7), _monthly(shopee_record, "3", 2024, 1)]
+    second.write_text("\n".join(json.dumps(r) for r in again), encoding="utf-8")
+    run_incremental(state, [str(first)])
+
+    store = ShopeeStateStore(state)
+    try:
+        assert fold_file_into_state(store, str(second), "second", chunk_size=2)[0] == 3
+        stored = store.load_products([(i, 2024, 3) for i in range(10)] + [("3", 2024, 3)])
+    finally:
+        store.close()
+    sales = {key: p["metrics"]["sales_amount"] for key, p in stored.items()}
+    assert sales == {(0, 2024, 3): 10.0, (1, 2024, 3): 10.0, (2, 2024, 3): 10.0, (3, 2024, 3): 5.0,
+                     (4, 2024, 3): 10.0, (9, 2024, 3): 7.0, ("3", 2024, 3): 1.0}
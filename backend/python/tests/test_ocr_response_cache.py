@@ -0,0 +1,50 @@
+import itertools
+
+import ocr_response_cache
+from ocr_response_cache import OcrResponseCache
+
+
+def _clock(monkeypatch, start=1000.0):
+    ticks = itertools.count(start)
+    monkeypatch.setattr(ocr_response_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_evicts_least_recently_used_over_max_bytes(tmp_path, monkeypatch):
+    _clock(monkeypatch)
+    cache = OcrResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=0)
+    value = {"text": "x" * 40}
+    cache.put("a", "p", value)
+    entry = cache.summary()["bytes"]
+    cache.max_bytes = 2 * entry
+    cache.put("b", "p", value)
+    assert cache.get("a") == value
+    cache.put("c", "p", value)
+    assert cache.get("b") is None
+    assert cache.get("a") == value and cache.get("c") == value
+    assert cache.summary()["evicted"] == 1
+    cache.close()
+
+
+def test_entries_expire_after_max_age(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ocr_response_cache.time, "time", lambda: now[0])
+    path = str(tmp_path / "cache.sqlite")
+    cache = OcrResponseCache(path, max_age=60)
+    cache.put("old", "p", {"n": 1})
+    now[0] += 30
+    cache.put("new", "p", {"n": 2})
+    now[0] += 40
+    assert cache.get("old") is None and cache.get("new") == {"n": 2}
+    cache.close()
+    now[0] += 60
+    # Expired entries are also dropped when the store is opened
+    reopened = OcrResponseCache(path, max_age=60)
+    assert reopened.summary()["entries"] == 0
+    reopened.close()
+
+
+def test_key_changes_with_provider_settings():
+    key = OcrResponseCache.key("ocrspace", "img", {"OCREngine": 2, "targetDpi": 300})
+    assert key == OcrResponseCache.key("ocrspace", "img", {"targetDpi": 300, "OCREngine": 2})
+    assert key != OcrResponseCache.key("ocrspace", "img", {"OCREngine": 1, "targetDpi": 300})
+    assert key != OcrResponseCache.key("google_vision", "img", {"OCREngine": 2, "targetDpi": 300})
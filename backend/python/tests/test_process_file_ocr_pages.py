@@ -0,0 +1,191 @@
+import types
+
+import pytest
+
+import process_file
+
+fitz = pytest.importorskip("fitz")
+
+
+@pytest.fixture(autouse=True)
+def _defaults(monkeypatch):
+    for name in ("OCR_TARGET_XHEIGHT_PX", "OCR_MAX_RENDER_PX", "OCR_ADAPTIVE_SCALE"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def _text_page(size):
+    doc = fitz.open()
+    page = doc.new_page()
+    for i in range(5):
+        page.insert_text((40, 80 + 3 * size * i), f"Line {i} of {size} pt text 123.45", fontsize=size)
+    return doc, page
+
+
+def test_render_scale_follows_the_text_size():
+    # Tesseract wants a 20 px x-height: half the font size times the scale
+    assert process_file._ocr_render_scale(10.0, "tesseract") == 4.0
+    assert process_file._ocr_render_scale(40.0, "tesseract") == 1.0
+    assert process_file._ocr_render_scale(100.0, "tesseract") == 0.5
+    # Tiny print stops at the upper limit
+    assert process_file._ocr_render_scale(2.0, "tesseract") == process_file._OCR_SCALE_LIMITS[1]
+
+
+def test_render_scale_is_capped_by_native_resolution_and_pixel_budget(monkeypatch):
+    assert process_file._ocr_render_scale(4.0, "tesseract", native=2.0) == 2.0
+    assert process_file._ocr_render_scale(4.0, "tesseract", area=1000 * 1000) == 3.25
+    monkeypatch.setenv("OCR_MAX_RENDER_PX", "4000000")
+    assert process_file._ocr_render_scale(4.0, "tesseract", area=1000 * 1000) == 2.0
+
+
+def test_small_print_renders_above_the_fixed_scale_and_large_print_below():
+    doc, small = _text_page(6)
+    scale, entry = process_file._choose_render_scale(process_file._PageRaster(page=small), "tesseract", 3.0, "roi", 1)
+    # 5x would be 12.5 MP for this A4 page; the 12 MP budget keeps it at 4.75x
+    assert entry["source"] == "pdf_fonts" and scale == 4.75 > entry["fixedScale"]
+    doc, large = _text_page(24)
+    scale, entry = process_file._choose_render_scale(process_file._PageRaster(page=large), "tesseract", 3.0, "roi", 1)
+    assert scale == 1.75 and entry["px"] < entry["fixedPx"]
+
+
+def test_scanned_page_is_not_rendered_above_its_native_resolution():
+    doc, page = _text_page(6)
+    scan = fitz.open()
+    scanned = scan.new_page(width=page.rect.width, height=page.rect.height)
+    # 144 dpi: 2 pixels per point
+    scanned.insert_image(scanned.rect, pixmap=page.get_pixmap(matrix=fitz.Matrix(2, 2)))
+    raster = process_file._PageRaster(page=scanned)
+    scale, entry = process_file._choose_render_scale(raster, "tesseract", 1.0, "page_ocr", 1)
+    assert entry["source"] == "ink_profile" and scale == 2.0
+
+
+def _scan_pages(count, mode="L"):
+    Image = pytest.importorskip("PIL.Image")
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(7)
+    shape = (120, 90, 3) if mode == "RGB" else (120, 90)
+    return [Image.fromarray(rng.integers(0, 256, shape, dtype=np.uint8), mode) for _ in range(count)]
+
+
+@pytest.mark.parametrize("mode", ["L", "RGB", "1", "P"])
+def test_spilled_pages_round_trip_unchanged(mode):
+    pages = [img.convert(mode) for img in _scan_pages(6, "RGB")]
+    store = process_file._PageImageStore(cap=2, max_bytes=0)
+    for img in pages:
+        assert store.append(img)
+    assert store.spilled == 4 and store.spilled_bytes > 0
+    for original, read in zip(pages, store):
+        assert read.mode == original.mode and read.tobytes() == original.tobytes()
+        if mode == "P":
+            assert read.getpalette() == original.getpalette()
+    store.close()
+
+
+def test_page_store_keeps_at_most_cap_pages_decoded():
+    store = process_file._PageImageStore(cap=3, max_bytes=0)
+    for img in _scan_pages(20):
+        store.append(img)
+        assert len(store._live) <= 3
+    for i in (0, 19, 5, 5, 12):
+        store[i]
+        assert len(store._live) <= 3
+    assert store.summary()["peakInMemory"] == 3 and len(store) == 20
+    store.close()
+
+
+def test_page_store_stops_taking_pages_at_the_spill_limit():
+    store = process_file._PageImageStore(cap=2, max_bytes=1)
+    kept = [store.append(img) for img in _scan_pages(5)]
+    # The first spill reaches the limit; the page that would force a second one is dropped
+    assert kept == [True, True, True, False, False]
+    assert len(store) == 3 and store.summary()["dropped"] == 2 and store.spilled == 1
+    assert [img.size for img in store] == [(90, 120)] * 3
+    store.close()
+
+
+def _scanned(doc, lines, size=16):
+    """Append an image-only page showing lines (a 144 dpi scan of a text page)"""
+    source = fitz.open()
+    text_page = source.new_page()
+    for i, line in enumerate(lines):
+        text_page.insert_text((50, 100 + 2 * size * i), line, fontsize=size)
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=text_page.get_pixmap(matrix=fitz.Matrix(2, 2)))
+
+
+class _Tesseract:
+    """Stand-in for pytesseract: image_to_string reads the given texts in order, image_to_data finds no words"""
+
+    Output = types.SimpleNamespace(DATAFRAME="data.frame")
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.sizes = []
+        self.data_sizes = []
+
+    def image_to_string(self, img, timeout=0):
+        self.sizes.append(img.size)
+        return self.texts.pop(0)
+
+    def image_to_data(self, img, output_type=None, config="", timeout=0):
+        self.data_sizes.append(img.size)
+        columns = ["level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                   "left", "top", "width", "height", "conf", "text"]
+        return pytest.importorskip("pandas").DataFrame(columns=columns)
+
+
+@pytest.fixture
+def triage(monkeypatch):
+    monkeypatch.delenv("OCR_TRIAGE_DPI", raising=False)
+    monkeypatch.setenv("TESSERACT_CONCURRENCY", "1")
+
+    def run(doc, thumbnail_texts=()):
+        tesseract = _Tesseract(thumbnail_texts)
+        monkeypatch.setattr(process_file, "pytesseract", tesseract)
+        entries = process_file._triage_pages(doc, [p.get_text() for p in doc])
+        assert not tesseract.texts
+        return [(e["class"], e["decision"], e["signal"]) for e in entries]
+    return run
+
+
+def test_triage_reads_text_pages_skips_blank_ones_and_defers_terms(triage):
+    doc = fitz.open()
+    doc.new_page().insert_text((50, 100), "Order Details  Grand Total P500.00", fontsize=10)
+    doc.new_page()
+    doc.new_page().insert_text((50, 100), "Terms and Conditions apply to every purchase", fontsize=10)
+    assert triage(doc) == [("order", "ocr", "text"), ("blank", "skip", "ink"), ("terms", "defer", "text")]
+
+
+def test_triage_reads_scanned_pages_from_a_thumbnail(triage):
+    doc = fitz.open()
+    _scanned(doc, ["Order Summary", "Grand Total  P1,299.00"])
+    _scanned(doc, ["Return Policy", "Warranty"])
+    thumbnail_texts = ["Order Summary\nGrand Total P1,299.00", "Return Policy\nWarranty"]
+    assert triage(doc, thumbnail_texts) == [("order", "ocr", "thumbnail_ocr"), ("terms", "defer", "thumbnail_ocr")]
+
+
+def test_triage_never_skips_a_page_with_a_little_ink_or_unreadable_text(triage):
+    doc = fitz.open()
+    # A continuation page with one line of small print has little ink, and its thumbnail reads nothing
+    _scanned(doc, ["Grand Total   P1,299.00"], size=6)
+    _scanned(doc, ["Waybill", "Ship To"])
+    pages = triage(doc, ["", "Waybill\nShip To"])
+    assert pages[0][:2] == ("unknown", "ocr")
+    # With no order page the triage cannot tell the document apart, so nothing is deferred
+    assert pages[1][:2] == ("shipping_label", "ocr")
+
+
+def test_coarse_to_fine_reads_the_whole_page_when_the_coarse_pass_finds_no_text(monkeypatch, tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    monkeypatch.setenv("OCR_COARSE_TO_FINE", "1")
+    monkeypatch.setenv("OCR_CACHE", "0")
+    tesseract = _Tesseract(["Order Details\nGrand Total P1,299.00"])
+    monkeypatch.setattr(process_file, "pytesseract", tesseract)
+    path = tmp_path / "photo.png"
+    Image.new("L", (1240, 1754), 255).save(path)
+    result = process_file.process_file(str(path), None, 0)
+    coarse = result["diagnostics"]["ocrCoarseToFine"]
+    assert [page["mode"] for page in coarse["pages"]] == ["full_page"] and coarse["regionPages"] == 0
+    # The coarse pass read a ~100 dpi copy; the full pass then read the whole page
+    assert tesseract.data_sizes[0][1] < 1754 / 1.5
+    assert len(tesseract.sizes) == 1 and not tesseract.texts
+    assert "Grand Total P1,299.00" in result["text"]
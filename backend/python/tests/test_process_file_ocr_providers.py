@@ -0,0 +1,105 @@
+import base64
+import io
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+import process_file
+
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("requests")
+
+
+class _Response:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+
+class _Session:
+    """Stand-in for the provider session: answers each image with its width, the first call last"""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def post(self, url, params=None, json=None, files=None, data=None, headers=None, timeout=None):
+        with self.lock:
+            call = len(self.calls)
+            self.calls.append(json["requests"] if json else files)
+        time.sleep(0.05 if call == 0 else 0.0)
+        if json:
+            widths = [Image.open(io.BytesIO(base64.b64decode(r["image"]["content"]))).width for r in json["requests"]]
+            return _Response({"responses": [{"fullTextAnnotation": {"text": str(w)}} for w in widths]})
+        width = Image.open(io.BytesIO(files["file"][1])).width
+        return _Response({"ParsedResults": [{"ParsedText": str(width)}]})
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setenv("OCR_CACHE", "0")
+    stand_in = _Session()
+    monkeypatch.setattr(process_file, "_http_session", lambda provider, pool_size=4: stand_in)
+    return stand_in
+
+
+def _pages(count):
+    return [Image.new("L", (40 + i, 30), 255) for i in range(count)]
+
+
+def test_google_vision_batches_evenly_and_keeps_page_order(session, monkeypatch):
+    monkeypatch.setenv("GOOGLE_VISION_BATCH_SIZE", "8")
+    monkeypatch.setenv("GOOGLE_VISION_CONCURRENCY", "2")
+    results = process_file._google_vision_annotate(_pages(10), "key")
+    assert sorted(len(batch) for batch in session.calls) == [5, 5]
+    assert [r["fullTextAnnotation"]["text"] for r in results] == [str(40 + i) for i in range(10)]
+
+
+def test_ocrspace_uploads_concurrently_and_keeps_page_order(session, monkeypatch):
+    monkeypatch.setenv("OCRSPACE_CONCURRENCY", "3")
+    monkeypatch.setenv("OCRSPACE_TARGET_DPI", "0")
+    stats = {}
+    results = process_file._ocrspace_submit(_pages(5), "key", stats)
+    assert len(session.calls) == 5 and stats["concurrency"] == 3 and stats["failed"] == 0
+    assert [r["ParsedResults"][0]["ParsedText"] for r in results] == [str(40 + i) for i in range(5)]
+
+
+def test_each_provider_has_its_own_pool(monkeypatch):
+    monkeypatch.setattr(process_file, "_HTTP_SESSIONS", {})
+    vision = process_file._http_session("google_vision", pool_size=2)
+    ocrspace = process_file._http_session("ocrspace", pool_size=6)
+    assert vision is not ocrspace
+    assert process_file._http_session("google_vision", pool_size=10) is vision
+    assert vision.get_adapter("https://x")._pool_maxsize == 2
+    assert ocrspace.get_adapter("https://x")._pool_maxsize == 6
+
+
+def test_cache_answers_repeat_pages_until_the_settings_change(session, monkeypatch, tmp_path):
+    monkeypatch.setenv("OCR_CACHE", "1")
+    monkeypatch.setenv("OCR_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(process_file, "_OCR_CACHE", None)
+    pages = _pages(3)
+    first = process_file._google_vision_annotate(pages, "key")
+    assert process_file._google_vision_annotate(pages, "key") == first
+    assert len(session.calls) == 1
+    monkeypatch.setenv("GOOGLE_VISION_ENDPOINT", "http://127.0.0.1:9/v1/images:annotate")
+    assert process_file._google_vision_annotate(pages, "key") == first
+    assert len(session.calls) == 2
+    process_file._OCR_CACHE.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_cache_file_is_private(monkeypatch, tmp_path):
+    monkeypatch.setattr(process_file.tempfile, "gettempdir", lambda: str(tmp_path))
+    path = process_file._private_cache_path(None, "ocr_cache.sqlite")
+    assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    os.chmod(os.path.dirname(path), 0o755)
+    with pytest.raises(OSError):
+        process_file._private_cache_path(None, "ocr_cache.sqlite")
@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+
+import pytest
+
+import process_file
+
+
+@pytest.fixture
+def scheduler(monkeypatch, tmp_path):
+    """A budgeted scheduler installed as process_file's, with a cheap 'probe' stage"""
+    monkeypatch.setenv("PROCESS_FILE_BUDGET_RESERVE_MS", "0")
+    monkeypatch.setenv("PROCESS_FILE_STAGE_HISTORY", str(tmp_path / "timings.json"))
+    monkeypatch.setitem(process_file._STAGE_COST_PRIORS, "probe", (0.0, 1.0))
+
+    def make(budget_ms):
+        sched = process_file._StageScheduler(budget_ms)
+        monkeypatch.setattr(process_file, "_SCHEDULER", sched)
+        return sched
+    return make
+
+
+def test_stage_that_does_not_fit_is_skipped(scheduler):
+    sched = scheduler(1000)
+    calls = []
+    assert sched.run("paddle", lambda: calls.append(1), pages=2, default="skipped") == "skipped"
+    assert calls == []
+    assert sched.skipped[0]["stage"] == "paddle" and sched.skipped[0]["estimateMs"] == 11000.0
+    assert sched.ran == [] and sched.cancelled == []
+
+
+def test_stage_is_cancelled_inline_at_its_next_checkpoint(scheduler):
+    sched = scheduler(150)
+    threads = threading.active_count()
+    pages = []
+
+    def stage():
+        for page in range(100):
+            process_file._stage_checkpoint()
+            pages.append(page)
+            time.sleep(0.01)
+        return "finished"
+
+    assert sched.run("probe", stage, default=[]) == []
+    done = len(pages)
+    time.sleep(0.05)
+    assert len(pages) == done < 100
+    assert threading.active_count() == threads
+    assert [c["stage"] for c in sched.cancelled] == ["probe"] and sched.ran == []
+    assert sched.active == 0
+
+
+def test_error_after_the_deadline_counts_as_cancelled(scheduler):
+    sched = scheduler(50)
+
+    def killed():
+        time.sleep(0.08)
+        raise RuntimeError("Tesseract process timeout")
+
+    assert sched.run("probe", killed, default="default") == "default"
+    assert len(sched.cancelled) == 1
+
+
+def test_error_before_the_deadline_propagates(scheduler):
+    sched = scheduler(10000)
+
+    def broken():
+        raise ValueError("bad page")
+
+    with pytest.raises(ValueError):
+        sched.run("probe", broken)
+    assert sched.ran[0]["failed"] is True and sched.active == 0
+
+
+def test_checkpoints_and_ocr_timeouts_only_apply_inside_a_stage(scheduler):
+    sched = scheduler(30)
+
+    def late_ocr():
+        time.sleep(0.05)
+        return process_file._ocr_timeout()
+
+    assert sched.run("probe", late_ocr, default="cancelled") == "cancelled"
+    # Past the deadline but outside any stage: no-ops
+    process_file._stage_checkpoint()
+    assert process_file._ocr_timeout() == 0
+    sched = scheduler(10000)
+    assert sched.run("probe", process_file._ocr_timeout) == pytest.approx(10, abs=0.5)
+
+
+def test_run_times_are_learned_and_persisted(scheduler, monkeypatch, tmp_path):
+    monkeypatch.setitem(process_file._STAGE_COST_PRIORS, "probe", (0.0, 100.0))
+    sched = scheduler(60000)
+    sched.run("probe", lambda: time.sleep(0.02), pages=1)
+    learned = sched.history["probe"]
+    assert learned["runs"] == 1
+    # Moving average of the prior (100 ms/page) and the ~20 ms run
+    assert 70 < learned["perPageMs"] < 80
+    sched.save_history()
+    with open(tmp_path / "timings.json", encoding="utf-8") as f:
+        assert json.load(f) == sched.history
+    again = scheduler(60000)
+    assert again.estimate_ms("probe", pages=2) == pytest.approx(2 * learned["perPageMs"])
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+import process_file
+
+
+def _reasons(texts):
+    return [(seg['first'], seg['last'], seg['reason']) for seg in process_file._invoice_segments(texts)]
+
+
+def test_segments_split_on_another_id_of_the_same_type():
+    texts = ["Order ID: 2309258H1UTEXV\nOrder Details", "more items", "Order ID: 23072602PCX5BX\nOrder Details"]
+    assert _reasons(texts) == [(0, 1, 'start'), (2, 2, 'order_id')]
+
+
+def test_segments_keep_pages_naming_another_id_type_together():
+    # An invoice number on page 1 and the order's ID on page 2 belong to one invoice
+    texts = ["Invoice No: INV-000123\nItems", "Order ID: 2309258H1UTEXV\nTotals"]
+    assert _reasons(texts) == [(0, 1, 'start')]
+
+
+def test_segment_budget_is_what_is_left_of_the_deadline(monkeypatch):
+    budgets = []
+    monkeypatch.setattr(process_file, "process_file", lambda path, poppler, budget_ms: budgets.append(budget_ms) or {})
+    process_file._process_invoice_segment("a.pdf", None, time.time() + 2.0)
+    process_file._process_invoice_segment("b.pdf", None, time.time() - 5.0)
+    process_file._process_invoice_segment("c.pdf", None, None)
+    assert 1500 < budgets[0] <= 2000
+    assert budgets[1:] == [1.0, 0.0]
+
+
+def test_segment_missing_dependency_raises_without_writing_stdout(monkeypatch, capsys):
+    missing = process_file._LazyModule("process_file_no_such_module")
+    monkeypatch.setattr(process_file, "process_file", lambda path, poppler, budget_ms: print("noise") or missing.open)
+    with pytest.raises(ImportError):
+        process_file._process_invoice_segment("a.pdf", None, None)
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_invoices_run_through_the_process_pool(order_pdf, monkeypatch, workers):
+    fitz = pytest.importorskip("fitz")
+    pytest.importorskip("pdfplumber")
+    monkeypatch.setenv("PROCESS_FILE_SPLIT_WORKERS", workers)
+    path = order_pdf("2309258H1UTEXV", "23072602PCX5BX")
+    with fitz.open(path) as doc:
+        segments = process_file._invoice_segments([page.get_text() for page in doc])
+    result = process_file._process_invoices(path, None, 0, segments, 0.0)
+    assert [inv["pages"] for inv in result["invoices"]] == [{"from": 1, "to": 1}, {"from": 2, "to": 2}]
+    assert [[item["product"] for item in inv["layout_items"]] for inv in result["invoices"]] == [
+        ["Cotton Shirt Blue", "Denim Pants"]] * 2
+    assert not any("invoice_failed" in w for w in result["warnings"])
@@ -0,0 +1,42 @@
+import pytest
+
+import process_file
+
+pytest.importorskip("fitz")
+pytest.importorskip("pdfplumber")
+
+
+@pytest.fixture
+def invoice_pdf(order_pdf):
+    return order_pdf()
+
+
+def test_roi_stage_renders_the_order_details_region(invoice_pdf):
+    result = process_file.process_file(invoice_pdf, None, 0)
+    roi = result["diagnostics"]["items"]["roi"]
+    assert roi["regions"] and roi["roiImageCount"] == len(roi["regions"])
+
+
+def _run(path, monkeypatch, parallel):
+    monkeypatch.setenv("PROCESS_FILE_PARALLEL_STAGES", "1" if parallel else "0")
+    return process_file.process_file(path, None, 0)
+
+
+def test_parallel_stages_match_the_serial_run(invoice_pdf, monkeypatch):
+    serial = _run(invoice_pdf, monkeypatch, parallel=False)
+    parallel = _run(invoice_pdf, monkeypatch, parallel=True)
+    assert serial["diagnostics"]["stages"]["mode"] == "serial"
+    assert parallel["diagnostics"]["stages"]["mode"] == "threads"
+    assert [item["product"] for item in parallel["layout_items"]] == ["Cotton Shirt Blue", "Denim Pants"]
+    assert parallel["layout_items"] == serial["layout_items"]
+    assert parallel["text"] == serial["text"] and parallel["warnings"] == serial["warnings"]
+
+
+def test_missing_dependency_in_a_stage_thread_fails_only_that_stage(invoice_pdf, monkeypatch, capsys):
+    monkeypatch.setattr(process_file, "pdf2image", process_file._LazyModule("process_file_no_such_module"))
+    monkeypatch.setattr(process_file, "_extract_items_from_tesseract_images",
+                        lambda *args, **kwargs: process_file.pdf2image.convert_from_path(invoice_pdf))
+    result = _run(invoice_pdf, monkeypatch, parallel=True)
+    assert any(w.startswith("tesseract_roi_failed: Missing Python dependency") for w in result["warnings"])
+    assert len(result["layout_items"]) == 2
+    assert capsys.readouterr().out == ""
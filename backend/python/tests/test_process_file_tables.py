@@ -0,0 +1,139 @@
+import os
+
+import numpy as np
+import pytest
+
+import process_file
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "uploads")
+
+
+def _layout_items(monkeypatch, name):
+    monkeypatch.setenv("LAYOUT_TEMPLATES", "0")
+    path = os.path.join(UPLOADS, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{name} not present")
+    return process_file._extract_items_from_pdf_layout(path)
+
+
+def test_layout_items_match_shopee_invoice(monkeypatch):
+    # Order Details: ₱1.00 x 1, ₱20.00 x 1, ₱20.00 x 1; Merchandise Subtotal ₱41.00
+    items = _layout_items(monkeypatch, "file-1758022578089-129057976.pdf")
+    assert [(it["no"], it["variation"], it["productPrice"], it["qty"], it["subtotal"]) for it in items] == [
+        (1, "25g", 1.0, 1, 1.0),
+        (2, "SILVER-A(1pcs）", 20.0, 1, 20.0),
+        (3, "SILVER-B(1pcs）", 20.0, 1, 20.0),
+    ]
+    assert items[1]["product"] == "CHK 3mm Alphabet Letters Numbers Chunky Glitter Epoxy Resin Decorative Stickers"
+
+
+def test_layout_items_stop_before_buyer_remarks(monkeypatch):
+    # One item, ₱82.00 x 1, followed by the buyer's remarks and the summary lines
+    items = _layout_items(monkeypatch, "file-1757998307471-100517332.pdf")
+    assert [(it["product"], it["productPrice"], it["qty"], it["subtotal"]) for it in items] == [
+        ("Red Padding Glue 250g (250 grams) - Stik Grip", 82.0, 1, 82.0),
+    ]
+
+
+def test_row_item_reads_no_price_qty_subtotal():
+    words = ["2", "CHK", "Stickers", "SILVER-A", "₱20.00", "1", "₱20.00"]
+    mids = [63.0, 98.0, 130.0, 340.0, 403.0, 446.0, 496.0]
+    assert process_file._table_row_item(words, mids) == {
+        "product": "CHK Stickers SILVER-A", "variation": None, "productPrice": 20.0, "qty": 1, "subtotal": 20.0,
+    }
+
+
+def _header_columns(cells):
+    words, x0 = [], []
+    for text, x in cells:
+        words.append(text)
+        x0.append(float(x))
+    x0 = np.array(x0)
+    x1 = x0 + 6.0 * np.array([len(w) for w in words])
+    boxes = process_file._WordBoxes(words, x0, np.full(len(words), 100.0), x1, np.full(len(words), 110.0))
+    lines = process_file._table_rows_by_proximity(boxes, np.arange(len(words)), 3.0)
+    return [name for _, name in process_file._table_header(lines)[1]]
+
+
+def test_header_product_price_is_one_column_only_within_a_cell():
+    # Shopee: 'Product Price' is one cell, a word space apart
+    assert _header_columns([("No.", 20), ("Product", 60), ("Name", 108), ("Variation", 250), ("Product", 330),
+                            ("Price", 375), ("Qty", 450), ("Subtotal", 500)]) == [
+        "no", "product", "variation", "price", "qty", "subtotal"]
+    # Separate Product and Price columns side by side
+    assert _header_columns([("No", 20), ("Product", 80), ("Price", 400), ("Qty", 500), ("Subtotal", 580)]) == [
+        "no", "product", "price", "qty", "subtotal"]
+
+
+def test_page_fingerprint_ignores_lines_below_the_table():
+    from layout_template_store import page_fingerprint
+
+    head = [(40, 40, "Order Summary"), (40, 70, "Order ID: 2409A"), (40, 90, "Seller Name: Shop A"),
+            (40, 120, "No. Product Name Variation Product Price Qty Subtotal")]
+
+    def page(items):
+        rows = [(40, 140 + 20 * i, f"{i + 1} Item {i + 1} 10.00 1 10.00") for i in range(items)]
+        return head + rows + [(300, 160 + 20 * items, "Merchandise Subtotal: 10.00")]
+
+    short = page_fingerprint(page(1), 595, 842, process_file._table_header_names)
+    assert short == page_fingerprint(page(12), 595, 842, process_file._table_header_names)
+    assert short[2] == "shop a"
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_layout_templates_open_in_the_private_cache_directory(monkeypatch, tmp_path):
+    monkeypatch.setattr(process_file.tempfile, "gettempdir", lambda: str(tmp_path))
+    monkeypatch.delenv("LAYOUT_TEMPLATES_PATH", raising=False)
+    monkeypatch.setenv("LAYOUT_TEMPLATES", "1")
+    monkeypatch.setattr(process_file, "_LAYOUT_TEMPLATES", None)
+    store = process_file._layout_templates()
+    try:
+        assert os.path.dirname(store.db_path) == os.path.join(str(tmp_path), f"process_file-{os.getuid()}")
+        assert os.stat(store.db_path).st_mode & 0o777 == 0o600
+    finally:
+        store.close()
+
+
+def _tsv_frame():
+    """image_to_data rows: words out of order, a '-1' layout row, a word without a box and a blank word"""
+    pd = pytest.importorskip("pandas")
+    rows = [
+        # block, par, line, left, top, width, height, conf, text
+        (1, 1, 1, 0, 0, 600, 40, "-1", None),
+        (1, 1, 2, 210, 52, 60, 14, "91", "Qty"),
+        (1, 1, 1, 20, 10, 80, 14, "96", "Order"),
+        (1, 1, 1, 110, 11, 90, 14, "95", "Details"),
+        (1, 1, 2, 20, 50, 70, 14, "93", "Product"),
+        (1, 1, 2, "", 50, 40, 14, "90", "Lost"),
+        (2, 1, 1, 330, 90, 70, 15, "88", "P500.00"),
+        (2, 1, 1, 20, 92, 150, 13, "90", "Cotton"),
+        (2, 1, 1, 180, 91, 40, 13, "12", None),
+        (1, 2, 1, 400, 30, 80, 12, "80", "Paid"),
+    ]
+    columns = ["block_num", "par_num", "line_num", "left", "top", "width", "height", "conf", "text"]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def _groupby_lines(df):
+    """Lines as the former pandas code built them: filter, then one group per (block, par, line)"""
+    pd = pytest.importorskip("pandas")
+    df = df[df["conf"].astype(str) != "-1"].copy()
+    df["text"] = df["text"].fillna("")
+    for col in ("left", "top", "width"):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df = df.dropna(subset=["left", "top", "width"])
+    lines = []
+    for _key, group in df.groupby(["block_num", "par_num", "line_num"]):
+        group = group.sort_values("left", kind="stable")
+        lines.append((" ".join(group["text"]), float(group["left"].min()), float(group["top"].min())))
+    return lines
+
+
+def test_tesseract_lines_match_the_pandas_groupby():
+    df = _tsv_frame()
+    lines = process_file._table_lines_by_key(process_file._tesseract_word_boxes(df), reading_order=False)
+    assert list(zip(lines.texts, lines.x.tolist())) == [(text, x) for text, x, _top in _groupby_lines(df)]
+    # In reading order lines go by their top, then left
+    lines = process_file._table_lines_by_key(process_file._tesseract_word_boxes(df))
+    expected = sorted(_groupby_lines(df), key=lambda line: (line[2], line[1]))
+    assert list(zip(lines.texts, lines.y.tolist())) == [(text, top) for text, _x, top in expected]
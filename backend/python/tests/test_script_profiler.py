@@ -0,0 +1,56 @@
+import os
+import pstats
+import threading
+
+import process_file
+from script_profiler import ScriptProfiler, profile_base_path, profiling_requested
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+
+def test_profile_flag_is_taken_out_of_the_arguments(monkeypatch):
+    monkeypatch.delenv("PYTHON_PROFILE", raising=False)
+    args = ["in.pdf", "--profile", "--budget-ms", "100"]
+    assert profiling_requested(args) and args == ["in.pdf", "--budget-ms", "100"]
+    assert not profiling_requested(["in.pdf"])
+    monkeypatch.setenv("PYTHON_PROFILE", "/tmp/profiles")
+    assert profiling_requested(["in.pdf"])
+    assert profile_base_path("/data/in.pdf", "process_file") == os.path.join("/tmp/profiles", "in.pdf")
+
+
+def test_stages_and_threads_are_profiled(tmp_path):
+    profiler = ScriptProfiler(str(tmp_path / "in.pdf")).start()
+    with profiler.stage("parse"):
+        blob = [bytearray(1024) for _ in range(512)]
+        worker = threading.Thread(target=_busy, args=(200_000,))
+        worker.start()
+        worker.join()
+    with profiler.stage("structure"):
+        _busy(10_000)
+    summary = profiler.finish()
+    del blob
+    assert [s["name"] for s in summary["stages"]] == ["parse", "structure"]
+    parse = summary["stages"][0]
+    assert parse["netBytes"] >= 512 * 1024 and parse["peakBytes"] >= parse["netBytes"]
+    assert parse["topAllocations"] and summary["peakTracedBytes"] >= parse["peakBytes"]
+    assert summary["threads"] == 2
+    # Every thread's profile is merged into one set of stats
+    assert any("_busy" in row["function"] or "genexpr" in row["function"] for row in summary["hottest"])
+    assert pstats.Stats(summary["statsFile"]).total_calls > 0
+    with open(summary["allocationsFile"], encoding="utf-8") as f:
+        report = f.read()
+    assert "== parse:" in report and "== structure:" in report
+
+
+def test_process_file_stages_are_profiled_when_a_profiler_runs(monkeypatch, tmp_path):
+    profiler = ScriptProfiler(str(tmp_path / "in.pdf"), snapshots=False).start()
+    monkeypatch.setattr(process_file, "_PROFILER", profiler)
+    sched = process_file._StageScheduler()
+    assert sched.run("layout", lambda: _busy(1000)) == _busy(1000)
+    monkeypatch.setattr(process_file, "_PROFILER", None)
+    sched.run("pdfplumber", lambda: None)
+    summary = profiler.finish()
+    assert [s["name"] for s in summary["stages"]] == ["layout"]
+    assert summary["stages"][0]["topAllocations"] == []
@@ -0,0 +1,50 @@
+import json
+import threading
+
+from trace_spans import SpanTracer
+
+
+def _traced():
+    tracer = SpanTracer()
+    with tracer.span("main", pages=2):
+        with tracer.span("page", page=1) as span:
+            span["bytes"] = 512
+        parent = tracer.current()
+        worker = threading.Thread(target=lambda: _ocr(tracer, parent), name="ocr-0")
+        worker.start()
+        worker.join()
+    return tracer
+
+
+def _ocr(tracer, parent):
+    with tracer.adopt(parent), tracer.span("tesseract_image"):
+        pass
+
+
+def test_tree_nests_spans_across_threads():
+    (main,) = _traced().tree()
+    assert main["name"] == "main" and main["pages"] == 2
+    page, ocr = main["children"]
+    assert (page["name"], page["page"], page["bytes"]) == ("page", 1, 512)
+    assert (ocr["name"], ocr["thread"]) == ("tesseract_image", "ocr-0")
+    assert "thread" not in main
+    assert main["startMs"] <= page["startMs"] <= ocr["startMs"]
+    assert page["wallMs"] <= main["wallMs"] and ocr["wallMs"] <= main["wallMs"]
+
+
+def test_chrome_trace_is_well_formed(tmp_path):
+    path = _traced().write_chrome_trace(str(tmp_path / "run.trace.json"))
+    with open(path, encoding="utf-8") as f:
+        trace = json.load(f)
+    assert trace["displayTimeUnit"] == "ms"
+    complete = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    names = {e["args"]["name"]: e["tid"] for e in trace["traceEvents"] if e["ph"] == "M"}
+    assert [e["name"] for e in complete] == ["main", "page", "tesseract_image"]
+    assert set(names) == {"MainThread", "ocr-0"}
+    for event in complete:
+        assert set(event) == {"name", "ph", "pid", "tid", "ts", "dur", "args"}
+        assert event["ts"] >= 0 and event["dur"] >= 0 and event["args"]["cpuMs"] >= 0
+        assert event["tid"] == names["ocr-0" if event["name"] == "tesseract_image" else "MainThread"]
+    main, page, _ocr = complete
+    assert main["ts"] <= page["ts"] and page["ts"] + page["dur"] <= main["ts"] + main["dur"]
+    assert page["args"] == {"page": 1, "bytes": 512, "cpuMs": page["args"]["cpuMs"]}
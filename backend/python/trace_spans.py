@@ -0,0 +1,129 @@
+"""
+Lightweight nested tracing spans for the Python processing scripts
+Each span records wall time, CPU time of the thread that ran it and optional
+counters (bytes, pages, ...). Spans nest per thread; work handed to a pool can
+name its parent explicitly. The result is a JSON tree for diagnostics and,
+optionally, a Chrome trace file (chrome://tracing, Perfetto, speedscope).
+
+Used by: process_file.py (diagnostics['timings'], PROCESS_FILE_TRACE)
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class SpanTracer:
+    """
+    Collects spans; safe to use from several threads
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def current(self):
+        """
+        Innermost open span on this thread (pass it as parent= to work run on another thread)
+        """
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def adopt(self, parent):
+        """
+        Make `parent` (a span from another thread) the current span on this thread, without timing it
+        """
+        stack = self._stack()
+        stack.append(parent)
+        try:
+            yield parent
+        finally:
+            stack.pop()
+
+    @contextmanager
+    def span(self, name, parent=None, **attrs):
+        """
+        Time a block; yields the span dict so the block can add counters (span['bytes'] = n)
+        """
+        stack = self._stack()
+        record = dict(attrs)
+        record['name'] = name
+        if parent is None and stack:
+            parent = stack[-1]
+        record['parent'] = id(parent) if parent is not None else None
+        record['thread'] = threading.current_thread().name
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        stack.append(record)
+        try:
+            yield record
+        finally:
+            stack.pop()
+            record['start'] = start - self.origin
+            record['wall'] = time.perf_counter() - start
+            record['cpu'] = time.thread_time() - cpu_start
+            with self.lock:
+                self.spans.append(record)
+
+    def tree(self):
+        """
+        Nested spans in start order: {name, startMs, wallMs, cpuMs, <counters>, children}
+        """
+        with self.lock:
+            spans = sorted(self.spans, key=lambda s: s['start'])
+        nodes = {}
+        roots = []
+        for span in spans:
+            node = {
+                'name': span['name'],
+                'startMs': round(span['start'] * 1000, 1),
+                'wallMs': round(span['wall'] * 1000, 1),
+                'cpuMs': round(span['cpu'] * 1000, 1),
+            }
+            for key, value in span.items():
+                if key not in ('name', 'parent', 'thread', 'start', 'wall', 'cpu'):
+                    node[key] = value
+            if span['thread'] != 'MainThread':
+                node['thread'] = span['thread']
+            nodes[id(span)] = node
+        for span in spans:
+            parent = nodes.get(span['parent'])
+            if parent is not None:
+                parent.setdefault('children', []).append(nodes[id(span)])
+            else:
+                roots.append(nodes[id(span)])
+        return roots
+
+    def write_chrome_trace(self, path):
+        """
+        Write complete ('X') events in the Chrome trace event format
+        """
+        with self.lock:
+            spans = list(self.spans)
+        threads = {}
+        events = []
+        pid = os.getpid()
+        for span in sorted(spans, key=lambda s: s['start']):
+            tid = threads.setdefault(span['thread'], len(threads) + 1)
+            args = {k: v for k, v in span.items() if k not in ('name', 'parent', 'thread', 'start', 'wall', 'cpu')}
+            args['cpuMs'] = round(span['cpu'] * 1000, 3)
+            events.append({
+                'name': span['name'], 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': round(span['start'] * 1e6, 1), 'dur': round(span['wall'] * 1e6, 1), 'args': args,
+            })
+        for name, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return path